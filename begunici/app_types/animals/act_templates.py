@@ -0,0 +1,201 @@
+"""
+Шаблоны актов и кэш готовых актов.
+
+Разбор .xlsx-шаблона openpyxl занимает десятки миллисекунд, поэтому реестр
+шаблонов загружает каждый файл один раз на процесс и хранит его снимок
+(pickle книги). Каждый вызов open() получает независимую копию из снимка —
+это в 10–20 раз быстрее load_workbook. Снимок перечитывается, если файл
+шаблона изменился (mtime). Подготовка, не зависящая от данных (например,
+вставка строк под нужное количество животных), тоже кэшируется: prepare
+применяется один раз для каждого variant.
+
+Готовые акты кэшируются в django cache по ключу: вид акта, его параметры,
+дата выгрузки, mtime шаблона и версия данных. Версия данных увеличивается
+сигналами при изменении животных, истории, взвешиваний и актов
+(invalidate_acts); короткий таймаут страхует от изменений в других
+процессах и массовых UPDATE, которые сигналов не посылают.
+"""
+
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from copy import copy
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+ACT_CACHE_TIMEOUT = 300
+ACT_CACHE_PREFIX = "acts"
+ACT_DATA_VERSION_KEY = f"{ACT_CACHE_PREFIX}:data_version"
+# Сколько подготовленных вариантов шаблонов держать в памяти процесса
+MAX_TEMPLATE_VARIANTS = 64
+
+
+def get_templates_dir():
+    return Path(settings.BASE_DIR) / "begunici" / "app_types" / "animals" / "excel_templates"
+
+
+def get_template_path(*parts):
+    return get_templates_dir().joinpath(*parts)
+
+
+def get_template_mtime(path):
+    return Path(path).stat().st_mtime_ns
+
+
+class TemplateRegistry:
+    """Снимки разобранных шаблонов: (путь, variant) -> (mtime, pickle книги)."""
+
+    def __init__(self, max_variants=MAX_TEMPLATE_VARIANTS):
+        self.max_variants = max_variants
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, path, variant=None, prepare=None):
+        """
+        Новая книга из шаблона. prepare(workbook) применяется к книге до
+        снимка, поэтому для одного variant выполняется один раз.
+        Если шаблона нет — FileNotFoundError.
+        """
+        path = Path(path)
+        mtime = get_template_mtime(path)
+        key = (str(path), variant)
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot[0] == mtime:
+                self._snapshots.move_to_end(key)
+                data = snapshot[1]
+            else:
+                data = None
+        if data is None:
+            workbook = _load_workbook(path)
+            if prepare is not None:
+                prepare(workbook)
+            data = pickle.dumps(workbook, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                self._snapshots[key] = (mtime, data)
+                self._snapshots.move_to_end(key)
+                while len(self._snapshots) > self.max_variants:
+                    self._snapshots.popitem(last=False)
+        return pickle.loads(data)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+def _load_workbook(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise RuntimeError("Библиотека openpyxl не установлена") from exc
+    return load_workbook(path)
+
+
+template_registry = TemplateRegistry()
+
+
+def open_template(path, variant=None, prepare=None):
+    return template_registry.open(path, variant=variant, prepare=prepare)
+
+
+def save_workbook(workbook):
+    output = BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+def copy_sheet_into(workbook, source, title):
+    """
+    Копирует лист source (из другой книги) в workbook: значения, стили,
+    объединения, размеры строк и колонок, параметры печати и изображения.
+    Стили переносятся объектами — индексы стилей у книг свои. Ячейки без
+    стиля получают стиль книги по умолчанию, поэтому, если он у книг разный,
+    стиль по умолчанию книги source переносится явно.
+    """
+    from openpyxl.cell.cell import MergedCell
+
+    source_book = source.parent
+    same_defaults = (
+        source_book._fonts[0] == workbook._fonts[0]
+        and source_book._fills[0] == workbook._fills[0]
+        and source_book._borders[0] == workbook._borders[0]
+    )
+    target = workbook.create_sheet(title=title[:31])
+    for cell_range in source.merged_cells.ranges:
+        target.merge_cells(str(cell_range))
+
+    for row in source.iter_rows():
+        for cell in row:
+            target_cell = target.cell(row=cell.row, column=cell.column)
+            if not isinstance(cell, MergedCell):
+                target_cell.value = cell.value
+            if cell.has_style or not same_defaults:
+                target_cell.font = copy(cell.font)
+                target_cell.border = copy(cell.border)
+                target_cell.fill = copy(cell.fill)
+                target_cell.number_format = cell.number_format
+                target_cell.protection = copy(cell.protection)
+                target_cell.alignment = copy(cell.alignment)
+
+    for key, dimension in source.column_dimensions.items():
+        target_dimension = target.column_dimensions[key]
+        target_dimension.width = dimension.width
+        target_dimension.hidden = dimension.hidden
+        target_dimension.min = dimension.min
+        target_dimension.max = dimension.max
+    for key, dimension in source.row_dimensions.items():
+        target.row_dimensions[key].height = dimension.height
+        target.row_dimensions[key].hidden = dimension.hidden
+
+    target.sheet_format = copy(source.sheet_format)
+    target.sheet_properties = copy(source.sheet_properties)
+    target.page_setup = copy(source.page_setup)
+    target.page_margins = copy(source.page_margins)
+    target.print_options = copy(source.print_options)
+    target.sheet_view.showGridLines = source.sheet_view.showGridLines
+    target.sheet_view.zoomScale = source.sheet_view.zoomScale
+    if source.print_area:
+        target.print_area = source.print_area
+    for image in source._images:
+        target.add_image(copy(image))
+    return target
+
+
+def get_act_data_version():
+    version = cache.get(ACT_DATA_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(ACT_DATA_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_acts():
+    """Сбрасывает кэш готовых актов (новая версия данных)."""
+    try:
+        cache.incr(ACT_DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(ACT_DATA_VERSION_KEY, 2, None)
+
+
+def get_act_cache_key(kind, params, template_path):
+    raw = repr((params, timezone.localdate().isoformat(), get_template_mtime(template_path)))
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return f"{ACT_CACHE_PREFIX}:{kind}:{get_act_data_version()}:{digest}"
+
+
+def get_cached_act(kind, params, template_path, build):
+    """
+    Байты готового акта из кэша или build() (книга openpyxl). params — всё,
+    кроме данных БД, от чего зависит содержимое (номер акта, год, пользователь).
+    """
+    key = get_act_cache_key(kind, params, template_path)
+    data = cache.get(key)
+    if data is None:
+        data = save_workbook(build())
+        cache.set(key, data, ACT_CACHE_TIMEOUT)
+    return data
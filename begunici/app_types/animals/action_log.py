@@ -0,0 +1,177 @@
+"""
+Отложенная запись журнала действий пользователей (write-behind).
+
+Записи UserActionLog не сохраняются в рамках запроса: после фиксации
+текущей транзакции (transaction.on_commit) они помещаются в ограниченную
+очередь процесса, а фоновый поток сохраняет их пачками через bulk_create.
+Действие, транзакция которого откатилась, в журнал не попадает. Время
+действия фиксируется в момент вызова log_user_action.
+
+- если очередь заполнена, отложенная запись отключена настройкой
+  USER_ACTION_LOG_ASYNC или поток не удалось запустить, запись сохраняется
+  синхронно, как раньше;
+- при завершении процесса (atexit) очередь сохраняется полностью;
+- после fork (воркеры gunicorn/uwsgi) очередь и поток создаются заново.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .log_links import attach_animal_types
+from .models_user_log import UserActionLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0  # секунды
+
+
+class ActionLogWriter:
+    """Очередь записей журнала и фоновый поток, сохраняющий их пачками."""
+
+    def __init__(self, buffer_size, batch_size, flush_interval):
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def _ensure_started(self):
+        """Запускает поток в текущем процессе (повторно — после fork)."""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return True
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return True
+            if self._pid != pid:
+                # Очередь родительского процесса после fork не используется
+                self._queue = queue.Queue(maxsize=self.buffer_size)
+                self._pid = pid
+            self._stopping.clear()
+            try:
+                self._thread = threading.Thread(
+                    target=self._run, name="user-action-log-writer", daemon=True
+                )
+                self._thread.start()
+            except RuntimeError:
+                # Интерпретатор завершается — новые потоки создавать нельзя
+                self._thread = None
+                return False
+        return True
+
+    def submit(self, entry):
+        """Ставит запись в очередь. False — очередь недоступна или заполнена."""
+        if self._stopping.is_set() or not self._ensure_started():
+            return False
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            return False
+        return True
+
+    def _drain(self, first=None):
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+        connection.close()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        with self._write_lock:
+            close_old_connections()
+            try:
+                # Типы животных для ссылок — одним запросом на всю пачку
+                attach_animal_types(batch)
+            except Exception:
+                logger.exception("Не удалось определить типы животных для журнала действий")
+            try:
+                UserActionLog.objects.bulk_create(batch, batch_size=self.batch_size)
+                return
+            except Exception:
+                logger.exception("Не удалось сохранить пачку журнала действий, сохраняем по одной записи")
+                connection.close()
+            for entry in batch:
+                try:
+                    entry.pk = None
+                    entry.save(force_insert=True)
+                except Exception:
+                    logger.exception("Запись журнала действий потеряна: %s", entry.description[:200])
+
+    def flush(self):
+        """Синхронно сохраняет всё, что накопилось в очереди текущего процесса."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._write(batch)
+
+    def shutdown(self):
+        """Останавливает поток и сохраняет остаток очереди (вызывается при выходе)."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+_writer = ActionLogWriter(
+    buffer_size=getattr(settings, "USER_ACTION_LOG_BUFFER_SIZE", DEFAULT_BUFFER_SIZE),
+    batch_size=getattr(settings, "USER_ACTION_LOG_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+    flush_interval=getattr(settings, "USER_ACTION_LOG_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+)
+atexit.register(_writer.shutdown)
+
+
+def is_async_logging_enabled():
+    return getattr(settings, "USER_ACTION_LOG_ASYNC", True)
+
+
+def _store_entry(entry):
+    if is_async_logging_enabled() and _writer.submit(entry):
+        return
+    attach_animal_types([entry])
+    entry.save(force_insert=True)
+
+
+def log_user_action(**fields):
+    """
+    Записывает действие пользователя (аргументы — поля UserActionLog).
+    Запись ставится в очередь после фиксации текущей транзакции (вне
+    транзакции — сразу) и по умолчанию сохраняется фоновым потоком.
+    """
+    entry = UserActionLog(**fields)
+    entry.refresh_technical_flag()
+    transaction.on_commit(lambda: _store_entry(entry))
+    return entry
+
+
+def flush_user_action_log():
+    """Дожидается сохранения накопленных записей журнала (для команд и отладки)."""
+    _writer.flush()
@@ -0,0 +1,277 @@
+"""
+Помесячные секции журнала действий и архивирование старых записей.
+
+В PostgreSQL таблица UserActionLog секционирована по timestamp (RANGE, по
+месяцу на секцию, плюс секция DEFAULT для записей вне созданных секций).
+Старые месяцы выгружаются в сжатые JSONL-файлы в каталог бэкапов, после чего
+секция отсоединяется и удаляется целиком — без DELETE по строкам и без
+роста таблицы. На других СУБД (и до секционирования) те же функции
+выгружают и удаляют записи месяца обычным запросом.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime, time
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models_user_log import UserActionLog
+
+DEFAULT_RETENTION_MONTHS = 12
+ARCHIVE_SUBDIR = "action_logs"
+EXPORT_BATCH_SIZE = 2000
+EXPORT_FIELDS = (
+    "id",
+    "user_id",
+    "user__username",
+    "action_type",
+    "object_type",
+    "object_id",
+    "description",
+    "timestamp",
+    "ip_address",
+    "additional_data",
+    "animal_types",
+    "is_technical",
+)
+
+
+def get_log_table():
+    return UserActionLog._meta.db_table
+
+
+def get_partition_name(month_start):
+    return f"{get_log_table()}_y{month_start:%Y}m{month_start:%m}"
+
+
+def get_default_partition_name():
+    return f"{get_log_table()}_default"
+
+
+def get_archive_dir():
+    return os.path.join(settings.BASE_DIR, "backups", ARCHIVE_SUBDIR)
+
+
+def get_archive_path(month_start):
+    return os.path.join(get_archive_dir(), f"action_log_{month_start:%Y-%m}.jsonl.gz")
+
+
+def month_start_of(value):
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def month_bounds(month_start):
+    """Границы месяца [начало, начало следующего) в часовом поясе проекта."""
+    start = timezone.make_aware(datetime.combine(month_start, time.min))
+    end = timezone.make_aware(datetime.combine(month_start + relativedelta(months=1), time.min))
+    return start, end
+
+
+def get_retention_months():
+    return getattr(settings, "USER_ACTION_LOG_RETENTION_MONTHS", DEFAULT_RETENTION_MONTHS)
+
+
+def get_retention_cutoff(keep_months=None, today=None):
+    """Первый сохраняемый месяц: всё, что раньше, подлежит архивированию."""
+    keep_months = get_retention_months() if keep_months is None else keep_months
+    today = today or timezone.localdate()
+    return today.replace(day=1) - relativedelta(months=max(keep_months - 1, 0))
+
+
+# --- PostgreSQL: секции ----------------------------------------------------
+
+
+def is_partitioned():
+    """Секционирована ли таблица журнала (только PostgreSQL)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [get_log_table()],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """{первое число месяца: имя секции} для помесячных секций журнала."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [get_log_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f"{get_log_table()}_y"
+    partitions = {}
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        try:
+            partitions[datetime.strptime(name[len(prefix):], "%Ym%m").date()] = name
+        except ValueError:
+            continue
+    return partitions
+
+
+def _timestamp_literal(value):
+    # Границы секции в DDL задаются литералами (параметры там не поддерживаются)
+    return f"'{value.isoformat()}'::timestamptz"
+
+
+def create_partition(executor, month_start):
+    """
+    Создаёт секцию месяца. Записи этого месяца, уже попавшие в секцию
+    DEFAULT, переносятся в новую секцию (иначе PostgreSQL не даст её
+    присоединить). executor — курсор или schema_editor.
+    """
+    quote = connection.ops.quote_name
+    table = quote(get_log_table())
+    partition = quote(get_partition_name(month_start))
+    default_partition = quote(get_default_partition_name())
+    start, end = month_bounds(month_start)
+
+    executor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+    executor.execute(
+        f'WITH moved AS (DELETE FROM {default_partition} WHERE "timestamp" >= %s AND "timestamp" < %s '
+        f"RETURNING *) INSERT INTO {partition} SELECT * FROM moved",
+        [start, end],
+    )
+    executor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+        f"FOR VALUES FROM ({_timestamp_literal(start)}) TO ({_timestamp_literal(end)})"
+    )
+
+
+def ensure_partitions(months_ahead=2, today=None):
+    """Создаёт недостающие секции с текущего месяца на months_ahead вперёд."""
+    if not is_partitioned():
+        return []
+    existing = list_partitions()
+    month = (today or timezone.localdate()).replace(day=1)
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for _offset in range(months_ahead + 1):
+            if month not in existing:
+                create_partition(cursor, month)
+                created.append(month)
+            month += relativedelta(months=1)
+    return created
+
+
+def _drop_partition(month_start):
+    table = connection.ops.quote_name(get_log_table())
+    partition = connection.ops.quote_name(get_partition_name(month_start))
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition}")
+        cursor.execute(f"DROP TABLE {partition}")
+
+
+# --- Архивирование ---------------------------------------------------------
+
+
+def get_months_to_archive(cutoff):
+    """Месяцы с записями раньше cutoff (по секциям и по самим записям)."""
+    months = set()
+    if is_partitioned():
+        months.update(month for month in list_partitions() if month < cutoff)
+    months.update(
+        month_start_of(value)
+        for value in UserActionLog.objects.filter(timestamp__lt=month_bounds(cutoff)[0]).datetimes(
+            "timestamp", "month"
+        )
+    )
+    return sorted(months)
+
+
+def export_month(month_start, path):
+    """Выгружает записи месяца в сжатый JSONL-файл (по строке на запись). Возвращает количество."""
+    start, end = month_bounds(month_start)
+    queryset = (
+        UserActionLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by("timestamp", "id")
+        .values(*EXPORT_FIELDS)
+    )
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for row in queryset.iterator(chunk_size=EXPORT_BATCH_SIZE):
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            archive.write("\n")
+            count += 1
+    return count
+
+
+def _append_archive(part_path, path):
+    """Переносит выгрузку в итоговый файл; к существующему архиву дописывается gzip-блок."""
+    if not os.path.exists(path):
+        os.replace(part_path, path)
+        return
+    with open(path, "ab") as target, open(part_path, "rb") as source:
+        shutil.copyfileobj(source, target)
+    os.remove(part_path)
+
+
+def purge_month(month_start):
+    """Удаляет записи месяца: секцию целиком (PostgreSQL) или запросом DELETE."""
+    if is_partitioned() and month_start in list_partitions():
+        _drop_partition(month_start)
+        return
+    start, end = month_bounds(month_start)
+    UserActionLog.objects.filter(timestamp__gte=start, timestamp__lt=end).delete()
+
+
+def archive_month(month_start, dry_run=False):
+    """
+    Выгружает месяц в архив и удаляет его из БД. Возвращает (путь, количество);
+    для пустого месяца файл не создаётся и путь равен None.
+    """
+    if dry_run:
+        start, end = month_bounds(month_start)
+        count = UserActionLog.objects.filter(timestamp__gte=start, timestamp__lt=end).count()
+        return (get_archive_path(month_start) if count else None), count
+
+    path = get_archive_path(month_start)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.part"
+    try:
+        with transaction.atomic():
+            count = export_month(month_start, part_path)
+            purge_month(month_start)
+    except Exception:
+        # Записи остались в БД — незавершённую выгрузку не сохраняем
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if not count:
+        os.remove(part_path)
+        return None, 0
+    _append_archive(part_path, path)
+    return path, count
+
+
+def archive_old_logs(keep_months=None, dry_run=False, today=None):
+    """Архивирует все месяцы старше срока хранения. Возвращает [(месяц, путь, количество)]."""
+    cutoff = get_retention_cutoff(keep_months, today=today)
+    results = []
+    for month_start in get_months_to_archive(cutoff):
+        path, count = archive_month(month_start, dry_run=dry_run)
+        results.append((month_start, path, count))
+    return results
+
+
+def get_recent_logs_start(months, today=None):
+    """Начало периода «последние months месяцев» — граница для отсечения старых секций."""
+    month = (today or timezone.localdate()).replace(day=1) - relativedelta(months=max(months - 1, 0))
+    return month_bounds(month)[0]
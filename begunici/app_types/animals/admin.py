@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Maker, Ram, Ewe, Sheep, Lambing
+from .models_export_job import ExportJob
+from .models_scales import ScalesApiToken, ScalesOperation
 
 admin.site.register(Maker)
 admin.site.register(Ram)
@@ -32,3 +34,46 @@ class SheepAdmin(admin.ModelAdmin):
 # Регистрируем модель с кастомным админом
 admin.site.register(Sheep, SheepAdmin)
 admin.site.register(Ewe, EweAdmin)
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "user", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    readonly_fields = ("created_at", "started_at", "finished_at", "updated_at")
+
+
+admin.site.register(ExportJob, ExportJobAdmin)
+
+
+class ScalesOperationAdmin(admin.ModelAdmin):
+    list_display = ("key", "operation", "created_at")
+    list_filter = ("operation",)
+    search_fields = ("key",)
+    readonly_fields = ("key", "operation", "result", "created_at")
+
+
+admin.site.register(ScalesOperation, ScalesOperationAdmin)
+
+
+def revoke_scales_tokens(modeladmin, request, queryset):
+    for token in queryset:
+        token.revoke()
+    modeladmin.message_user(request, "Выбранные токены отозваны")
+
+
+revoke_scales_tokens.short_description = "Отозвать токены"
+
+
+class ScalesApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("prefix", "name", "user", "scopes", "created_at", "last_used_at", "revoked_at")
+    list_filter = ("revoked_at",)
+    search_fields = ("name", "prefix")
+    readonly_fields = ("user", "prefix", "token_hash", "created_at", "last_used_at", "revoked_at")
+    actions = [revoke_scales_tokens]
+
+    def has_add_permission(self, request):
+        # Токен выпускается командой create_scales_user --token или через API
+        return False
+
+
+admin.site.register(ScalesApiToken, ScalesApiTokenAdmin)
@@ -0,0 +1,131 @@
+"""
+Поиск животных по номеру бирки и РСХН.
+
+Прежний поиск собирал для каждого слова OR из восьми условий (точное
+совпадение и contains в исходном, нижнем, верхнем и title-регистре) — такой
+запрос не может использовать индексы и читает таблицы целиком. В PostgreSQL
+регистронезависимый поиск — одно условие UPPER(поле) LIKE UPPER('%слово%')
+на колонку, а для UPPER(tag_number) и UPPER(rshn_tag) есть триграммные
+GIN-индексы (pg_trgm, миграция 0038), которые обслуживают и подстроку, и
+префикс. На других СУБД остаётся перебор вариантов регистра: их LIKE не
+меняет регистр кириллицы.
+
+search_animals — общий поиск для автодополнения: совпадения с начала номера
+идут первыми, затем совпадения по РСХН и подстроке.
+"""
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from begunici.app_types.veterinary.vet_models import Tag
+
+from .models import Ewe, Maker, Ram, Sheep
+
+# Ключ типа, модель и подпись — как в общем списке животных
+SEARCH_ANIMAL_TYPES = (
+    ("maker", Maker, "Баран-Производитель"),
+    ("ram", Ram, "Баранчик"),
+    ("ewe", Ewe, "Ярка"),
+    ("sheep", Sheep, "Овцематка"),
+)
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+RANK_TAG_PREFIX = 0
+RANK_RSHN_PREFIX = 1
+RANK_CONTAINS = 2
+
+
+def split_search_terms(value):
+    """Слова поиска: несколько значений перечисляются через запятую."""
+    if value is None:
+        return []
+    return [term.strip() for term in str(value).split(",") if term.strip()]
+
+
+def _case_variants_q(field_name, value):
+    variants = {value, value.lower(), value.upper(), value.title()}
+    combined_q = Q()
+    for variant in variants:
+        combined_q |= Q(**{f"{field_name}__contains": variant})
+    return combined_q
+
+
+def contains_q(field_name, value):
+    """Поле содержит любое из слов value без учёта регистра."""
+    use_icontains = connection.vendor == "postgresql"
+    combined_q = Q()
+    for term in split_search_terms(value):
+        if use_icontains:
+            combined_q |= Q(**{f"{field_name}__icontains": term})
+        else:
+            combined_q |= _case_variants_q(field_name, term)
+    return combined_q
+
+
+def _matching_tag_ids(terms):
+    # Бирки ищутся в одной таблице Tag (по её индексу), животные — по tag_id
+    return Tag.objects.filter(contains_q("tag_number", ",".join(terms))).values("id")
+
+
+def animal_search_q(value, tag_id_field="tag_id", rshn_field="rshn_tag"):
+    """
+    Номер бирки или РСХН животного содержит любое из слов value. Условие по
+    бирке — подзапрос к Tag: LIKE через JOIN внутри OR не использует индекс.
+    """
+    terms = split_search_terms(value)
+    if not terms:
+        return Q()
+    return Q(**{f"{tag_id_field}__in": _matching_tag_ids(terms)}) | contains_q(rshn_field, value)
+
+
+def _search_rank(terms, match_rshn):
+    whens = [When(tag__tag_number__istartswith=term, then=Value(RANK_TAG_PREFIX)) for term in terms]
+    if match_rshn:
+        whens += [When(rshn_tag__istartswith=term, then=Value(RANK_RSHN_PREFIX)) for term in terms]
+    return Case(*whens, default=Value(RANK_CONTAINS), output_field=IntegerField())
+
+
+def search_animals(
+    query,
+    *,
+    archived=False,
+    match_rshn=True,
+    match_names=False,
+    require_rshn=False,
+    limit=DEFAULT_SEARCH_LIMIT,
+):
+    """
+    Животные, у которых номер бирки (или РСХН, имя производителя) содержит
+    слово поиска: список (ключ типа, подпись типа, животное). archived —
+    True/False или None (все). Пустой запрос — все животные по номеру бирки.
+    """
+    terms = split_search_terms(query)
+    limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+    search_filter = None
+    if terms:
+        search_filter = Q(tag_id__in=_matching_tag_ids(terms))
+        if match_rshn:
+            search_filter |= contains_q("rshn_tag", query)
+
+    matches = []
+    for type_key, model, type_label in SEARCH_ANIMAL_TYPES:
+        queryset = model.objects.select_related("tag", "animal_status", "place")
+        if archived is not None:
+            queryset = queryset.filter(is_archived=archived)
+        if require_rshn:
+            queryset = queryset.exclude(rshn_tag__isnull=True).exclude(rshn_tag="")
+        if search_filter is not None:
+            type_filter = search_filter
+            if match_names and model is Maker:
+                type_filter = type_filter | contains_q("name", query)
+            queryset = queryset.filter(type_filter).annotate(search_rank=_search_rank(terms, match_rshn))
+        else:
+            queryset = queryset.annotate(search_rank=Value(RANK_CONTAINS, output_field=IntegerField()))
+
+        for animal in queryset.order_by("search_rank", Lower("tag__tag_number"))[:limit]:
+            matches.append((animal.search_rank, animal.tag.tag_number.lower(), type_key, type_label, animal))
+
+    matches.sort(key=lambda match: match[:2])
+    return [(type_key, type_label, animal) for _rank, _number, type_key, type_label, animal in matches[:limit]]
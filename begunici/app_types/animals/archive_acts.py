@@ -1,14 +1,13 @@
 from io import BytesIO
-from pathlib import Path
 from urllib.parse import quote
 
 from dateutil.relativedelta import relativedelta
-from django.conf import settings
 from django.http import HttpResponse
 from django.utils import timezone
 
-from begunici.app_types.veterinary.vet_models import StatusHistory, Tag, WeightRecord
+from begunici.app_types.veterinary.vet_models import Tag, WeightRecord
 
+from .act_templates import get_cached_act, get_template_path, open_template
 from .models import ArchiveAct, Ewe, Maker, Ram, Sheep
 
 
@@ -109,15 +108,7 @@ def get_archive_act_template_path(status_name):
     config = get_archive_act_template_config(status_name)
     if not config:
         return None
-    return (
-        Path(settings.BASE_DIR)
-        / "begunici"
-        / "app_types"
-        / "animals"
-        / "excel_templates"
-        / "archive_acts"
-        / config["filename"]
-    )
+    return get_template_path("archive_acts", config["filename"])
 
 
 def find_animal(animal_type, tag_number):
@@ -141,16 +132,10 @@ def get_latest_live_weight(tag):
 
 
 def get_archive_status_date(animal):
-    if not animal.tag or not animal.animal_status:
+    if not animal.tag_id or not animal.animal_status_id or not animal.archived_at:
         return None
-    history = (
-        StatusHistory.objects.filter(tag=animal.tag, new_status=animal.animal_status)
-        .order_by("-change_date", "-id")
-        .first()
-    )
-    if history and history.change_date:
-        return normalize_date(history.change_date)
-    return None
+    # Дата последней записи истории с текущим статусом хранится на животном
+    return normalize_date(animal.archived_at)
 
 
 def format_age_for_act(birth_date, reference_date=None):
@@ -238,14 +223,26 @@ def get_act_number_from_note(note):
 
 
 def get_archive_act_context(animal, user=None):
+    return build_archive_act_context(
+        animal,
+        get_archive_act_for_animal(animal),
+        lambda: get_latest_live_weight(animal.tag),
+        user=user,
+    )
+
+
+def build_archive_act_context(animal, act, get_latest_weight, user=None):
+    """
+    Данные акта по уже загруженному акту архивирования (или None);
+    get_latest_weight() вызывается, только если в акте нет живого веса.
+    """
     status_name = animal.animal_status.status_type if animal.animal_status else ""
     config = get_archive_act_template_config(status_name)
     if not config:
         return None
 
-    act = get_archive_act_for_animal(animal)
     status_date = (act.status_date if act else None) or get_archive_status_date(animal)
-    live_weight = (act.live_weight if act and act.live_weight is not None else None) or get_latest_live_weight(animal.tag)
+    live_weight = (act.live_weight if act and act.live_weight is not None else None) or get_latest_weight()
     animal_type = animal.get_animal_type()
     responsible_person = get_responsible_person_for_user(user)
 
@@ -331,23 +328,7 @@ def write_archive_act_row(sheet, context):
     sheet[f"AJ{row}"] = context.get("responsible_person") or ""
 
 
-def generate_archive_act_workbook(animal, user=None):
-    try:
-        from openpyxl import load_workbook
-    except ImportError as exc:
-        raise RuntimeError("Библиотека openpyxl не установлена") from exc
-
-    context = get_archive_act_context(animal, user=user)
-    if not context:
-        return None
-
-    template_path = get_archive_act_template_path(context["status_name"])
-    if not template_path or not template_path.exists():
-        raise FileNotFoundError(f"Шаблон акта не найден: {template_path}")
-
-    workbook = load_workbook(template_path)
-    sheet = workbook.active
-
+def fill_archive_act_sheet(sheet, context):
     write_act_number(sheet, context)
     write_archive_sender(sheet, context)
     if context["config"].get("layout") == "sale":
@@ -360,10 +341,30 @@ def generate_archive_act_workbook(animal, user=None):
         write_date_parts(sheet, context["act_date"])
 
 
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
+def build_archive_act_workbook(context):
+    workbook = open_template(get_archive_act_template_path(context["status_name"]))
+    fill_archive_act_sheet(workbook.active, context)
+    return workbook
+
+
+def generate_archive_act_workbook(animal, user=None):
+    status_name = animal.animal_status.status_type if animal.animal_status else ""
+    if not get_archive_act_template_config(status_name):
+        return None
+
+    template_path = get_archive_act_template_path(status_name)
+    if not template_path.exists():
+        raise FileNotFoundError(f"Шаблон акта не найден: {template_path}")
+
+    # Ответственный зависит от пользователя, остальное — от данных животного
+    params = (animal.get_animal_type(), animal.pk, get_responsible_person_for_user(user))
+    data = get_cached_act(
+        "archive",
+        params,
+        template_path,
+        lambda: build_archive_act_workbook(get_archive_act_context(animal, user=user)),
+    )
+    return BytesIO(data)
 
 
 def archive_act_response(animal, user=None):
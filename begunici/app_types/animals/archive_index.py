@@ -0,0 +1,162 @@
+"""
+Дата архивирования животного и выборка архива средствами БД.
+
+Дата перевода в текущий статус (последняя запись StatusHistory с этим
+статусом) хранится в поле AnimalBase.archived_at. Поле заполняется при
+сохранении животного и пересчитывается сигналами при изменении истории
+статусов, поэтому страница архива, выгрузка в Excel и фильтры по дате
+архивирования выполняются одним запросом (UNION ALL по четырём таблицам)
+с сортировкой и пагинацией в БД. У животных без истории статусов поле
+пустое — для сортировки и фильтров архива вместо него берётся дата рождения.
+"""
+
+from django.db.models import CharField, DateTimeField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, TruncDate
+
+from begunici.app_types.veterinary.vet_models import StatusHistory, Tag
+
+from .models import Ewe, Maker, Ram, Sheep
+from .record_prefetch import get_latest_weight_records
+
+ANIMAL_MODELS = (Maker, Ram, Ewe, Sheep)
+ANIMAL_MODELS_BY_TYPE = {model.__name__: model for model in ANIMAL_MODELS}
+ARCHIVE_SELECT_RELATED = ("tag", "animal_status", "place")
+# Дата архивирования для сортировки и фильтров: без истории статусов — дата рождения
+ARCHIVE_SORT_DATE = Coalesce("archived_at", Cast("birth_date", DateTimeField()))
+ARCHIVE_DATE = Coalesce(TruncDate("archived_at"), "birth_date")
+# Порядок архива: самые свежие первыми, животные без обеих дат — в конце
+ARCHIVE_ORDERING = (F("archive_sort_date").desc(nulls_last=True), F("pk").desc())
+
+
+def latest_status_change_date(tag_id, status_id):
+    """Дата последнего перевода бирки в указанный статус (или None)."""
+    if tag_id is None or status_id is None:
+        return None
+    return (
+        StatusHistory.objects.filter(tag_id=tag_id, new_status_id=status_id)
+        .order_by("-change_date", "-id")
+        .values_list("change_date", flat=True)
+        .first()
+    )
+
+
+def _archived_at_subquery():
+    return Subquery(
+        StatusHistory.objects.filter(tag_id=OuterRef("tag_id"), new_status_id=OuterRef("animal_status_id"))
+        .order_by("-change_date", "-id")
+        .values("change_date")[:1]
+    )
+
+
+def refresh_archived_at(tag_ids=None):
+    """
+    Пересчитывает archived_at одним UPDATE на таблицу: для указанных бирок
+    или (tag_ids=None) для всего поголовья. Возвращает число обновлённых строк.
+    """
+    if tag_ids is not None:
+        tag_ids = {tag_id for tag_id in tag_ids if tag_id is not None}
+        if not tag_ids:
+            return 0
+
+    models = ANIMAL_MODELS if tag_ids is None else _models_for_tags(tag_ids)
+    updated = 0
+    for model in models:
+        queryset = model.objects.all()
+        if tag_ids is not None:
+            queryset = queryset.filter(tag_id__in=tag_ids)
+        updated += queryset.update(archived_at=_archived_at_subquery())
+    return updated
+
+
+def _models_for_tags(tag_ids):
+    """Таблицы животных для бирок по Tag.animal_type (все — если тип не заполнен)."""
+    models = set()
+    for animal_type in Tag.objects.filter(pk__in=tag_ids).values_list("animal_type", flat=True).distinct():
+        model = ANIMAL_MODELS_BY_TYPE.get(animal_type or "")
+        if model is None:
+            return ANIMAL_MODELS
+        models.add(model)
+    return [model for model in ANIMAL_MODELS if model in models]
+
+
+def filter_archive_dates(queryset, date_from=None, date_to=None):
+    """Диапазон дат архивирования (дата в часовом поясе проекта, см. ARCHIVE_DATE)."""
+    if not date_from and not date_to:
+        return queryset
+    queryset = queryset.annotate(archive_date=ARCHIVE_DATE)
+    if date_from:
+        queryset = queryset.filter(archive_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(archive_date__lte=date_to)
+    return queryset
+
+
+def archive_rows(querysets_by_type):
+    """
+    Объединяет отфильтрованные querysets ({animal_type: queryset}) в один
+    запрос строк (animal_type, pk, archive_sort_date), упорядоченный по дате
+    архивирования. Результат можно считать (count) и нарезать срезами.
+    """
+    parts = [
+        queryset.annotate(
+            row_type=Value(animal_type, output_field=CharField()),
+            archive_sort_date=ARCHIVE_SORT_DATE,
+        )
+        .values("row_type", "pk", "archive_sort_date")
+        .order_by()
+        for animal_type, queryset in querysets_by_type.items()
+    ]
+    if not parts:
+        return Maker.objects.none().values("pk")
+    combined = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    return combined.order_by(*ARCHIVE_ORDERING)
+
+
+def load_archive_animals(rows):
+    """
+    Загружает экземпляры животных для строк archive_rows (по запросу на
+    встретившийся тип) в исходном порядке строк.
+    """
+    rows = list(rows)
+    pks_by_type = {}
+    for row in rows:
+        pks_by_type.setdefault(row["row_type"], []).append(row["pk"])
+
+    loaded = {}
+    for animal_type, pks in pks_by_type.items():
+        model = ANIMAL_MODELS_BY_TYPE[animal_type]
+        for pk, animal in model.objects.select_related(*ARCHIVE_SELECT_RELATED).in_bulk(pks).items():
+            loaded[(animal_type, pk)] = animal
+
+    return [
+        loaded[(row["row_type"], row["pk"])]
+        for row in rows
+        if (row["row_type"], row["pk"]) in loaded
+    ]
+
+
+def build_archive_serializer_context(animals):
+    """
+    Данные для ArchiveAnimalSerializer, загруженные пакетом для набора
+    животных: последний живой вес по бирке и типы матерей (для ссылки).
+    """
+    tag_ids = [animal.tag_id for animal in animals if animal.tag_id]
+    last_live_weights = {
+        tag_id: record.weight for tag_id, record in get_latest_weight_records(tag_ids).items()
+    }
+
+    mother_tags = {(animal.mother or "").strip() for animal in animals}
+    mother_tags.discard("")
+    mother_types = {}
+    if mother_tags:
+        # Ссылка строится на Ewe в первую очередь, как и при поштучной проверке
+        for model in (Sheep, Ewe):
+            for tag_number in model.objects.filter(tag__tag_number__in=mother_tags).values_list(
+                "tag__tag_number", flat=True
+            ):
+                mother_types[tag_number] = model.__name__
+
+    return {
+        "last_live_weights": last_live_weights,
+        "mother_types": mother_types,
+    }
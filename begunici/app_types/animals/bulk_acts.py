@@ -0,0 +1,271 @@
+"""
+Пакетная печать актов выбытия и актов перевода.
+
+Данные для всех актов пакета загружаются несколькими запросами (животные,
+последние акты архивирования и взвешивания, история статусов), после чего
+акты формируются в пуле потоков без обращений к БД. Результат — ZIP с
+отдельным файлом на акт или одна книга, где каждый акт на своём листе.
+Готовые акты берутся из кэша актов (act_templates), если они там есть.
+"""
+
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from begunici.app_types.veterinary.vet_models import PlaceMovement
+
+from .act_templates import copy_sheet_into, get_cached_act
+from .archive_acts import (
+    ARCHIVE_ACT_TEMPLATES,
+    build_archive_act_context,
+    build_archive_act_workbook,
+    get_archive_act_template_path,
+    get_responsible_person_for_user,
+)
+from .excel_export import XLSX_CONTENT_TYPE, ExportRequestError, ExportResult
+from .models import Ewe, Maker, Ram, Sheep, TransferAct
+from .record_prefetch import get_latest_archive_acts, get_latest_weight_records
+from .transfer_acts import (
+    build_transfer_act_group,
+    build_transfer_act_workbook,
+    filter_transfer_acts,
+    get_template_path as get_transfer_act_template_path,
+    parse_filter_date,
+    prefetch_transfer_act_rows,
+)
+
+BULK_ACT_KINDS = ("archive", "transfer")
+BULK_ACT_OUTPUTS = ("zip", "xlsx")
+# Больше актов за один раз не формируется
+BULK_ACTS_MAX = 500
+DEFAULT_BULK_ACTS_WORKERS = 4
+
+
+class BulkAct:
+    """Один акт пакета: имя файла, название листа, параметры кэша и построение книги."""
+
+    def __init__(self, kind, filename, sheet_title, cache_params, template_path, build):
+        self.kind = kind
+        self.filename = filename
+        self.sheet_title = sheet_title
+        self.cache_params = cache_params
+        self.template_path = template_path
+        self.build = build
+
+    def render(self):
+        return get_cached_act(self.kind, self.cache_params, self.template_path, self.build)
+
+
+def parse_tag_list(value):
+    """Список бирок из массива или строки через запятую, без пустых и дублей."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ExportRequestError("Список должен быть массивом или строкой через запятую")
+    items = []
+    for raw_item in value:
+        item = str(raw_item if raw_item is not None else "").strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def _parse_date_range(params):
+    date_from = parse_filter_date(params.get("date_from"))
+    date_to = parse_filter_date(params.get("date_to"))
+    if params.get("date_from") and not date_from or params.get("date_to") and not date_to:
+        raise ExportRequestError("Неверный формат даты (ожидается YYYY-MM-DD)")
+    return date_from, date_to
+
+
+def collect_archive_acts(params, user=None):
+    """Акты выбытия по списку бирок (tag_numbers) и/или периоду архивирования."""
+    tag_numbers = parse_tag_list(params.get("tag_numbers"))
+    date_from, date_to = _parse_date_range(params)
+    if not tag_numbers and not date_from and not date_to:
+        raise ExportRequestError("Укажите бирки или период для печати актов")
+
+    animals = []
+    for model in (Maker, Ram, Ewe, Sheep):
+        queryset = model.objects.filter(
+            is_archived=True,
+            animal_status__status_type__in=list(ARCHIVE_ACT_TEMPLATES),
+        ).select_related("tag", "animal_status", "place")
+        if tag_numbers:
+            queryset = queryset.filter(tag__tag_number__in=tag_numbers)
+        if date_from:
+            queryset = queryset.filter(archived_at__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(archived_at__date__lte=date_to)
+        animals.extend(queryset[: BULK_ACTS_MAX + 1])
+    if len(animals) > BULK_ACTS_MAX:
+        raise ExportRequestError(f"Слишком много актов за один раз (максимум {BULK_ACTS_MAX})")
+
+    animals.sort(key=lambda animal: (animal.archived_at is None, animal.archived_at, animal.tag.tag_number))
+    tag_ids = [animal.tag_id for animal in animals]
+    archive_acts = get_latest_archive_acts(tag_ids)
+    weights = get_latest_weight_records(tag_ids)
+    responsible_person = get_responsible_person_for_user(user)
+
+    acts = []
+    for animal in animals:
+        weight_record = weights.get(animal.tag_id)
+        context = build_archive_act_context(
+            animal,
+            archive_acts.get(animal.tag_id),
+            lambda record=weight_record: record.weight if record else None,
+            user=user,
+        )
+        tag_number = animal.tag.tag_number
+        status_name = context["status_name"]
+        acts.append(
+            BulkAct(
+                "archive",
+                f"act_{status_name}_{tag_number}.xlsx".replace(" ", "_"),
+                tag_number,
+                (animal.get_animal_type(), animal.pk, responsible_person),
+                get_archive_act_template_path(status_name),
+                lambda context=context: build_archive_act_workbook(context),
+            )
+        )
+    return acts
+
+
+def collect_transfer_acts(params, user=None):
+    """Акты перевода по номерам (act_numbers), дате/месяцу/году или периоду."""
+    act_numbers = []
+    for value in parse_tag_list(params.get("act_numbers")):
+        try:
+            act_numbers.append(int(value))
+        except ValueError:
+            raise ExportRequestError(f"Неверный номер акта: {value}")
+    date_from, date_to = _parse_date_range(params)
+
+    queryset = filter_transfer_acts(
+        TransferAct.objects.select_related("old_place", "new_place"),
+        transfer_date=params.get("transfer_date"),
+        month=params.get("month"),
+        year=params.get("year"),
+    )
+    if act_numbers:
+        queryset = queryset.filter(act_number__in=act_numbers)
+    if date_from:
+        queryset = queryset.filter(transfer_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(transfer_date__lte=date_to)
+    queryset = queryset.prefetch_related(
+        Prefetch(
+            "movements",
+            queryset=PlaceMovement.objects.select_related("tag", "old_place", "new_place").order_by(
+                "created_at", "id"
+            ),
+        )
+    ).order_by("act_number")
+
+    transfer_acts = list(queryset[: BULK_ACTS_MAX + 1])
+    if len(transfer_acts) > BULK_ACTS_MAX:
+        raise ExportRequestError(f"Слишком много актов за один раз (максимум {BULK_ACTS_MAX})")
+
+    groups = [build_transfer_act_group(act, list(act.movements.all())) for act in transfer_acts]
+    prefetch_transfer_act_rows(groups)
+    template_path = get_transfer_act_template_path()
+    responsible_person = get_responsible_person_for_user(user)
+    return [
+        BulkAct(
+            "transfer",
+            f"akt_perevoda_{group['act_number']}_{group['transfer_date'].strftime('%Y-%m-%d')}.xlsx",
+            f"Акт {group['act_number']}",
+            (group["act_number"], responsible_person),
+            template_path,
+            lambda group=group: build_transfer_act_workbook(group, user=user),
+        )
+        for group in groups
+    ]
+
+
+def get_bulk_acts_workers():
+    return max(1, getattr(settings, "ACTS_BULK_WORKERS", DEFAULT_BULK_ACTS_WORKERS))
+
+
+def _render_in_pool(acts, render, progress=None):
+    """Результаты render(act) в порядке acts; формирование идет в пуле потоков."""
+    results = [None] * len(acts)
+    with ThreadPoolExecutor(max_workers=get_bulk_acts_workers()) as executor:
+        futures = {executor.submit(render, act): index for index, act in enumerate(acts)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(acts))
+    return results
+
+
+def write_acts_zip(acts, fileobj, progress=None):
+    contents = _render_in_pool(acts, BulkAct.render, progress=progress)
+    # Файлы xlsx уже сжаты — архив только собирает их
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED) as archive:
+        used_names = set()
+        for act, data in zip(acts, contents):
+            name = act.filename
+            suffix = 2
+            while name in used_names:
+                name = act.filename.replace(".xlsx", f"_{suffix}.xlsx")
+                suffix += 1
+            used_names.add(name)
+            archive.writestr(name, data)
+
+
+def _unique_sheet_title(title, used_titles):
+    result = title[:31]
+    suffix = 2
+    while result in used_titles:
+        result = f"{title[:27]} ({suffix})"
+        suffix += 1
+    used_titles.add(result)
+    return result
+
+
+def build_acts_workbook(acts, progress=None):
+    """Одна книга, лист на акт. Основой служит книга первого акта — с её стилями по умолчанию."""
+    workbooks = _render_in_pool(acts, lambda act: act.build(), progress=progress)
+    workbook = workbooks[0]
+    for sheet in list(workbook.worksheets):
+        if sheet is not workbook.active:
+            workbook.remove(sheet)
+    used_titles = set()
+    workbook.active.title = _unique_sheet_title(acts[0].sheet_title, used_titles)
+    for act, source in zip(acts[1:], workbooks[1:]):
+        copy_sheet_into(workbook, source.active, _unique_sheet_title(act.sheet_title, used_titles))
+    return workbook
+
+
+def build_bulk_acts_export(params, user=None, progress=None):
+    """
+    Пакет актов: kind — "archive" (tag_numbers, date_from, date_to) или "transfer"
+    (act_numbers, transfer_date, month, year, date_from, date_to);
+    output — "zip" (файл на акт) или "xlsx" (лист на акт).
+    """
+    kind = params.get("kind") or "archive"
+    output_format = params.get("output") or "zip"
+    if kind not in BULK_ACT_KINDS:
+        raise ExportRequestError("Неизвестный вид актов")
+    if output_format not in BULK_ACT_OUTPUTS:
+        raise ExportRequestError("Неизвестный формат (ожидается zip или xlsx)")
+
+    collect = collect_archive_acts if kind == "archive" else collect_transfer_acts
+    acts = collect(params, user=user)
+    if not acts:
+        raise ExportRequestError("Нет актов для печати по заданным условиям", 404)
+
+    prefix = "akty_vybytiya" if kind == "archive" else "akty_perevoda"
+    if output_format == "xlsx":
+        workbook = build_acts_workbook(acts, progress=progress)
+        return ExportResult(f"{prefix}_{len(acts)}.xlsx", XLSX_CONTENT_TYPE, workbook.save)
+
+    def write(fileobj):
+        write_acts_zip(acts, fileobj, progress=progress)
+
+    return ExportResult(f"{prefix}_{len(acts)}.zip", "application/zip", write)
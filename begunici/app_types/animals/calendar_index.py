@@ -0,0 +1,414 @@
+"""
+Индекс событий календаря (таблица CalendarEvent).
+
+Для каждого месяца хранятся готовые события по дням: планируемые окоты
+активных случек, заметки, ветобработки и окончания их действия, плановые
+взвешивания (3, 5 и 10 месяцев от рождения). Месяц строится целиком при
+первом чтении (отметка в CalendarEventMonth), после чего календарь месяца
+читается одним запросом; готовый ответ дополнительно кэшируется.
+
+Месяц пересчитывается под блокировкой своей строки CalendarEventMonth, а
+отметка снимается после фиксации изменившей данные транзакции: сброс,
+пришедший во время пересчёта, дождётся его и снова пометит месяц устаревшим.
+
+Сигналы сбрасывают только затронутые месяцы (invalidate_calendar_dates):
+дату окота, заметки, ветобработки и её окончания, месяцы взвешиваний
+животного. Изменение подписей (номер и тип бирки, имя производителя,
+названия в справочнике обработок) сбрасывает только месяцы, где есть
+события с этой биркой, животным или обработкой. Полный пересчёт — команда
+rebuild_calendar_index.
+"""
+
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from begunici.app_types.veterinary.vet_models import Veterinary
+
+from .models import CalendarEvent, CalendarEventMonth, CalendarNote, Ewe, Lambing, Maker, Ram, Sheep
+from .monthly_stats import month_end, to_month
+
+CALENDAR_CACHE_TIMEOUT = 300
+CALENDAR_CACHE_PREFIX = "calendar"
+CALENDAR_VERSION_KEY = f"{CALENDAR_CACHE_PREFIX}:version"
+BULK_CREATE_BATCH_SIZE = 1000
+
+# Плановые взвешивания: (месяцев от рождения, тип, подпись, только для ярок)
+WEIGHING_SCHEDULE = (
+    (3, "primary", "Первичное взвешивание", False),
+    (5, "secondary", "Вторичное взвешивание", False),
+    (10, "final", "Заключительное взвешивание", True),
+)
+# Животные для напоминаний о взвешивании: модель, тип, маршрут карточки, подпись
+WEIGHING_ANIMAL_SOURCES = (
+    (Maker, "maker", "animals:maker-detail", lambda animal: animal.get_display_name()),
+    (Ram, "ram", "animals:ram-detail", lambda animal: animal.tag.tag_number),
+    (Ewe, "ewe", "animals:ewe-detail", lambda animal: animal.tag.tag_number),
+    (Sheep, "sheep", "animals:sheep-detail", lambda animal: animal.tag.tag_number),
+)
+
+
+# --- описание событий (формат прежних эндпоинтов календаря) ---
+
+def lambing_event(lambing):
+    mother = lambing.get_mother()
+    father = lambing.get_father()
+
+    mother_url = None
+    mother_tag = "Неизвестно"
+    if mother and mother.tag:
+        mother_tag = mother.tag.tag_number
+        mother_type = lambing.get_mother_type()
+        if mother_type == "Ярка":
+            mother_url = reverse("animals:ewe-detail", kwargs={"tag_number": mother_tag})
+        elif mother_type == "Овца":
+            mother_url = reverse("animals:sheep-detail", kwargs={"tag_number": mother_tag})
+
+    father_url = None
+    father_tag = "Неизвестно"
+    father_display_name = "Неизвестно"
+    if father and father.tag:
+        father_tag = father.tag.tag_number
+        father_type = lambing.get_father_type()
+        if father_type == "Производитель":
+            father_url = reverse("animals:maker-detail", kwargs={"tag_number": father_tag})
+            father_display_name = father.get_display_name()
+        elif father_type == "Баран":
+            father_url = reverse("animals:ram-detail", kwargs={"tag_number": father_tag})
+            father_display_name = father_tag
+
+    return {
+        "id": lambing.id,
+        "mother_tag": mother_tag,
+        "mother_type": lambing.get_mother_type(),
+        "mother_url": mother_url,
+        "father_tag": father_tag,
+        "father_display_name": father_display_name,
+        "father_type": lambing.get_father_type(),
+        "father_url": father_url,
+        "start_date": lambing.start_date.strftime("%Y-%m-%d"),
+    }
+
+
+def note_event(note):
+    return {
+        "id": note.id,
+        "text": note.text[:100] + "..." if len(note.text) > 100 else note.text,
+        "formatted_text": note.get_formatted_text(),
+    }
+
+
+def _vet_care_fields(vet):
+    care = vet.veterinary_care
+    return {
+        "id": vet.id,
+        "tag_number": vet.tag.tag_number,
+        "animal_type": vet.tag.animal_type,
+        "care_name": care.care_name if care else "Не указано",
+        "care_type": care.care_type if care else "Не указан",
+        "medication": care.medication if care and care.medication else "Не указан препарат",
+        "purpose": care.purpose if care and care.purpose else "Не указана цель",
+    }
+
+
+def vet_treatment_event(vet, care_date, expiry_date):
+    return {
+        **_vet_care_fields(vet),
+        "date_of_care": care_date.strftime("%Y-%m-%d"),
+        "duration_days": vet.duration_days,
+        "expiry_date": expiry_date.strftime("%Y-%m-%d") if expiry_date else None,
+    }
+
+
+def vet_expiring_event(vet, care_date, expiry_date):
+    return {
+        **_vet_care_fields(vet),
+        "date_of_care": care_date.strftime("%Y-%m-%d"),
+        "expiry_date": expiry_date.strftime("%Y-%m-%d"),
+    }
+
+
+def weighing_event(animal, animal_type, url, display_name, weighing_type, weighing_type_display):
+    return {
+        "tag": animal.tag.tag_number,
+        "animal_type": animal_type,
+        "display_name": display_name,
+        "birth_date": animal.birth_date.strftime("%Y-%m-%d"),
+        "weighing_type": weighing_type,
+        "weighing_type_display": weighing_type_display,
+        "url": url,
+    }
+
+
+# --- построение месяца ---
+
+class _MonthEvents:
+    def __init__(self, month):
+        self.month = month
+        self.rows = []
+
+    def add(self, kind, date, payload):
+        self.rows.append(
+            CalendarEvent(month=self.month, date=date, kind=kind, position=len(self.rows), payload=payload)
+        )
+
+
+def _add_lambings(events, first_day, last_day):
+    lambings = Lambing.objects.filter(
+        is_active=True,
+        planned_lambing_date__gte=first_day,
+        planned_lambing_date__lte=last_day,
+    ).select_related("sheep__tag", "ewe__tag", "maker__tag", "ram__tag").order_by("planned_lambing_date", "id")
+    for lambing in lambings:
+        events.add(CalendarEvent.KIND_LAMBING, lambing.planned_lambing_date, lambing_event(lambing))
+
+
+def _add_notes(events, first_day, last_day):
+    for note in CalendarNote.objects.filter(date__gte=first_day, date__lte=last_day).order_by("date", "id"):
+        events.add(CalendarEvent.KIND_NOTE, note.date, note_event(note))
+
+
+def _add_vet_records(events, first_day, last_day):
+    vets = Veterinary.objects.select_related("tag", "veterinary_care")
+    for vet in vets.filter(date_of_care__date__gte=first_day, date_of_care__date__lte=last_day).order_by(
+        "date_of_care", "id"
+    ):
+        care_date = vet.get_care_date()
+        if care_date:
+            events.add(
+                CalendarEvent.KIND_VET_TREATMENT,
+                care_date,
+                vet_treatment_event(vet, care_date, vet.get_expiry_date()),
+            )
+
+    # Окончание действия попадает в месяц, только если обработка была не раньше,
+    # чем за максимальный срок действия до его начала
+    max_duration = Veterinary.objects.filter(duration_days__gt=0).aggregate(value=Max("duration_days"))["value"]
+    if not max_duration:
+        return
+    expiring = vets.filter(
+        duration_days__gt=0,
+        date_of_care__date__gte=first_day - timedelta(days=max_duration),
+        date_of_care__date__lte=last_day,
+    ).order_by("date_of_care", "id")
+    for vet in expiring:
+        care_date = vet.get_care_date()
+        expiry_date = vet.get_expiry_date()
+        if care_date and expiry_date and first_day <= expiry_date <= last_day:
+            events.add(CalendarEvent.KIND_VET_EXPIRING, expiry_date, vet_expiring_event(vet, care_date, expiry_date))
+
+
+def _add_weighings(events, month):
+    # birth_date + N месяцев попадает в месяц month, только если рождение — в month - N
+    for model, animal_type, route_name, display_getter in WEIGHING_ANIMAL_SOURCES:
+        schedule = [item for item in WEIGHING_SCHEDULE if model is Ewe or not item[3]]
+        birth_months = [month - relativedelta(months=months) for months, *_rest in schedule]
+        queryset = model.objects.filter(
+            is_archived=False,
+            birth_date__gte=min(birth_months),
+            birth_date__lte=month_end(max(birth_months)),
+        ).select_related("tag").order_by("birth_date", "id")
+        for animal in queryset:
+            url = reverse(route_name, kwargs={"tag_number": animal.tag.tag_number})
+            display_name = display_getter(animal)
+            for months, weighing_type, weighing_type_display, _ewe_only in schedule:
+                weighing_date = animal.birth_date + relativedelta(months=months)
+                if to_month(weighing_date) != month:
+                    continue
+                events.add(
+                    CalendarEvent.KIND_WEIGHING,
+                    weighing_date,
+                    weighing_event(animal, animal_type, url, display_name, weighing_type, weighing_type_display),
+                )
+
+
+def compute_month_events(month):
+    """События месяца (несохранённые строки CalendarEvent)."""
+    month = to_month(month)
+    first_day, last_day = month, month_end(month)
+    events = _MonthEvents(month)
+    _add_lambings(events, first_day, last_day)
+    _add_notes(events, first_day, last_day)
+    _add_vet_records(events, first_day, last_day)
+    _add_weighings(events, month)
+    return events.rows
+
+
+def rebuild_month(month):
+    """Пересчитывает и сохраняет события месяца."""
+    month = to_month(month)
+    # Строка месяца фиксируется до расчёта, чтобы сброс всегда её находил
+    CalendarEventMonth.objects.get_or_create(month=month)
+    with transaction.atomic():
+        # Расчёт под блокировкой строки месяца: сброс и параллельное построение
+        # того же месяца ждут его окончания и не затирают более свежее состояние
+        CalendarEventMonth.objects.select_for_update().filter(month=month).exists()
+        rows = compute_month_events(month)
+        CalendarEvent.objects.filter(month=month).delete()
+        CalendarEvent.objects.bulk_create(rows, batch_size=BULK_CREATE_BATCH_SIZE)
+        CalendarEventMonth.objects.filter(month=month).update(is_built=True, built_at=timezone.now())
+    cache.delete(get_calendar_cache_key(month))
+    return len(rows)
+
+
+# --- чтение ---
+
+def _get_calendar_version():
+    version = cache.get(CALENDAR_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(CALENDAR_VERSION_KEY, version, None)
+    return version
+
+
+def get_calendar_cache_key(month):
+    return f"{CALENDAR_CACHE_PREFIX}:{_get_calendar_version()}:{month:%Y-%m}"
+
+
+def serialize_month_events(events):
+    """События в разрезе разделов календаря; внутри раздела — по датам."""
+    data = {"lambings": {}, "notes": {}, "vet": {}, "weighings": {}}
+    for kind, event_date, payload in events:
+        date_str = event_date.strftime("%Y-%m-%d")
+        if kind == CalendarEvent.KIND_LAMBING:
+            data["lambings"].setdefault(date_str, []).append(payload)
+        elif kind == CalendarEvent.KIND_NOTE:
+            data["notes"].setdefault(date_str, []).append(payload)
+        elif kind == CalendarEvent.KIND_WEIGHING:
+            data["weighings"].setdefault(date_str, []).append(payload)
+        else:
+            section = "vet_treatments" if kind == CalendarEvent.KIND_VET_TREATMENT else "vet_expiring"
+            data["vet"].setdefault(date_str, {}).setdefault(section, []).append(payload)
+    return data
+
+
+def get_month_calendar(month):
+    """Все события календаря за месяц (из кэша, индекса или с построением месяца)."""
+    month = to_month(month)
+    cache_key = get_calendar_cache_key(month)
+    data = cache.get(cache_key)
+    if data is not None:
+        return data
+
+    if not CalendarEventMonth.objects.filter(month=month, is_built=True).exists():
+        rebuild_month(month)
+    events = CalendarEvent.objects.filter(month=month).order_by("position").values_list("kind", "date", "payload")
+    data = serialize_month_events(events)
+    cache.set(cache_key, data, CALENDAR_CACHE_TIMEOUT)
+    return data
+
+
+# --- инвалидация ---
+
+def _reset_months(months):
+    CalendarEventMonth.objects.filter(month__in=months, is_built=True).update(is_built=False)
+    version = _get_calendar_version()
+    cache.delete_many([f"{CALENDAR_CACHE_PREFIX}:{version}:{month:%Y-%m}" for month in months])
+
+
+def invalidate_calendar_dates(*values):
+    """
+    Сбрасывает месяцы, в которые попадают даты values (пустые значения
+    пропускаются) — после фиксации текущей транзакции, когда изменение
+    видно пересчёту месяца.
+    """
+    months = {to_month(value) for value in values if value}
+    if not months:
+        return
+    transaction.on_commit(lambda: _reset_months(months), robust=True)
+
+
+def invalidate_calendar():
+    """Сбрасывает весь индекс календаря."""
+    CalendarEventMonth.objects.filter(is_built=True).update(is_built=False)
+    try:
+        cache.incr(CALENDAR_VERSION_KEY)
+    except ValueError:
+        cache.set(CALENDAR_VERSION_KEY, 2, None)
+
+
+def get_lambing_calendar_dates(lambing):
+    return [lambing.planned_lambing_date]
+
+
+def get_note_calendar_dates(note):
+    return [note.date]
+
+
+def _as_date(value):
+    """Дата из даты, даты-времени или строки (значения, присвоенные строкой и ещё не прочитанные из БД)."""
+    if isinstance(value, str):
+        value = parse_datetime(value) or parse_date(value)
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value
+
+
+def _vet_dates(date_of_care, duration_days):
+    care_date = _as_date(date_of_care)
+    if not care_date:
+        return []
+    if not duration_days:
+        return [care_date]
+    return [care_date, care_date + timedelta(days=duration_days)]
+
+
+def get_vet_calendar_dates(vet):
+    return _vet_dates(vet.date_of_care, vet.duration_days)
+
+
+def get_weighing_dates(birth_date):
+    birth_date = _as_date(birth_date)
+    if not birth_date:
+        return []
+    return [birth_date + relativedelta(months=months) for months, *_rest in WEIGHING_SCHEDULE]
+
+
+# --- даты событий, в подписях которых есть объект ---
+
+def _vet_records_dates(**filters):
+    dates = []
+    for date_of_care, duration_days in Veterinary.objects.filter(**filters).values_list(
+        "date_of_care", "duration_days"
+    ):
+        dates.extend(_vet_dates(date_of_care, duration_days))
+    return dates
+
+
+def _lambing_dates(lambing_filter):
+    return list(
+        Lambing.objects.filter(lambing_filter, is_active=True).values_list("planned_lambing_date", flat=True)
+    )
+
+
+def get_animal_calendar_dates(animal):
+    """Даты взвешиваний животного и окотов, где оно — мать или отец."""
+    # Поля Lambing названы по моделям родителей: sheep, ewe, maker, ram
+    parent_field = type(animal).__name__.lower()
+    return [*get_weighing_dates(animal.birth_date), *_lambing_dates(Q(**{parent_field: animal.pk}))]
+
+
+def get_tag_calendar_dates(tag_id):
+    """Даты всех событий календаря с биркой tag_id: ветобработки, взвешивания, окоты."""
+    dates = _vet_records_dates(tag_id=tag_id)
+    for model, *_rest in WEIGHING_ANIMAL_SOURCES:
+        for birth_date in model.objects.filter(tag_id=tag_id).values_list("birth_date", flat=True):
+            dates.extend(get_weighing_dates(birth_date))
+    parent_filter = Q()
+    for parent_field in ("sheep", "ewe", "maker", "ram"):
+        parent_filter |= Q(**{f"{parent_field}__tag_id": tag_id})
+    dates.extend(_lambing_dates(parent_filter))
+    return dates
+
+
+def get_vet_care_calendar_dates(care_id):
+    """Даты ветобработок (и окончания их действия) из справочника care_id."""
+    return _vet_records_dates(veterinary_care_id=care_id)
@@ -0,0 +1,132 @@
+"""
+Статистика главной страницы.
+
+Все показатели считаются двумя запросами с условной агрегацией (UNION ALL по
+четырём таблицам животных), результат кэшируется на месяц-ключ. Кэш
+сбрасывается сигналами при изменении животных и истории статусов; короткий
+таймаут страхует от изменений в других процессах, чьи сигналы сюда не доходят.
+"""
+
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.db.models import CharField, Count, Q, Value
+from django.utils import timezone
+
+from begunici.app_types.veterinary.vet_models import StatusHistory
+
+from .models import ARCHIVE_STATUS_NAMES, Ewe, Maker, Ram, Sheep
+
+DASHBOARD_CACHE_TIMEOUT = 60
+DASHBOARD_CACHE_PREFIX = "dashboard_statistics"
+
+DASHBOARD_TYPES = (
+    ("makers", Maker),
+    ("rams", Ram),
+    ("ewes", Ewe),
+    ("sheep", Sheep),
+)
+# Молодняк, для которого считается количество родившихся
+BORN_TYPES = ("rams", "ewes")
+
+
+def get_dashboard_cache_key(month_start):
+    return f"{DASHBOARD_CACHE_PREFIX}:{month_start:%Y-%m}"
+
+
+def invalidate_dashboard_statistics():
+    cache.delete(get_dashboard_cache_key(timezone.localdate().replace(day=1)))
+
+
+def _type_value(key):
+    return Value(key, output_field=CharField())
+
+
+def _count_active_and_born(month_start, month_end):
+    """Один запрос: количество активных и родившихся за месяц по каждому типу."""
+    born_filter = Q(birth_date__gte=month_start, birth_date__lte=month_end)
+    querysets = [
+        model.objects.annotate(type_key=_type_value(key))
+        .values("type_key")
+        .annotate(
+            active=Count("id", filter=Q(is_archived=False)),
+            born=Count("id", filter=born_filter),
+        )
+        .order_by()
+        for key, model in DASHBOARD_TYPES
+    ]
+    rows = querysets[0].union(*querysets[1:], all=True)
+    return {row["type_key"]: row for row in rows}
+
+
+def _count_archived_by_status(month_start, month_end):
+    """Один запрос: переведённые в архив за месяц по типам и статусам."""
+    archived_tag_ids = StatusHistory.objects.filter(
+        new_status__status_type__in=ARCHIVE_STATUS_NAMES,
+        change_date__date__gte=month_start,
+        change_date__date__lte=month_end,
+    ).values("tag_id")
+    querysets = [
+        model.objects.filter(is_archived=True, tag_id__in=archived_tag_ids)
+        .annotate(type_key=_type_value(key))
+        .values("type_key", "animal_status__status_type")
+        .annotate(count=Count("id"))
+        .order_by()
+        for key, model in DASHBOARD_TYPES
+    ]
+    by_type = {key: [] for key, _model in DASHBOARD_TYPES}
+    for row in querysets[0].union(*querysets[1:], all=True):
+        by_type[row["type_key"]].append(
+            {
+                "animal_status__status_type": row["animal_status__status_type"],
+                "count": row["count"],
+            }
+        )
+    return by_type
+
+
+def build_dashboard_statistics(today=None):
+    today = today or timezone.localdate()
+    # Текущий календарный месяц: с 1 числа по последнее число месяца.
+    month_start = today.replace(day=1)
+    month_end = month_start + relativedelta(months=1) - timedelta(days=1)
+
+    counts = _count_active_and_born(month_start, month_end)
+    archived = _count_archived_by_status(month_start, month_end)
+
+    active_by_type = {key: counts.get(key, {}).get("active", 0) for key, _model in DASHBOARD_TYPES}
+    born_by_type = {key: counts.get(key, {}).get("born", 0) for key in BORN_TYPES}
+    archived_by_type = {
+        key: {
+            "total": sum(item["count"] for item in archived[key]),
+            "by_status": archived[key],
+        }
+        for key, _model in DASHBOARD_TYPES
+    }
+
+    return {
+        "active_animals": {
+            "total": sum(active_by_type.values()),
+            "by_type": active_by_type,
+        },
+        "archived_last_month": {
+            "total": sum(item["total"] for item in archived_by_type.values()),
+            "by_type": archived_by_type,
+        },
+        "born_last_month": {
+            "total": sum(born_by_type.values()),
+            "by_type": born_by_type,
+        },
+    }
+
+
+def get_dashboard_statistics():
+    """Статистика текущего месяца из кэша (или рассчитанная и сохранённая в кэш)."""
+    month_start = timezone.localdate().replace(day=1)
+    cache_key = get_dashboard_cache_key(month_start)
+    data = cache.get(cache_key)
+    if data is None:
+        data = build_dashboard_statistics()
+        cache.set(cache_key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,236 @@
+"""
+Пакетный пересчёт дорперности по родословной.
+
+Для полного пересчёта родословная всех четырёх таблиц загружается одним
+проходом (по запросу на таблицу); при изменении одного животного — только
+его потомки, поколение за поколением по индексам mother/father, и их
+вторые родители. Значения рассчитываются в памяти в порядке поколений —
+родители раньше потомков, — а изменившиеся записи сохраняются через
+bulk_update.
+Правило расчёта совпадает с AnimalBase.calculate_dorper_percentage:
+среднее дорперности отца и матери, если она известна у обоих, иначе None;
+заданная вручную дорперность не изменяется.
+Бирки родителей сопоставляются без учёта пробелов по краям и регистра —
+как при поиске родителей в родословной.
+"""
+
+from collections import deque
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.functions import Trim, Upper
+
+from .models import Ewe, Maker, Ram, Sheep
+
+ANIMAL_MODELS = (Maker, Ram, Ewe, Sheep)
+DORPER_QUANT = Decimal("0.00001")  # decimal_places=5 у поля dorper_percentage
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def _clean_tag(value):
+    return (value or "").strip()
+
+
+def _tag_key(value):
+    """Ключ бирки для сопоставления с родителями: без пробелов по краям и регистра."""
+    return _clean_tag(value).upper()
+
+
+# Выражения ключа в БД; для mother/father есть функциональные индексы
+# (миграция 0039), для бирки — триграммный индекс по UPPER(tag_number)
+MOTHER_KEY = Upper(Trim("mother"))
+FATHER_KEY = Upper(Trim("father"))
+TAG_KEY = Upper("tag__tag_number")
+
+
+def _quantize(value):
+    return None if value is None else value.quantize(DORPER_QUANT)
+
+
+class DorperNode:
+    __slots__ = ("model", "pk", "tag_number", "mother", "father", "is_manual", "old_value", "value")
+
+    def __init__(self, model, pk, tag_number, mother, father, is_manual, value):
+        self.model = model
+        self.pk = pk
+        self.tag_number = tag_number
+        self.mother = _tag_key(mother)
+        self.father = _tag_key(father)
+        self.is_manual = is_manual
+        self.old_value = value
+        self.value = value
+
+
+def _load_nodes(nodes, key_expression=None, keys=None, **filters):
+    """
+    Добавляет в nodes животных всех таблиц по условию; возвращает ключи
+    добавленных. key_expression/keys — отбор по ключу бирки, матери или
+    отца среди keys.
+    """
+    added = set()
+    for model in ANIMAL_MODELS:
+        queryset = model.objects.filter(**filters)
+        if key_expression is not None:
+            queryset = queryset.annotate(match_key=key_expression).filter(match_key__in=keys)
+        rows = queryset.values_list(
+            "pk", "tag__tag_number", "mother", "father", "is_manual_dorper", "dorper_percentage"
+        )
+        for pk, tag_number, mother, father, is_manual, value in rows:
+            key = _tag_key(tag_number)
+            if key and key not in nodes:
+                nodes[key] = DorperNode(model, pk, _clean_tag(tag_number), mother, father, is_manual, value)
+                added.add(key)
+    return added
+
+
+def find_dorper_value(tag_number):
+    """Дорперность животного по бирке родителя (без учёта пробелов и регистра) или None."""
+    key = _tag_key(tag_number)
+    if not key:
+        return None
+    nodes = {}
+    _load_nodes(nodes, TAG_KEY, [key])
+    node = nodes.get(key)
+    return None if node is None else node.value
+
+
+def load_dorper_nodes():
+    """Загружает {ключ бирки: DorperNode} для всех животных — по запросу на таблицу."""
+    nodes = {}
+    _load_nodes(nodes)
+    return nodes
+
+
+def load_descendant_nodes(tag_number):
+    """
+    {ключ бирки: DorperNode} для животного, всех его потомков и их вторых
+    родителей — без чтения остального поголовья.
+    """
+    nodes = {}
+    root = _tag_key(tag_number)
+    _load_nodes(nodes, tag__tag_number=_clean_tag(tag_number))
+    generation = {root}
+    while generation:
+        parents = sorted(generation)
+        generation = _load_nodes(nodes, MOTHER_KEY, parents) | _load_nodes(nodes, FATHER_KEY, parents)
+
+    co_parents = {
+        parent
+        for node in nodes.values()
+        for parent in (node.mother, node.father)
+        if parent and parent not in nodes
+    }
+    if co_parents:
+        _load_nodes(nodes, TAG_KEY, sorted(co_parents))
+    return nodes
+
+
+def _build_children(nodes):
+    children = {}
+    for key, node in nodes.items():
+        for parent in {node.mother, node.father}:
+            if parent and parent in nodes and parent != key:
+                children.setdefault(parent, []).append(key)
+    return children
+
+
+def _collect_subtree(root_tags, children):
+    """Все потомки указанных животных (сами корни не включаются)."""
+    subtree = set()
+    queue = deque(root_tags)
+    while queue:
+        for child in children.get(queue.popleft(), ()):
+            if child not in subtree:
+                subtree.add(child)
+                queue.append(child)
+    return subtree
+
+
+def _topological_order(tags, nodes, children):
+    """
+    Порядок поколений внутри набора tags (алгоритм Кана). Животные в
+    циклах (ошибки ввода родителей) добавляются в конец в исходном порядке.
+    """
+    pending_parents = {}
+    for tag in tags:
+        node = nodes[tag]
+        pending_parents[tag] = len({p for p in (node.mother, node.father) if p in tags and p != tag})
+
+    queue = deque(sorted(tag for tag, count in pending_parents.items() if count == 0))
+    order = []
+    while queue:
+        tag = queue.popleft()
+        order.append(tag)
+        for child in children.get(tag, ()):
+            if child in pending_parents:
+                pending_parents[child] -= 1
+                if pending_parents[child] == 0:
+                    queue.append(child)
+
+    if len(order) < len(tags):
+        placed = set(order)
+        order.extend(sorted(tag for tag in tags if tag not in placed))
+    return order
+
+
+def _compute(node, nodes):
+    father = nodes.get(node.father) if node.father else None
+    mother = nodes.get(node.mother) if node.mother else None
+    if father is None or mother is None or father.value is None or mother.value is None:
+        return None
+    return _quantize((father.value + mother.value) / 2)
+
+
+def recalculate_dorper(root_tags=None, dry_run=False, nodes=None):
+    """
+    Пересчитывает дорперность и возвращает список изменённых DorperNode
+    (old_value → value).
+
+    root_tags=None — пересчёт всего поголовья. Иначе пересчитываются только
+    потомки указанных животных (сами они не пересчитываются: их значение
+    считается уже актуальным).
+    """
+    if nodes is None:
+        nodes = load_dorper_nodes()
+    children = _build_children(nodes)
+
+    if root_tags is None:
+        targets = set(nodes)
+    else:
+        targets = _collect_subtree({_tag_key(tag) for tag in root_tags if _tag_key(tag)}, children)
+
+    changed = []
+    for tag in _topological_order(targets, nodes, children):
+        node = nodes[tag]
+        if node.is_manual:
+            continue
+        node.value = _compute(node, nodes)
+        if _quantize(node.old_value) != node.value:
+            changed.append(node)
+
+    if changed and not dry_run:
+        _save_changes(changed)
+    return changed
+
+
+def _save_changes(changed):
+    by_model = {}
+    for node in changed:
+        by_model.setdefault(node.model, []).append(node)
+
+    with transaction.atomic():
+        for model, model_nodes in by_model.items():
+            instances = []
+            for node in model_nodes:
+                instance = model(pk=node.pk)
+                instance.dorper_percentage = node.value
+                instances.append(instance)
+            model.objects.bulk_update(instances, ["dorper_percentage"], batch_size=BULK_UPDATE_BATCH_SIZE)
+
+
+def propagate_dorper_to_descendants(tag_number):
+    """Инкрементальный режим: пересчёт поддерева потомков изменённого животного."""
+    tag_number = _clean_tag(tag_number)
+    if not tag_number:
+        return []
+    return recalculate_dorper(root_tags=[tag_number], nodes=load_descendant_nodes(tag_number))
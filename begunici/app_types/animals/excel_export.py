@@ -0,0 +1,220 @@
+"""
+Потоковая выгрузка таблиц в Excel — общий движок для всех экспортов.
+
+Строки берутся из итератора (обычно queryset.iterator() или генератор,
+загружающий данные частями по EXPORT_CHUNK_SIZE) и сразу записываются книгой
+openpyxl в режиме write-only: в памяти не держится ни весь набор строк, ни
+объекты ячеек. Ширина колонок оценивается по заголовкам и первым
+WIDTH_SAMPLE_ROWS строкам, без второго прохода по листу. Готовая книга
+записывается во временный файл и отдаётся частями (FileResponse —
+разновидность StreamingHttpResponse), после отправки файл удаляется.
+Построители выгрузок возвращают ExportResult, поэтому тот же файл можно
+сохранить на диск в фоновой задаче (см. export_jobs).
+"""
+
+import tempfile
+from datetime import datetime
+from itertools import chain, islice
+
+from django.http import FileResponse
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Сколько первых строк учитывается при оценке ширины колонок
+WIDTH_SAMPLE_ROWS = 200
+# Размер части при загрузке данных для выгрузки
+EXPORT_CHUNK_SIZE = 500
+DEFAULT_HEADER_COLOR = "4472C4"
+DEFAULT_MAX_WIDTH = 60
+
+
+class ExportRequestError(Exception):
+    """Некорректные параметры выгрузки (сообщение показывается пользователю)."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ExportResult:
+    """Готовая выгрузка: имя файла, тип содержимого и функция записи в двоичный файл."""
+
+    def __init__(self, filename, content_type, write):
+        self.filename = filename
+        self.content_type = content_type
+        self._write = write
+
+    def save(self, fileobj):
+        self._write(fileobj)
+
+    def response(self):
+        """Записывает выгрузку во временный файл и отдаёт его потоковым ответом."""
+        output = tempfile.TemporaryFile()
+        self.save(output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=self.filename, content_type=self.content_type)
+
+
+def iter_chunks(iterable, size=EXPORT_CHUNK_SIZE):
+    """Разбивает итерируемое на списки по size элементов."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def estimate_column_widths(headers, sample_rows, min_width=0, max_width=DEFAULT_MAX_WIDTH):
+    """Ширина колонок по длине заголовков и значений из выборки строк."""
+    lengths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for index, value in enumerate(row[: len(lengths)]):
+            if value is not None:
+                lengths[index] = max(lengths[index], len(str(value)))
+    return [min(max(min_width, length + 2), max_width) for length in lengths]
+
+
+def iter_with_progress(rows, progress=None, total=None, step=100):
+    """Передаёт строки дальше, сообщая progress(готово, всего) каждые step строк."""
+    if progress is None:
+        yield from rows
+        return
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % step == 0:
+            progress(done, total)
+    progress(done, total)
+
+
+def export_filename(filename_prefix, extension):
+    return f"{filename_prefix}_{datetime.now().strftime('%Y-%m-%d')}.{extension}"
+
+
+def default_header_style(color=DEFAULT_HEADER_COLOR, wrap_text=False):
+    """Стиль заголовка таблицы: белый жирный шрифт на цветной заливке."""
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    return {
+        "fill": PatternFill(start_color=color, end_color=color, fill_type="solid"),
+        "font": Font(bold=True, color="FFFFFF"),
+        "alignment": Alignment(horizontal="center", vertical="center", wrap_text=wrap_text),
+    }
+
+
+class StreamingWorkbook:
+    """
+    Книга openpyxl в режиме write-only. Листы добавляются add_table, строки
+    записываются по мере чтения итератора; response() отдаёт готовый файл.
+    """
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self._workbook = Workbook(write_only=True)
+
+    def add_table(
+        self,
+        title,
+        headers,
+        rows,
+        summary_lines=None,
+        column_widths=None,
+        min_width=0,
+        max_width=DEFAULT_MAX_WIDTH,
+        header_style=None,
+        cell_style=None,
+        column_formats=None,
+        footer_rows=None,
+        empty_text=None,
+        freeze_header=False,
+    ):
+        """
+        Добавляет лист: строки summary_lines, пустая строка, заголовок, данные
+        из rows, затем footer_rows.
+
+        header_style и cell_style — словари атрибутов ячейки openpyxl (font,
+        fill, alignment, border); column_formats — {номер колонки: number_format}
+        для строк данных. Если строк нет и задан empty_text, он выводится
+        вместо данных. Возвращает количество записанных строк данных.
+        """
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+        from openpyxl.worksheet.views import Pane
+
+        worksheet = self._workbook.create_sheet(title=title[:31])
+        rows = iter(rows)
+        sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+        if column_widths is None:
+            column_widths = estimate_column_widths(headers, sample, min_width=min_width, max_width=max_width)
+        # В режиме write-only размеры колонок задаются до первой строки
+        for column_index, width in enumerate(column_widths, start=1):
+            worksheet.column_dimensions[get_column_letter(column_index)].width = width
+
+        header_style = default_header_style() if header_style is None else header_style
+        column_formats = column_formats or {}
+
+        def styled(value, style, number_format=None):
+            cell = WriteOnlyCell(worksheet, value=value)
+            for attribute, style_value in (style or {}).items():
+                setattr(cell, attribute, style_value)
+            if number_format:
+                cell.number_format = number_format
+            return cell
+
+        header_row = len(summary_lines) + 2 if summary_lines else 1
+        if freeze_header:
+            # Лист write-only: закрепление задаётся через вид листа до первой строки
+            worksheet.sheet_view.pane = Pane(
+                ySplit=header_row,
+                topLeftCell=f"A{header_row + 1}",
+                activePane="bottomLeft",
+                state="frozen",
+            )
+        if summary_lines:
+            for summary_line in summary_lines:
+                worksheet.append([summary_line])
+            worksheet.append([])
+        worksheet.append([styled(header, header_style) for header in headers])
+
+        count = 0
+        for row in chain(sample, rows):
+            if cell_style or column_formats:
+                row = [
+                    styled(value, cell_style, column_formats.get(column_index))
+                    for column_index, value in enumerate(row, start=1)
+                ]
+            worksheet.append(row)
+            count += 1
+
+        if not count and empty_text is not None:
+            worksheet.append([styled(empty_text, cell_style)])
+        for row in footer_rows or ():
+            worksheet.append([styled(value, cell_style) for value in row] if cell_style else row)
+        return count
+
+    def result(self, filename):
+        return ExportResult(filename, XLSX_CONTENT_TYPE, self._workbook.save)
+
+    def response(self, filename):
+        """Сохраняет книгу во временный файл и отдаёт его потоковым ответом."""
+        return self.result(filename).response()
+
+
+def build_table_export(filename_prefix, sheet_title, headers, rows, summary_lines=None, **table_options):
+    """
+    Выгрузка одной таблицы в XLSX (лист sheet_title).
+    rows может быть любым итерируемым, в том числе генератором.
+    """
+    workbook = StreamingWorkbook()
+    workbook.add_table(sheet_title, headers, rows, summary_lines=summary_lines, **table_options)
+    return workbook.result(export_filename(filename_prefix, "xlsx"))
+
+
+def build_table_export_response(filename_prefix, sheet_title, headers, rows, summary_lines=None, **table_options):
+    """Ответ с выгрузкой одной таблицы (см. build_table_export)."""
+    return build_table_export(
+        filename_prefix, sheet_title, headers, rows, summary_lines=summary_lines, **table_options
+    ).response()
@@ -0,0 +1,205 @@
+"""
+Фоновые выгрузки: очередь в таблице ExportJob и их выполнение.
+
+Интерфейс ставит выгрузку в очередь (enqueue_export_job), опрашивает её
+прогресс и скачивает готовый файл. Выполняет задачи команда run_export_jobs
+(пул потоков, можно запускать несколько процессов): задача захватывается
+условным UPDATE, поэтому один и тот же job не возьмут два обработчика.
+
+Построитель выгрузки — функция builder(params, progress=None), возвращающая
+excel_export.ExportResult; progress(готово, всего) сообщает о ходе работы.
+Те же построители вызываются синхронными эндпоинтами экспорта.
+"""
+
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .excel_export import ExportRequestError
+from .models_export_job import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Тип выгрузки -> построитель
+EXPORT_JOB_BUILDERS = {
+    "herd": "begunici.app_types.animals.views.build_herd_export",
+    "animal_detail": "begunici.app_types.animals.views.build_animal_detail_export",
+    "kinship_pairs": "begunici.app_types.animals.views.build_kinship_pairs_export",
+}
+DEFAULT_RETENTION_DAYS = 7
+# Задача без сообщений о прогрессе дольше этого срока считается прерванной
+STALE_JOB_SECONDS = 30 * 60
+# Как часто (секунды) прогресс записывается в БД
+PROGRESS_SAVE_INTERVAL = 1.0
+
+
+def get_export_jobs_dir():
+    return getattr(settings, "EXPORT_JOBS_DIR", os.path.join(settings.BASE_DIR, "exports"))
+
+
+def get_result_path(job):
+    return os.path.join(get_export_jobs_dir(), job.result_path)
+
+
+def enqueue_export_job(user, kind, params):
+    """Ставит выгрузку в очередь. Неизвестный тип — ExportRequestError."""
+    if kind not in EXPORT_JOB_BUILDERS:
+        raise ExportRequestError("Неизвестный тип выгрузки")
+    if not isinstance(params, dict):
+        raise ExportRequestError("Некорректные параметры выгрузки")
+    return ExportJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        kind=kind,
+        params=params,
+    )
+
+
+def claim_next_job():
+    """Захватывает самую старую задачу из очереди (или возвращает None)."""
+    pending_ids = (
+        ExportJob.objects.filter(status=ExportJob.STATUS_PENDING)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in list(pending_ids):
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.STATUS_PENDING).update(
+            status=ExportJob.STATUS_RUNNING,
+            started_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=job_id)
+    return None
+
+
+class JobProgress:
+    """Обработчик progress(готово, всего) для задачи: пишет процент в БД не чаще раза в секунду."""
+
+    def __init__(self, job):
+        self.job = job
+        self._saved_at = 0.0
+
+    def __call__(self, done, total=None, text=None):
+        now = time.monotonic()
+        if now - self._saved_at < PROGRESS_SAVE_INTERVAL:
+            return
+        self._saved_at = now
+        # 100% выставляется только после сохранения файла
+        percent = min(int(done * 100 / total), 99) if total else 0
+        fields = {"progress": percent, "updated_at": timezone.now()}
+        if text is not None:
+            fields["progress_text"] = text[:255]
+        elif total:
+            fields["progress_text"] = f"Обработано {done} из {total}"
+        ExportJob.objects.filter(pk=self.job.pk).update(**fields)
+
+
+def _finish_job(job, **fields):
+    fields.update(finished_at=timezone.now(), updated_at=timezone.now())
+    ExportJob.objects.filter(pk=job.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run_export_job(job):
+    """Выполняет захваченную задачу и сохраняет результат в каталог выгрузок."""
+    try:
+        builder = import_string(EXPORT_JOB_BUILDERS[job.kind])
+        result = builder(job.params, progress=JobProgress(job))
+
+        extension = os.path.splitext(result.filename)[1]
+        relative_path = f"{job.pk}_{uuid.uuid4().hex}{extension}"
+        path = os.path.join(get_export_jobs_dir(), relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{path}.part"
+        try:
+            with open(part_path, "wb") as output:
+                result.save(output)
+            os.replace(part_path, path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    except ExportRequestError as exc:
+        _finish_job(job, status=ExportJob.STATUS_FAILED, error=exc.message)
+    except Exception as exc:
+        logger.exception("Фоновая выгрузка %s завершилась ошибкой", job.pk)
+        _finish_job(job, status=ExportJob.STATUS_FAILED, error=f"Ошибка при создании файла: {exc}")
+    else:
+        _finish_job(
+            job,
+            status=ExportJob.STATUS_DONE,
+            progress=100,
+            progress_text="",
+            result_path=relative_path,
+            result_filename=result.filename,
+            content_type=result.content_type,
+        )
+    return job
+
+
+def run_export_job_in_thread(job):
+    """run_export_job для потока пула: своё соединение с БД, закрываемое после задачи."""
+    close_old_connections()
+    try:
+        return run_export_job(job)
+    finally:
+        connection.close()
+
+
+def fail_stale_jobs(stale_seconds=STALE_JOB_SECONDS):
+    """Помечает ошибкой задачи, «зависшие» в работе (обработчик был остановлен)."""
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    return ExportJob.objects.filter(status=ExportJob.STATUS_RUNNING, updated_at__lt=cutoff).update(
+        status=ExportJob.STATUS_FAILED,
+        error="Выгрузка прервана: обработчик был остановлен",
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def cleanup_expired_jobs(retention_days=None):
+    """Удаляет завершённые задачи старше срока хранения вместе с файлами."""
+    if retention_days is None:
+        retention_days = getattr(settings, "EXPORT_JOBS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = ExportJob.objects.filter(status__in=ExportJob.FINISHED_STATUSES, finished_at__lt=cutoff)
+    removed = 0
+    for job in expired.only("id", "result_path"):
+        if job.result_path:
+            try:
+                os.remove(get_result_path(job))
+            except FileNotFoundError:
+                pass
+        job.delete()
+        removed += 1
+    return removed
+
+
+def serialize_export_job(job):
+    """Состояние задачи для опроса из интерфейса."""
+    from django.urls import reverse
+
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "progress": job.progress,
+        "progress_text": job.progress_text,
+        "error": job.error,
+        "filename": job.result_filename,
+        "download_url": (
+            reverse("animals:export-job-download", kwargs={"job_id": job.pk})
+            if job.status == ExportJob.STATUS_DONE
+            else None
+        ),
+        "created_at": timezone.localtime(job.created_at).strftime("%d.%m.%Y %H:%M:%S"),
+    }
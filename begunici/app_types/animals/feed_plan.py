@@ -1,13 +1,12 @@
 from calendar import monthrange
 from io import BytesIO
-from pathlib import Path
 from urllib.parse import quote
 
 from dateutil.relativedelta import relativedelta
-from django.conf import settings
 from django.http import HttpResponse
 from django.utils import timezone
 
+from .act_templates import get_cached_act, get_template_path as get_act_template_path, open_template
 from .models import Ewe, Maker, Ram, Sheep, STATUS_INSEMINATED, STATUS_LAMBED
 
 
@@ -37,14 +36,7 @@ FEED_GROUP_ROWS = {
 
 
 def get_template_path():
-    return (
-        Path(settings.BASE_DIR)
-        / "begunici"
-        / "app_types"
-        / "animals"
-        / "excel_templates"
-        / TEMPLATE_FILENAME
-    )
+    return get_act_template_path(TEMPLATE_FILENAME)
 
 
 def get_full_age_months(birth_date, as_of_date):
@@ -125,22 +117,18 @@ def fill_feed_plan_workbook(workbook, as_of_date=None):
 
 
 def generate_feed_plan_workbook(as_of_date=None):
-    try:
-        from openpyxl import load_workbook
-    except ImportError as exc:
-        raise RuntimeError("Библиотека openpyxl не установлена") from exc
-
+    as_of_date = as_of_date or timezone.localdate()
     template_path = get_template_path()
     if not template_path.exists():
         raise FileNotFoundError(f"Шаблон не найден: {template_path}")
 
-    workbook = load_workbook(template_path)
-    fill_feed_plan_workbook(workbook, as_of_date=as_of_date)
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
+    data = get_cached_act(
+        "feed_plan",
+        (as_of_date.isoformat(),),
+        template_path,
+        lambda: fill_feed_plan_workbook(open_template(template_path), as_of_date=as_of_date),
+    )
+    return BytesIO(data)
 
 
 def feed_plan_response(as_of_date=None):
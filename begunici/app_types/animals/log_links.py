@@ -0,0 +1,119 @@
+"""
+Ссылки на карточки животных в журнале действий.
+
+Тип животного для бирок из записи лога определяется одним запросом к Tag
+(Tag.animal_type с проверкой, что животное существует) и сохраняется в
+UserActionLog.animal_types при записи лога; старые записи заполнены
+миграцией 0031. При смене типа животного (ярка → овцематка, баранчик →
+производитель) сохранённые типы для его бирки обновляются.
+"""
+
+from begunici.app_types.veterinary.vet_models import Tag
+
+from .log_utils import TAG_LINK_OBJECT_TYPES, normalize_log_for_display
+from .models_user_log import UserActionLog
+
+# Tag.animal_type -> (тип в URL карточки, название)
+ANIMAL_LINK_TYPES = {
+    "Maker": ("maker", "Баран-Производитель"),
+    "Ram": ("ram", "Баранчик"),
+    "Ewe": ("ewe", "Ярка"),
+    "Sheep": ("sheep", "Овцематка"),
+}
+# Обратные связи Tag -> животное (порядок проверки, если тип не заполнен)
+ANIMAL_TAG_RELATIONS = (("Maker", "maker"), ("Ram", "ram"), ("Ewe", "ewe"), ("Sheep", "sheep"))
+REFRESH_BATCH_SIZE = 1000
+
+
+def get_link_tags(display_object_type, display_object_id):
+    """Бирки, для которых строятся ссылки: одна бирка, пара бирок или ничего."""
+    if not display_object_id or display_object_type not in TAG_LINK_OBJECT_TYPES:
+        return []
+    if ", " in display_object_id:
+        tags = [tag.strip() for tag in display_object_id.split(", ")]
+        return tags if len(tags) == 2 else []
+    if display_object_type == "Окот":
+        return []
+    return [display_object_id]
+
+
+def resolve_animal_types(tag_numbers, tag_model=Tag):
+    """
+    {бирка: тип животного или None} — одним запросом к Tag
+    (tag_model — историческая модель при вызове из миграции).
+    """
+    tag_numbers = {tag for tag in tag_numbers if tag}
+    if not tag_numbers:
+        return {}
+
+    columns = ["tag_number", "animal_type"] + [f"{relation}__id" for _type, relation in ANIMAL_TAG_RELATIONS]
+    existing = {}
+    for row in tag_model.objects.filter(tag_number__in=tag_numbers).values_list(*columns):
+        tag_number, animal_type, *animal_ids = row
+        present = [name for (name, _relation), animal_id in zip(ANIMAL_TAG_RELATIONS, animal_ids) if animal_id]
+        if animal_type in present:
+            existing[tag_number] = animal_type
+        elif present:
+            # Тип в бирке не заполнен или устарел — берём таблицу, где животное есть
+            existing[tag_number] = present[0]
+    return {tag: existing.get(tag) for tag in tag_numbers}
+
+
+def attach_animal_types(entries, tag_model=Tag):
+    """
+    Заполняет animal_types у записей лога, где они ещё не определены.
+    Все бирки набора разрешаются одним запросом. Возвращает изменённые записи.
+    """
+    pending = []
+    for entry in entries:
+        if entry.animal_types is not None:
+            continue
+        display_data = normalize_log_for_display(entry)
+        pending.append((entry, get_link_tags(display_data["object_type"], display_data["object_id"])))
+    if not pending:
+        return []
+
+    resolved = resolve_animal_types({tag for _entry, tags in pending for tag in tags}, tag_model)
+    for entry, tags in pending:
+        entry.animal_types = {tag: resolved.get(tag) for tag in tags}
+    return [entry for entry, _tags in pending]
+
+
+def build_animal_link_info(display_data, animal_types):
+    """Информация для ссылок на карточки животных (формат API панели администратора)."""
+    tags = get_link_tags(display_data["object_type"], display_data["object_id"])
+    if not tags:
+        return None
+
+    animal_types = animal_types or {}
+    if len(tags) == 2:
+        pair_tags = []
+        for tag in tags:
+            link_type = ANIMAL_LINK_TYPES.get(animal_types.get(tag) or "")
+            if link_type:
+                url_type, russian_name = link_type
+                pair_tags.append({"tag": tag, "url_type": url_type, "russian_name": russian_name})
+            else:
+                pair_tags.append({"tag": tag, "url_type": None})
+        return {"pair_tags": pair_tags}
+
+    link_type = ANIMAL_LINK_TYPES.get(animal_types.get(tags[0]) or "")
+    if not link_type:
+        return None
+    url_type, russian_name = link_type
+    return {"url_type": url_type, "russian_name": russian_name}
+
+
+def refresh_log_animal_types(tag_number):
+    """Обновляет сохранённый тип бирки в логах (тип животного изменился). Возвращает число записей."""
+    if not tag_number:
+        return 0
+    animal_type = resolve_animal_types([tag_number]).get(tag_number)
+    logs = UserActionLog.objects.filter(animal_types__has_key=tag_number).only("pk", "animal_types")
+    changed = []
+    for log in logs.iterator(chunk_size=REFRESH_BATCH_SIZE):
+        if log.animal_types.get(tag_number) != animal_type:
+            log.animal_types[tag_number] = animal_type
+            changed.append(log)
+    UserActionLog.objects.bulk_update(changed, ["animal_types"], batch_size=REFRESH_BATCH_SIZE)
+    return len(changed)
@@ -27,6 +27,21 @@ TAG_LINK_OBJECT_TYPES = ANIMAL_OBJECT_TYPES | {
 }
 
 
+# Технические (служебные) записи журнала скрываются в панели администратора.
+# Признак вычисляется при записи лога (UserActionLog.is_technical).
+TECHNICAL_LOG_PATHS = (
+    "/animals/api/archive/act-preview/",
+    "/animals/api/check-kinship/",
+)
+TECHNICAL_ACTION_PARTS = ("предпросмотр акта",)
+TECHNICAL_ACTIONS = {"проверка родства"}
+# Успешные запросы, которые уже залогированы представлениями с подробностями
+MIDDLEWARE_DUPLICATE_PATH_RE = re.compile(
+    r"^/animals/(?:lambing-group/(?:[0-9]+/remove-father/)?"
+    r"|lambing/[0-9]+/(?:complete|complete-with-children|complete-early-failure)/)$"
+)
+
+
 def strip_http_status(value):
     if value is None:
         return ""
@@ -410,6 +425,31 @@ def extract_request_context(action_type, raw_details, parsed_details, additional
     return method, _normalize_path(path), status_code, params
 
 
+def is_technical_log(action_type, description, additional_data):
+    """Служебная запись (предпросмотры, проверки) или дубль лога middleware."""
+    action = str(action_type or "").lower()
+    if action in TECHNICAL_ACTIONS or any(part in action for part in TECHNICAL_ACTION_PARTS):
+        return True
+
+    description = str(description or "").lower()
+    if any(path in description for path in TECHNICAL_LOG_PATHS):
+        return True
+
+    if not isinstance(additional_data, dict):
+        return False
+    path = additional_data.get("path")
+    if path in TECHNICAL_LOG_PATHS:
+        return True
+
+    status_code = additional_data.get("status_code")
+    return (
+        isinstance(status_code, (int, float))
+        and status_code < 400
+        and isinstance(path, str)
+        and bool(MIDDLEWARE_DUPLICATE_PATH_RE.match(path))
+    )
+
+
 def is_raw_request_label(value):
     return bool(RAW_REQUEST_RE.search(str(value or "")))
 
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from begunici.app_types.animals.action_log import flush_user_action_log
+from begunici.app_types.animals.action_log_partitions import (
+    archive_old_logs,
+    ensure_partitions,
+    get_retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Архивирует журнал действий старше срока хранения в сжатые JSONL-файлы '
+        '(backups/action_logs) и удаляет эти месяцы из БД; создает секции на ближайшие месяцы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            help='Сколько месяцев (включая текущий) хранить в БД. По умолчанию — USER_ACTION_LOG_RETENTION_MONTHS',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=2,
+            help='На сколько месяцев вперед создавать секции (только PostgreSQL)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, какие месяцы будут архивированы',
+        )
+
+    def handle(self, *args, **options):
+        keep_months = options['keep_months']
+        if keep_months is not None and keep_months < 1:
+            raise CommandError('--keep-months должен быть не меньше 1')
+
+        flush_user_action_log()
+        cutoff = get_retention_cutoff(keep_months)
+        results = archive_old_logs(keep_months, dry_run=options['dry_run'])
+
+        if not results:
+            self.stdout.write(self.style.WARNING(f'Нет записей журнала раньше {cutoff:%Y-%m}'))
+        for month_start, path, count in results:
+            if not count:
+                self.stdout.write(f'{month_start:%Y-%m}: записей нет, удаляется пустая секция')
+            elif options['dry_run']:
+                self.stdout.write(f'{month_start:%Y-%m}: записей {count} -> {path}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{month_start:%Y-%m}: архивировано записей {count} -> {path}'))
+
+        if options['dry_run']:
+            return
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        if created:
+            self.stdout.write(
+                self.style.SUCCESS('Созданы секции: ' + ', '.join(f'{month:%Y-%m}' for month in created))
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from begunici.app_types.animals.scales_sync import cleanup_sync_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет записи журнала синхронизации весов (ScalesSyncChange) старше срока хранения. '
+        'Терминалы с более старым курсором получат полный снимок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Срок хранения в днях. По умолчанию — SCALES_SYNC_RETENTION_DAYS',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is not None and days < 0:
+            raise CommandError('--days не может быть отрицательным')
+
+        removed = cleanup_sync_changes(days)
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {removed}'))
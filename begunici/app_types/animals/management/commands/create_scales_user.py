@@ -3,18 +3,65 @@ import os
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from begunici.app_types.animals.models_scales import ScalesApiToken
+from begunici.app_types.animals.scales_auth import issue_token, parse_scopes
 
 
 class Command(BaseCommand):
-    help = "Создаёт или обновляет сервисного пользователя scales"
+    help = "Создаёт или обновляет сервисного пользователя scales и выпускает токены весов"
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--password",
             help="Пароль пользователя scales; безопаснее передать через SCALES_SERVICE_PASSWORD",
         )
+        parser.add_argument(
+            "--token",
+            action="store_true",
+            help="Выпустить токен для терминала (показывается один раз)",
+        )
+        parser.add_argument(
+            "--token-name",
+            default="",
+            help="Название токена, например имя терминала",
+        )
+        parser.add_argument(
+            "--scopes",
+            default="",
+            help="Права токена через запятую: read, write (по умолчанию все)",
+        )
+        parser.add_argument(
+            "--revoke-tokens",
+            action="store_true",
+            help="Отозвать все действующие токены пользователя scales",
+        )
 
     def handle(self, *args, **options):
+        try:
+            scopes = parse_scopes(options["scopes"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        user = User.objects.filter(username="scales").first()
+        # Для выпуска и отзыва токенов существующему пользователю пароль не нужен
+        if user is None or not (options["token"] or options["revoke_tokens"]) or options.get("password"):
+            self._save_user(options)
+            user = User.objects.get(username="scales")
+
+        if options["revoke_tokens"]:
+            tokens = list(ScalesApiToken.objects.filter(user=user, revoked_at__isnull=True))
+            ScalesApiToken.objects.filter(pk__in=[token.pk for token in tokens]).update(revoked_at=timezone.now())
+            self.stdout.write(self.style.SUCCESS(f"Отозвано токенов: {len(tokens)}"))
+
+        if options["token"]:
+            api_token, raw_token = issue_token(user, name=options["token_name"], scopes=scopes)
+            self.stdout.write(self.style.SUCCESS(f"Токен {api_token} ({', '.join(api_token.scopes)}):"))
+            self.stdout.write(raw_token)
+            self.stdout.write("Сохраните токен — повторно его показать нельзя.")
+
+    def _save_user(self, options):
         password = (
             options.get("password")
             or os.getenv("SCALES_SERVICE_PASSWORD")
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+
+from begunici.app_types.animals.calendar_index import invalidate_calendar, rebuild_month
+from begunici.app_types.animals.models import CalendarEvent
+from begunici.app_types.animals.monthly_stats import current_month, iter_months
+
+# Диапазон по умолчанию: столько месяцев до и после текущего
+DEFAULT_MONTHS_AROUND = 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает индекс событий календаря (CalendarEvent). '
+        'Месяцы вне диапазона строятся при первом просмотре'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='from_month',
+            type=str,
+            help=f'Первый месяц (YYYY-MM). По умолчанию — {DEFAULT_MONTHS_AROUND} месяцев назад',
+        )
+        parser.add_argument(
+            '--to',
+            dest='to_month',
+            type=str,
+            help=f'Последний месяц (YYYY-MM). По умолчанию — через {DEFAULT_MONTHS_AROUND} месяцев',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить весь индекс перед построением',
+        )
+
+    def _parse_month(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f'Неверный формат месяца: {value} (ожидается YYYY-MM)')
+
+    def handle(self, *args, **options):
+        month = current_month()
+        first_month = (
+            self._parse_month(options['from_month'])
+            if options['from_month']
+            else month - relativedelta(months=DEFAULT_MONTHS_AROUND)
+        )
+        last_month = (
+            self._parse_month(options['to_month'])
+            if options['to_month']
+            else month + relativedelta(months=DEFAULT_MONTHS_AROUND)
+        )
+        if first_month > last_month:
+            raise CommandError('Первый месяц позже последнего')
+
+        if options['clear']:
+            invalidate_calendar()
+            CalendarEvent.objects.all().delete()
+            self.stdout.write('Индекс календаря очищен')
+
+        months = list(iter_months(first_month, last_month))
+        events_count = sum(rebuild_month(month) for month in months)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Построено месяцев: {len(months)} '
+                f'({months[0]:%Y-%m} — {months[-1]:%Y-%m}), событий: {events_count}'
+            )
+        )
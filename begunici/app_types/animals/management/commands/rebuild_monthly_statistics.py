@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from begunici.app_types.animals.models import MonthlyStatistic, MonthlyStatisticMonth
+from begunici.app_types.animals.monthly_stats import (
+    current_month,
+    get_first_data_month,
+    iter_months,
+    rebuild_months,
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает помесячную свертку статистики (MonthlyStatistic) по завершенным месяцам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='from_month',
+            type=str,
+            help='Первый пересчитываемый месяц (YYYY-MM). По умолчанию — самый ранний месяц с данными',
+        )
+        parser.add_argument(
+            '--to',
+            dest='to_month',
+            type=str,
+            help='Последний пересчитываемый месяц (YYYY-MM). По умолчанию — прошлый месяц',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить все строки свертки перед пересчетом',
+        )
+
+    def _parse_month(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f'Неверный формат месяца: {value} (ожидается YYYY-MM)')
+
+    def handle(self, *args, **options):
+        # Текущий месяц не хранится в свертке — он всегда считается на лету
+        limit = current_month()
+        first_month = (
+            self._parse_month(options['from_month']) if options['from_month'] else get_first_data_month()
+        )
+        last_month = self._parse_month(options['to_month']) if options['to_month'] else limit
+
+        if options['clear']:
+            MonthlyStatisticMonth.objects.all().delete()
+            MonthlyStatistic.objects.all().delete()
+            self.stdout.write('Свертка очищена')
+
+        if first_month is None:
+            self.stdout.write(self.style.WARNING('Нет данных для расчета статистики'))
+            return
+
+        months = [month for month in iter_months(first_month, last_month) if month < limit]
+        if not months:
+            self.stdout.write(self.style.WARNING('Нет завершенных месяцев в указанном диапазоне'))
+            return
+
+        rows_count = rebuild_months(months)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Пересчитано месяцев: {len(months)} '
+                f'({months[0]:%Y-%m} — {months[-1]:%Y-%m}), строк: {rows_count}'
+            )
+        )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from begunici.app_types.animals.models import Maker, Ram, Ewe, Sheep
+
+from begunici.app_types.animals.dorper import recalculate_dorper
 
 
 class Command(BaseCommand):
@@ -11,56 +12,37 @@ class Command(BaseCommand):
             action='store_true',
             help='Показать что будет изменено, но не сохранять изменения',
         )
+        parser.add_argument(
+            '--tag',
+            action='append',
+            dest='tags',
+            default=None,
+            help='Пересчитать только потомков животного с этой биркой (можно указать несколько раз)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
+        tags = options['tags']
         
         if dry_run:
             self.stdout.write(self.style.WARNING('РЕЖИМ ТЕСТИРОВАНИЯ - изменения не будут сохранены'))
+        if tags:
+            self.stdout.write(f"Пересчет потомков: {', '.join(tags)}")
         
-        total_updated = 0
+        # Родословная загружается один раз, расчет идет по поколениям в памяти
+        changed = recalculate_dorper(root_tags=tags, dry_run=dry_run)
         
-        # Обрабатываем все типы животных
-        for model in [Maker, Ram, Ewe, Sheep]:
-            model_name = model.__name__
-            self.stdout.write(f'\n=== Обработка {model_name} ===')
-            
-            # Находим животных без ручной дорперности
-            animals = model.objects.filter(is_manual_dorper=False)
-            updated_count = 0
-            
-            for animal in animals:
-                old_dorper = animal.dorper_percentage
-                
-                # Вызываем расчет
-                animal.calculate_dorper_percentage()
-                new_dorper = animal.dorper_percentage
-                
-                # Проверяем, изменилось ли значение
-                if old_dorper != new_dorper:
-                    if not dry_run:
-                        # Сохраняем без вызова полного save() чтобы избежать лишних операций
-                        model.objects.filter(id=animal.id).update(
-                            dorper_percentage=new_dorper
-                        )
-                    
-                    updated_count += 1
-                    total_updated += 1
-                    
-                    old_str = f"{old_dorper}%" if old_dorper else "None"
-                    new_str = f"{new_dorper}%" if new_dorper else "None"
-                    
-                    self.stdout.write(
-                        f"  {animal.tag.tag_number}: {old_str} → {new_str}"
-                    )
-            
-            if updated_count == 0:
-                self.stdout.write(f"  Нет изменений для {model_name}")
-            else:
-                self.stdout.write(
-                    self.style.SUCCESS(f"  Обновлено {updated_count} {model_name}")
-                )
+        counts = {}
+        for node in changed:
+            counts[node.model.__name__] = counts.get(node.model.__name__, 0) + 1
+            old_str = f"{node.old_value}%" if node.old_value is not None else "None"
+            new_str = f"{node.value}%" if node.value is not None else "None"
+            self.stdout.write(f"  {node.tag_number}: {old_str} → {new_str}")
         
+        for model_name, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"  Обновлено {count} {model_name}"))
+        
+        total_updated = len(changed)
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(f'\nВсего было бы обновлено: {total_updated} животных')
@@ -68,4 +50,4 @@ class Command(BaseCommand):
         else:
             self.stdout.write(
                 self.style.SUCCESS(f'\nВсего обновлено: {total_updated} животных')
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from begunici.app_types.animals.tag_resolver import repair_tag_animal_types
+
+
+class Command(BaseCommand):
+    help = (
+        'Исправляет тип животного у бирок (Tag.animal_type), не совпадающий с таблицей, '
+        'в которой лежит животное. Расхождения при поиске по бирке пишутся в лог.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать что будет изменено, но не сохранять изменения',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('РЕЖИМ ТЕСТИРОВАНИЯ - изменения не будут сохранены'))
+
+        repaired = repair_tag_animal_types(dry_run=dry_run)
+        for tag_number, old_type, new_type in repaired:
+            self.stdout.write(f"  {tag_number}: {old_type or '—'} → {new_type}")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f'Всего было бы исправлено: {len(repaired)} бирок'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Всего исправлено: {len(repaired)} бирок'))
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from begunici.app_types.animals.export_jobs import (
+    claim_next_job,
+    cleanup_expired_jobs,
+    fail_stale_jobs,
+    run_export_job_in_thread,
+)
+from begunici.app_types.animals.scales_sync import cleanup_sync_changes
+
+# Как часто (секунды) удалять выгрузки и записи журнала весов старше срока хранения
+CLEANUP_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые выгрузки (ExportJob) из очереди. '
+        'Работает постоянно; с --once обрабатывает очередь и завершается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Сколько выгрузок выполнять одновременно. По умолчанию — EXPORT_JOBS_WORKERS',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза (секунды) между проверками пустой очереди',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить задачи, уже стоящие в очереди, и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or getattr(settings, 'EXPORT_JOBS_WORKERS', 2)
+        if workers < 1:
+            raise CommandError('--workers должен быть не меньше 1')
+
+        stale = fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Прерванных выгрузок помечено ошибкой: {stale}'))
+
+        last_cleanup = 0.0
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                if time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                    removed = cleanup_expired_jobs()
+                    if removed:
+                        self.stdout.write(f'Удалено устаревших выгрузок: {removed}')
+                    removed = cleanup_sync_changes()
+                    if removed:
+                        self.stdout.write(f'Удалено записей журнала весов: {removed}')
+                    last_cleanup = time.monotonic()
+
+                while len(running) < workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f'Выгрузка #{job.pk} ({job.kind}) начата')
+                    running.add(executor.submit(run_export_job_in_thread, job))
+
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = future.result()
+                    if job.status == job.STATUS_DONE:
+                        self.stdout.write(self.style.SUCCESS(f'Выгрузка #{job.pk} готова: {job.result_filename}'))
+                    else:
+                        self.stdout.write(self.style.ERROR(f'Выгрузка #{job.pk} завершилась ошибкой: {job.error}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from begunici.app_types.animals.transfer_acts import register_missing_transfer_movements
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет в акты перевода перемещения, которые еще не попали ни в один акт '
+        '(например, после загрузки данных в обход сигналов). Номера существующих актов не меняются.'
+    )
+
+    def handle(self, *args, **options):
+        added = register_missing_transfer_movements()
+        self.stdout.write(self.style.SUCCESS(f'Добавлено перемещений в акты: {added}'))
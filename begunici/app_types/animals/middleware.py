@@ -8,6 +8,7 @@ from .log_utils import (
     resolve_log_object_id,
     resolve_log_object_type,
 )
+from .action_log import log_user_action
 from .models_user_log import UserActionLog
 
 
@@ -44,7 +45,7 @@ class UserActionLogMiddleware(MiddlewareMixin):
         )
         object_id_max_len = UserActionLog._meta.get_field("object_id").max_length or 100
 
-        UserActionLog.objects.create(
+        log_user_action(
             user=request.user,
             action_type=self._truncate(action, action_max_len),
             object_type=self._truncate(self.get_object_type(request), object_type_max_len),
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinary', '0019_remove_place_date_of_transfer'),
+        ('animals', '0025_animal_is_reject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyStatisticMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц (первое число)')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Рассчитано')),
+            ],
+            options={
+                'verbose_name': 'Рассчитанный месяц статистики',
+                'verbose_name_plural': 'Рассчитанные месяцы статистики',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True, verbose_name='Месяц (первое число)')),
+                ('metric', models.CharField(choices=[('weight_gain', 'Прирост веса'), ('vaccinations', 'Ветобработки'), ('status_end', 'Статус на конец месяца'), ('births', 'Рождения'), ('deadborn', 'Мертворожденные')], max_length=20, verbose_name='Показатель')),
+                ('animal_type', models.CharField(blank=True, default='', max_length=30, verbose_name='Тип животного')),
+                ('label', models.CharField(blank=True, default='', max_length=255, verbose_name='Подпись (обработка)')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='veterinary.place', verbose_name='Место')),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='veterinary.status', verbose_name='Статус')),
+            ],
+            options={
+                'verbose_name': 'Месячная статистика',
+                'verbose_name_plural': 'Месячная статистика',
+                'indexes': [models.Index(fields=['metric', 'month'], name='monthly_stat_metric_month_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veterinary', '0019_remove_place_date_of_transfer'),
+        ('animals', '0026_monthly_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferAct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('act_number', models.PositiveIntegerField(unique=True, verbose_name='Номер акта')),
+                ('transfer_date', models.DateField(db_index=True, verbose_name='Дата перевода')),
+                ('first_created_at', models.DateTimeField(verbose_name='Первое перемещение')),
+                ('last_created_at', models.DateTimeField(verbose_name='Последнее перемещение')),
+                ('movements', models.ManyToManyField(blank=True, related_name='transfer_acts', to='veterinary.placemovement', verbose_name='Перемещения')),
+                ('new_place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='veterinary.place', verbose_name='Куда')),
+                ('old_place', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='veterinary.place', verbose_name='Откуда')),
+            ],
+            options={
+                'verbose_name': 'Акт перевода',
+                'verbose_name_plural': 'Акты перевода',
+                'ordering': ['-transfer_date', '-last_created_at', '-act_number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='transferact',
+            constraint=models.UniqueConstraint(fields=('transfer_date', 'old_place', 'new_place'), name='transfer_act_date_places_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transferact',
+            constraint=models.UniqueConstraint(condition=models.Q(('old_place__isnull', True)), fields=('transfer_date', 'new_place'), name='transfer_act_date_new_place_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transferact',
+            constraint=models.UniqueConstraint(condition=models.Q(('new_place__isnull', True)), fields=('transfer_date', 'old_place'), name='transfer_act_date_old_place_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='transferact',
+            constraint=models.UniqueConstraint(condition=models.Q(('new_place__isnull', True), ('old_place__isnull', True)), fields=('transfer_date',), name='transfer_act_date_no_places_uniq'),
+        ),
+    ]
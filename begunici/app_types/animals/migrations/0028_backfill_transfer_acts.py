@@ -0,0 +1,85 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+# Совпадает с EXCLUDED_TRANSFER_PLACE_NAMES в transfer_acts.py на момент миграции
+EXCLUDED_TRANSFER_PLACE_NAMES = {"Овчарня 4 Отсек 17"}
+
+
+def backfill_transfer_acts(apps, schema_editor):
+    """
+    Заполняет таблицу актов перевода по уже существующим перемещениям.
+    Нумерация совпадает с прежней (по дате, времени первого перемещения и id).
+    """
+    PlaceMovement = apps.get_model("veterinary", "PlaceMovement")
+    TransferAct = apps.get_model("animals", "TransferAct")
+
+    movements = (
+        PlaceMovement.objects.select_related("old_place", "new_place")
+        .order_by("created_at", "id")
+    )
+
+    groups = {}
+    for movement in movements.iterator():
+        old_place = movement.old_place
+        new_place = movement.new_place
+        if (old_place and old_place.sheepfold in EXCLUDED_TRANSFER_PLACE_NAMES) or (
+            new_place and new_place.sheepfold in EXCLUDED_TRANSFER_PLACE_NAMES
+        ):
+            continue
+
+        created_at = movement.created_at
+        if timezone.is_aware(created_at):
+            created_at = timezone.localtime(created_at)
+        key = (created_at.date(), movement.old_place_id, movement.new_place_id)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "first_created_at": movement.created_at,
+                "last_created_at": movement.created_at,
+                "first_movement_id": movement.id,
+                "movement_ids": [],
+            }
+        group["movement_ids"].append(movement.id)
+        if movement.created_at < group["first_created_at"]:
+            group["first_created_at"] = movement.created_at
+            group["first_movement_id"] = movement.id
+        if movement.created_at > group["last_created_at"]:
+            group["last_created_at"] = movement.created_at
+
+    ordered = sorted(
+        groups.items(),
+        key=lambda item: (item[0][0], item[1]["first_created_at"], item[1]["first_movement_id"]),
+    )
+    Through = TransferAct.movements.through
+    for act_number, ((transfer_date, old_place_id, new_place_id), group) in enumerate(ordered, start=1):
+        act = TransferAct.objects.create(
+            act_number=act_number,
+            transfer_date=transfer_date,
+            old_place_id=old_place_id,
+            new_place_id=new_place_id,
+            first_created_at=group["first_created_at"],
+            last_created_at=group["last_created_at"],
+        )
+        Through.objects.bulk_create(
+            [
+                Through(transferact_id=act.id, placemovement_id=movement_id)
+                for movement_id in group["movement_ids"]
+            ],
+            batch_size=1000,
+        )
+
+
+def clear_transfer_acts(apps, schema_editor):
+    apps.get_model("animals", "TransferAct").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("animals", "0027_transfer_act"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transfer_acts, clear_transfer_acts),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:06
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_archived_at(apps, schema_editor):
+    """Заполняет дату архивирования по последней записи истории с текущим статусом."""
+    StatusHistory = apps.get_model("veterinary", "StatusHistory")
+    for model_name in ("Maker", "Ram", "Ewe", "Sheep"):
+        model = apps.get_model("animals", model_name)
+        model.objects.filter(animal_status__isnull=False).update(
+            archived_at=Subquery(
+                StatusHistory.objects.filter(
+                    tag_id=OuterRef("tag_id"), new_status_id=OuterRef("animal_status_id")
+                )
+                .order_by("-change_date", "-id")
+                .values("change_date")[:1]
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0028_backfill_transfer_acts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ewe',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Дата перевода в текущий статус по истории статусов (заполняется автоматически)', null=True, verbose_name='Дата архивирования'),
+        ),
+        migrations.AddField(
+            model_name='maker',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Дата перевода в текущий статус по истории статусов (заполняется автоматически)', null=True, verbose_name='Дата архивирования'),
+        ),
+        migrations.AddField(
+            model_name='ram',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Дата перевода в текущий статус по истории статусов (заполняется автоматически)', null=True, verbose_name='Дата архивирования'),
+        ),
+        migrations.AddField(
+            model_name='sheep',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Дата перевода в текущий статус по истории статусов (заполняется автоматически)', null=True, verbose_name='Дата архивирования'),
+        ),
+        migrations.RunPython(backfill_archived_at, migrations.RunPython.noop),
+    ]
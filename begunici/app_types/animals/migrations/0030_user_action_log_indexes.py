@@ -0,0 +1,76 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:09
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_technical_logs(apps, schema_editor):
+    """Признак служебной записи для существующих логов (прежние условия скрытия)."""
+    UserActionLog = apps.get_model("animals", "UserActionLog")
+    hidden_readonly_logs = (
+        Q(action_type__icontains="Предпросмотр акта")
+        | Q(description__icontains="/animals/api/archive/act-preview/")
+        | Q(additional_data__path="/animals/api/archive/act-preview/")
+        | Q(action_type__iexact="Проверка родства")
+        | Q(description__icontains="/animals/api/check-kinship/")
+        | Q(additional_data__path="/animals/api/check-kinship/")
+    )
+    successful_middleware_duplicates = Q(additional_data__status_code__lt=400) & (
+        Q(additional_data__path="/animals/lambing-group/")
+        | Q(additional_data__path__regex=r"^/animals/lambing-group/[0-9]+/remove-father/$")
+        | Q(additional_data__path__regex=r"^/animals/lambing/[0-9]+/(complete|complete-with-children|complete-early-failure)/$")
+    )
+    UserActionLog.objects.filter(hidden_readonly_logs | successful_middleware_duplicates).update(
+        is_technical=True
+    )
+
+
+# Поиск в панели администратора (icontains → UPPER(...) LIKE) по триграммному индексу.
+# Только для PostgreSQL; на других СУБД поиск работает без индекса.
+SEARCH_INDEX_NAME = "action_log_search_trgm_idx"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    table = schema_editor.quote_name(apps.get_model("animals", "UserActionLog")._meta.db_table)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON {table} USING gin ("
+        '(UPPER("action_type"::text)) gin_trgm_ops, '
+        '(UPPER("object_type"::text)) gin_trgm_ops, '
+        '(UPPER("object_id"::text)) gin_trgm_ops, '
+        '(UPPER("description"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}")
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0029_animal_archived_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractionlog',
+            name='is_technical',
+            field=models.BooleanField(default=False, help_text='Скрывается в панели администратора (заполняется автоматически)', verbose_name='Служебная запись'),
+        ),
+        migrations.RunPython(mark_technical_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['-timestamp', 'user'], name='action_log_ts_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractionlog',
+            index=models.Index(fields=['is_technical', '-timestamp', '-id'], name='action_log_visible_ts_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+from begunici.app_types.animals.log_links import attach_animal_types
+
+
+# Сброс сохранённых типов по бирке (animal_types ? 'бирка') — GIN-индекс jsonb.
+# Только для PostgreSQL.
+ANIMAL_TYPES_INDEX_NAME = "action_log_animal_types_idx"
+
+
+def create_animal_types_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = schema_editor.quote_name(apps.get_model("animals", "UserActionLog")._meta.db_table)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {ANIMAL_TYPES_INDEX_NAME} ON {table} USING gin ("animal_types")'
+    )
+
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_animal_types(apps, schema_editor):
+    """Типы животных для ссылок у существующих логов — по запросу к Tag на пачку."""
+    UserActionLog = apps.get_model("animals", "UserActionLog")
+    Tag = apps.get_model("veterinary", "Tag")
+    batch = []
+    for log in UserActionLog.objects.filter(animal_types__isnull=True).order_by("id").iterator(
+        chunk_size=BACKFILL_BATCH_SIZE
+    ):
+        batch.append(log)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            attach_animal_types(batch, tag_model=Tag)
+            UserActionLog.objects.bulk_update(batch, ["animal_types"])
+            batch = []
+    if batch:
+        attach_animal_types(batch, tag_model=Tag)
+        UserActionLog.objects.bulk_update(batch, ["animal_types"])
+
+
+def drop_animal_types_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {ANIMAL_TYPES_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0030_user_action_log_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractionlog',
+            name='animal_types',
+            field=models.JSONField(blank=True, help_text='Бирка -> тип животного для ссылок в панели администратора (заполняется автоматически)', null=True, verbose_name='Типы животных по биркам'),
+        ),
+        migrations.RunPython(create_animal_types_index, drop_animal_types_index),
+        migrations.RunPython(backfill_animal_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+from datetime import datetime, time
+
+from dateutil.relativedelta import relativedelta
+from django.db import migrations
+from django.utils import timezone
+
+
+# Помесячное секционирование журнала действий (RANGE по timestamp) — только
+# для PostgreSQL. Первичный ключ секционированной таблицы обязан включать
+# ключ секционирования, поэтому он становится (id, timestamp); id по-прежнему
+# выдаётся последовательностью. Индексы и внешние ключи пересоздаются на
+# родительской таблице с прежними именами. Обратная миграция ничего не делает:
+# секционированная таблица совместима с моделью.
+MONTHS_AHEAD = 2
+
+
+def _month_bounds(month_start):
+    start = timezone.make_aware(datetime.combine(month_start, time.min))
+    end = timezone.make_aware(datetime.combine(month_start + relativedelta(months=1), time.min))
+    return start, end
+
+
+def _literal(value):
+    return f"'{value.isoformat()}'::timestamptz"
+
+
+def partition_action_log(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    quote = schema_editor.quote_name
+    table_name = apps.get_model("animals", "UserActionLog")._meta.db_table
+    legacy_name = f"{table_name}_legacy"
+    table, legacy = quote(table_name), quote(legacy_name)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table_name],
+        )
+        if cursor.fetchone():
+            return
+
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [table_name],
+        )
+        pkey_name = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema() AND indexname <> %s",
+            [table_name, pkey_name],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table_name],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN("timestamp") FROM {table}')
+        first_timestamp = cursor.fetchone()[0]
+
+    # Старая таблица освобождает имена индексов и ограничений
+    schema_editor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    for index_name, _definition in indexes:
+        schema_editor.execute(f"DROP INDEX {quote(index_name)}")
+    schema_editor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {quote(pkey_name)}")
+
+    schema_editor.execute(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS, "
+        f'CONSTRAINT {quote(pkey_name)} PRIMARY KEY ("id", "timestamp")) '
+        f'PARTITION BY RANGE ("timestamp")'
+    )
+    schema_editor.execute(f'ALTER TABLE {table} ALTER COLUMN "id" DROP DEFAULT')
+    schema_editor.execute(f"CREATE TABLE {quote(table_name + '_default')} PARTITION OF {table} DEFAULT")
+
+    today = timezone.localdate()
+    first_month = timezone.localtime(first_timestamp).date() if first_timestamp else today
+    month = first_month.replace(day=1)
+    last_month = today.replace(day=1) + relativedelta(months=MONTHS_AHEAD)
+    while month <= last_month:
+        start, end = _month_bounds(month)
+        partition = quote(f"{table_name}_y{month:%Y}m{month:%m}")
+        schema_editor.execute(
+            f"CREATE TABLE {partition} PARTITION OF {table} "
+            f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+        )
+        month += relativedelta(months=1)
+
+    schema_editor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+    schema_editor.execute(f"DROP TABLE {legacy}")
+
+    sequence = quote(f"{table_name}_id_seq")
+    schema_editor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {table}."id"')
+    schema_editor.execute(f"ALTER TABLE {table} ALTER COLUMN \"id\" SET DEFAULT nextval('{sequence}')")
+    schema_editor.execute(
+        f"SELECT setval('{sequence}', COALESCE((SELECT MAX(\"id\") FROM {table}), 0) + 1, false)"
+    )
+
+    for _index_name, definition in indexes:
+        schema_editor.execute(definition)
+    for constraint_name, definition in foreign_keys:
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote(constraint_name)} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0031_user_action_log_animal_types'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_action_log, migrations.RunPython.noop),
+    ]
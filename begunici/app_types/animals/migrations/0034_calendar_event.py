@@ -0,0 +1,43 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0033_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarEventMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц (первое число)')),
+                ('is_built', models.BooleanField(default=False, verbose_name='Построен')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Построено')),
+            ],
+            options={
+                'verbose_name': 'Построенный месяц календаря',
+                'verbose_name_plural': 'Построенные месяцы календаря',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CalendarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц (первое число)')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('kind', models.CharField(choices=[('lambing', 'Планируемый окот'), ('note', 'Заметка'), ('vet_treatment', 'Ветобработка'), ('vet_expiring', 'Окончание действия ветобработки'), ('weighing', 'Взвешивание')], max_length=20, verbose_name='Вид события')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Порядок в месяце')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные события')),
+            ],
+            options={
+                'verbose_name': 'Событие календаря',
+                'verbose_name_plural': 'События календаря',
+                'indexes': [models.Index(fields=['month', 'position'], name='calendar_event_month_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0034_calendar_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScalesOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ идемпотентности')),
+                ('operation', models.CharField(choices=[('weight', 'Взвешивание')], max_length=30, verbose_name='Операция')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='Результат')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Выполнена')),
+            ],
+            options={
+                'verbose_name': 'Операция весов',
+                'verbose_name_plural': 'Операции весов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
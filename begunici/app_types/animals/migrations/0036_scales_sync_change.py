@@ -0,0 +1,32 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0035_scales_operation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScalesSyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('animal', 'Животное'), ('place', 'Место')], max_length=20, verbose_name='Объект')),
+                ('object_id', models.PositiveIntegerField(verbose_name='ID бирки или места')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Изменено')),
+            ],
+            options={
+                'verbose_name': 'Изменение для весов',
+                'verbose_name_plural': 'Изменения для весов',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='scalesoperation',
+            name='operation',
+            field=models.CharField(choices=[('weight', 'Взвешивание'), ('binding', 'Привязка РСХН'), ('movement', 'Перемещение')], max_length=30, verbose_name='Операция'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('animals', '0036_scales_sync_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScalesApiToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=100, verbose_name='Название (терминал)')),
+                ('prefix', models.CharField(max_length=12, verbose_name='Начало токена')),
+                ('token_hash', models.CharField(max_length=64, unique=True, verbose_name='Хэш токена')),
+                ('scopes', models.JSONField(blank=True, default=list, verbose_name='Права')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Выпущен')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее использование')),
+                ('revoked_at', models.DateTimeField(blank=True, null=True, verbose_name='Отозван')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scales_tokens', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Токен весов',
+                'verbose_name_plural': 'Токены весов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
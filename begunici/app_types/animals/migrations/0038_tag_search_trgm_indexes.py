@@ -0,0 +1,51 @@
+# Generated by Django 4.2.15 on 2026-10-18 16:02
+
+from django.db import migrations
+
+
+# Поиск по номеру бирки и РСХН (icontains → UPPER(...) LIKE) по триграммным
+# индексам, см. animal_search. Только для PostgreSQL; на других СУБД поиск
+# работает без индексов.
+TAG_SEARCH_INDEX_NAME = "tag_number_search_trgm_idx"
+ANIMAL_MODELS = ("Maker", "Ram", "Ewe", "Sheep")
+
+
+def _rshn_index_name(model_name):
+    return f"{model_name.lower()}_rshn_search_trgm_idx"
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    tag_table = schema_editor.quote_name(apps.get_model("veterinary", "Tag")._meta.db_table)
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TAG_SEARCH_INDEX_NAME} ON {tag_table} "
+        'USING gin ((UPPER("tag_number"::text)) gin_trgm_ops)'
+    )
+    for model_name in ANIMAL_MODELS:
+        table = schema_editor.quote_name(apps.get_model("animals", model_name)._meta.db_table)
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {_rshn_index_name(model_name)} ON {table} "
+            'USING gin ((UPPER("rshn_tag"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TAG_SEARCH_INDEX_NAME}")
+    for model_name in ANIMAL_MODELS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {_rshn_index_name(model_name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0037_scales_api_token'),
+        ('veterinary', '0019_remove_place_date_of_transfer'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# Поиск потомков по бирке родителя без учёта пробелов по краям и регистра
+# (UPPER(TRIM(mother/father)), см. dorper.py). Только для PostgreSQL; на
+# других СУБД поиск работает без индексов.
+ANIMAL_MODELS = ("Maker", "Ram", "Ewe", "Sheep")
+PARENT_FIELDS = ("mother", "father")
+
+
+def _index_name(model_name, field):
+    return f"{model_name.lower()}_{field}_key_idx"
+
+
+def create_parent_key_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name in ANIMAL_MODELS:
+        table = schema_editor.quote_name(apps.get_model("animals", model_name)._meta.db_table)
+        for field in PARENT_FIELDS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {_index_name(model_name, field)} ON {table} "
+                f'((UPPER(TRIM("{field}"))))'
+            )
+
+
+def drop_parent_key_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name in ANIMAL_MODELS:
+        for field in PARENT_FIELDS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {_index_name(model_name, field)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0038_tag_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_parent_key_indexes, drop_parent_key_indexes),
+    ]
@@ -22,6 +22,18 @@ ARCHIVE_STATUS_NAMES = {
     "Убой на мясо",
 }
 
+# Поля, изменения которых отслеживаются в AnimalBase.save без повторного чтения записи
+TRACKED_FIELDS = (
+    "tag_id",
+    "birth_date",
+    "animal_status_id",
+    "is_archived",
+    "mother",
+    "father",
+    "is_manual_dorper",
+    "dorper_percentage",
+)
+
 STATUS_INSEMINATED = "Осемененная"
 STATUS_LAMBED = "Объягненная"
 STATUS_NOT_INSEMINATED = "Неосемененная"
@@ -84,6 +96,13 @@ class AnimalBase(models.Model):
         db_index=True,
     )
     is_archived = models.BooleanField(default=False, verbose_name="В архиве", db_index=True)
+    archived_at = models.DateTimeField(
+        verbose_name="Дата архивирования",
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Дата перевода в текущий статус по истории статусов (заполняется автоматически)",
+    )
     carcass_weight = models.DecimalField(
         max_digits=6,
         decimal_places=1,
@@ -251,16 +270,10 @@ class AnimalBase(models.Model):
         father_tag = self.get_father_tag()
         if father_tag:
             # Получаем объект животного-отца для правильного отображения имени
-            father_animal = None
-            try:
-                # Проверяем среди производителей
-                father_animal = Maker.objects.get(tag=father_tag)
-            except Maker.DoesNotExist:
-                try:
-                    # Проверяем среди баранов
-                    father_animal = Ram.objects.get(tag=father_tag)
-                except Ram.DoesNotExist:
-                    pass
+            from .tag_resolver import resolve_animal_for_tag
+            father_animal = resolve_animal_for_tag(father_tag, select_related=())
+            if father_animal is not None and not isinstance(father_animal, (Maker, Ram)):
+                father_animal = None
             
             # Определяем отображаемое имя
             display_name = self.father
@@ -311,33 +324,24 @@ class AnimalBase(models.Model):
             father_dorper = None
             mother_dorper = None
             
+            from .dorper import find_dorper_value
+            from .tag_resolver import resolve_animal_by_tag
+
+            def parent_dorper(tag_number):
+                animal = resolve_animal_by_tag(tag_number, select_related=())
+                if animal is not None:
+                    return animal.dorper_percentage
+                # Бирка родителя записана с пробелами или в другом регистре —
+                # сопоставляем так же, как пересчёт по родословной
+                return find_dorper_value(tag_number)
+
             # Получаем дорперность отца
             if self.father:
-                father_tag = Tag.objects.filter(tag_number=self.father).first()
-                if father_tag:
-                    # Ищем животное с этой биркой среди всех типов
-                    for model in [Maker, Ram, Ewe, Sheep]:
-                        try:
-                            father_animal = model.objects.get(tag=father_tag)
-                            if father_animal.dorper_percentage is not None:
-                                father_dorper = father_animal.dorper_percentage
-                            break
-                        except model.DoesNotExist:
-                            continue
+                father_dorper = parent_dorper(self.father)
             
             # Получаем дорперность матери
             if self.mother:
-                mother_tag = Tag.objects.filter(tag_number=self.mother).first()
-                if mother_tag:
-                    # Ищем животное с этой биркой среди всех типов
-                    for model in [Maker, Ram, Ewe, Sheep]:
-                        try:
-                            mother_animal = model.objects.get(tag=mother_tag)
-                            if mother_animal.dorper_percentage is not None:
-                                mother_dorper = mother_animal.dorper_percentage
-                            break
-                        except model.DoesNotExist:
-                            continue
+                mother_dorper = parent_dorper(self.mother)
             
             # Рассчитываем среднее арифметическое, если у обоих родителей есть дорперность
             if father_dorper is not None and mother_dorper is not None:
@@ -351,56 +355,170 @@ class AnimalBase(models.Model):
             print(f"Ошибка при расчете дорперности для {self.tag.tag_number if self.tag else 'животного'}: {e}")
             self.dorper_percentage = None
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_tracked_values()
+
+    def _remember_tracked_values(self, attnames=TRACKED_FIELDS):
+        """Запоминает значения отслеживаемых полей в том виде, в каком они лежат в БД."""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        for attname in attnames:
+            # Отложенные (deferred) поля не запоминаем — их значение неизвестно
+            if attname in self.__dict__:
+                loaded[attname] = self.__dict__[attname]
+
+    def _get_loaded_values(self):
+        """
+        Значения отслеживаемых полей до изменения. Для экземпляров, созданных
+        не из БД (или с отложенными полями), недостающие значения читаются
+        одним запросом.
+        """
+        loaded = getattr(self, "_loaded_values", None) or {}
+        missing = [attname for attname in TRACKED_FIELDS if attname not in loaded]
+        if missing:
+            row = self.__class__.objects.filter(pk=self.pk).values(*missing).first()
+            if row is None:
+                return None
+            loaded = self._loaded_values = {**loaded, **row}
+        return loaded
+
+    def _sync_tag_animal_type(self, tag_changed):
+        """Обновляет `animal_type` у `Tag`, только если он действительно отличается."""
+        animal_type = self.get_animal_type()
+        if self.__class__.tag.is_cached(self):
+            tag = self.tag
+            if tag is not None and tag.animal_type != animal_type:
+                tag.animal_type = animal_type
+                tag.save(update_fields=["animal_type"])
+        elif tag_changed and self.tag_id is not None:
+            # Бирка читается, только если тип отличается; сохранение через save() —
+            # зависимые кэши сбрасывают обработчики сигналов Tag
+            tag = Tag.objects.filter(pk=self.tag_id).exclude(animal_type=animal_type).first()
+            if tag is not None:
+                tag.animal_type = animal_type
+                tag.save(update_fields=["animal_type"])
+
     def save(self, *args, **kwargs):
         """
         Переопределяем сохранение, учитывая:
         1. Архивирование животного при изменении статуса.
         2. Обновление `animal_type` у `Tag`.
-        3. Создание записей о перемещении (`PlaceMovement`).
-        4. Создание записей об изменении статуса (`StatusHistory`).
+        3. Пересчёт дорперности при изменении родителей и её распространение
+           на потомков, если значение изменилось.
+        4. Создание записей об изменении статуса (`StatusHistory`) и
+           обновление даты перевода в текущий статус (`archived_at`).
+
+        Изменения определяются по значениям, загруженным из БД, поэтому
+        повторное чтение записи перед сохранением не требуется. Поддерживается
+        `update_fields`: производные поля пересчитываются и сохраняются только
+        если среди обновляемых есть поля, от которых они зависят.
         """
-        print(f"Сохранение животного {self.tag.tag_number if self.tag else 'без бирки'}")
         is_new = self.pk is None  # Проверяем, создаётся ли новый объект
-        old_place = None
-        old_status = None
-        
         # Параметр для пропуска создания StatusHistory (используется в сериализаторе)
         skip_status_history = kwargs.pop('skip_status_history', False)
+        # Пропуск пересчёта потомков (массовые операции пересчитывают их сами)
+        skip_dorper_propagation = kwargs.pop('skip_dorper_propagation', False)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            if not update_fields:
+                # Пустой update_fields — Django ничего не сохраняет
+                return super().save(*args, **kwargs)
+            update_fields = {self._meta.get_field(name).name for name in update_fields}
+
+        def is_updated(*names):
+            return update_fields is None or any(name in update_fields for name in names)
+
+        loaded = None if is_new else self._get_loaded_values()
+        if loaded is None:
+            is_new = True
+
+        def changed(attname):
+            return is_new or loaded.get(attname) != getattr(self, attname)
+
+        derived_fields = set()
 
         # 🔹 Проверка на архивный статус
-        if self.animal_status and self.animal_status.status_type in ARCHIVE_STATUS_NAMES:
-            self.is_archived = True
-        else:
-            self.is_archived = False
-        
-        # 🔹 Вычисляем возраст независимо от статуса архивирования
+        if is_updated("animal_status", "is_archived") and (
+            changed("animal_status_id") or changed("is_archived")
+        ):
+            self.is_archived = bool(
+                self.animal_status and self.animal_status.status_type in ARCHIVE_STATUS_NAMES
+            )
+            derived_fields.add("is_archived")
+
+        # 🔹 Вычисляем возраст независимо от статуса архивирования (без запросов к БД)
         self.calculate_age()
-        
-        # 🔹 Автоматический расчет дорперности (если не задана вручную)
-        if not self.is_manual_dorper:
+        derived_fields.add("age")
+
+        # 🔹 Автоматический расчет дорперности — только при изменении родителей
+        if (
+            not self.is_manual_dorper
+            and is_updated("mother", "father", "is_manual_dorper")
+            and (changed("mother") or changed("father") or changed("is_manual_dorper"))
+        ):
             self.calculate_dorper_percentage()
+            derived_fields.add("dorper_percentage")
 
         # 🔹 Автоматическое заполнение `animal_type` у `Tag`
-        if self.tag:
-            self.tag.animal_type = self.get_animal_type()
-            self.tag.save()
+        if is_updated("tag"):
+            self._sync_tag_animal_type(changed("tag_id"))
+
+        old_status_id = None if is_new else loaded.get("animal_status_id")
+        status_changed = (
+            not is_new
+            and is_updated("animal_status")
+            and self.animal_status_id is not None
+            and old_status_id != self.animal_status_id
+        )
 
-        # 🔹 Получаем старые значения до сохранения
-        if not is_new:
-            try:
-                old_instance = self.__class__.objects.get(pk=self.pk)
-                old_place = old_instance.place
-                old_status = old_instance.animal_status
-            except self.__class__.DoesNotExist:
-                pass  # old_place и old_status останутся None
+        # 🔹 Дата архивирования — дата перевода в текущий статус
+        status_change_date = None
+        if is_updated("animal_status") and changed("animal_status_id"):
+            if status_changed and not skip_status_history:
+                # Запись истории создаётся ниже с этой же датой
+                status_change_date = timezone.now()
+                self.archived_at = status_change_date
+            else:
+                from .archive_index import latest_status_change_date
+                self.archived_at = latest_status_change_date(self.tag_id, self.animal_status_id)
+            derived_fields.add("archived_at")
+
+        if update_fields is not None:
+            kwargs["update_fields"] = update_fields | derived_fields
+
+        # Потомки могут быть внесены раньше родителя (или родитель переведён
+        # в другую таблицу, например ярка в овцы) — при создании тоже пересчитываем
+        dorper_changed = (
+            (is_updated("dorper_percentage") or "dorper_percentage" in derived_fields)
+            and changed("dorper_percentage")
+            and not (is_new and self.dorper_percentage is None)
+        )
 
         # 🔹 Сохранение объекта
         super().save(*args, **kwargs)
+        self._remember_tracked_values()
+
+        # 🔹 Пересчёт дорперности потомков, у которых это животное — родитель
+        if dorper_changed and not skip_dorper_propagation and self.tag_id:
+            from .dorper import propagate_dorper_to_descendants
+            propagate_dorper_to_descendants(self.tag.tag_number)
 
         # 🔹 Создание записи в `StatusHistory`, если статус изменился (только если не пропускаем)
-        if not is_new and self.animal_status and old_status != self.animal_status and not skip_status_history:
+        if status_changed and not skip_status_history:
             StatusHistory.objects.create(
-                tag=self.tag, old_status=old_status, new_status=self.animal_status
+                tag_id=self.tag_id,
+                old_status_id=old_status_id,
+                new_status_id=self.animal_status_id,
+                change_date=status_change_date,
             )
 
 
@@ -462,6 +580,73 @@ class ArchiveAct(models.Model):
         return f"Акт {self.act_number or 'без номера'}: {self.tag.tag_number}"
 
 
+class TransferAct(models.Model):
+    """
+    Акт перевода: перемещения животных за один день из одного места в другое.
+    Записи добавляются при создании перемещений; номер акта присваивается
+    один раз и дальше не меняется.
+    """
+
+    act_number = models.PositiveIntegerField(unique=True, verbose_name="Номер акта")
+    transfer_date = models.DateField(verbose_name="Дата перевода", db_index=True)
+    old_place = models.ForeignKey(
+        Place,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Откуда",
+    )
+    new_place = models.ForeignKey(
+        Place,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Куда",
+    )
+    first_created_at = models.DateTimeField(verbose_name="Первое перемещение")
+    last_created_at = models.DateTimeField(verbose_name="Последнее перемещение")
+    movements = models.ManyToManyField(
+        PlaceMovement,
+        related_name="transfer_acts",
+        blank=True,
+        verbose_name="Перемещения",
+    )
+
+    class Meta:
+        verbose_name = "Акт перевода"
+        verbose_name_plural = "Акты перевода"
+        ordering = ["-transfer_date", "-last_created_at", "-act_number"]
+        constraints = [
+            # Один акт на день и пару мест; индекс ограничения обслуживает и поиск акта
+            models.UniqueConstraint(
+                fields=["transfer_date", "old_place", "new_place"],
+                name="transfer_act_date_places_uniq",
+            ),
+            # NULL в уникальном ограничении не совпадает с NULL — пары с пустым
+            # местом ограничиваются отдельно
+            models.UniqueConstraint(
+                fields=["transfer_date", "new_place"],
+                condition=Q(old_place__isnull=True),
+                name="transfer_act_date_new_place_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["transfer_date", "old_place"],
+                condition=Q(new_place__isnull=True),
+                name="transfer_act_date_old_place_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["transfer_date"],
+                condition=Q(old_place__isnull=True, new_place__isnull=True),
+                name="transfer_act_date_no_places_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Акт перевода {self.act_number} от {self.transfer_date:%d.%m.%Y}"
+
+
 class Maker(AnimalBase):
     name = models.CharField(
         max_length=50,
@@ -1397,3 +1582,129 @@ class ShiftTransferNote(models.Model):
             return "0, 0, 0"
         except Exception:
             return "0, 0, 0"
+
+
+class MonthlyStatistic(models.Model):
+    """
+    Предрасчитанные показатели статистики за месяц в разрезе
+    месяц × тип животного × место × статус. Строки рассчитываются модулем
+    monthly_stats для завершённых месяцев; текущий месяц считается на лету.
+    """
+
+    METRIC_WEIGHT_GAIN = "weight_gain"
+    METRIC_VACCINATIONS = "vaccinations"
+    METRIC_STATUS_END = "status_end"
+    METRIC_BIRTHS = "births"
+    METRIC_DEADBORN = "deadborn"
+    METRIC_CHOICES = [
+        (METRIC_WEIGHT_GAIN, "Прирост веса"),
+        (METRIC_VACCINATIONS, "Ветобработки"),
+        (METRIC_STATUS_END, "Статус на конец месяца"),
+        (METRIC_BIRTHS, "Рождения"),
+        (METRIC_DEADBORN, "Мертворожденные"),
+    ]
+
+    month = models.DateField(verbose_name="Месяц (первое число)", db_index=True)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES, verbose_name="Показатель")
+    animal_type = models.CharField(max_length=30, blank=True, default="", verbose_name="Тип животного")
+    place = models.ForeignKey(
+        Place,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Место",
+    )
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Статус",
+    )
+    label = models.CharField(max_length=255, blank=True, default="", verbose_name="Подпись (обработка)")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Месячная статистика"
+        verbose_name_plural = "Месячная статистика"
+        indexes = [
+            models.Index(fields=["metric", "month"], name="monthly_stat_metric_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.metric}: {self.count}"
+
+
+class MonthlyStatisticMonth(models.Model):
+    """Месяцы, для которых строки MonthlyStatistic рассчитаны и актуальны."""
+
+    month = models.DateField(unique=True, verbose_name="Месяц (первое число)")
+    built_at = models.DateTimeField(auto_now=True, verbose_name="Рассчитано")
+
+    class Meta:
+        verbose_name = "Рассчитанный месяц статистики"
+        verbose_name_plural = "Рассчитанные месяцы статистики"
+        ordering = ["month"]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}"
+
+
+class CalendarEvent(models.Model):
+    """
+    Индекс событий календаря по дням: планируемые окоты, заметки, ветобработки
+    и окончания их действия, плановые взвешивания. В payload хранится готовое
+    описание события для интерфейса. Строки строятся модулем calendar_index
+    целиком за месяц и пересобираются после изменения исходных данных.
+    """
+
+    KIND_LAMBING = "lambing"
+    KIND_NOTE = "note"
+    KIND_VET_TREATMENT = "vet_treatment"
+    KIND_VET_EXPIRING = "vet_expiring"
+    KIND_WEIGHING = "weighing"
+    KIND_CHOICES = [
+        (KIND_LAMBING, "Планируемый окот"),
+        (KIND_NOTE, "Заметка"),
+        (KIND_VET_TREATMENT, "Ветобработка"),
+        (KIND_VET_EXPIRING, "Окончание действия ветобработки"),
+        (KIND_WEIGHING, "Взвешивание"),
+    ]
+
+    month = models.DateField(verbose_name="Месяц (первое число)")
+    date = models.DateField(verbose_name="Дата")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Вид события")
+    position = models.PositiveIntegerField(default=0, verbose_name="Порядок в месяце")
+    payload = models.JSONField(default=dict, verbose_name="Данные события")
+
+    class Meta:
+        verbose_name = "Событие календаря"
+        verbose_name_plural = "События календаря"
+        indexes = [
+            models.Index(fields=["month", "position"], name="calendar_event_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date:%Y-%m-%d} {self.kind}"
+
+
+class CalendarEventMonth(models.Model):
+    """
+    Месяцы индекса календаря: отметка, что события CalendarEvent построены и
+    актуальны. Строка месяца не удаляется — её блокирует пересчёт месяца.
+    """
+
+    month = models.DateField(unique=True, verbose_name="Месяц (первое число)")
+    is_built = models.BooleanField(default=False, verbose_name="Построен")
+    built_at = models.DateTimeField(auto_now=True, verbose_name="Построено")
+
+    class Meta:
+        verbose_name = "Построенный месяц календаря"
+        verbose_name_plural = "Построенные месяцы календаря"
+        ordering = ["month"]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}"
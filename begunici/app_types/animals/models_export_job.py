@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class ExportJob(models.Model):
+    """
+    Фоновая выгрузка: ставится в очередь из интерфейса, выполняется
+    командой run_export_jobs, готовый файл скачивается по ссылке.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "В очереди"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_DONE, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+    FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Пользователь"
+    )
+    kind = models.CharField(
+        max_length=50,
+        verbose_name="Тип выгрузки"
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Параметры"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус"
+    )
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Прогресс, %"
+    )
+    progress_text = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name="Этап"
+    )
+    result_path = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name="Файл результата",
+        help_text="Путь относительно каталога выгрузок"
+    )
+    result_filename = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        verbose_name="Имя файла для скачивания"
+    )
+    content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        verbose_name="Тип содержимого"
+    )
+    error = models.TextField(
+        blank=True,
+        default="",
+        verbose_name="Ошибка"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Создана"
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Начата"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Завершена"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Обновлена",
+        help_text="Обновляется при каждом сообщении о прогрессе"
+    )
+
+    class Meta:
+        verbose_name = "Фоновая выгрузка"
+        verbose_name_plural = "Фоновые выгрузки"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="export_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
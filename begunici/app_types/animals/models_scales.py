@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class ScalesOperation(models.Model):
+    """
+    Операция сервиса весов, выполненная по ключу идемпотентности клиента.
+    Повторная отправка с тем же ключом не выполняется заново — клиенту
+    возвращается сохранённый результат.
+    """
+
+    OPERATION_WEIGHT = "weight"
+    OPERATION_BINDING = "binding"
+    OPERATION_MOVEMENT = "movement"
+    OPERATION_CHOICES = [
+        (OPERATION_WEIGHT, "Взвешивание"),
+        (OPERATION_BINDING, "Привязка РСХН"),
+        (OPERATION_MOVEMENT, "Перемещение"),
+    ]
+
+    key = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Ключ идемпотентности"
+    )
+    operation = models.CharField(
+        max_length=30,
+        choices=OPERATION_CHOICES,
+        verbose_name="Операция"
+    )
+    result = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Результат"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name="Выполнена"
+    )
+
+    class Meta:
+        verbose_name = "Операция весов"
+        verbose_name_plural = "Операции весов"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_operation_display()} {self.key}"
+
+
+class ScalesSyncChange(models.Model):
+    """
+    Журнал изменений для синхронизации терминалов весов. Номер записи служит
+    курсором: терминал запрашивает изменения после последнего полученного
+    номера. Хранится только что изменилось (животное по бирке или место),
+    актуальные данные берутся из основных таблиц.
+    """
+
+    ENTITY_ANIMAL = "animal"
+    ENTITY_PLACE = "place"
+    ENTITY_CHOICES = [
+        (ENTITY_ANIMAL, "Животное"),
+        (ENTITY_PLACE, "Место"),
+    ]
+
+    entity = models.CharField(
+        max_length=20,
+        choices=ENTITY_CHOICES,
+        verbose_name="Объект"
+    )
+    object_id = models.PositiveIntegerField(
+        verbose_name="ID бирки или места"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name="Изменено"
+    )
+
+    class Meta:
+        verbose_name = "Изменение для весов"
+        verbose_name_plural = "Изменения для весов"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.id}: {self.get_entity_display()} {self.object_id}"
+
+
+class ScalesApiToken(models.Model):
+    """
+    Токен доступа сервиса весов. В базе хранится только SHA-256 токена —
+    сам токен показывается один раз при выпуске. Права ограничены scopes:
+    read — чтение справочников и синхронизация, write — запись весов,
+    привязок и перемещений.
+    """
+
+    SCOPE_READ = "read"
+    SCOPE_WRITE = "write"
+    SCOPES = (SCOPE_READ, SCOPE_WRITE)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="scales_tokens",
+        verbose_name="Пользователь"
+    )
+    name = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        verbose_name="Название (терминал)"
+    )
+    prefix = models.CharField(
+        max_length=12,
+        verbose_name="Начало токена"
+    )
+    token_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Хэш токена"
+    )
+    scopes = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="Права"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Выпущен"
+    )
+    last_used_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Последнее использование"
+    )
+    revoked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Отозван"
+    )
+
+    class Meta:
+        verbose_name = "Токен весов"
+        verbose_name_plural = "Токены весов"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.name or self.user} ({self.prefix}…)"
+
+    @property
+    def is_active(self):
+        return self.revoked_at is None
+
+    def has_scope(self, scope):
+        return scope in (self.scopes or [])
+
+    def revoke(self):
+        if self.revoked_at is None:
+            self.revoked_at = timezone.now()
+            self.save(update_fields=["revoked_at"])
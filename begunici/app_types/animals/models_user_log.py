@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 import pytz
 
+from .log_utils import is_technical_log
+
 
 class UserActionLog(models.Model):
     """
@@ -46,11 +48,35 @@ class UserActionLog(models.Model):
         blank=True,
         verbose_name="Дополнительные данные"
     )
+    animal_types = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Типы животных по биркам",
+        help_text="Бирка -> тип животного для ссылок в панели администратора (заполняется автоматически)"
+    )
+    is_technical = models.BooleanField(
+        default=False,
+        verbose_name="Служебная запись",
+        help_text="Скрывается в панели администратора (заполняется автоматически)"
+    )
 
     class Meta:
         verbose_name = "Лог действий пользователя"
         verbose_name_plural = "Логи действий пользователей"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', 'user'], name='action_log_ts_user_idx'),
+            # Лента панели администратора: видимые записи, новые первыми
+            models.Index(fields=['is_technical', '-timestamp', '-id'], name='action_log_visible_ts_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.refresh_technical_flag()
+        super().save(*args, **kwargs)
+
+    def refresh_technical_flag(self):
+        """Вычисляет признак служебной записи (bulk_create не вызывает save)."""
+        self.is_technical = is_technical_log(self.action_type, self.description, self.additional_data)
 
     def __str__(self):
         moscow_tz = pytz.timezone('Europe/Moscow')
@@ -1,11 +1,10 @@
 from datetime import date
 from io import BytesIO
-from pathlib import Path
 from urllib.parse import quote
 
-from django.conf import settings
 from django.http import HttpResponse
 
+from .act_templates import get_cached_act, get_template_path as get_act_template_path, open_template
 from .models import Lambing
 
 
@@ -38,14 +37,7 @@ TOTAL_COLUMN = "N"
 
 
 def get_template_path():
-    return (
-        Path(settings.BASE_DIR)
-        / "begunici"
-        / "app_types"
-        / "animals"
-        / "excel_templates"
-        / TEMPLATE_FILENAME
-    )
+    return get_act_template_path(TEMPLATE_FILENAME)
 
 
 def get_mother_key(lambing):
@@ -156,17 +148,8 @@ def fill_monthly_block(sheet, row_map, counts):
         )
 
 
-def generate_monthly_breeding_act_workbook(year):
-    try:
-        from openpyxl import load_workbook
-    except ImportError as exc:
-        raise RuntimeError("Библиотека openpyxl не установлена") from exc
-
-    template_path = get_template_path()
-    if not template_path.exists():
-        raise FileNotFoundError(f"Шаблон не найден: {template_path}")
-
-    workbook = load_workbook(template_path)
+def build_monthly_breeding_act_workbook(year):
+    workbook = open_template(get_template_path())
     sheet = workbook.active
     counts = build_monthly_breeding_counts(year)
 
@@ -174,11 +157,21 @@ def generate_monthly_breeding_act_workbook(year):
     sheet["B11"] = year
     fill_monthly_block(sheet, INSEMINATION_ROWS, counts["insemination"])
     fill_monthly_block(sheet, LAMBING_ROWS, counts["lambing"])
+    return workbook
 
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output
+
+def generate_monthly_breeding_act_workbook(year):
+    template_path = get_template_path()
+    if not template_path.exists():
+        raise FileNotFoundError(f"Шаблон не найден: {template_path}")
+
+    data = get_cached_act(
+        "monthly_breeding",
+        (year,),
+        template_path,
+        lambda: build_monthly_breeding_act_workbook(year),
+    )
+    return BytesIO(data)
 
 
 def monthly_breeding_act_response(year):
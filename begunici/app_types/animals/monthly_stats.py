@@ -0,0 +1,388 @@
+"""
+Помесячная свёртка статистики (таблица MonthlyStatistic).
+
+Для каждого завершённого месяца хранятся агрегаты в разрезе
+месяц × тип животного × место × статус:
+- weight_gain — сумма приростов (последний минус первый вес за месяц) и число животных;
+- vaccinations — количество ветобработок (label — «обработка (препарат)»);
+- status_end — количество животных по статусу на конец месяца;
+- births — количество рождений;
+- deadborn — количество мертворожденных ягнят по завершённым окотам.
+
+Место и статус для weight_gain/vaccinations/births берутся текущими на момент
+расчёта; итоги по месяцу от этого не зависят.
+
+Сигналы сбрасывают отметку «рассчитан» у затронутых месяцев
+(MonthlyStatisticMonth), и при следующем чтении такие месяцы
+пересчитываются. Текущий и будущие месяцы всегда считаются на лету.
+Полный пересчёт — команда rebuild_monthly_statistics.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from begunici.app_types.veterinary.vet_models import StatusHistory, Tag, Veterinary, WeightRecord
+
+from .models import Ewe, Lambing, Maker, MonthlyStatistic, MonthlyStatisticMonth, Ram, Sheep
+
+ALL_METRICS = tuple(metric for metric, _label in MonthlyStatistic.METRIC_CHOICES)
+# Порядок совпадает с прежним расчётом статусов: при дублях бирки берётся первая таблица
+STATUS_ANIMAL_MODELS = (Ram, Ewe, Sheep, Maker)
+BOYS_TYPES = ("Maker", "Ram")
+GIRLS_TYPES = ("Ewe", "Sheep")
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def to_month(value):
+    """Первое число месяца для даты или даты-времени (в текущем часовом поясе)."""
+    if isinstance(value, str):
+        # Значения, присвоенные строкой и ещё не прочитанные из БД
+        value = parse_datetime(value) or parse_date(value)
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def month_end(month):
+    return month + relativedelta(months=1) - timedelta(days=1)
+
+
+def iter_months(first_month, last_month):
+    month = to_month(first_month)
+    while month <= last_month:
+        yield month
+        month += relativedelta(months=1)
+
+
+def current_month():
+    return timezone.localdate().replace(day=1)
+
+
+# --- инвалидация ---
+
+def invalidate_month(value):
+    """Сбрасывает рассчитанный месяц, в который попадает дата value."""
+    if not value:
+        return
+    month = to_month(value)
+    if month >= current_month():
+        # Текущий месяц не хранится — считается на лету
+        return
+    MonthlyStatisticMonth.objects.filter(month=month).delete()
+
+
+def invalidate_months_from(value=None):
+    """Сбрасывает все рассчитанные месяцы начиная с месяца даты value (None — все)."""
+    queryset = MonthlyStatisticMonth.objects.all()
+    if value:
+        month = to_month(value)
+        if month >= current_month():
+            return
+        queryset = queryset.filter(month__gte=month)
+    queryset.delete()
+
+
+def get_animal_first_stat_date(tag_id, birth_date=None):
+    """
+    Самая ранняя дата, с которой животное с биркой tag_id попадает в
+    статистику: начало учёта (дата рождения, без неё — выдачи бирки) или
+    более ранние взвешивания и ветобработки. None — в статистике его нет.
+    """
+    start_date = birth_date or Tag.objects.filter(pk=tag_id).values_list("issue_date", flat=True).first()
+    dates = [
+        start_date,
+        WeightRecord.objects.filter(tag_id=tag_id).aggregate(value=Min("weight_date"))["value"],
+        Veterinary.objects.filter(tag_id=tag_id).aggregate(value=Min("date_of_care"))["value"],
+    ]
+    months = [to_month(value) for value in dates if value]
+    return min(months) if months else None
+
+
+# --- расчёт ---
+
+def _load_animal_dims():
+    """{tag_id: (тип, place_id, animal_status_id)} для всех животных."""
+    dims = {}
+    for model in STATUS_ANIMAL_MODELS:
+        animal_type = model.__name__
+        for tag_id, place_id, status_id in model.objects.values_list("tag_id", "place_id", "animal_status_id"):
+            dims.setdefault(tag_id, (animal_type, place_id, status_id))
+    return dims
+
+
+class _Accumulator:
+    def __init__(self):
+        self.values = defaultdict(lambda: [Decimal("0"), 0])
+
+    def add(self, month, metric, animal_type="", place_id=None, status_id=None, label="", total=0, count=1):
+        item = self.values[(month, metric, animal_type or "", place_id, status_id, label)]
+        item[0] += Decimal(total)
+        item[1] += count
+
+    def rows(self):
+        return [
+            MonthlyStatistic(
+                month=month,
+                metric=metric,
+                animal_type=animal_type,
+                place_id=place_id,
+                status_id=status_id,
+                label=label,
+                total=total,
+                count=count,
+            )
+            for (month, metric, animal_type, place_id, status_id, label), (total, count) in self.values.items()
+        ]
+
+
+def _add_weight_gain(acc, months, dims):
+    first_day, last_day = months[0], month_end(months[-1])
+    records = (
+        WeightRecord.objects.filter(weight_date__gte=first_day, weight_date__lte=last_day)
+        .order_by("tag_id", "weight_date", "id")
+        .values_list("tag_id", "weight_date", "weight")
+    )
+    month_set = set(months)
+    first_last = {}
+    for tag_id, weight_date, weight in records:
+        key = (weight_date.replace(day=1), tag_id)
+        if key[0] not in month_set:
+            continue
+        if key in first_last:
+            first_last[key][1] = weight
+            first_last[key][2] += 1
+        else:
+            first_last[key] = [weight, weight, 1]
+
+    for (month, tag_id), (first_weight, last_weight, records_count) in first_last.items():
+        if records_count < 2:
+            continue
+        animal_type, place_id, status_id = dims.get(tag_id, ("", None, None))
+        acc.add(
+            month,
+            MonthlyStatistic.METRIC_WEIGHT_GAIN,
+            animal_type,
+            place_id,
+            status_id,
+            total=last_weight - first_weight,
+        )
+
+
+def _add_vaccinations(acc, months, dims):
+    first_day, last_day = months[0], month_end(months[-1])
+    month_set = set(months)
+    rows = (
+        Veterinary.objects.filter(date_of_care__date__gte=first_day, date_of_care__date__lte=last_day)
+        .annotate(stat_month=TruncMonth("date_of_care"))
+        .values("stat_month", "tag_id", "veterinary_care__care_name", "veterinary_care__medication")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        month = to_month(row["stat_month"])
+        if month not in month_set:
+            continue
+        care_name = row["veterinary_care__care_name"] or "Без названия"
+        medication = row["veterinary_care__medication"] or "Без препарата"
+        animal_type, place_id, status_id = dims.get(row["tag_id"], ("", None, None))
+        acc.add(
+            month,
+            MonthlyStatistic.METRIC_VACCINATIONS,
+            animal_type,
+            place_id,
+            status_id,
+            label=f"{care_name} ({medication})",
+            count=row["count"],
+        )
+
+
+def _add_births(acc, months):
+    first_day, last_day = months[0], month_end(months[-1])
+    month_set = set(months)
+    for model in (Maker, Ram, Ewe, Sheep):
+        rows = (
+            model.objects.filter(birth_date__gte=first_day, birth_date__lte=last_day)
+            .annotate(stat_month=TruncMonth("birth_date"))
+            .values("stat_month", "place_id", "animal_status_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            month = to_month(row["stat_month"])
+            if month in month_set:
+                acc.add(
+                    month,
+                    MonthlyStatistic.METRIC_BIRTHS,
+                    model.__name__,
+                    row["place_id"],
+                    row["animal_status_id"],
+                    count=row["count"],
+                )
+
+
+def _add_deadborn(acc, months):
+    first_day, last_day = months[0], month_end(months[-1])
+    month_set = set(months)
+    lambings = Lambing.objects.filter(
+        is_active=False,
+        actual_lambing_date__gte=first_day,
+        actual_lambing_date__lte=last_day,
+        dead_lambs_count__gt=0,
+    ).values_list("actual_lambing_date", "sheep_id", "ewe_id", "dead_lambs_count")
+    for lambing_date, sheep_id, ewe_id, dead_lambs_count in lambings:
+        month = lambing_date.replace(day=1)
+        if month not in month_set:
+            continue
+        mother_type = "Sheep" if sheep_id else ("Ewe" if ewe_id else "")
+        acc.add(month, MonthlyStatistic.METRIC_DEADBORN, mother_type, total=dead_lambs_count, count=dead_lambs_count)
+
+
+def _add_status_end(acc, months):
+    """
+    Статус каждого животного на конец месяца: последний переход до конца
+    месяца, иначе исходный статус первого перехода после него, иначе текущий.
+    Животные и история загружаются один раз на весь набор месяцев.
+    """
+    last_day = month_end(months[-1])
+    animals = {}
+    for model in STATUS_ANIMAL_MODELS:
+        rows = model.objects.filter(tag__isnull=False).values_list(
+            "tag_id", "birth_date", "tag__issue_date", "place_id", "animal_status_id"
+        )
+        for tag_id, birth_date, issue_date, place_id, status_id in rows:
+            if tag_id in animals:
+                continue
+            start_date = birth_date if birth_date else issue_date
+            if start_date is None or start_date > last_day:
+                continue
+            animals[tag_id] = (model.__name__, start_date, place_id, status_id)
+
+    histories_by_tag = defaultdict(list)
+    histories = (
+        StatusHistory.objects.filter(tag_id__in=list(animals))
+        .order_by("tag_id", "change_date", "id")
+        .values_list("tag_id", "change_date", "old_status_id", "new_status_id")
+    )
+    for tag_id, change_date, old_status_id, new_status_id in histories:
+        histories_by_tag[tag_id].append((change_date, old_status_id, new_status_id))
+
+    current_tz = timezone.get_current_timezone()
+    for month in months:
+        period_end = month_end(month)
+        period_end_exclusive_dt = timezone.make_aware(
+            datetime.combine(period_end + timedelta(days=1), time.min),
+            current_tz,
+        )
+        for tag_id, (animal_type, start_date, place_id, current_status_id) in animals.items():
+            if start_date > period_end:
+                continue
+            last_before = None
+            first_after = None
+            for history in histories_by_tag.get(tag_id, ()):
+                if history[0] < period_end_exclusive_dt:
+                    last_before = history
+                elif first_after is None:
+                    first_after = history
+                    break
+
+            if last_before and last_before[2]:
+                status_id = last_before[2]
+            elif first_after and first_after[1]:
+                status_id = first_after[1]
+            else:
+                status_id = current_status_id
+
+            if status_id:
+                acc.add(month, MonthlyStatistic.METRIC_STATUS_END, animal_type, place_id, status_id)
+
+
+def compute_month_rows(months, metrics=ALL_METRICS):
+    """Рассчитывает (не сохраняя) строки MonthlyStatistic для набора месяцев."""
+    months = sorted({to_month(month) for month in months})
+    if not months:
+        return []
+
+    acc = _Accumulator()
+    dims = None
+    if MonthlyStatistic.METRIC_WEIGHT_GAIN in metrics or MonthlyStatistic.METRIC_VACCINATIONS in metrics:
+        dims = _load_animal_dims()
+    if MonthlyStatistic.METRIC_WEIGHT_GAIN in metrics:
+        _add_weight_gain(acc, months, dims)
+    if MonthlyStatistic.METRIC_VACCINATIONS in metrics:
+        _add_vaccinations(acc, months, dims)
+    if MonthlyStatistic.METRIC_BIRTHS in metrics:
+        _add_births(acc, months)
+    if MonthlyStatistic.METRIC_DEADBORN in metrics:
+        _add_deadborn(acc, months)
+    if MonthlyStatistic.METRIC_STATUS_END in metrics:
+        _add_status_end(acc, months)
+    return acc.rows()
+
+
+def rebuild_months(months):
+    """Пересчитывает и сохраняет строки для завершённых месяцев из набора."""
+    limit = current_month()
+    months = sorted({to_month(month) for month in months if to_month(month) < limit})
+    if not months:
+        return 0
+
+    rows = compute_month_rows(months)
+    try:
+        with transaction.atomic():
+            MonthlyStatisticMonth.objects.filter(month__in=months).delete()
+            # Отметки создаются первыми: параллельный пересчёт тех же месяцев
+            # упрётся в уникальность и откатится, не создав дублей строк
+            MonthlyStatisticMonth.objects.bulk_create([MonthlyStatisticMonth(month=month) for month in months])
+            MonthlyStatistic.objects.filter(month__in=months).delete()
+            MonthlyStatistic.objects.bulk_create(rows, batch_size=BULK_CREATE_BATCH_SIZE)
+    except IntegrityError:
+        return 0
+    return len(rows)
+
+
+def get_first_data_month():
+    """Самый ранний месяц, в котором есть исходные данные для статистики."""
+    candidates = [
+        WeightRecord.objects.aggregate(value=Min("weight_date"))["value"],
+        Veterinary.objects.aggregate(value=Min("date_of_care"))["value"],
+        StatusHistory.objects.aggregate(value=Min("change_date"))["value"],
+        Lambing.objects.aggregate(value=Min("actual_lambing_date"))["value"],
+    ]
+    for model in (Maker, Ram, Ewe, Sheep):
+        candidates.append(model.objects.aggregate(value=Min("birth_date"))["value"])
+    candidates = [to_month(value) for value in candidates if value]
+    return min(candidates) if candidates else None
+
+
+def get_month_rows(months, metrics=ALL_METRICS):
+    """
+    Строки статистики для набора месяцев: завершённые месяцы читаются из
+    свёртки (недостающие пересчитываются), текущий и будущие считаются на лету.
+    """
+    months = sorted({to_month(month) for month in months})
+    limit = current_month()
+    stored_months = [month for month in months if month < limit]
+    live_months = [month for month in months if month >= limit]
+
+    rows = []
+    if stored_months:
+        built = set(
+            MonthlyStatisticMonth.objects.filter(month__in=stored_months).values_list("month", flat=True)
+        )
+        missing = [month for month in stored_months if month not in built]
+        if missing:
+            rebuild_months(missing)
+        rows.extend(MonthlyStatistic.objects.filter(month__in=stored_months, metric__in=metrics))
+    if live_months:
+        rows.extend(compute_month_rows(live_months, metrics))
+    return rows
@@ -0,0 +1,385 @@
+"""
+Индекс родословной в памяти процесса для проверок родства.
+
+Ребра мать/отец всех четырех таблиц животных загружаются одним проходом
+(по запросу на таблицу) в компактную структуру: бирка -> целочисленный id,
+массивы матерей и отцов по id. Индекс обновляется сигналами при сохранении
+и удалении животных; изменения из других процессов подхватываются
+перестроением по истечении PEDIGREE_GRAPH_MAX_AGE_SECONDS.
+"""
+
+import threading
+import time
+from array import array
+
+NO_PARENT = -1
+# Приоритет таблиц при дублировании бирки — как у find_animal_by_tag
+ANIMAL_TYPE_PRIORITY = ("Maker", "Ram", "Ewe", "Sheep")
+
+# Максимальный возраст индекса: страхует от изменений, сделанных другими
+# процессами (gunicorn workers, management-команды), чьи сигналы сюда не доходят.
+PEDIGREE_GRAPH_MAX_AGE_SECONDS = 300
+
+
+def _clean_tag(value):
+    return (value or "").strip()
+
+
+class PedigreeGraph:
+    """
+    Родословная как массивы родителей по целочисленным id бирок.
+
+    Бирки родителей, которых нет в БД, тоже получают id (у них просто нет
+    своих родителей), поэтому результат совпадает с обходом по таблицам.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._tags = []
+        self._mothers = array("l")
+        self._fathers = array("l")
+        self._animal_types = []
+        # Родители по каждой таблице, где есть бирка: id -> {тип: (мать, отец)}
+        self._entries = {}
+        self._tag_numbers_by_tag_id = {}
+        self.built_at = time.monotonic()
+
+    # --- построение и обновление ---
+
+    def _intern(self, tag_number):
+        node_id = self._ids.get(tag_number)
+        if node_id is None:
+            node_id = len(self._tags)
+            self._ids[tag_number] = node_id
+            self._tags.append(tag_number)
+            self._mothers.append(NO_PARENT)
+            self._fathers.append(NO_PARENT)
+            self._animal_types.append(None)
+        return node_id
+
+    def set_animal(self, tag_number, mother, father, animal_type, tag_id=None):
+        """Добавляет или обновляет животное и его родителей."""
+        tag_number = _clean_tag(tag_number)
+        if not tag_number:
+            return
+        if tag_id is not None:
+            self._tag_numbers_by_tag_id[tag_id] = tag_number
+        node_id = self._intern(tag_number)
+        mother = _clean_tag(mother)
+        father = _clean_tag(father)
+        self._entries.setdefault(node_id, {})[animal_type] = (
+            self._intern(mother) if mother else NO_PARENT,
+            self._intern(father) if father else NO_PARENT,
+        )
+        self._apply_entry(node_id)
+
+    def remove_animal(self, tag_number, animal_type=None):
+        """
+        Убирает запись животного из таблицы animal_type (None — из всех). Если
+        бирка есть и в другой таблице, действующей становится её запись (при
+        переводе ярки в овцу сначала создается овца, затем удаляется ярка).
+        """
+        node_id = self._ids.get(_clean_tag(tag_number))
+        if node_id is None:
+            return
+        entries = self._entries.get(node_id, {})
+        if animal_type is None:
+            entries.clear()
+        else:
+            entries.pop(animal_type, None)
+        self._apply_entry(node_id)
+
+    def _apply_entry(self, node_id):
+        """Родители и тип узла — по таблице с наивысшим приоритетом."""
+        entries = self._entries.get(node_id) or {}
+        for animal_type in ANIMAL_TYPE_PRIORITY:
+            if animal_type in entries:
+                self._mothers[node_id], self._fathers[node_id] = entries[animal_type]
+                self._animal_types[node_id] = animal_type
+                return
+        self._mothers[node_id] = NO_PARENT
+        self._fathers[node_id] = NO_PARENT
+        self._animal_types[node_id] = None
+
+    @classmethod
+    def load(cls):
+        from .models import Ewe, Maker, Ram, Sheep
+
+        graph = cls()
+        # Приоритет при дублировании бирки задаёт ANIMAL_TYPE_PRIORITY, а не порядок загрузки
+        for model in (Maker, Ram, Ewe, Sheep):
+            animal_type = model.__name__
+            rows = model.objects.values_list("tag_id", "tag__tag_number", "mother", "father")
+            for tag_id, tag_number, mother, father in rows.iterator():
+                graph.set_animal(tag_number, mother, father, animal_type, tag_id=tag_id)
+        return graph
+
+    # --- запросы ---
+
+    def node_id(self, tag_number):
+        return self._ids.get(_clean_tag(tag_number))
+
+    def tag_number(self, node_id):
+        return self._tags[node_id]
+
+    def is_tag_renamed(self, tag_id, tag_number):
+        """True, если бирка с этим id известна индексу под другим номером."""
+        known_number = self._tag_numbers_by_tag_id.get(tag_id)
+        return known_number is not None and known_number != _clean_tag(tag_number)
+
+    def has_animal(self, tag_number):
+        node_id = self.node_id(tag_number)
+        return node_id is not None and self._animal_types[node_id] is not None
+
+    def get_animal_type(self, tag_number):
+        node_id = self.node_id(tag_number)
+        return self._animal_types[node_id] if node_id is not None else None
+
+    def get_parents(self, tag_number):
+        """Возвращает (мать, отец) как номера бирок или None."""
+        node_id = self.node_id(tag_number)
+        if node_id is None:
+            return None, None
+        mother_id = self._mothers[node_id]
+        father_id = self._fathers[node_id]
+        return (
+            self._tags[mother_id] if mother_id != NO_PARENT else None,
+            self._tags[father_id] if father_id != NO_PARENT else None,
+        )
+
+    def ancestor_ids(self, tag_number, max_generations=5):
+        """Множество id всех предков до max_generations поколений."""
+        node_id = self.node_id(tag_number)
+        ancestors = set()
+        if node_id is None:
+            return ancestors
+
+        current_generation = {node_id}
+        for _generation in range(max_generations):
+            next_generation = set()
+            for current_id in current_generation:
+                for parent_id in (self._mothers[current_id], self._fathers[current_id]):
+                    if parent_id != NO_PARENT:
+                        ancestors.add(parent_id)
+                        next_generation.add(parent_id)
+            if not next_generation:
+                break
+            current_generation = next_generation
+        return ancestors
+
+    def ancestors(self, tag_number, max_generations=5):
+        """Множество номеров бирок всех предков до max_generations поколений."""
+        return {self._tags[node_id] for node_id in self.ancestor_ids(tag_number, max_generations)}
+
+    def common_ancestors(self, tag1, tag2, max_generations=4):
+        """Отсортированный список бирок общих предков двух животных."""
+        common = self.ancestor_ids(tag1, max_generations) & self.ancestor_ids(tag2, max_generations)
+        return sorted(self._tags[node_id] for node_id in common)
+
+    def direct_relation(self, parent_tag, child_tag):
+        """'father' / 'mother', если parent_tag записан родителем child_tag, иначе None."""
+        parent_id = self.node_id(parent_tag)
+        child_id = self.node_id(child_tag)
+        if parent_id is None or child_id is None:
+            return None
+        if self._fathers[child_id] == parent_id:
+            return "father"
+        if self._mothers[child_id] == parent_id:
+            return "mother"
+        return None
+
+    def coancestry(self, tag1, tag2, max_generations=4, memo=None):
+        """
+        Коэффициент родства (коанцестрии) двух животных по Райту с учетом
+        max_generations поколений. Равен коэффициенту инбридинга их потомка.
+        memo можно передавать между вызовами при расчете многих пар.
+        """
+        id1 = self.node_id(tag1)
+        id2 = self.node_id(tag2)
+        if id1 is None or id2 is None:
+            return 0.0
+        if memo is None:
+            memo = {}
+        return self._coancestry(id1, id2, 0, 0, max_generations, memo)
+
+    def inbreeding(self, tag_number, max_generations=4):
+        """Коэффициент инбридинга животного по его родителям."""
+        mother, father = self.get_parents(tag_number)
+        if not mother or not father:
+            return 0.0
+        return self.coancestry(mother, father, max_generations)
+
+    def kinship_matrix(self, father_tags, mother_tags, max_generations=4):
+        """
+        Матрица родства отцы × матери.
+
+        Для каждой пары возвращает словарь: прямое родство (direct_relation),
+        общие предки до max_generations колена, коэффициент родства
+        (= коэффициент инбридинга потомка) и признак has_kinship. Множества
+        предков строятся один раз на животное, коэффициент считается только
+        для пар с пересекающимися линиями, с общей мемоизацией на всю матрицу.
+        """
+        lineages = {}
+        for tag_number in list(father_tags) + list(mother_tags):
+            if tag_number not in lineages:
+                node_id = self.node_id(tag_number)
+                ancestors = frozenset(self.ancestor_ids(tag_number, max_generations))
+                own = frozenset() if node_id is None else frozenset((node_id,))
+                lineages[tag_number] = (ancestors, ancestors | own)
+
+        memo = {}
+        matrix = []
+        for father_tag in father_tags:
+            father_ancestors, father_lineage = lineages[father_tag]
+            father_exists = self.has_animal(father_tag)
+            row = []
+            for mother_tag in mother_tags:
+                mother_ancestors, mother_lineage = lineages[mother_tag]
+
+                direct_relation = None
+                if father_exists and self.has_animal(mother_tag):
+                    if self.direct_relation(father_tag, mother_tag):
+                        direct_relation = "father_is_parent"
+                    elif self.direct_relation(mother_tag, father_tag):
+                        direct_relation = "mother_is_parent"
+
+                common_ancestors = sorted(self._tags[node_id] for node_id in father_ancestors & mother_ancestors)
+                coefficient = 0.0
+                if not father_lineage.isdisjoint(mother_lineage):
+                    coefficient = self.coancestry(father_tag, mother_tag, max_generations, memo=memo)
+
+                row.append(
+                    {
+                        "father_tag": father_tag,
+                        "mother_tag": mother_tag,
+                        "has_kinship": bool(direct_relation or common_ancestors),
+                        "direct_relation": direct_relation,
+                        "common_ancestors": common_ancestors,
+                        "coefficient": coefficient,
+                    }
+                )
+            matrix.append(row)
+        return matrix
+
+    def _rank(self, node_id, memo):
+        """
+        Поколенческий ранг: 0 у животных без известных родителей, иначе
+        1 + максимум рангов родителей. Потомок всегда старше по рангу предка.
+        """
+        ranks = memo.setdefault("ranks", {})
+        if node_id in ranks:
+            return ranks[node_id]
+
+        stack = [node_id]
+        in_progress = set()
+        while stack:
+            current_id = stack[-1]
+            if current_id in ranks:
+                stack.pop()
+                continue
+            parents = [
+                parent_id
+                for parent_id in (self._mothers[current_id], self._fathers[current_id])
+                if parent_id != NO_PARENT
+            ]
+            pending = [
+                parent_id for parent_id in parents
+                if parent_id not in ranks and parent_id not in in_progress
+            ]
+            if pending:
+                in_progress.add(current_id)
+                stack.extend(pending)
+                continue
+            # Циклы в ошибочных данных разрываются: незавершенный родитель считается рангом 0.
+            ranks[current_id] = 1 + max((ranks.get(parent_id, 0) for parent_id in parents), default=-1)
+            in_progress.discard(current_id)
+            stack.pop()
+        return ranks[node_id]
+
+    def _coancestry(self, id1, id2, depth1, depth2, max_generations, memo):
+        if id1 == NO_PARENT or id2 == NO_PARENT:
+            return 0.0
+
+        key = (id1, id2, depth1, depth2) if id1 <= id2 else (id2, id1, depth2, depth1)
+        cached = memo.get(key)
+        if cached is not None:
+            return cached
+
+        if id1 == id2:
+            depth = max(depth1, depth2)
+            parents_coancestry = 0.0
+            if depth < max_generations:
+                parents_coancestry = self._coancestry(
+                    self._mothers[id1], self._fathers[id1], depth + 1, depth + 1, max_generations, memo
+                )
+            result = 0.5 * (1.0 + parents_coancestry)
+        else:
+            # Раскрываем более молодое животное: оно не может быть предком другого.
+            if self._rank(id1, memo) < self._rank(id2, memo):
+                id1, id2, depth1, depth2 = id2, id1, depth2, depth1
+            if depth1 >= max_generations:
+                result = 0.0
+            else:
+                result = 0.5 * (
+                    self._coancestry(self._mothers[id1], id2, depth1 + 1, depth2, max_generations, memo)
+                    + self._coancestry(self._fathers[id1], id2, depth1 + 1, depth2, max_generations, memo)
+                )
+
+        memo[key] = result
+        return result
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_pedigree_graph():
+    """Возвращает индекс родословной процесса, строя его при необходимости."""
+    global _graph
+    graph = _graph
+    if graph is not None and time.monotonic() - graph.built_at < PEDIGREE_GRAPH_MAX_AGE_SECONDS:
+        return graph
+
+    with _graph_lock:
+        graph = _graph
+        if graph is None or time.monotonic() - graph.built_at >= PEDIGREE_GRAPH_MAX_AGE_SECONDS:
+            graph = PedigreeGraph.load()
+            _graph = graph
+    return graph
+
+
+def invalidate_pedigree_graph():
+    """Сбрасывает индекс; он будет перестроен при следующем обращении."""
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def update_animal_in_pedigree(animal):
+    """Обновляет запись животного в уже построенном индексе."""
+    graph = _graph
+    if graph is None or not getattr(animal, "tag_id", None):
+        return
+    with _graph_lock:
+        graph.set_animal(
+            animal.tag.tag_number,
+            animal.mother,
+            animal.father,
+            animal.get_animal_type(),
+            tag_id=animal.tag_id,
+        )
+
+
+def remove_animal_from_pedigree(animal):
+    graph = _graph
+    if graph is None or not getattr(animal, "tag_id", None):
+        return
+    with _graph_lock:
+        graph.remove_animal(animal.tag.tag_number, animal.get_animal_type())
+
+
+def handle_tag_saved(tag):
+    """Переименование бирки меняет ключи индекса — проще перестроить его целиком."""
+    graph = _graph
+    if graph is not None and graph.is_tag_renamed(tag.pk, tag.tag_number):
+        invalidate_pedigree_graph()
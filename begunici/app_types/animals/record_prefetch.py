@@ -0,0 +1,167 @@
+"""
+Пакетная загрузка последних и ближайших к дате записей взвешиваний,
+ветобработок и актов архивирования.
+
+Все функции принимают набор tag_id и выполняют один запрос на весь набор,
+поэтому страница списка из N животных обходится постоянным числом запросов
+вместо отдельного запроса на каждую строку.
+"""
+
+from datetime import timedelta
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from begunici.app_types.veterinary.vet_models import Veterinary, WeightRecord
+
+from .models import ArchiveAct
+
+
+def _unique_tag_ids(tag_ids):
+    return {tag_id for tag_id in tag_ids if tag_id is not None}
+
+
+def _latest_per_tag(queryset, tag_ids, ordering):
+    """
+    Возвращает {tag_id: запись} с одной (последней по ordering) записью на бирку.
+    Выбор первой записи в каждой группе выполняется оконной функцией в БД.
+    """
+    tag_ids = _unique_tag_ids(tag_ids)
+    if not tag_ids:
+        return {}
+
+    queryset = (
+        queryset.filter(tag_id__in=tag_ids)
+        .annotate(
+            tag_row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("tag_id")],
+                order_by=ordering,
+            )
+        )
+        .filter(tag_row_number=1)
+    )
+    return {record.tag_id: record for record in queryset}
+
+
+def _recent_per_tag(queryset, tag_ids, ordering, limit):
+    """{tag_id: [записи]} — до limit последних записей на бирку (порядок по ordering)."""
+    tag_ids = _unique_tag_ids(tag_ids)
+    if not tag_ids:
+        return {}
+
+    queryset = (
+        queryset.filter(tag_id__in=tag_ids)
+        .annotate(
+            tag_row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("tag_id")],
+                order_by=ordering,
+            )
+        )
+        .filter(tag_row_number__lte=limit)
+        .order_by("tag_id", "tag_row_number")
+    )
+    records = {}
+    for record in queryset:
+        records.setdefault(record.tag_id, []).append(record)
+    return records
+
+
+def get_latest_weight_records(tag_ids):
+    """Последнее взвешивание для каждой бирки: {tag_id: WeightRecord}."""
+    return _latest_per_tag(
+        WeightRecord.objects.all(),
+        tag_ids,
+        [F("weight_date").desc(), F("id").desc()],
+    )
+
+
+def get_latest_vet_records(tag_ids):
+    """Последняя ветобработка для каждой бирки: {tag_id: Veterinary}."""
+    return _latest_per_tag(
+        Veterinary.objects.select_related("veterinary_care"),
+        tag_ids,
+        [F("date_of_care").desc(), F("id").desc()],
+    )
+
+
+def get_latest_archive_acts(tag_ids):
+    """Последний акт архивирования для каждой бирки: {tag_id: ArchiveAct}."""
+    return _latest_per_tag(
+        ArchiveAct.objects.all(),
+        tag_ids,
+        [F("updated_at").desc(), F("id").desc()],
+    )
+
+
+def get_recent_weight_records(tag_ids, limit=5):
+    """Последние limit взвешиваний каждой бирки: {tag_id: [WeightRecord]}."""
+    return _recent_per_tag(
+        WeightRecord.objects.all(),
+        tag_ids,
+        [F("weight_date").desc(), F("id").desc()],
+        limit,
+    )
+
+
+def get_recent_vet_records(tag_ids, limit=5):
+    """Последние limit ветобработок каждой бирки: {tag_id: [Veterinary]}."""
+    return _recent_per_tag(
+        Veterinary.objects.select_related("veterinary_care"),
+        tag_ids,
+        [F("date_of_care").desc(), F("id").desc()],
+        limit,
+    )
+
+
+def pick_weight_record_near_date(records, target_date):
+    """Выбирает из записей ближайшую к дате (при равенстве — более раннюю)."""
+    if not target_date:
+        return None
+    return min(
+        records,
+        key=lambda record: (abs((record.weight_date - target_date).days), record.weight_date, record.id),
+        default=None,
+    )
+
+
+def get_weight_records_near_dates(tag_dates, delta_days=5):
+    """
+    Ближайшие к заданным датам взвешивания (в пределах ±delta_days).
+
+    tag_dates — итерируемое из пар (tag_id, date). Возвращает
+    {(tag_id, date): WeightRecord}; пары без подходящей записи отсутствуют.
+    """
+    tag_dates = {
+        (tag_id, target_date)
+        for tag_id, target_date in tag_dates
+        if tag_id is not None and target_date
+    }
+    if not tag_dates:
+        return {}
+
+    # Один запрос по всем биркам в общем диапазоне дат; точное окно ±delta_days
+    # для каждой пары проверяется ниже в памяти.
+    target_dates = [target_date for _tag_id, target_date in tag_dates]
+    queryset = WeightRecord.objects.filter(
+        tag_id__in={tag_id for tag_id, _target_date in tag_dates},
+        weight_date__gte=min(target_dates) - timedelta(days=delta_days),
+        weight_date__lte=max(target_dates) + timedelta(days=delta_days),
+    ).order_by("weight_date", "id")
+
+    records_by_tag = {}
+    for record in queryset:
+        records_by_tag.setdefault(record.tag_id, []).append(record)
+
+    result = {}
+    for tag_id, target_date in tag_dates:
+        candidates = [
+            record
+            for record in records_by_tag.get(tag_id, [])
+            if abs((record.weight_date - target_date).days) <= delta_days
+        ]
+        record = pick_weight_record_near_date(candidates, target_date)
+        if record is not None:
+            result[(tag_id, target_date)] = record
+    return result
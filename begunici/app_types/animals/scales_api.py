@@ -1,10 +1,14 @@
 import re
+from datetime import timedelta
 from decimal import Decimal, InvalidOperation
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Q
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.decorators import (
@@ -12,14 +16,27 @@ from rest_framework.decorators import (
     authentication_classes,
     permission_classes,
 )
-from rest_framework.permissions import BasePermission
+from rest_framework.permissions import SAFE_METHODS, BasePermission
 from rest_framework.response import Response
 
 from begunici.app_types.animals.models import Ewe, Maker, Ram, Sheep
-from begunici.app_types.animals.models_user_log import UserActionLog
+from begunici.app_types.animals.act_templates import invalidate_acts
+from begunici.app_types.animals.animal_search import search_animals
+from begunici.app_types.animals.action_log import log_user_action
+from begunici.app_types.animals.models_scales import ScalesApiToken, ScalesOperation, ScalesSyncChange
+from begunici.app_types.animals.scales_auth import ScalesTokenAuthentication, issue_token, parse_scopes
+from begunici.app_types.animals.monthly_stats import invalidate_month
+from begunici.app_types.animals.scales_sync import (
+    get_sync_changes,
+    get_sync_cursor,
+    record_animal_changes,
+)
+from begunici.app_types.animals.tag_resolver import get_animal_model, resolve_tag_models
 from begunici.app_types.veterinary.vet_models import (
     Place,
     PlaceMovement,
+    Status,
+    Tag,
     WeightRecord,
 )
 from begunici.app_types.veterinary.vet_views import place_natural_sort_key
@@ -32,9 +49,24 @@ ANIMAL_TYPES = (
     ("ewe", "Ярка", Ewe, "animals:ewe-detail"),
     ("sheep", "Овцематка", Sheep, "animals:sheep-detail"),
 )
+ANIMAL_TYPES_BY_MODEL = {animal_type[2]: animal_type for animal_type in ANIMAL_TYPES}
+ANIMAL_TYPES_BY_KEY = {animal_type[0]: animal_type for animal_type in ANIMAL_TYPES}
+# Сколько взвешиваний принимается в одном пакете
+WEIGHTS_BATCH_MAX = 1000
+# Сколько отложенных операций терминал может выгрузить за один обмен
+SYNC_UPLOAD_MAX = 1000
+IDEMPOTENCY_KEY_MAX_LENGTH = 100
+DEFAULT_IDEMPOTENCY_RETENTION_DAYS = 30
+
 
+# Токен проверяется за микросекунды; Basic (PBKDF2 на каждый запрос) оставлен
+# для терминалов, ещё не перешедших на токены, и отключается SCALES_BASIC_AUTH
+SCALES_AUTHENTICATION = [ScalesTokenAuthentication]
+if getattr(settings, "SCALES_BASIC_AUTH", True):
+    SCALES_AUTHENTICATION.append(BasicAuthentication)
 
-class ScalesServicePermission(BasePermission):
+
+class ScalesUserPermission(BasePermission):
     message = "Доступ разрешён только сервисному пользователю scales"
 
     def has_permission(self, request, view):
@@ -47,6 +79,21 @@ class ScalesServicePermission(BasePermission):
         )
 
 
+class ScalesServicePermission(ScalesUserPermission):
+    """Пользователь scales; при входе по токену — ещё и право токена на метод запроса."""
+
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        if isinstance(request.auth, ScalesApiToken):
+            # Чтение — право read, любые изменения — право write
+            scope = ScalesApiToken.SCOPE_READ if request.method in SAFE_METHODS else ScalesApiToken.SCOPE_WRITE
+            if not request.auth.has_scope(scope):
+                self.message = f"У токена нет права {scope}"
+                return False
+        return True
+
+
 def _log_scales_action(
     request,
     *,
@@ -60,7 +107,7 @@ def _log_scales_action(
     if not user or not user.is_authenticated:
         return
 
-    UserActionLog.objects.create(
+    log_user_action(
         user=user,
         action_type=action_type,
         object_type=object_type,
@@ -81,6 +128,10 @@ def _error(message, code, http_status):
     return Response({"error": message, "code": code}, status=http_status)
 
 
+def _error_body(message, code, http_status):
+    return {"error": message, "code": code}, http_status
+
+
 def _normalize_rshn(value):
     normalized = str(value or "").strip()
     if not RSHN_PATTERN.fullmatch(normalized):
@@ -88,21 +139,24 @@ def _normalize_rshn(value):
     return f"RU{normalized[2:].lower()}"
 
 
+def _display_name(type_key, animal):
+    if type_key == "maker" and getattr(animal, "name", None):
+        return f"{animal.name}({animal.tag.tag_number})"
+    return animal.tag.tag_number
+
+
+def _status_name(animal):
+    return animal.animal_status.status_type if animal.animal_status else "Нет статуса"
+
+
 def _animal_payload(type_key, type_label, route_name, animal):
     place = animal.place.sheepfold if animal.place else None
-    display_name = animal.tag.tag_number
-    if type_key == "maker" and getattr(animal, "name", None):
-        display_name = f"{animal.name}({animal.tag.tag_number})"
     return {
         "tag_number": animal.tag.tag_number,
-        "display_name": display_name,
+        "display_name": _display_name(type_key, animal),
         "animal_type": type_key,
         "animal_type_label": type_label,
-        "status": (
-            animal.animal_status.status_type
-            if animal.animal_status
-            else "Нет статуса"
-        ),
+        "status": _status_name(animal),
         "rshn_tag": animal.rshn_tag,
         "place": place,
         "place_id": animal.place_id,
@@ -114,30 +168,17 @@ def _animal_payload(type_key, type_label, route_name, animal):
 
 
 def _active_animals(search="", *, with_rshn=False, limit=100):
-    search = str(search or "").strip()
-    items = []
-
-    for type_key, type_label, model, route_name in ANIMAL_TYPES:
-        queryset = model.objects.filter(is_archived=False).select_related(
-            "tag",
-            "place",
-            "animal_status",
-        )
-        if with_rshn:
-            queryset = queryset.exclude(rshn_tag__isnull=True).exclude(rshn_tag="")
-        if search:
-            search_filter = Q(tag__tag_number__icontains=search) | Q(
-                rshn_tag__icontains=search
-            )
-            if model is Maker:
-                search_filter |= Q(name__icontains=search)
-            queryset = queryset.filter(search_filter)
-
-        for animal in queryset.order_by("tag__tag_number")[:limit]:
-            items.append((type_key, type_label, route_name, animal))
-
-    items.sort(key=lambda item: item[3].tag.tag_number.lower())
-    return items[:limit]
+    matches = search_animals(
+        search,
+        archived=False,
+        match_names=True,
+        require_rshn=with_rshn,
+        limit=limit,
+    )
+    return [
+        (type_key, type_label, ANIMAL_TYPES_BY_KEY[type_key][3], animal)
+        for type_key, type_label, animal in matches
+    ]
 
 
 def _find_active_by_tag(tag_number, *, lock=False):
@@ -145,19 +186,56 @@ def _find_active_by_tag(tag_number, *, lock=False):
     if not tag_number:
         return None
 
-    for type_key, type_label, model, route_name in ANIMAL_TYPES:
+    # Tag.animal_type указывает таблицу, поэтому запрос идёт только к ней
+    for tag_id, model in resolve_tag_models(tag_number, case_insensitive=True):
         queryset = model.objects.filter(
             is_archived=False,
-            tag__tag_number__iexact=tag_number,
-        ).select_related("tag", "place", "animal_status")
+            tag_id=tag_id,
+        ).select_related("tag", "place", "animal_status").order_by("pk")
         if lock:
             queryset = queryset.select_for_update(of=("self",))
         animal = queryset.first()
         if animal is not None:
-            return type_key, type_label, model, route_name, animal
+            return (*ANIMAL_TYPES_BY_MODEL[model], animal)
     return None
 
 
+def _find_active_by_tags(tag_numbers):
+    """
+    Пакетный вариант _find_active_by_tag: {бирка в нижнем регистре: найденное}.
+    Один запрос к Tag и по одному запросу на каждый встретившийся тип животного.
+    """
+    keys = {str(tag_number or "").strip().lower() for tag_number in tag_numbers}
+    keys.discard("")
+    if not keys:
+        return {}
+
+    tags = Tag.objects.annotate(tag_number_lower=Lower("tag_number")).filter(tag_number_lower__in=keys)
+    tag_ids_by_model = {}
+    for tag_id, animal_type in tags.values_list("id", "animal_type"):
+        model = get_animal_model(animal_type)
+        for candidate in (model,) if model else ANIMAL_TYPES_BY_MODEL:
+            tag_ids_by_model.setdefault(candidate, []).append(tag_id)
+
+    found = {}
+    for type_key, type_label, model, route_name in ANIMAL_TYPES:
+        tag_ids = tag_ids_by_model.get(model)
+        if not tag_ids:
+            continue
+        # Порядок как у _find_active_by_tag: при совпадении бирок без учёта регистра — по tag_id
+        queryset = (
+            model.objects.filter(is_archived=False, tag_id__in=tag_ids)
+            .select_related("tag", "place", "animal_status")
+            .order_by("tag_id")
+        )
+        for animal in queryset:
+            found.setdefault(
+                animal.tag.tag_number.lower(),
+                (type_key, type_label, model, route_name, animal),
+            )
+    return found
+
+
 def _find_active_by_rshn(rshn_tag, *, lock=False):
     matches = []
     for type_key, type_label, model, route_name in ANIMAL_TYPES:
@@ -186,8 +264,22 @@ def _find_archived_by_rshn(rshn_tag, *, lock=False):
     return matches
 
 
+def _parse_weight(value):
+    """Вес в кг (Decimal, 2 знака). Некорректное значение — ValueError с сообщением."""
+    try:
+        weight = Decimal(str(value if value is not None else "").replace(",", "."))
+        if not weight.is_finite():
+            raise InvalidOperation
+        weight = weight.quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError("Вес должен быть числом")
+    if weight <= 0 or weight >= Decimal("1000"):
+        raise ValueError("Вес должен быть больше 0 и меньше 1000 кг")
+    return weight
+
+
 @api_view(["GET"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def animals(request):
     results = [
@@ -200,7 +292,7 @@ def animals(request):
 
 
 @api_view(["GET", "POST"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def bindings(request):
     if request.method == "GET":
@@ -213,20 +305,29 @@ def bindings(request):
         ]
         return Response({"results": results})
 
-    tag_number = str(request.data.get("tag_number", "")).strip()
-    force = request.data.get("force") is True
+    body, http_status = _bind_rshn(request, request.data)
+    return Response(body, status=http_status)
+
+
+def _bind_rshn(request, data):
+    """
+    Привязка РСХН к бирке по данным {tag_number, rshn_tag, force}.
+    Возвращает (тело ответа, HTTP-статус); при конфликте без force ничего не меняет.
+    """
+    tag_number = str(data.get("tag_number", "")).strip()
+    force = data.get("force") is True
     if not tag_number:
-        return _error("Не выбрана бирка животного", "tag_required", status.HTTP_400_BAD_REQUEST)
+        return _error_body("Не выбрана бирка животного", "tag_required", status.HTTP_400_BAD_REQUEST)
 
     try:
-        rshn_tag = _normalize_rshn(request.data.get("rshn_tag"))
+        rshn_tag = _normalize_rshn(data.get("rshn_tag"))
     except ValueError as exc:
-        return _error(str(exc), "invalid_rshn", status.HTTP_400_BAD_REQUEST)
+        return _error_body(str(exc), "invalid_rshn", status.HTTP_400_BAD_REQUEST)
 
     with transaction.atomic():
         selected = _find_active_by_tag(tag_number, lock=True)
         if selected is None:
-            return _error(
+            return _error_body(
                 "Активное животное с такой биркой не найдено",
                 "animal_not_found",
                 status.HTTP_404_NOT_FOUND,
@@ -237,7 +338,7 @@ def bindings(request):
         same_rshn = _find_active_by_rshn(rshn_tag, lock=True)
         archived_owners = _find_archived_by_rshn(rshn_tag, lock=True)
         if archived_owners:
-            return Response(
+            return (
                 {
                     "error": "РСХН указан у архивного животного и не может быть перепривязан",
                     "code": "archived_binding_conflict",
@@ -246,7 +347,7 @@ def bindings(request):
                         for _type, _label, _model, _route, archived_animal in archived_owners
                     ],
                 },
-                status=status.HTTP_409_CONFLICT,
+                status.HTTP_409_CONFLICT,
             )
 
         other_owners = [
@@ -280,19 +381,20 @@ def bindings(request):
                         ),
                     }
                 )
-            return Response(
+            return (
                 {
                     "error": "Для этой привязки требуется подтверждение замены",
                     "code": "binding_conflict",
                     "requires_confirmation": True,
                     "conflicts": conflicts,
                 },
-                status=status.HTTP_409_CONFLICT,
+                status.HTTP_409_CONFLICT,
             )
 
         if force:
             for _owner_type, _owner_label, owner_model, _owner_route, owner in other_owners:
                 owner_model.objects.filter(pk=owner.pk).update(rshn_tag=None)
+            record_animal_changes(match[4].tag_id for match in other_owners)
 
         was_unchanged = bool(
             animal.rshn_tag and animal.rshn_tag.lower() == rshn_tag.lower()
@@ -300,6 +402,7 @@ def bindings(request):
         if not was_unchanged:
             model.objects.filter(pk=animal.pk).update(rshn_tag=rshn_tag)
             animal.rshn_tag = rshn_tag
+            record_animal_changes([animal.tag_id])
 
         was_rebound = bool(force and (selected_has_other_rshn or other_owners))
         if not was_unchanged or detached_tag_numbers:
@@ -330,14 +433,11 @@ def bindings(request):
 
     payload = _animal_payload(type_key, type_label, route_name, animal)
     payload.update({"created": not was_unchanged, "rebound": bool(force)})
-    return Response(
-        payload,
-        status=status.HTTP_200_OK if was_unchanged else status.HTTP_201_CREATED,
-    )
+    return payload, status.HTTP_200_OK if was_unchanged else status.HTTP_201_CREATED
 
 
 @api_view(["GET"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def identification(request):
     try:
@@ -369,7 +469,7 @@ def identification(request):
 
 
 @api_view(["GET"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def places(request):
     sorted_places = sorted(Place.objects.all(), key=place_natural_sort_key)
@@ -384,7 +484,7 @@ def places(request):
 
 
 @api_view(["POST"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def weights(request):
     tag_number = str(request.data.get("tag_number", "")).strip()
@@ -397,18 +497,9 @@ def weights(request):
         )
 
     try:
-        weight = Decimal(str(request.data.get("weight", "")).replace(",", "."))
-        if not weight.is_finite():
-            raise InvalidOperation
-        weight = weight.quantize(Decimal("0.01"))
-    except (InvalidOperation, TypeError, ValueError):
-        return _error("Вес должен быть числом", "invalid_weight", status.HTTP_400_BAD_REQUEST)
-    if weight <= 0 or weight >= Decimal("1000"):
-        return _error(
-            "Вес должен быть больше 0 и меньше 1000 кг",
-            "invalid_weight",
-            status.HTTP_400_BAD_REQUEST,
-        )
+        weight = _parse_weight(request.data.get("weight", ""))
+    except ValueError as exc:
+        return _error(str(exc), "invalid_weight", status.HTTP_400_BAD_REQUEST)
 
     animal = active_animal[4]
     weight_date = timezone.localdate()
@@ -469,13 +560,289 @@ def weights(request):
     )
 
 
+def _parse_measured_at(value):
+    """
+    Дата взвешивания по отметке времени клиента (ISO 8601, дата или дата-время).
+    Пустое значение — сегодня. Некорректное или будущее — ValueError.
+    """
+    today = timezone.localdate()
+    if value in (None, ""):
+        return today
+    value = str(value).strip()
+    try:
+        measured_at = parse_datetime(value)
+        if measured_at is not None:
+            if timezone.is_naive(measured_at):
+                measured_at = timezone.make_aware(measured_at)
+            weight_date = timezone.localdate(measured_at)
+        else:
+            weight_date = parse_date(value)
+    except ValueError:
+        weight_date = None
+    if weight_date is None:
+        raise ValueError("measured_at должен быть датой или датой-временем в формате ISO 8601")
+    if weight_date > today:
+        raise ValueError("Дата взвешивания не может быть в будущем")
+    return weight_date
+
+
+def _parse_weight_reading(item):
+    """Проверяет показание пакета: (бирка, вес, дата, ключ) или ValueError с кодом в args[1]."""
+    if not isinstance(item, dict):
+        raise ValueError("Показание должно быть объектом", "invalid_reading")
+    tag_number = str(item.get("tag_number") or "").strip()
+    if not tag_number:
+        raise ValueError("Не указана бирка животного", "tag_required")
+    try:
+        weight = _parse_weight(item.get("weight"))
+    except ValueError as exc:
+        raise ValueError(str(exc), "invalid_weight")
+    try:
+        weight_date = _parse_measured_at(item.get("measured_at"))
+    except ValueError as exc:
+        raise ValueError(str(exc), "invalid_measured_at")
+    key = str(item.get("idempotency_key") or "").strip()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValueError(
+            f"idempotency_key длиннее {IDEMPOTENCY_KEY_MAX_LENGTH} символов",
+            "invalid_idempotency_key",
+        )
+    return tag_number, weight, weight_date, key
+
+
+def _cleanup_scales_operations():
+    retention_days = getattr(
+        settings, "SCALES_IDEMPOTENCY_RETENTION_DAYS", DEFAULT_IDEMPOTENCY_RETENTION_DAYS
+    )
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    ScalesOperation.objects.filter(created_at__lt=cutoff).delete()
+
+
+def _save_weight_groups(groups):
+    """
+    Записывает итоговые веса: groups — {(tag_id, дата): (животное, вес)}.
+    Одна запись на животное и день: существующая обновляется, лишние за тот же
+    день удаляются. Возвращает {(tag_id, дата): (запись, прежний вес или None)}.
+    """
+    tag_ids = {tag_id for tag_id, _weight_date in groups}
+    weight_dates = {weight_date for _tag_id, weight_date in groups}
+    existing = {}
+    duplicate_ids = []
+    records = (
+        WeightRecord.objects.select_for_update()
+        .filter(tag_id__in=tag_ids, weight_date__in=weight_dates)
+        .order_by("-id")
+    )
+    for record in records:
+        key = (record.tag_id, record.weight_date)
+        if key not in groups:
+            continue
+        if key in existing:
+            duplicate_ids.append(record.pk)
+        else:
+            existing[key] = record
+
+    saved = {}
+    to_create = []
+    to_update = []
+    for key, (animal, weight) in groups.items():
+        record = existing.get(key)
+        if record is None:
+            record = WeightRecord(tag=animal.tag, weight=weight, weight_date=key[1])
+            to_create.append(record)
+            saved[key] = (record, None)
+        else:
+            old_weight = record.weight
+            if old_weight != weight:
+                record.weight = weight
+                to_update.append(record)
+            saved[key] = (record, old_weight)
+
+    WeightRecord.objects.bulk_create(to_create)
+    WeightRecord.objects.bulk_update(to_update, ["weight"])
+    if duplicate_ids:
+        WeightRecord.objects.filter(pk__in=duplicate_ids).delete()
+
+    # Массовые операции не посылают сигналов — сбрасываем зависимые кэши сами
+    if to_create or to_update or duplicate_ids:
+        for weight_date in weight_dates:
+            invalidate_month(weight_date)
+        invalidate_acts()
+    return saved
+
+
+@api_view(["POST"])
+@authentication_classes(SCALES_AUTHENTICATION)
+@permission_classes([ScalesServicePermission])
+def weights_batch(request):
+    """
+    Пакет взвешиваний: readings — список {tag_number, weight, measured_at,
+    idempotency_key}. Для каждого показания возвращается свой результат в
+    порядке отправки. Если за один день у животного несколько показаний,
+    сохраняется последнее из них; прежние получают статус superseded.
+    Показание с уже обработанным ключом не выполняется повторно (duplicate)
+    и получает сохранённый результат.
+    """
+    readings = request.data.get("readings")
+    if not isinstance(readings, list) or not readings:
+        return _error(
+            "readings должен быть непустым списком показаний",
+            "invalid_readings",
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if len(readings) > WEIGHTS_BATCH_MAX:
+        return _error(
+            f"В одном пакете не больше {WEIGHTS_BATCH_MAX} показаний",
+            "batch_too_large",
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    results = _save_weight_readings(request, readings)
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return Response({"results": results, "summary": summary})
+
+
+def _save_weight_readings(request, readings):
+    """Обрабатывает показания пакета; результаты — в порядке readings."""
+    results = [None] * len(readings)
+    parsed = []
+    for index, item in enumerate(readings):
+        try:
+            tag_number, weight, weight_date, key = _parse_weight_reading(item)
+        except ValueError as exc:
+            message, code = exc.args
+            key = str(item.get("idempotency_key") or "").strip() if isinstance(item, dict) else ""
+            results[index] = {"idempotency_key": key or None, "status": "error", "code": code, "error": message}
+            continue
+        parsed.append((index, tag_number, weight, weight_date, key))
+
+    with transaction.atomic():
+        keys = [key for _index, _tag, _weight, _date, key in parsed if key]
+        done_operations = {
+            operation.key: operation.result
+            for operation in ScalesOperation.objects.filter(key__in=keys)
+        }
+
+        pending = []
+        seen_keys = set()
+        repeated = []
+        for index, tag_number, weight, weight_date, key in parsed:
+            if key in done_operations:
+                results[index] = {**done_operations[key], "idempotency_key": key, "status": "duplicate"}
+                continue
+            if key in seen_keys:
+                # Повтор ключа внутри пакета — результат первого показания
+                repeated.append((index, key))
+                continue
+            if key:
+                seen_keys.add(key)
+            pending.append((index, tag_number, weight, weight_date, key))
+
+        found = _find_active_by_tags(tag_number for _index, tag_number, *_rest in pending)
+        groups = {}
+        items_by_group = {}
+        for index, tag_number, weight, weight_date, key in pending:
+            match = found.get(tag_number.lower())
+            if match is None:
+                results[index] = {
+                    "idempotency_key": key or None,
+                    "tag_number": tag_number,
+                    "status": "error",
+                    "code": "animal_not_found",
+                    "error": "Активное животное с такой биркой не найдено",
+                }
+                continue
+            animal = match[4]
+            group_key = (animal.tag_id, weight_date)
+            # Показания обрабатываются в порядке отправки — побеждает последнее
+            groups[group_key] = (animal, weight)
+            items_by_group.setdefault(group_key, []).append((index, key))
+
+        saved = _save_weight_groups(groups) if groups else {}
+
+        created_tags = []
+        updated_tags = []
+        operations = []
+        for group_key, items in items_by_group.items():
+            record, old_weight = saved[group_key]
+            animal = groups[group_key][0]
+            if old_weight is None:
+                final_status = "created"
+                created_tags.append(animal.tag.tag_number)
+            elif old_weight != record.weight:
+                final_status = "updated"
+                updated_tags.append(animal.tag.tag_number)
+            else:
+                final_status = "unchanged"
+            record_payload = {
+                "id": record.id,
+                "tag_number": animal.tag.tag_number,
+                "weight": str(record.weight),
+                "weight_date": record.weight_date.isoformat(),
+            }
+            last_index = items[-1][0]
+            for index, key in items:
+                result = {
+                    **record_payload,
+                    "idempotency_key": key or None,
+                    "status": final_status if index == last_index else "superseded",
+                }
+                results[index] = result
+                if key:
+                    operations.append(
+                        ScalesOperation(key=key, operation=ScalesOperation.OPERATION_WEIGHT, result=result)
+                    )
+
+        # При гонке двух пакетов с одним ключом запись уже может существовать
+        ScalesOperation.objects.bulk_create(operations, ignore_conflicts=True)
+
+        first_results = {
+            result["idempotency_key"]: result
+            for result in results
+            if result is not None and result.get("idempotency_key")
+        }
+        for index, key in repeated:
+            first_result = first_results[key]
+            results[index] = (
+                dict(first_result) if first_result["status"] == "error" else {**first_result, "status": "duplicate"}
+            )
+
+        if created_tags or updated_tags:
+            saved_tags = created_tags + updated_tags
+            _log_scales_action(
+                request,
+                action_type="Пакетное взвешивание",
+                object_type="Запись о весе",
+                object_id=_short_tag_list(saved_tags),
+                description=(
+                    f"Добавлено записей о весе: {len(created_tags)}; "
+                    f"Обновлено: {len(updated_tags)}; "
+                    f"Бирки: {', '.join(saved_tags)}"
+                ),
+            )
+
+    _cleanup_scales_operations()
+    return results
+
+
 @api_view(["POST"])
-@authentication_classes([BasicAuthentication])
+@authentication_classes(SCALES_AUTHENTICATION)
 @permission_classes([ScalesServicePermission])
 def movements(request):
-    raw_tag_numbers = request.data.get("tag_numbers")
+    body, http_status = _move_animals(request, request.data)
+    return Response(body, status=http_status)
+
+
+def _move_animals(request, data):
+    """
+    Перемещение животных {tag_numbers, place_id} в другое место.
+    Возвращает (тело ответа, HTTP-статус); если часть животных недоступна — конфликт без изменений.
+    """
+    raw_tag_numbers = data.get("tag_numbers")
     if not isinstance(raw_tag_numbers, list):
-        return _error(
+        return _error_body(
             "tag_numbers должен быть списком бирок",
             "invalid_tag_numbers",
             status.HTTP_400_BAD_REQUEST,
@@ -490,16 +857,16 @@ def movements(request):
             seen.add(key)
             tag_numbers.append(tag_number)
     if not tag_numbers:
-        return _error(
+        return _error_body(
             "Не выбраны животные для перемещения",
             "animals_required",
             status.HTTP_400_BAD_REQUEST,
         )
 
     try:
-        place_id = int(request.data.get("place_id"))
+        place_id = int(data.get("place_id"))
     except (TypeError, ValueError):
-        return _error(
+        return _error_body(
             "Не выбрана овчарня",
             "place_required",
             status.HTTP_400_BAD_REQUEST,
@@ -509,7 +876,7 @@ def movements(request):
         try:
             new_place = Place.objects.select_for_update().get(pk=place_id)
         except Place.DoesNotExist:
-            return _error(
+            return _error_body(
                 "Выбранная овчарня не найдена",
                 "place_not_found",
                 status.HTTP_404_NOT_FOUND,
@@ -525,13 +892,13 @@ def movements(request):
                 resolved.append(match)
 
         if missing:
-            return Response(
+            return (
                 {
                     "error": "Часть животных больше недоступна для перемещения",
                     "code": "animals_changed",
                     "tag_numbers": missing,
                 },
-                status=status.HTTP_409_CONFLICT,
+                status.HTTP_409_CONFLICT,
             )
 
         moved = []
@@ -543,6 +910,7 @@ def movements(request):
 
             old_place = animal.place
             model.objects.filter(pk=animal.pk).update(place=new_place)
+            record_animal_changes([animal.tag_id])
             PlaceMovement.objects.create(
                 tag=animal.tag,
                 old_place=old_place,
@@ -565,10 +933,361 @@ def movements(request):
                 ),
             )
 
-    return Response(
+    return (
         {
             "moved": moved,
             "skipped": skipped,
             "place": {"id": new_place.id, "sheepfold": new_place.sheepfold},
+        },
+        status.HTTP_200_OK,
+    )
+
+
+def _sync_animal_payload(type_key, animal):
+    """Компактная запись животного для локальной копии терминала."""
+    return {
+        "tag_id": animal.tag_id,
+        "tag_number": animal.tag.tag_number,
+        "display_name": _display_name(type_key, animal),
+        "animal_type": type_key,
+        "status": _status_name(animal),
+        "rshn_tag": animal.rshn_tag,
+        "place_id": animal.place_id,
+    }
+
+
+def _sync_animals(tag_ids=None):
+    items = []
+    for type_key, _type_label, model, _route_name in ANIMAL_TYPES:
+        queryset = model.objects.filter(is_archived=False).select_related("tag", "animal_status")
+        if tag_ids is not None:
+            queryset = queryset.filter(tag_id__in=tag_ids)
+        items.extend(_sync_animal_payload(type_key, animal) for animal in queryset)
+    items.sort(key=lambda item: item["tag_number"].lower())
+    return items
+
+
+def _sync_places(place_ids=None):
+    queryset = Place.objects.all()
+    if place_ids is not None:
+        queryset = queryset.filter(id__in=place_ids)
+    return [
+        {"id": place.id, "sheepfold": place.sheepfold}
+        for place in sorted(queryset, key=place_natural_sort_key)
+    ]
+
+
+def _parse_since(value):
+    """Курсор журнала изменений из параметра запроса; None — курсора нет."""
+    if value in (None, ""):
+        return None
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        since = -1
+    if since < 0:
+        raise ValueError("since должен быть неотрицательным целым числом")
+    return since
+
+
+@api_view(["GET"])
+@authentication_classes(SCALES_AUTHENTICATION)
+@permission_classes([ScalesServicePermission])
+def sync(request):
+    """
+    Изменения для локальной копии терминала после курсора since.
+    Возвращает новый курсор, изменённые активные животные (с РСХН и местом)
+    и места, а также id бирок и мест, которые надо удалить из копии. Если
+    курсора нет или он устарел, full=true и в ответе полный снимок — копию
+    нужно заменить целиком.
+    """
+    try:
+        since = _parse_since(request.query_params.get("since"))
+    except ValueError as exc:
+        return _error(str(exc), "invalid_since", status.HTTP_400_BAD_REQUEST)
+
+    cursor, changes = get_sync_changes(since)
+    if changes is None:
+        return Response(
+            {
+                "cursor": cursor,
+                "full": True,
+                "animals": _sync_animals(),
+                "removed_animals": [],
+                "places": _sync_places(),
+                "removed_places": [],
+            }
+        )
+
+    changed_tag_ids = changes[ScalesSyncChange.ENTITY_ANIMAL]
+    changed_place_ids = changes[ScalesSyncChange.ENTITY_PLACE]
+    animals = _sync_animals(changed_tag_ids) if changed_tag_ids else []
+    places = _sync_places(changed_place_ids) if changed_place_ids else []
+    # Бирки, у которых больше нет активного животного (архив, удаление), и удалённые места
+    removed_animals = sorted(changed_tag_ids - {item["tag_id"] for item in animals})
+    removed_places = sorted(changed_place_ids - {item["id"] for item in places})
+    return Response(
+        {
+            "cursor": cursor,
+            "full": False,
+            "animals": animals,
+            "removed_animals": removed_animals,
+            "places": places,
+            "removed_places": removed_places,
+        }
+    )
+
+
+SYNC_OPERATIONS = {
+    ScalesOperation.OPERATION_BINDING: _bind_rshn,
+    ScalesOperation.OPERATION_MOVEMENT: _move_animals,
+}
+
+
+def _apply_queued_operation(request, operation_type, item):
+    """
+    Выполняет отложенную привязку или перемещение с ключом идемпотентности.
+    Ключ занимается до выполнения операции: параллельная выгрузка того же
+    ключа ждёт и получает результат первой. Конфликт и ошибка ничего не
+    меняют и ключ не занимают — операцию можно отправить повторно.
+    """
+    key = str(item.get("idempotency_key") or "").strip()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return {
+            "type": operation_type,
+            "idempotency_key": None,
+            "status": "error",
+            "code": "invalid_idempotency_key",
+            "error": f"idempotency_key длиннее {IDEMPOTENCY_KEY_MAX_LENGTH} символов",
         }
+
+    with transaction.atomic():
+        if key:
+            operation, created = ScalesOperation.objects.get_or_create(
+                key=key, defaults={"operation": operation_type}
+            )
+            if not created:
+                return {**operation.result, "status": "duplicate"}
+
+        body, http_status = SYNC_OPERATIONS[operation_type](request, item)
+        if http_status < 300:
+            result_status = "applied"
+        elif http_status == status.HTTP_409_CONFLICT:
+            result_status = "conflict"
+        else:
+            result_status = "error"
+        result = {"type": operation_type, "idempotency_key": key or None, "status": result_status}
+        if result_status == "applied":
+            result["data"] = body
+        else:
+            result.update(body)
+
+        if key:
+            if result_status == "applied":
+                operation.result = result
+                operation.save(update_fields=["result"])
+            else:
+                operation.delete()
+    return result
+
+
+@api_view(["POST"])
+@authentication_classes(SCALES_AUTHENTICATION)
+@permission_classes([ScalesServicePermission])
+def sync_upload(request):
+    """
+    Выгрузка очереди терминала: operations — список операций в порядке их
+    выполнения офлайн, каждая с type и idempotency_key:
+    "weight" (tag_number, weight, measured_at), "binding" (tag_number,
+    rshn_tag, force) и "movement" (tag_numbers, place_id).
+    Результат по каждой операции — в порядке отправки: applied, duplicate,
+    conflict (данные на сервере изменились, нужен выбор пользователя) или
+    error; взвешивания получают статусы пакетного взвешивания.
+    """
+    operations = request.data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        return _error(
+            "operations должен быть непустым списком операций",
+            "invalid_operations",
+            status.HTTP_400_BAD_REQUEST,
+        )
+    if len(operations) > SYNC_UPLOAD_MAX:
+        return _error(
+            f"За один обмен не больше {SYNC_UPLOAD_MAX} операций",
+            "batch_too_large",
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    results = [None] * len(operations)
+    weight_items = []
+    for index, item in enumerate(operations):
+        operation_type = item.get("type") if isinstance(item, dict) else None
+        if operation_type == ScalesOperation.OPERATION_WEIGHT:
+            weight_items.append((index, item))
+        elif operation_type in SYNC_OPERATIONS:
+            results[index] = _apply_queued_operation(request, operation_type, item)
+        else:
+            results[index] = {
+                "type": operation_type,
+                "idempotency_key": (
+                    str(item.get("idempotency_key") or "").strip() or None if isinstance(item, dict) else None
+                ),
+                "status": "error",
+                "code": "invalid_operation",
+                "error": "Неизвестный тип операции (ожидается weight, binding или movement)",
+            }
+
+    # Взвешивания не зависят от привязок и перемещений и сохраняются одним пакетом
+    if weight_items:
+        weight_results = _save_weight_readings(request, [item for _index, item in weight_items])
+        for (index, _item), result in zip(weight_items, weight_results):
+            results[index] = {"type": ScalesOperation.OPERATION_WEIGHT, **result}
+    else:
+        _cleanup_scales_operations()
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return Response({"results": results, "summary": summary})
+
+
+@api_view(["POST", "DELETE"])
+@authentication_classes([ScalesTokenAuthentication, BasicAuthentication])
+@permission_classes([ScalesUserPermission])
+def token(request):
+    """
+    POST по логину и паролю (Basic) выпускает токен {name, scopes} — дальше
+    терминал работает с заголовком Authorization: Token <токен>.
+    DELETE с токеном отзывает этот токен.
+    """
+    if request.method == "DELETE":
+        if not isinstance(request.auth, ScalesApiToken):
+            return _error("Отозвать можно только токен, которым выполнен запрос", "token_required", status.HTTP_400_BAD_REQUEST)
+        request.auth.revoke()
+        _log_scales_action(
+            request,
+            action_type="Отзыв токена весов",
+            object_type="Токен весов",
+            object_id=request.auth.prefix,
+            description=f"Отозван токен {request.auth}",
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if isinstance(request.auth, ScalesApiToken):
+        return _error(
+            "Новый токен выдаётся только по логину и паролю",
+            "password_required",
+            status.HTTP_403_FORBIDDEN,
+        )
+    try:
+        scopes = parse_scopes(request.data.get("scopes"))
+    except ValueError as exc:
+        return _error(str(exc), "invalid_scopes", status.HTTP_400_BAD_REQUEST)
+    name = str(request.data.get("name") or "").strip()[:100]
+
+    api_token, raw_token = issue_token(request.user, name=name, scopes=scopes)
+    _log_scales_action(
+        request,
+        action_type="Выпуск токена весов",
+        object_type="Токен весов",
+        object_id=api_token.prefix,
+        description=f"Выпущен токен {api_token}; Права: {', '.join(api_token.scopes)}",
+    )
+    return Response(
+        {
+            "token": raw_token,
+            "prefix": api_token.prefix,
+            "name": api_token.name,
+            "scopes": api_token.scopes,
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+ROSTER_FIELDS = ("tag_id", "tag_number", "name", "animal_type", "rshn_tag", "place_id", "status_id")
+ROSTER_ETAG_PATTERN = re.compile(r'"roster-(\d+)"')
+ROSTER_CACHE_TIMEOUT = 300
+
+
+def _roster_etag(version):
+    return f'"roster-{version}"'
+
+
+def _roster_rows(tag_ids=None):
+    """Строки реестра активных животных в порядке ROSTER_FIELDS, без создания объектов моделей."""
+    rows = []
+    for type_key, _type_label, model, _route_name in ANIMAL_TYPES:
+        queryset = model.objects.filter(is_archived=False)
+        if tag_ids is not None:
+            queryset = queryset.filter(tag_id__in=tag_ids)
+        fields = ["tag_id", "tag__tag_number", "rshn_tag", "place_id", "animal_status_id"]
+        if model is Maker:
+            fields.append("name")
+        for tag_id, tag_number, rshn_tag, place_id, status_id, *name in queryset.values_list(*fields):
+            rows.append([tag_id, tag_number, name[0] if name else None, type_key, rshn_tag, place_id, status_id])
+    rows.sort(key=lambda row: row[1].lower())
+    return rows
+
+
+def _full_roster(version):
+    # Полный реестр одной версии одинаков для всех терминалов — строится один раз
+    cache_key = f"scales:roster:{version}"
+    rows = cache.get(cache_key)
+    if rows is None:
+        rows = _roster_rows()
+        cache.set(cache_key, rows, ROSTER_CACHE_TIMEOUT)
+    return rows
+
+
+@api_view(["GET"])
+@authentication_classes(SCALES_AUTHENTICATION)
+@permission_classes([ScalesServicePermission])
+def roster(request):
+    """
+    Реестр активных животных для поиска на терминале без запросов к серверу.
+    Строки — массивы в порядке fields; статусы — справочник {id: название}.
+    Версия реестра — курсор журнала изменений, она же ETag. С If-None-Match
+    (или since) возвращаются только изменения после этой версии: изменённые
+    строки и removed — tag_id, которые надо удалить; если ничего не
+    изменилось — 304. Без версии или с устаревшей — полный реестр (full=true).
+    """
+    try:
+        since = _parse_since(request.query_params.get("since"))
+    except ValueError as exc:
+        return _error(str(exc), "invalid_since", status.HTTP_400_BAD_REQUEST)
+    conditional = False
+    if since is None:
+        match = ROSTER_ETAG_PATTERN.search(request.headers.get("If-None-Match", ""))
+        if match:
+            since = int(match.group(1))
+            conditional = True
+
+    if conditional and get_sync_cursor() == since:
+        # Частый случай — реестр не менялся: ответ без выборки изменений
+        return Response(
+            status=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": _roster_etag(since), "Cache-Control": "private, no-cache"},
+        )
+
+    version, changes = get_sync_changes(since)
+    headers = {"ETag": _roster_etag(version), "Cache-Control": "private, no-cache"}
+
+    if changes is None:
+        rows = _full_roster(version)
+        removed = []
+    else:
+        changed_tag_ids = changes[ScalesSyncChange.ENTITY_ANIMAL]
+        rows = _roster_rows(changed_tag_ids) if changed_tag_ids else []
+        removed = sorted(changed_tag_ids - {row[0] for row in rows})
+
+    return Response(
+        {
+            "version": version,
+            "full": changes is None,
+            "fields": ROSTER_FIELDS,
+            "animals": rows,
+            "removed": removed,
+            "statuses": dict(Status.objects.values_list("id", "status_type")),
+        },
+        headers=headers,
     )
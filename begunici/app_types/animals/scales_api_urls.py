@@ -6,10 +6,15 @@ from . import scales_api
 app_name = "scales_api"
 
 urlpatterns = [
+    path("token/", scales_api.token, name="token"),
     path("animals/", scales_api.animals, name="animals"),
     path("bindings/", scales_api.bindings, name="bindings"),
     path("identification/", scales_api.identification, name="identification"),
     path("places/", scales_api.places, name="places"),
     path("weights/", scales_api.weights, name="weights"),
+    path("weights/batch/", scales_api.weights_batch, name="weights-batch"),
     path("movements/", scales_api.movements, name="movements"),
+    path("roster/", scales_api.roster, name="roster"),
+    path("sync/", scales_api.sync, name="sync"),
+    path("sync/upload/", scales_api.sync_upload, name="sync-upload"),
 ]
@@ -0,0 +1,147 @@
+"""
+Аутентификация сервиса весов по токену.
+
+BasicAuthentication на каждом запросе проверяет пароль через PBKDF2 — это
+сотни миллисекунд процессора на одно взвешивание. Токен весов — случайная
+строка с большой энтропией, поэтому для него достаточно SHA-256: в базе
+хранится только хэш, поиск идёт по уникальному индексу, сравнение —
+hmac.compare_digest. Найденный токен вместе с пользователем держится в
+памяти процесса SCALES_TOKEN_CACHE_SECONDS секунд; отзыв токена в этом же
+процессе сбрасывает кэш сразу (сигнал), в остальных — по истечении срока.
+
+Заголовок запроса: Authorization: Token <токен> (или Bearer <токен>).
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models_scales import ScalesApiToken
+
+TOKEN_PREFIX = "scl_"
+AUTH_KEYWORDS = (b"token", b"bearer")
+DEFAULT_TOKEN_CACHE_SECONDS = 60
+# Токенов немного; ограничение защищает память процесса от перебора
+TOKEN_CACHE_MAX_SIZE = 256
+
+
+def hash_token(raw_token):
+    return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+
+
+def issue_token(user, name="", scopes=ScalesApiToken.SCOPES):
+    """Выпускает токен: (запись, сам токен). Токен нигде не сохраняется — показать его можно только сейчас."""
+    raw_token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    token = ScalesApiToken.objects.create(
+        user=user,
+        name=name,
+        prefix=raw_token[:12],
+        token_hash=hash_token(raw_token),
+        scopes=[scope for scope in ScalesApiToken.SCOPES if scope in scopes],
+    )
+    return token, raw_token
+
+
+def parse_scopes(value):
+    """Права из списка или строки через запятую; неизвестное право — ValueError."""
+    if value in (None, ""):
+        return list(ScalesApiToken.SCOPES)
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("scopes должен быть списком или строкой через запятую")
+    scopes = [str(scope).strip() for scope in value if str(scope).strip()]
+    unknown = [scope for scope in scopes if scope not in ScalesApiToken.SCOPES]
+    if unknown or not scopes:
+        raise ValueError(f"Допустимые права: {', '.join(ScalesApiToken.SCOPES)}")
+    return scopes
+
+
+class TokenCache:
+    """Проверенные токены процесса: хэш -> (момент истечения, токен с пользователем)."""
+
+    def __init__(self, max_size=TOKEN_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, token_hash):
+        with self._lock:
+            entry = self._entries.get(token_hash)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, token_hash, token, timeout):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[token_hash] = (time.monotonic() + timeout, token)
+
+    def forget(self, token_hash):
+        with self._lock:
+            self._entries.pop(token_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def get_token_cache_seconds():
+    return getattr(settings, "SCALES_TOKEN_CACHE_SECONDS", DEFAULT_TOKEN_CACHE_SECONDS)
+
+
+def get_active_token(raw_token):
+    """Действующий токен (с пользователем) или None."""
+    token_hash = hash_token(raw_token)
+    token = token_cache.get(token_hash)
+    if token is not None:
+        return token
+
+    token = (
+        ScalesApiToken.objects.select_related("user")
+        .filter(token_hash=token_hash, revoked_at__isnull=True)
+        .first()
+    )
+    if token is None or not hmac.compare_digest(token.token_hash, token_hash) or not token.user.is_active:
+        return None
+    # Отметка об использовании пишется раз в срок кэша, а не на каждый запрос
+    token.last_used_at = timezone.now()
+    ScalesApiToken.objects.filter(pk=token.pk).update(last_used_at=token.last_used_at)
+    token_cache.set(token_hash, token, get_token_cache_seconds())
+    return token
+
+
+class ScalesTokenAuthentication(BaseAuthentication):
+    """Аутентификация по токену весов; request.auth — запись ScalesApiToken."""
+
+    keyword = "Token"
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() not in AUTH_KEYWORDS:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Неверный заголовок токена")
+        try:
+            raw_token = auth[1].decode("ascii")
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Неверный заголовок токена")
+
+        token = get_active_token(raw_token)
+        if token is None:
+            raise exceptions.AuthenticationFailed("Токен недействителен или отозван")
+        return token.user, token
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,120 @@
+"""
+Журнал изменений для синхронизации терминалов весов.
+
+Терминал держит локальную копию активных животных (бирка, статус, РСХН,
+место) и списка мест и работает с ней без связи. Чтобы не выгружать всё
+заново, он запрашивает только изменения после своего курсора — номера
+последней полученной записи журнала ScalesSyncChange.
+
+Журнал пополняется сигналами (сохранение и удаление животных, бирок,
+статусов и мест; у животных — только при изменении полей, которые есть в
+копии терминала) и явными вызовами там, где данные меняются через update()
+без сигналов. Запись делается в той же транзакции, что и изменение: она
+фиксируется и откатывается вместе с ним.
+
+Номер записи (sequence) выдаётся при вставке, а видимой она становится при
+фиксации, поэтому у параллельных вставок номер N+1 может зафиксироваться
+раньше N: терминал, получивший курсор N+1, запись N уже не запросит. Чтобы
+порядок номеров совпадал с порядком фиксации, вставки в журнал в PostgreSQL
+идут под транзакционной advisory-блокировкой, которая держится до фиксации
+(SQLite и так сериализует запись). Старые записи удаляются по сроку хранения
+командой cleanup_scales_sync и обработчиком выгрузок; терминал с курсором
+старше журнала получает полный снимок.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Ewe, Maker, Ram, Sheep
+from .models_scales import ScalesSyncChange
+
+DEFAULT_SYNC_RETENTION_DAYS = 30
+# Ключ pg_advisory_xact_lock для вставок в журнал
+SYNC_JOURNAL_LOCK_KEY = 7_240_118
+
+
+def _lock_sync_journal():
+    """Сериализует вставки в журнал до конца текущей транзакции (только PostgreSQL)."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SYNC_JOURNAL_LOCK_KEY])
+
+
+def record_sync_changes(entity, object_ids):
+    """Отмечает изменение объектов entity в текущей транзакции."""
+    object_ids = sorted({object_id for object_id in object_ids if object_id is not None})
+    if not object_ids:
+        return
+
+    # Блокировка держится до фиксации внешней транзакции — номера фиксируются по порядку
+    with transaction.atomic():
+        _lock_sync_journal()
+        ScalesSyncChange.objects.bulk_create(
+            [ScalesSyncChange(entity=entity, object_id=object_id) for object_id in object_ids]
+        )
+
+
+def record_animal_changes(tag_ids):
+    record_sync_changes(ScalesSyncChange.ENTITY_ANIMAL, tag_ids)
+
+
+def record_place_changes(place_ids):
+    record_sync_changes(ScalesSyncChange.ENTITY_PLACE, place_ids)
+
+
+def record_active_animals(**filters):
+    """Отмечает активных животных по условию (например, со статусом или местом)."""
+    tag_ids = []
+    for model in (Maker, Ram, Ewe, Sheep):
+        tag_ids.extend(model.objects.filter(is_archived=False, **filters).values_list("tag_id", flat=True))
+    record_animal_changes(tag_ids)
+
+
+def get_sync_cursor():
+    return ScalesSyncChange.objects.aggregate(cursor=Max("id"))["cursor"] or 0
+
+
+def get_sync_changes(since):
+    """
+    (курсор, изменения) после курсора since: изменения — {объект: множество id}
+    или None, если нужен полный снимок (курсора нет, он старше журнала или
+    новее текущего).
+    """
+    bounds = ScalesSyncChange.objects.aggregate(oldest=Min("id"), cursor=Max("id"))
+    cursor = bounds["cursor"] or 0
+    if since is None or since > cursor:
+        return cursor, None
+    if bounds["oldest"] is not None and since < bounds["oldest"] - 1:
+        return cursor, None
+
+    changes = {
+        ScalesSyncChange.ENTITY_ANIMAL: set(),
+        ScalesSyncChange.ENTITY_PLACE: set(),
+    }
+    # order_by() снимает Meta.ordering: иначе id попадает в SELECT DISTINCT и дубли не схлопываются
+    rows = (
+        ScalesSyncChange.objects.filter(id__gt=since, id__lte=cursor)
+        .order_by()
+        .values_list("entity", "object_id")
+        .distinct()
+    )
+    for entity, object_id in rows:
+        changes.setdefault(entity, set()).add(object_id)
+    return cursor, changes
+
+
+def cleanup_sync_changes(retention_days=None):
+    """
+    Удаляет записи старше срока хранения и возвращает их число; последняя
+    запись остаётся — она держит курсор.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, "SCALES_SYNC_RETENTION_DAYS", DEFAULT_SYNC_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    cursor = get_sync_cursor()
+    removed, _by_model = ScalesSyncChange.objects.filter(created_at__lt=cutoff, id__lt=cursor).delete()
+    return removed
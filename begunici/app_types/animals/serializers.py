@@ -35,6 +35,7 @@ from begunici.app_types.veterinary.vet_serializers import (
     StatusHistorySerializer,
 )
 from .status_logic import set_mothers_not_inseminated_after_child_update
+from .record_prefetch import get_latest_weight_records, get_weight_records_near_dates
 
 
 def _format_weight_kg(value):
@@ -232,6 +233,41 @@ class DynamicFieldsModelSerializer(serializers.ModelSerializer):
                 self.fields.pop(field_name)
 
 
+class LatestRecordsListSerializer(serializers.ListSerializer):
+    """
+    Список животных, для которого последние взвешивания и взвешивания при
+    рождении/отбивке загружаются пакетно и передаются дочернему сериализатору
+    через контекст, вместо запросов на каждую строку.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        animals = list(iterable)
+        tag_ids = [animal.tag_id for animal in animals]
+        tag_dates = []
+        for animal in animals:
+            tag_dates.append((animal.tag_id, animal.birth_date))
+            tag_dates.append((animal.tag_id, animal.date_otbivka))
+
+        self.context["latest_weights_by_tag"] = get_latest_weight_records(tag_ids)
+        self.context["near_weights_by_tag_date"] = get_weight_records_near_dates(tag_dates)
+        return super().to_representation(animals)
+
+
+def _get_context_last_weight(serializer, obj):
+    latest_weights = serializer.context.get("latest_weights_by_tag")
+    if latest_weights is not None:
+        return latest_weights.get(obj.tag_id)
+    return WeightRecord.objects.filter(tag=obj.tag).order_by("-weight_date", "-id").first()
+
+
+def _get_context_weight_near_date(serializer, obj, target_date):
+    near_weights = serializer.context.get("near_weights_by_tag_date")
+    if near_weights is not None:
+        return near_weights.get((obj.tag_id, target_date))
+    return _get_weight_record_near_date(obj.tag, target_date)
+
+
 class AnimalBaseSerializer(DynamicFieldsModelSerializer):
     animal_status = StatusSerializer(
         read_only=True
@@ -454,7 +490,7 @@ class AnimalBaseSerializer(DynamicFieldsModelSerializer):
         instance = super().create(validated_data)
         
         # Создаем подробный лог создания
-        from .models_user_log import UserActionLog
+        from .action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -490,7 +526,7 @@ class AnimalBaseSerializer(DynamicFieldsModelSerializer):
             
             details_text = "; ".join(details)
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Создание животного",
                 object_type=russian_type,
@@ -838,7 +874,7 @@ class AnimalBaseSerializer(DynamicFieldsModelSerializer):
         
         # Создаем подробный лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -867,7 +903,7 @@ class AnimalBaseSerializer(DynamicFieldsModelSerializer):
                     action_type = "Восстановление из архива"
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type=action_type,
                     object_type=russian_type,
@@ -1085,6 +1121,7 @@ class EweSerializer(AnimalBaseSerializer):
     class Meta(AnimalBaseSerializer.Meta):
         model = Ewe
         fields = "__all__"
+        list_serializer_class = LatestRecordsListSerializer
 
     def get_children(self, obj):
         children = obj.get_children()
@@ -1103,15 +1140,14 @@ class EweSerializer(AnimalBaseSerializer):
         return "-"
 
     def get_birth_weight_display(self, obj):
-        weight_record = _get_weight_record_near_date(obj.tag, obj.birth_date)
+        weight_record = _get_context_weight_near_date(self, obj, obj.birth_date)
         return _format_weight_kg(weight_record.weight) if weight_record else "-"
 
     def get_last_weight_display(self, obj):
-        weight_record = WeightRecord.objects.filter(tag=obj.tag).order_by("-weight_date", "-id").first()
-        return _format_weight_record_with_date(weight_record)
+        return _format_weight_record_with_date(_get_context_last_weight(self, obj))
 
     def get_weaning_display(self, obj):
-        weight_record = _get_weight_record_near_date(obj.tag, obj.date_otbivka)
+        weight_record = _get_context_weight_near_date(self, obj, obj.date_otbivka)
         return _format_weight_record_with_date(weight_record)
 
 
@@ -1125,6 +1161,7 @@ class SheepSerializer(AnimalBaseSerializer):
     class Meta(AnimalBaseSerializer.Meta):
         model = Sheep
         fields = "__all__"
+        list_serializer_class = LatestRecordsListSerializer
 
     def get_lambing_history(self, obj):
         # Получаем все окоты для овцематки
@@ -1146,8 +1183,7 @@ class SheepSerializer(AnimalBaseSerializer):
         return UniversalChildSerializer(children, many=True).data
 
     def get_last_weight_display(self, obj):
-        weight_record = WeightRecord.objects.filter(tag=obj.tag).order_by("-weight_date", "-id").first()
-        return _format_weight_record_with_date(weight_record)
+        return _format_weight_record_with_date(_get_context_last_weight(self, obj))
 
     def get_last_insemination(self, obj):
         return build_sheep_last_insemination_data(obj)
@@ -1426,6 +1462,24 @@ class ArchiveAnimalSerializer(serializers.Serializer):
             return reverse("animals:sheep-detail", kwargs={"tag_number": mother_tag})
         return None
 
+    def _get_context_last_live_weight(self, instance):
+        """Последний живой вес из пакета в контексте (build_archive_serializer_context) или запросом."""
+        last_live_weights = self.context.get("last_live_weights")
+        if last_live_weights is None:
+            return self._get_last_live_weight(instance.tag)
+        return self._format_weight(last_live_weights.get(instance.tag_id))
+
+    def _get_context_mother_url(self, mother_tag):
+        mother_types = self.context.get("mother_types")
+        if mother_types is None:
+            return self._build_mother_url(mother_tag)
+        mother_type = mother_types.get(mother_tag) if mother_tag else None
+        if mother_type == "Ewe":
+            return reverse("animals:ewe-detail", kwargs={"tag_number": mother_tag})
+        if mother_type == "Sheep":
+            return reverse("animals:sheep-detail", kwargs={"tag_number": mother_tag})
+        return None
+
     @staticmethod
     def _can_download_archive_act(status_type):
         from .archive_acts import get_archive_act_template_config
@@ -1523,18 +1577,8 @@ class ArchiveAnimalSerializer(serializers.Serializer):
         tag_number = instance.tag.tag_number if instance.tag else "Нет данных"
         animal_type = instance.tag.animal_type if instance.tag else "Unknown"
 
-        archived_date = None
-        if instance.animal_status and instance.tag:
-            last_status_change = (
-                StatusHistory.objects.filter(
-                    tag=instance.tag,
-                    new_status=instance.animal_status,
-                )
-                .order_by("-id")
-                .first()
-            )
-            if last_status_change:
-                archived_date = last_status_change.change_date
+        # Дата перевода в текущий статус хранится на животном (AnimalBase.archived_at)
+        archived_date = instance.archived_at if instance.animal_status else None
 
         mother_tag = (instance.mother or "").strip() or None
         age_display = self._format_age_at_date(instance.birth_date, archived_date)
@@ -1550,10 +1594,10 @@ class ArchiveAnimalSerializer(serializers.Serializer):
             "birth_date": instance.birth_date,
             "age": age_display,
             "is_archived": instance.is_archived,
-            "last_live_weight": self._get_last_live_weight(instance.tag),
+            "last_live_weight": self._get_context_last_live_weight(instance),
             "carcass_weight": self._format_weight(instance.carcass_weight),
             "mother_tag": mother_tag,
-            "mother_url": self._build_mother_url(mother_tag),
+            "mother_url": self._get_context_mother_url(mother_tag),
             "can_download_act": self._can_download_archive_act(
                 instance.animal_status.status_type if instance.animal_status else ""
             ),
@@ -1587,7 +1631,7 @@ class CalendarNoteSerializer(serializers.ModelSerializer):
         note = CalendarNote.objects.create(**validated_data)
         
         # Создаем подробный лог создания
-        from .models_user_log import UserActionLog
+        from .action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -1601,7 +1645,7 @@ class CalendarNoteSerializer(serializers.ModelSerializer):
             date_str = date_moscow.strftime('%d.%m.%Y')
             
             # Не включаем текст заметки в лог (может быть длинным)
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Создание заметки календаря",
                 object_type="Заметка календаря",
@@ -1635,7 +1679,7 @@ class CalendarNoteSerializer(serializers.ModelSerializer):
         
         # Создаем подробный лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -1647,7 +1691,7 @@ class CalendarNoteSerializer(serializers.ModelSerializer):
                 changes_text = "; ".join(changes)
                 date_str = instance.date.strftime('%d.%m.%Y')
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Редактирование заметки календаря",
                     object_type="Заметка календаря",
@@ -0,0 +1,432 @@
+"""
+Обработчики сигналов моделей животных: поддержание кэшей и индексов в актуальном состоянии.
+"""
+
+from types import SimpleNamespace
+
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from begunici.app_types.veterinary.vet_models import (
+    Place,
+    PlaceMovement,
+    Status,
+    StatusHistory,
+    Tag,
+    Veterinary,
+    VeterinaryCare,
+    WeightRecord,
+)
+
+from .act_templates import invalidate_acts
+from .archive_index import refresh_archived_at
+from .calendar_index import (
+    get_animal_calendar_dates,
+    get_lambing_calendar_dates,
+    get_note_calendar_dates,
+    get_tag_calendar_dates,
+    get_vet_calendar_dates,
+    get_vet_care_calendar_dates,
+    get_weighing_dates,
+    invalidate_calendar_dates,
+)
+from .dashboard_stats import invalidate_dashboard_statistics
+from .log_links import refresh_log_animal_types
+from .models_scales import ScalesApiToken
+from .models import ArchiveAct, CalendarNote, Ewe, Lambing, Maker, Ram, Sheep, TransferAct
+from .monthly_stats import get_animal_first_stat_date, invalidate_month, invalidate_months_from
+from .pedigree import handle_tag_saved, remove_animal_from_pedigree, update_animal_in_pedigree
+from .scales_auth import token_cache
+from .scales_sync import record_active_animals, record_animal_changes, record_place_changes
+from .tag_resolver import invalidate_tag
+from .transfer_acts import (
+    get_movement_transfer_act_ids,
+    refresh_transfer_acts,
+    register_transfer_movement,
+    sync_transfer_movement,
+)
+
+ANIMAL_MODELS = (Maker, Ram, Ewe, Sheep)
+
+# Модели, данные которых попадают в печатные акты: их изменение сбрасывает кэш готовых актов
+ACT_SOURCE_MODELS = ANIMAL_MODELS + (
+    Tag,
+    Status,
+    StatusHistory,
+    WeightRecord,
+    Place,
+    PlaceMovement,
+    Lambing,
+    ArchiveAct,
+    TransferAct,
+)
+
+# Модели-источники помесячной статистики: поле даты и способ сброса свёртки.
+# Изменение истории статусов влияет на все последующие месяцы (статус на конец месяца).
+MONTHLY_STAT_SOURCES = (
+    (WeightRecord, "weight_date", invalidate_month),
+    (Veterinary, "date_of_care", invalidate_month),
+    (Lambing, "actual_lambing_date", invalidate_month),
+    (StatusHistory, "change_date", invalidate_months_from),
+)
+
+# Источники индекса календаря: модель, поля с датами и даты событий, которые даёт запись
+CALENDAR_SOURCES = (
+    (Lambing, ("planned_lambing_date",), get_lambing_calendar_dates),
+    (CalendarNote, ("date",), get_note_calendar_dates),
+    (Veterinary, ("date_of_care", "duration_days"), get_vet_calendar_dates),
+)
+# Поля, из которых строятся подписи событий календаря, и даты событий с объектом (по его id)
+CALENDAR_LABEL_SOURCES = (
+    (Tag, ("tag_number", "animal_type"), get_tag_calendar_dates),
+    (VeterinaryCare, ("care_type", "care_name", "medication", "purpose"), get_vet_care_calendar_dates),
+)
+MAKER_LABEL_FIELDS = ("name",)
+# Поля животного в локальной копии терминалов весов (у производителя — и кличка)
+SCALES_SYNC_FIELDS = ("tag_id", "animal_status_id", "is_archived", "rshn_tag", "place_id")
+
+
+# --- значения полей до сохранения (без повторного чтения записи) ---
+
+def _remember_values(instance, key, attnames):
+    tracked = instance.__dict__.setdefault("_tracked_values", {})
+    # Отложенные (deferred) поля не запоминаем — их значение неизвестно
+    tracked[key] = {attname: instance.__dict__[attname] for attname in attnames if attname in instance.__dict__}
+
+
+def _track_values(model, key, attnames):
+    """
+    Запоминает значения полей attnames экземпляров model при загрузке из БД
+    (post_init). Запрос перед сохранением нужен, только если экземпляр создан
+    с заданным pk, а не прочитан из БД, или поля были отложены.
+    """
+    def on_post_init(sender, instance, **kwargs):
+        _remember_values(instance, key, attnames)
+
+    def on_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+        tracked = instance.__dict__.setdefault("_tracked_values", {})
+        if raw or instance.pk is None:
+            tracked[key] = None
+            return
+        values = {} if instance._state.adding else dict(tracked.get(key) or {})
+        missing = [attname for attname in attnames if attname not in values]
+        if missing:
+            row = sender._base_manager.filter(pk=instance.pk).values(*missing).first()
+            values = None if row is None else {**values, **row}
+        tracked[key] = values
+
+    name = model.__name__
+    post_init.connect(on_post_init, sender=model, weak=False, dispatch_uid=f"track_{key}_init_{name}")
+    pre_save.connect(on_pre_save, sender=model, weak=False, dispatch_uid=f"track_{key}_pre_save_{name}")
+
+
+def _saved_values(instance, key, attnames, update_fields=None):
+    """
+    Для post_save: прежние значения изменившихся полей ({attname: (было, стало)}),
+    None для новой записи. Запомненные значения обновляются до сохранённых.
+    """
+    tracked = instance.__dict__.setdefault("_tracked_values", {})
+    old_values = tracked.get(key)
+    if update_fields is not None:
+        saved = {instance._meta.get_field(name).attname for name in update_fields}
+        attnames = [attname for attname in attnames if attname in saved]
+    if old_values is None:
+        _remember_values(instance, key, attnames)
+        return None
+    changes = {}
+    for attname in attnames:
+        new_value = getattr(instance, attname)
+        if old_values.get(attname, new_value) != new_value:
+            changes[attname] = (old_values[attname], new_value)
+        old_values[attname] = new_value
+    return changes
+
+
+def _invalidate_animal_months(instance, created):
+    birth_date = instance.birth_date
+    if created:
+        if birth_date:
+            invalidate_months_from(birth_date)
+        return
+    old_birth_date = getattr(instance, "_loaded_values", {}).get("birth_date", birth_date)
+    if old_birth_date != birth_date:
+        dates = [value for value in (old_birth_date, birth_date) if value]
+        if dates:
+            invalidate_months_from(min(dates))
+
+
+def _invalidate_animal_calendar(instance, created=False, label_changed=False):
+    # Напоминания о взвешивании считаются от даты рождения (прежней и новой) и
+    # только для животных не в архиве — без этих изменений месяцы не трогаем
+    loaded = getattr(instance, "_loaded_values", None) or {}
+    old_birth_date = loaded.get("birth_date", instance.birth_date)
+    weighing_changed = (
+        created
+        or old_birth_date != instance.birth_date
+        or loaded.get("is_archived", instance.is_archived) != instance.is_archived
+    )
+    dates = []
+    if weighing_changed or label_changed:
+        dates = [*get_weighing_dates(old_birth_date), *get_weighing_dates(instance.birth_date)]
+    if label_changed:
+        dates.extend(get_animal_calendar_dates(instance))
+    invalidate_calendar_dates(*dates)
+
+
+def _animal_label_changed(instance, created, update_fields):
+    """Изменилась ли подпись животного в календаре: бирка или имя производителя."""
+    if isinstance(instance, Maker):
+        name_changes = _saved_values(instance, "calendar", MAKER_LABEL_FIELDS, update_fields)
+    else:
+        name_changes = None
+    if created:
+        return False
+    old_tag_id = getattr(instance, "_loaded_values", {}).get("tag_id", instance.tag_id)
+    return old_tag_id != instance.tag_id or bool(name_changes)
+
+
+def _scales_sync_fields(model):
+    return (*SCALES_SYNC_FIELDS, *MAKER_LABEL_FIELDS) if model is Maker else SCALES_SYNC_FIELDS
+
+
+def _record_animal_sync(instance, update_fields):
+    # Обычное сохранение без изменений полей копии терминала журнал не пополняет
+    changes = _saved_values(instance, "scales_sync", _scales_sync_fields(type(instance)), update_fields)
+    if changes is None:
+        record_animal_changes([instance.tag_id])
+    elif changes:
+        old_tag_id = changes.get("tag_id", (instance.tag_id, None))[0]
+        record_animal_changes([old_tag_id, instance.tag_id])
+
+
+def _on_animal_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        _saved_values(instance, "scales_sync", _scales_sync_fields(sender))
+        return
+    created = kwargs.get("created", False)
+    update_animal_in_pedigree(instance)
+    invalidate_tag(instance.tag_id)
+    invalidate_dashboard_statistics()
+    _invalidate_animal_months(instance, created)
+    _invalidate_animal_calendar(
+        instance, created, _animal_label_changed(instance, created, kwargs.get("update_fields"))
+    )
+    _record_animal_sync(instance, kwargs.get("update_fields"))
+
+
+def _on_animal_deleting(sender, instance, **kwargs):
+    # Бирка и записи животного при каскадном удалении исчезают раньше post_delete —
+    # месяцы, в которые животное попадает, определяем заранее
+    instance._monthly_stats_from = get_animal_first_stat_date(instance.tag_id, instance.birth_date)
+
+
+def _on_animal_deleted(sender, instance, **kwargs):
+    remove_animal_from_pedigree(instance)
+    invalidate_tag(instance.tag_id)
+    record_animal_changes([instance.tag_id])
+    invalidate_dashboard_statistics()
+    _invalidate_animal_calendar(instance, created=True)
+    first_month = getattr(instance, "_monthly_stats_from", None)
+    if first_month:
+        invalidate_months_from(first_month)
+
+
+for _model in ANIMAL_MODELS:
+    _track_values(_model, "scales_sync", _scales_sync_fields(_model))
+    post_save.connect(_on_animal_saved, sender=_model, dispatch_uid=f"pedigree_save_{_model.__name__}")
+    pre_delete.connect(
+        _on_animal_deleting, sender=_model, dispatch_uid=f"monthly_stats_pre_delete_{_model.__name__}"
+    )
+    post_delete.connect(_on_animal_deleted, sender=_model, dispatch_uid=f"pedigree_delete_{_model.__name__}")
+
+
+@receiver(post_save, sender=Tag, dispatch_uid="pedigree_tag_save")
+def _on_tag_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    handle_tag_saved(instance)
+    invalidate_tag(instance.pk)
+    record_animal_changes([instance.pk])
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) == {"animal_type"}:
+        # Тип животного сменился (ярка → овцематка, баранчик → производитель)
+        refresh_log_animal_types(instance.tag_number)
+
+
+@receiver(post_delete, sender=Tag, dispatch_uid="tag_resolver_tag_delete")
+def _on_tag_deleted(sender, instance, **kwargs):
+    invalidate_tag(instance.pk)
+
+
+@receiver(post_save, sender=StatusHistory, dispatch_uid="dashboard_status_history_save")
+@receiver(post_delete, sender=StatusHistory, dispatch_uid="dashboard_status_history_delete")
+def _on_status_history_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard_statistics()
+
+
+@receiver(post_save, sender=StatusHistory, dispatch_uid="archive_index_status_history_save")
+@receiver(post_delete, sender=StatusHistory, dispatch_uid="archive_index_status_history_delete")
+def _on_status_history_archive_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Дата архивирования — последняя запись истории с текущим статусом животного
+    refresh_archived_at([instance.tag_id])
+
+
+def _make_monthly_stat_handlers(model, date_field, invalidate):
+    # Прежняя дата запоминается при загрузке записи — перед сохранением её не перечитываем
+    attnames = (date_field,)
+    _track_values(model, "monthly_stats", attnames)
+
+    def on_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+        changes = _saved_values(instance, "monthly_stats", attnames, update_fields)
+        if raw:
+            return
+        # При переносе записи на другую дату сбрасываем и прежний месяц
+        old_value = (changes or {}).get(date_field, (None,))[0]
+        if old_value:
+            invalidate(old_value)
+        value = getattr(instance, date_field)
+        if value:
+            invalidate(value)
+
+    def on_deleted(sender, instance, **kwargs):
+        value = getattr(instance, date_field)
+        if value:
+            invalidate(value)
+
+    name = model.__name__
+    post_save.connect(on_saved, sender=model, weak=False, dispatch_uid=f"monthly_stats_save_{name}")
+    post_delete.connect(on_deleted, sender=model, weak=False, dispatch_uid=f"monthly_stats_delete_{name}")
+
+
+for _model, _date_field, _invalidate in MONTHLY_STAT_SOURCES:
+    _make_monthly_stat_handlers(_model, _date_field, _invalidate)
+
+
+@receiver(post_save, sender=PlaceMovement, dispatch_uid="transfer_acts_movement_save")
+def _on_place_movement_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        register_transfer_movement(instance)
+    else:
+        sync_transfer_movement(instance)
+
+
+@receiver(pre_delete, sender=PlaceMovement, dispatch_uid="transfer_acts_movement_pre_delete")
+def _on_place_movement_deleting(sender, instance, **kwargs):
+    # Связи с актами удаляются раньше самого перемещения — запоминаем акты заранее
+    instance._transfer_act_ids = get_movement_transfer_act_ids(instance)
+
+
+@receiver(post_delete, sender=PlaceMovement, dispatch_uid="transfer_acts_movement_delete")
+def _on_place_movement_deleted(sender, instance, **kwargs):
+    refresh_transfer_acts(getattr(instance, "_transfer_act_ids", ()))
+
+
+def _on_act_source_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_acts()
+
+
+for _model in ACT_SOURCE_MODELS:
+    post_save.connect(_on_act_source_changed, sender=_model, dispatch_uid=f"acts_cache_save_{_model.__name__}")
+    post_delete.connect(_on_act_source_changed, sender=_model, dispatch_uid=f"acts_cache_delete_{_model.__name__}")
+m2m_changed.connect(
+    _on_act_source_changed, sender=TransferAct.movements.through, dispatch_uid="acts_cache_transfer_movements"
+)
+
+
+def _make_calendar_handlers(model, attnames, get_dates):
+    # Прежние даты запоминаются при загрузке записи — перед сохранением её не перечитываем
+    _track_values(model, "calendar_dates", attnames)
+
+    def on_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+        changes = _saved_values(instance, "calendar_dates", attnames, update_fields)
+        if raw:
+            return
+        dates = get_dates(instance)
+        if changes:
+            # При переносе записи сбрасывается и прежний месяц
+            old_values = {attname: getattr(instance, attname) for attname in attnames}
+            old_values.update((attname, old) for attname, (old, _new) in changes.items())
+            dates = [*get_dates(SimpleNamespace(**old_values)), *dates]
+        invalidate_calendar_dates(*dates)
+
+    def on_deleted(sender, instance, **kwargs):
+        invalidate_calendar_dates(*get_dates(instance))
+
+    name = model.__name__
+    post_save.connect(on_saved, sender=model, weak=False, dispatch_uid=f"calendar_save_{name}")
+    post_delete.connect(on_deleted, sender=model, weak=False, dispatch_uid=f"calendar_delete_{name}")
+
+
+for _model, _attnames, _get_dates in CALENDAR_SOURCES:
+    _make_calendar_handlers(_model, _attnames, _get_dates)
+
+
+def _make_calendar_label_handlers(model, attnames, get_dates):
+    _track_values(model, "calendar", attnames)
+
+    def on_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+        changes = _saved_values(instance, "calendar", attnames, update_fields)
+        if raw or created or not changes:
+            return
+        invalidate_calendar_dates(*get_dates(instance.pk))
+
+    def on_pre_delete(sender, instance, **kwargs):
+        # Связанные записи после удаления уже не найти (SET_NULL) — даты собираем заранее
+        instance._calendar_old_dates = get_dates(instance.pk)
+
+    def on_deleted(sender, instance, **kwargs):
+        invalidate_calendar_dates(*getattr(instance, "_calendar_old_dates", ()))
+
+    name = model.__name__
+    post_save.connect(on_saved, sender=model, weak=False, dispatch_uid=f"calendar_label_save_{name}")
+    pre_delete.connect(on_pre_delete, sender=model, weak=False, dispatch_uid=f"calendar_label_pre_delete_{name}")
+    post_delete.connect(on_deleted, sender=model, weak=False, dispatch_uid=f"calendar_label_delete_{name}")
+
+
+for _model, _attnames, _get_dates in CALENDAR_LABEL_SOURCES:
+    _make_calendar_label_handlers(_model, _attnames, _get_dates)
+_track_values(Maker, "calendar", MAKER_LABEL_FIELDS)
+
+
+# Журнал синхронизации терминалов весов: статусы и места попадают в данные
+# животных, а при удалении статуса или места поле у животных обнуляется без сигналов
+@receiver(post_save, sender=Status, dispatch_uid="scales_sync_status_save")
+def _on_status_saved_for_sync(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_active_animals(animal_status=instance)
+
+
+@receiver(pre_delete, sender=Status, dispatch_uid="scales_sync_status_pre_delete")
+def _on_status_deleting_for_sync(sender, instance, **kwargs):
+    record_active_animals(animal_status=instance)
+
+
+@receiver(post_save, sender=Place, dispatch_uid="scales_sync_place_save")
+def _on_place_saved_for_sync(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_place_changes([instance.pk])
+
+
+@receiver(pre_delete, sender=Place, dispatch_uid="scales_sync_place_pre_delete")
+def _on_place_deleting_for_sync(sender, instance, **kwargs):
+    record_active_animals(place=instance)
+    record_place_changes([instance.pk])
+
+
+@receiver(post_save, sender=ScalesApiToken, dispatch_uid="scales_token_cache_save")
+@receiver(post_delete, sender=ScalesApiToken, dispatch_uid="scales_token_cache_delete")
+def _on_scales_token_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Отозванный токен перестаёт приниматься этим процессом сразу
+    token_cache.forget(instance.token_hash)
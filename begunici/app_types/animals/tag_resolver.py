@@ -0,0 +1,309 @@
+"""
+Единый поиск животного по номеру бирки.
+
+Тип животного хранится в Tag.animal_type, поэтому вместо последовательного
+перебора четырёх таблиц (Maker, Ram, Ewe, Sheep) запрос выполняется только
+к одной из них. Результаты разрешения (бирка → тип и id животного) хранятся
+в LRU-кэше процесса и сбрасываются сигналами при сохранении/удалении бирки
+или животного. Внутри одного запроса дополнительно можно использовать
+TagResolver — он запоминает уже найденные экземпляры.
+
+Если животное нашлось не в таблице из Tag.animal_type (тип не заполнен или
+устарел), поиск продолжается по остальным таблицам, а расхождение пишется в
+лог; сами бирки при чтении не меняются — их исправляет команда
+repair_tag_animal_types.
+"""
+
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+from begunici.app_types.veterinary.vet_models import Tag
+
+from .models import Ewe, Maker, Ram, Sheep
+
+ANIMAL_MODELS = (Maker, Ram, Ewe, Sheep)
+ANIMAL_MODELS_BY_TYPE = {model.__name__: model for model in ANIMAL_MODELS}
+DEFAULT_SELECT_RELATED = ("tag", "animal_status", "place")
+TAG_RESOLVER_CACHE_SIZE = 4096
+
+# tag_number -> (animal_type, animal_id, tag_id)
+_resolved = OrderedDict()
+# tag_id -> tag_number, для сброса записи при переименовании бирки
+_tag_numbers_by_tag_id = {}
+_lock = Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def get_animal_model(animal_type):
+    """Модель животного по значению Tag.animal_type (или None)."""
+    return ANIMAL_MODELS_BY_TYPE.get(animal_type or "")
+
+
+def _normalize(tag_number):
+    return str(tag_number or "").strip()
+
+
+def _cache_get(tag_number):
+    with _lock:
+        entry = _resolved.get(tag_number)
+        if entry is not None:
+            _resolved.move_to_end(tag_number)
+        return entry
+
+
+def _cache_put(tag_number, animal):
+    entry = (animal.get_animal_type(), animal.pk, animal.tag_id)
+    with _lock:
+        _resolved[tag_number] = entry
+        _resolved.move_to_end(tag_number)
+        _tag_numbers_by_tag_id[animal.tag_id] = tag_number
+        while len(_resolved) > TAG_RESOLVER_CACHE_SIZE:
+            _old_number, (_type, _pk, old_tag_id) = _resolved.popitem(last=False)
+            _tag_numbers_by_tag_id.pop(old_tag_id, None)
+
+
+def _cache_discard(tag_number):
+    with _lock:
+        entry = _resolved.pop(tag_number, None)
+        if entry is not None:
+            _tag_numbers_by_tag_id.pop(entry[2], None)
+
+
+def invalidate_tag(tag_id):
+    """Сбрасывает закэшированное разрешение для бирки с указанным id."""
+    if tag_id is None:
+        return
+    with _lock:
+        tag_number = _tag_numbers_by_tag_id.pop(tag_id, None)
+        if tag_number is not None:
+            _resolved.pop(tag_number, None)
+
+
+def clear_tag_cache():
+    with _lock:
+        _resolved.clear()
+        _tag_numbers_by_tag_id.clear()
+
+
+def _animal_queryset(model, select_related):
+    return model.objects.select_related(*select_related)
+
+
+def _candidate_models(animal_type):
+    """
+    Таблицы для поиска: сначала указанная в Tag.animal_type, затем остальные —
+    тип может быть не заполнен или устареть (старые данные, сбой синхронизации).
+    """
+    model = get_animal_model(animal_type)
+    if model is None:
+        return ANIMAL_MODELS
+    return (model, *(candidate for candidate in ANIMAL_MODELS if candidate is not model))
+
+
+def _report_tag_type(animal, animal_type):
+    """Пишет в лог, если животное нашлось не в таблице из Tag.animal_type."""
+    actual_type = animal.get_animal_type()
+    if actual_type != animal_type:
+        logger.warning(
+            "Tag.animal_type устарел для бирки id=%s: указан %r, животное в таблице %s",
+            animal.tag_id,
+            animal_type,
+            actual_type,
+        )
+
+
+def _lookup_by_tag(tag_number, animal_type, select_related):
+    """Ищет животное сначала в таблице из Tag.animal_type, затем в остальных."""
+    for candidate in _candidate_models(animal_type):
+        animal = (
+            _animal_queryset(candidate, select_related)
+            .filter(tag__tag_number=tag_number)
+            .first()
+        )
+        if animal is not None:
+            _report_tag_type(animal, animal_type)
+            return animal
+    return None
+
+
+def resolve_animal_by_tag(tag_number, select_related=DEFAULT_SELECT_RELATED):
+    """
+    Возвращает животное с указанным номером бирки или None.
+
+    При попадании в кэш выполняется один запрос по первичному ключу;
+    иначе — запрос типа из Tag и запрос в одну таблицу животных.
+    """
+    tag_number = _normalize(tag_number)
+    if not tag_number:
+        return None
+
+    entry = _cache_get(tag_number)
+    if entry is not None:
+        animal_type, animal_id, _tag_id = entry
+        model = get_animal_model(animal_type)
+        animal = (
+            _animal_queryset(model, select_related)
+            .filter(pk=animal_id, tag__tag_number=tag_number)
+            .first()
+        )
+        if animal is not None:
+            return animal
+        # Запись устарела (например, изменение в другом процессе)
+        _cache_discard(tag_number)
+
+    tag_info = Tag.objects.filter(tag_number=tag_number).values_list("animal_type", flat=True).first()
+    if tag_info is None:
+        return None
+
+    animal = _lookup_by_tag(tag_number, tag_info, select_related)
+    if animal is not None:
+        _cache_put(tag_number, animal)
+    return animal
+
+
+def resolve_animal_for_tag(tag, select_related=DEFAULT_SELECT_RELATED):
+    """Возвращает животное для уже загруженного объекта Tag или None."""
+    if not tag:
+        return None
+    for candidate in _candidate_models(tag.animal_type):
+        animal = _animal_queryset(candidate, select_related).filter(tag=tag).first()
+        if animal is not None:
+            _report_tag_type(animal, tag.animal_type)
+            return animal
+    return None
+
+
+def resolve_animals_by_tags(tag_numbers, select_related=DEFAULT_SELECT_RELATED):
+    """
+    Пакетное разрешение: {tag_number: животное} для найденных бирок.
+    Один запрос к Tag и по одному запросу на каждый встретившийся тип.
+    """
+    tag_numbers = {_normalize(tag_number) for tag_number in tag_numbers}
+    tag_numbers.discard("")
+    if not tag_numbers:
+        return {}
+
+    numbers_by_type = {}
+    types_by_number = {}
+    for tag_number, animal_type in Tag.objects.filter(tag_number__in=tag_numbers).values_list(
+        "tag_number", "animal_type"
+    ):
+        types_by_number[tag_number] = animal_type
+        model = get_animal_model(animal_type)
+        if model is None:
+            # Тип не заполнен — ищем во всех таблицах
+            for candidate in ANIMAL_MODELS:
+                numbers_by_type.setdefault(candidate, set()).add(tag_number)
+        else:
+            numbers_by_type.setdefault(model, set()).add(tag_number)
+
+    if "tag" not in select_related:
+        select_related = ("tag", *select_related)
+
+    result = {}
+
+    def load(model, numbers):
+        for animal in _animal_queryset(model, select_related).filter(tag__tag_number__in=numbers):
+            result[animal.tag.tag_number] = animal
+            _cache_put(animal.tag.tag_number, animal)
+
+    for model in ANIMAL_MODELS:
+        numbers = numbers_by_type.get(model, set()) - result.keys()
+        if numbers:
+            load(model, numbers)
+
+    # Бирки с устаревшим типом: не нашлись в указанной таблице — ищем в остальных
+    missing = types_by_number.keys() - result.keys()
+    if missing:
+        for model in ANIMAL_MODELS:
+            numbers = {
+                number for number in missing - result.keys()
+                if get_animal_model(types_by_number[number]) not in (None, model)
+            }
+            if numbers:
+                load(model, numbers)
+        for number in missing & result.keys():
+            _report_tag_type(result[number], types_by_number[number])
+    return result
+
+
+def resolve_tag_models(tag_number, case_insensitive=False):
+    """
+    Список пар (tag_id, модель) для бирок с указанным номером — без загрузки
+    самих животных. Используется там, где запрос к таблице животного требует
+    дополнительных условий (активность, блокировка строки).
+    """
+    tag_number = _normalize(tag_number)
+    if not tag_number:
+        return []
+    lookup = "tag_number__iexact" if case_insensitive else "tag_number"
+    typed_pairs = []
+    fallback_pairs = []
+    tags = Tag.objects.filter(**{lookup: tag_number}).order_by("id").values_list("id", "animal_type")
+    for tag_id, animal_type in tags:
+        # Указанная в типе таблица идёт первой, остальные — на случай устаревшего типа
+        model = get_animal_model(animal_type)
+        for candidate in _candidate_models(animal_type):
+            pairs = fallback_pairs if model is not None and candidate is not model else typed_pairs
+            pairs.append((tag_id, candidate))
+
+    # Несколько бирок (поиск без учёта регистра) — по приоритету таблиц, затем по id бирки
+    def order(pair):
+        return ANIMAL_MODELS.index(pair[1]), pair[0]
+
+    return sorted(typed_pairs, key=order) + sorted(fallback_pairs, key=order)
+
+
+def repair_tag_animal_types(dry_run=False):
+    """
+    Приводит Tag.animal_type к таблице, в которой лежит животное (при
+    нескольких таблицах — по приоритету Maker, Ram, Ewe, Sheep). Бирки
+    сохраняются по одной, чтобы сработали сигналы. Возвращает список
+    (номер бирки, прежний тип, новый тип).
+    """
+    actual_types = {}
+    for model in ANIMAL_MODELS:
+        for tag_id in model.objects.values_list("tag_id", flat=True):
+            actual_types.setdefault(tag_id, model.__name__)
+
+    repaired = []
+    for tag in Tag.objects.order_by("id").iterator():
+        actual_type = actual_types.get(tag.pk)
+        if actual_type is None or tag.animal_type == actual_type:
+            continue
+        repaired.append((tag.tag_number, tag.animal_type, actual_type))
+        if not dry_run:
+            tag.animal_type = actual_type
+            tag.save(update_fields=["animal_type"])
+    return repaired
+
+
+class TagResolver:
+    """
+    Разрешение бирок в рамках одного запроса: повторный поиск той же бирки
+    не обращается к БД. Отсутствующие бирки тоже запоминаются.
+    """
+
+    def __init__(self, select_related=DEFAULT_SELECT_RELATED):
+        self.select_related = select_related
+        self._animals = {}
+
+    def prefetch(self, tag_numbers):
+        """Загружает набор бирок заранее одним пакетом."""
+        pending = {_normalize(tag_number) for tag_number in tag_numbers} - self._animals.keys()
+        pending.discard("")
+        if not pending:
+            return
+        found = resolve_animals_by_tags(pending, select_related=self.select_related)
+        for tag_number in pending:
+            self._animals[tag_number] = found.get(tag_number)
+
+    def resolve(self, tag_number):
+        tag_number = _normalize(tag_number)
+        if not tag_number:
+            return None
+        if tag_number not in self._animals:
+            self._animals[tag_number] = resolve_animal_by_tag(tag_number, select_related=self.select_related)
+        return self._animals[tag_number]
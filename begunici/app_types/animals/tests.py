@@ -1,3 +1,558 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from begunici.app_types.veterinary.vet_models import Place, PlaceMovement, Status, Tag, WeightRecord
+
+from . import (
+    animal_search,
+    archive_index,
+    calendar_index,
+    dorper,
+    monthly_stats,
+    pedigree,
+    scales_api,
+    scales_sync,
+    signals,
+    tag_resolver,
+    transfer_acts,
+    views,
+    views_admin,
+)
+from .excel_export import StreamingWorkbook
+from .models import (
+    CalendarEvent,
+    CalendarEventMonth,
+    CalendarNote,
+    Ewe,
+    Maker,
+    MonthlyStatistic,
+    MonthlyStatisticMonth,
+    Ram,
+    Sheep,
+    TransferAct,
+)
+from .models_scales import ScalesSyncChange
+from .models_user_log import UserActionLog
+from .pedigree import PedigreeGraph
+
+
+def make_animal(model, tag_number, **fields):
+    """Животное с новой (или существующей) биркой и минимально нужными полями."""
+    tag, _created = Tag.objects.get_or_create(tag_number=tag_number)
+    fields.setdefault("animal_status", Status.objects.get_or_create(status_type="Откорм")[0])
+    fields.setdefault("place", Place.objects.get_or_create(sheepfold="Тест-1")[0])
+    fields.setdefault("birth_date", date(2025, 1, 1))
+    if model is Maker:
+        fields.setdefault("plemstatus", "Племенной")
+        fields.setdefault("working_condition", "Рабочий")
+    return model.objects.create(tag=tag, **fields)
+
+
+class PedigreeGraphPriorityTests(TestCase):
+    """При дублировании бирки в нескольких таблицах действует приоритет Maker, Ram, Ewe, Sheep."""
+
+    def test_higher_priority_table_wins_regardless_of_order(self):
+        graph = PedigreeGraph()
+        graph.set_animal("A1", "M-maker", "F-maker", "Maker")
+        graph.set_animal("A1", "M-sheep", "F-sheep", "Sheep")
+
+        self.assertEqual(graph.get_animal_type("A1"), "Maker")
+        self.assertEqual(graph.get_parents("A1"), ("M-maker", "F-maker"))
+
+    def test_removal_falls_back_to_remaining_table(self):
+        graph = PedigreeGraph()
+        # Перевод ярки в овцу: сначала создаётся овца, затем удаляется ярка
+        graph.set_animal("A2", "M-ewe", "F-ewe", "Ewe")
+        graph.set_animal("A2", "M-sheep", "F-sheep", "Sheep")
+        self.assertEqual(graph.get_animal_type("A2"), "Ewe")
+
+        graph.remove_animal("A2", "Ewe")
+
+        self.assertEqual(graph.get_animal_type("A2"), "Sheep")
+        self.assertEqual(graph.get_parents("A2"), ("M-sheep", "F-sheep"))
+
+        graph.remove_animal("A2", "Sheep")
+        self.assertFalse(graph.has_animal("A2"))
+        self.assertEqual(graph.get_parents("A2"), (None, None))
+
+
+class PedigreeSignalTests(TestCase):
+    def setUp(self):
+        pedigree.invalidate_pedigree_graph()
+        self.addCleanup(pedigree.invalidate_pedigree_graph)
+
+    def test_incremental_update_matches_full_load(self):
+        make_animal(Maker, "P1", mother="MM", father="MF")
+        graph = pedigree.get_pedigree_graph()
+
+        # Бирка производителя появляется и в таблице овец — производитель остаётся главным
+        make_animal(Sheep, "P1", mother="SM", father="SF")
+        make_animal(Ram, "C1", mother="P1", father="X")
+
+        loaded = PedigreeGraph.load()
+        for tag_number in ("P1", "C1"):
+            self.assertEqual(graph.get_parents(tag_number), loaded.get_parents(tag_number))
+            self.assertEqual(graph.get_animal_type(tag_number), loaded.get_animal_type(tag_number))
+        self.assertEqual(graph.get_parents("P1"), ("MM", "MF"))
+
+    def test_deleting_ewe_keeps_converted_sheep(self):
+        ewe = make_animal(Ewe, "E1", mother="EM", father="EF")
+        graph = pedigree.get_pedigree_graph()
+
+        make_animal(Sheep, "E1", mother="EM", father="EF")
+        ewe.delete()
+
+        self.assertEqual(graph.get_animal_type("E1"), "Sheep")
+        self.assertEqual(graph.get_parents("E1"), ("EM", "EF"))
+
+
+class TagResolverStaleTypeTests(TestCase):
+    """Устаревший Tag.animal_type: животное находится, но чтение бирку не меняет."""
+
+    def setUp(self):
+        tag_resolver.clear_tag_cache()
+        self.addCleanup(tag_resolver.clear_tag_cache)
+        self.ram = make_animal(Ram, "R1")
+        Tag.objects.filter(pk=self.ram.tag_id).update(animal_type="Sheep")
+
+    def test_lookups_fall_back_without_writing(self):
+        tag = Tag.objects.get(pk=self.ram.tag_id)
+        with self.assertLogs("begunici.app_types.animals.tag_resolver", level="WARNING"):
+            self.assertEqual(tag_resolver.resolve_animal_by_tag("R1"), self.ram)
+        self.assertEqual(tag_resolver.resolve_animal_for_tag(tag), self.ram)
+        self.assertEqual(tag_resolver.resolve_animals_by_tags(["R1"]), {"R1": self.ram})
+
+        self.assertEqual(Tag.objects.get(pk=self.ram.tag_id).animal_type, "Sheep")
+
+    def test_repair_command_fixes_type(self):
+        call_command("repair_tag_animal_types", stdout=StringIO())
+        self.assertEqual(Tag.objects.get(pk=self.ram.tag_id).animal_type, "Ram")
+
+    def test_case_duplicates_resolve_by_table_priority(self):
+        # Бирки, совпадающие без учёта регистра: как в прежнем переборе — сначала Maker
+        make_animal(Sheep, "d1")
+        maker = make_animal(Maker, "D1")
+
+        for _attempt in range(3):
+            found = scales_api._find_active_by_tag("d1")
+            self.assertEqual(found[-1], maker)
+        self.assertEqual(scales_api._find_active_by_tags(["D1"])["d1"][-1], maker)
+
+
+class TagAnimalTypeSyncTests(TestCase):
+    def test_reassigned_tag_gets_type_through_tag_signals(self):
+        ram = make_animal(Ram, "S1")
+        tag = Tag.objects.create(tag_number="S2", animal_type="Sheep")
+        refreshed = []
+        original = signals.refresh_log_animal_types
+        signals.refresh_log_animal_types = refreshed.append
+        self.addCleanup(setattr, signals, "refresh_log_animal_types", original)
+
+        ram = Ram.objects.get(pk=ram.pk)
+        ram.tag_id = tag.pk
+        ram.save()
+
+        self.assertEqual(Tag.objects.get(pk=tag.pk).animal_type, "Ram")
+        self.assertIn("S2", refreshed)
+
+
+class TransferActUniquenessTests(TestCase):
+    """Один акт на дату и пару мест, в том числе когда одно из мест пустое."""
+
+    def setUp(self):
+        self.place = Place.objects.create(sheepfold="Тест-2")
+        self.tag = Tag.objects.create(tag_number="TA1")
+
+    def test_movements_without_old_place_share_act(self):
+        first = PlaceMovement.objects.create(tag=self.tag, new_place=self.place)
+        second = PlaceMovement.objects.create(tag=self.tag, new_place=self.place)
+
+        acts = TransferAct.objects.filter(old_place__isnull=True, new_place=self.place)
+        self.assertEqual(acts.count(), 1)
+        self.assertEqual(set(acts.get().movements.all()), {first, second})
+
+    def test_act_workbook_reflects_changes_from_other_processes(self):
+        ram = make_animal(Ram, "TA2")
+        movement = PlaceMovement.objects.create(tag=ram.tag, new_place=self.place)
+        act = movement.transfer_acts.get()
+
+        output, _group = transfer_acts.generate_transfer_act_workbook(act.act_number)
+        self.assertEqual(load_workbook(output).active["A19"].value, "TA2")
+
+        # Изменение без сигналов в этом процессе — как в другом worker
+        Tag.objects.filter(pk=ram.tag_id).update(tag_number="TA3")
+        output, _group = transfer_acts.generate_transfer_act_workbook(act.act_number)
+        self.assertEqual(load_workbook(output).active["A19"].value, "TA3")
+
+    def test_null_place_duplicates_rejected(self):
+        now = timezone.now()
+        fields = dict(transfer_date=now.date(), first_created_at=now, last_created_at=now)
+        TransferAct.objects.create(act_number=901, new_place=self.place, **fields)
+        TransferAct.objects.create(act_number=902, old_place=self.place, **fields)
+        TransferAct.objects.create(act_number=903, **fields)
+
+        for act_number, places in ((904, {"new_place": self.place}), (905, {"old_place": self.place}), (906, {})):
+            with self.subTest(places=places), self.assertRaises(IntegrityError), transaction.atomic():
+                TransferAct.objects.create(act_number=act_number, **places, **fields)
+
+
+class DorperPropagationTests(TestCase):
+    def test_parents_created_after_child(self):
+        child = make_animal(Ewe, "DC1", mother="dm1", father=" DF1 ")
+        self.assertIsNone(child.dorper_percentage)
+
+        make_animal(Maker, "DF1", dorper_percentage=Decimal("100"), is_manual_dorper=True)
+        make_animal(Sheep, "DM1", dorper_percentage=Decimal("50"), is_manual_dorper=True)
+
+        child.refresh_from_db()
+        self.assertEqual(child.dorper_percentage, Decimal("75"))
+
+    def test_parent_change_reaches_grandchildren(self):
+        make_animal(Maker, "GF1", dorper_percentage=Decimal("100"), is_manual_dorper=True)
+        mother = make_animal(Sheep, "GM1", dorper_percentage=Decimal("0"), is_manual_dorper=True)
+        child = make_animal(Ram, "GC1", mother="GM1", father="GF1")
+        grandchild = make_animal(Ewe, "GG1", mother="gm1", father="gc1")
+
+        mother.dorper_percentage = Decimal("50")
+        mother.save()
+
+        child.refresh_from_db()
+        grandchild.refresh_from_db()
+        self.assertEqual(child.dorper_percentage, Decimal("75"))
+        self.assertEqual(grandchild.dorper_percentage, Decimal("62.5"))
+        self.assertEqual(dorper.recalculate_dorper(dry_run=True), [])
+
+        # Повторное сохранение потомка считает так же, как пересчёт по родословной
+        grandchild.note = "пересохранение"
+        grandchild.mother = "Gm1"
+        grandchild.save()
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.dorper_percentage, Decimal("62.5"))
+
+
+class ArchiveIndexTests(TestCase):
+    def setUp(self):
+        self.status = Status.objects.create(status_type="Убыл")
+
+    def _archived(self, model, tag_number, birth_date):
+        animal = make_animal(model, tag_number, birth_date=birth_date)
+        # Без записи истории статусов — как у старых архивных животных
+        model.objects.filter(pk=animal.pk).update(animal_status=self.status, is_archived=True, archived_at=None)
+        return animal
+
+    def test_missing_history_falls_back_to_birth_date(self):
+        old = self._archived(Ram, "AR1", date(2024, 5, 1))
+        recent = self._archived(Ewe, "AR2", date(2025, 3, 1))
+
+        rows = archive_index.archive_rows(
+            {"Ram": Ram.objects.filter(is_archived=True), "Ewe": Ewe.objects.filter(is_archived=True)}
+        )
+        self.assertEqual([(row["row_type"], row["pk"]) for row in rows], [("Ewe", recent.pk), ("Ram", old.pk)])
+
+        filtered = archive_index.filter_archive_dates(
+            Ram.objects.filter(is_archived=True), date(2024, 4, 1), date(2024, 6, 1)
+        )
+        self.assertEqual(list(filtered), [old])
+
+    def test_serializer_context_takes_latest_weight(self):
+        ram = make_animal(Ram, "AW1")
+        WeightRecord.objects.create(tag=ram.tag, weight=20, weight_date=date(2025, 2, 1))
+        WeightRecord.objects.create(tag=ram.tag, weight=30, weight_date=date(2025, 4, 1))
+
+        context = archive_index.build_archive_serializer_context([ram])
+        self.assertEqual(context["last_live_weights"], {ram.tag_id: 30})
+
+
+class AdminLogsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("logs-admin", password="pw")
+        self.user.groups.add(Group.objects.get_or_create(name="Admin")[0])
+        self.client.force_login(self.user)
+
+    def _log(self, **fields):
+        fields.setdefault("action_type", "Изменение")
+        fields.setdefault("object_type", "Баранчик")
+        return UserActionLog.objects.create(user=self.user, **fields)
+
+    def test_empty_keyset_page_has_no_cursors(self):
+        log = self._log(object_id="L1")
+        cursor = views_admin._encode_logs_cursor(log)
+        log.delete()
+
+        for direction in ("next", "prev"):
+            response = self.client.get(reverse("admin_logs_api"), {"cursor": cursor, "direction": direction})
+            data = response.json()
+            self.assertEqual(data["logs"], [])
+            self.assertIsNone(data["next_cursor"])
+            self.assertIsNone(data["previous_cursor"])
+
+    def test_reading_logs_does_not_write(self):
+        self._log(object_id="L2", animal_types=None)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("admin_logs_api"))
+        self.assertEqual(len(response.json()["logs"]), 1)
+        self.assertFalse(any(query["sql"].startswith("UPDATE") for query in context.captured_queries))
+
+    def test_type_change_updates_stored_types(self):
+        ewe = make_animal(Ewe, "L3")
+        log = self._log(object_id="L3", animal_types={"L3": "Ewe"})
+
+        tag = Tag.objects.get(pk=ewe.tag_id)
+        ewe.delete()
+        make_animal(Sheep, "L3")
+        tag.animal_type = "Sheep"
+        tag.save(update_fields=["animal_type"])
+
+        log.refresh_from_db()
+        self.assertEqual(log.animal_types, {"L3": "Sheep"})
+
+
+class ExportTests(TestCase):
+    def _load(self, result):
+        output = BytesIO()
+        result.save(output)
+        output.seek(0)
+        return load_workbook(output).active
+
+    def test_frozen_header_in_streaming_sheet(self):
+        workbook = StreamingWorkbook()
+        workbook.add_table("Лист", ["A", "B"], [[1, 2]], summary_lines=["Итого"], freeze_header=True)
+        sheet = self._load(workbook.result("test.xlsx"))
+        self.assertEqual(sheet.freeze_panes, "A4")
+
+    def test_common_herd_export_streams_in_tag_order(self):
+        ram = make_animal(Ram, "H1")
+        ewe = make_animal(Ewe, "H2")
+        light = make_animal(Sheep, "H3")
+        for animal, weight in ((ram, 40), (ewe, 35), (light, 10)):
+            WeightRecord.objects.create(tag=animal.tag, weight=weight, weight_date=date(2025, 5, 1))
+
+        sheet = self._load(views.build_herd_export({"animal_type": "common", "weight_min": 20}))
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+
+        self.assertEqual([(row[0], row[2]) for row in rows], [(1, "H2"), (2, "H1")])
+        self.assertEqual(rows[0][8], 35)
+
+
+class CalendarIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _note_dates(self, month):
+        return sorted(calendar_index.get_month_calendar(month)["notes"])
+
+    def test_moved_note_resets_both_months(self):
+        note = CalendarNote.objects.create(date=date(2026, 3, 5), text="Стрижка")
+        self.assertEqual(self._note_dates(date(2026, 3, 1)), ["2026-03-05"])
+        self.assertEqual(self._note_dates(date(2026, 4, 1)), [])
+
+        note = CalendarNote.objects.get(pk=note.pk)
+        note.date = date(2026, 4, 10)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            note.save()
+
+        # Прежние даты известны с загрузки — запись перед сохранением не перечитывается
+        self.assertEqual(sum(query["sql"].startswith("SELECT") for query in queries), 0)
+        self.assertEqual(self._note_dates(date(2026, 3, 1)), [])
+        self.assertEqual(self._note_dates(date(2026, 4, 1)), ["2026-04-10"])
+
+    def test_reset_waits_for_commit(self):
+        CalendarNote.objects.create(date=date(2026, 3, 5), text="Стрижка")
+        calendar_index.get_month_calendar(date(2026, 3, 1))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            CalendarNote.objects.create(date=date(2026, 3, 6), text="Вакцинация")
+        self.assertTrue(CalendarEventMonth.objects.get(month=date(2026, 3, 1)).is_built)
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(CalendarEventMonth.objects.get(month=date(2026, 3, 1)).is_built)
+        self.assertEqual(self._note_dates(date(2026, 3, 1)), ["2026-03-05", "2026-03-06"])
+
+    def test_plain_animal_save_keeps_weighing_months(self):
+        ewe = make_animal(Ewe, "C1", birth_date=date(2026, 1, 15))
+        calendar_index.get_month_calendar(date(2026, 4, 1))
+        self.assertEqual(CalendarEvent.objects.filter(kind=CalendarEvent.KIND_WEIGHING).count(), 1)
+
+        ewe = Ewe.objects.get(pk=ewe.pk)
+        ewe.note = "Осмотрена"
+        with self.captureOnCommitCallbacks(execute=True):
+            ewe.save()
+        self.assertTrue(CalendarEventMonth.objects.get(month=date(2026, 4, 1)).is_built)
+
+        ewe.birth_date = date(2026, 2, 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            ewe.save()
+        self.assertFalse(CalendarEventMonth.objects.get(month=date(2026, 4, 1)).is_built)
+        self.assertEqual(sorted(calendar_index.get_month_calendar(date(2026, 5, 1))["weighings"]), ["2026-05-15"])
+
+
+class ScalesSyncJournalTests(TestCase):
+    def _journal(self):
+        return list(ScalesSyncChange.objects.order_by("id").values_list("entity", "object_id"))
+
+    def test_journal_rows_roll_back_with_change(self):
+        ram = make_animal(Ram, "S1")
+        ScalesSyncChange.objects.all().delete()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ram.rshn_tag = "RU100000010"
+            ram.save()
+            # Журнал пишется в транзакции изменения, а не после её фиксации
+            self.assertEqual(self._journal(), [("animal", ram.tag_id)])
+            raise IntegrityError
+        self.assertEqual(self._journal(), [])
+
+    def test_only_synced_fields_are_journaled(self):
+        ram = make_animal(Ram, "S2")
+        new_tag = Tag.objects.create(tag_number="S3")
+        ScalesSyncChange.objects.all().delete()
+
+        ram = Ram.objects.get(pk=ram.pk)
+        ram.note = "Осмотрен"
+        ram.save()
+        self.assertEqual(self._journal(), [])
+
+        old_tag_id = ram.tag_id
+        ram.tag = new_tag
+        ram.save()
+        self.assertEqual(set(self._journal()), {("animal", old_tag_id), ("animal", new_tag.pk)})
+
+    def test_sync_read_does_not_clean_journal(self):
+        ram = make_animal(Ram, "S4")
+        ScalesSyncChange.objects.update(created_at=timezone.now() - timedelta(days=90))
+        expired = ScalesSyncChange.objects.count()
+        scales_sync.record_animal_changes([ram.tag_id])
+        with CaptureQueriesContext(connection) as queries:
+            scales_sync.get_sync_changes(0)
+        self.assertFalse(any(query["sql"].startswith("DELETE") for query in queries))
+
+        output = StringIO()
+        call_command("cleanup_scales_sync", stdout=output)
+        self.assertIn(f"Удалено записей журнала: {expired}", output.getvalue())
+        self.assertEqual(ScalesSyncChange.objects.count(), 1)
+
+
+class MonthlyStatisticsTests(TestCase):
+    def _weight_gain(self, month):
+        rows = monthly_stats.get_month_rows([month], [MonthlyStatistic.METRIC_WEIGHT_GAIN])
+        return [(row.total, row.count) for row in rows]
+
+    def test_moved_weight_record_resets_both_months(self):
+        ram = make_animal(Ram, "M1")
+        WeightRecord.objects.create(tag=ram.tag, weight=10, weight_date=date(2025, 3, 1))
+        record = WeightRecord.objects.create(tag=ram.tag, weight=15, weight_date=date(2025, 3, 20))
+        self.assertEqual(self._weight_gain(date(2025, 3, 1)), [(Decimal("5"), 1)])
+        monthly_stats.rebuild_months([date(2025, 4, 1)])
+
+        record = WeightRecord.objects.get(pk=record.pk)
+        record.weight_date = date(2025, 4, 10)
+        record.save()
+
+        self.assertFalse(MonthlyStatisticMonth.objects.filter(month__in=[date(2025, 3, 1), date(2025, 4, 1)]).exists())
+        self.assertEqual(self._weight_gain(date(2025, 3, 1)), [])
+
+    def test_animal_delete_resets_months_from_its_first_record(self):
+        ewe = make_animal(Ewe, "M2", birth_date=date(2025, 4, 15))
+        months = list(monthly_stats.iter_months(date(2025, 1, 1), date(2025, 6, 1)))
+        monthly_stats.rebuild_months(months)
+
+        ewe.delete()
+
+        self.assertEqual(
+            list(MonthlyStatisticMonth.objects.order_by("month").values_list("month", flat=True)),
+            months[:3],
+        )
+
+
+class ScalesApiTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user("scales")
+
+    def _call(self, view, method="get", path="/", data=None, **headers):
+        request = getattr(self.factory, method)(path, data, format="json" if method == "post" else None, **headers)
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def test_batch_keeps_last_reading_and_replays_keys(self):
+        make_animal(Ram, "W1")
+        day = (timezone.localdate() - timedelta(days=1)).isoformat()
+        readings = [
+            {"tag_number": "W1", "weight": "40", "measured_at": day, "idempotency_key": "k1"},
+            {"tag_number": "w1", "weight": "42", "measured_at": day, "idempotency_key": "k2"},
+            {"tag_number": "W9", "weight": "30", "measured_at": day, "idempotency_key": "k3"},
+        ]
+
+        response = self._call(scales_api.weights_batch, "post", data={"readings": readings})
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]], ["superseded", "created", "error"]
+        )
+        self.assertEqual(list(WeightRecord.objects.values_list("weight", flat=True)), [Decimal("42")])
+
+        response = self._call(scales_api.weights_batch, "post", data={"readings": readings[:2]})
+        self.assertEqual([result["status"] for result in response.data["results"]], ["duplicate", "duplicate"])
+        self.assertEqual(WeightRecord.objects.count(), 1)
+
+    def test_sync_returns_changes_after_cursor(self):
+        ram = make_animal(Ram, "Y1")
+        since = scales_sync.get_sync_cursor()
+        sheep = make_animal(Sheep, "Y2")
+        ram.animal_status = Status.objects.create(status_type="Падеж")
+        ram.save()
+
+        response = self._call(scales_api.sync, data={"since": since})
+        self.assertFalse(response.data["full"])
+        self.assertEqual(response.data["cursor"], scales_sync.get_sync_cursor())
+        self.assertEqual([item["tag_id"] for item in response.data["animals"]], [sheep.tag_id])
+        self.assertEqual(response.data["removed_animals"], [ram.tag_id])
+
+        response = self._call(scales_api.sync, data={"since": response.data["cursor"] + 1})
+        self.assertTrue(response.data["full"])
+
+    def test_roster_answers_unchanged_version_with_304(self):
+        ram = make_animal(Ram, "R1")
+        response = self._call(scales_api.roster)
+        self.assertTrue(response.data["full"])
+        etag = response["ETag"]
+
+        response = self._call(scales_api.roster, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ram.rshn_tag = "RU100000010"
+        ram.save()
+        response = self._call(scales_api.roster, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["full"])
+        self.assertEqual([row[4] for row in response.data["animals"]], ["RU100000010"])
+
+
+class AnimalSearchTests(TestCase):
+    def _tags(self, query, **options):
+        return [animal.tag.tag_number for _type, _label, animal in animal_search.search_animals(query, **options)]
+
+    def test_prefix_matches_first_regardless_of_case(self):
+        make_animal(Ewe, "XAB1")
+        make_animal(Ram, "ab3")
+        make_animal(Sheep, "AB12")
+        make_animal(Ram, "AB4", animal_status=Status.objects.create(status_type="Падеж"))
+
+        self.assertEqual(self._tags("ab"), ["AB12", "ab3", "XAB1"])
+        self.assertEqual(self._tags("ab", archived=None), ["AB12", "ab3", "AB4", "XAB1"])
+
+    def test_rshn_matches_only_when_enabled(self):
+        make_animal(Ram, "Q1", rshn_tag="RU100000010")
 
-# Create your tests here.
+        self.assertEqual(self._tags("ru1000"), ["Q1"])
+        self.assertEqual(self._tags("ru1000", match_rshn=False), [])
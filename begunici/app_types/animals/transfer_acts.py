@@ -1,18 +1,24 @@
 from copy import copy
 from datetime import datetime
 from io import BytesIO
-from pathlib import Path
 from types import SimpleNamespace
 from urllib.parse import quote
 
-from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min
 from django.http import HttpResponse
 from django.utils import timezone
 
 from begunici.app_types.veterinary.vet_models import Place, PlaceMovement, StatusHistory, Tag, WeightRecord
 
-from .models import Ewe, Maker, Ram, Sheep
+from .act_templates import (
+    get_template_path as get_act_template_path,
+    open_template,
+    save_workbook,
+)
+from .models import Ewe, Maker, Ram, Sheep, TransferAct
+from .tag_resolver import resolve_animal_for_tag, resolve_animals_by_tags
 
 
 ANIMAL_TYPE_MODELS = {
@@ -36,6 +42,8 @@ ANIMAL_TYPE_LABELS = {
     "Sheep": "Овцематка",
 }
 
+TRANSFER_ACT_NUMBER_ATTEMPTS = 5
+
 TEMPLATE_FILENAME = "Akt_na_perevod_zhivotnykh.xlsx"
 EXCLUDED_TRANSFER_PLACE_NAMES = {"Овчарня 4 Отсек 17"}
 DATA_START_ROW = 19
@@ -84,14 +92,7 @@ def format_weight(value):
 
 
 def get_template_path():
-    return (
-        Path(settings.BASE_DIR)
-        / "begunici"
-        / "app_types"
-        / "animals"
-        / "excel_templates"
-        / TEMPLATE_FILENAME
-    )
+    return get_act_template_path(TEMPLATE_FILENAME)
 
 
 def get_place_name(place):
@@ -103,22 +104,7 @@ def is_excluded_transfer_place(place):
 
 
 def get_current_animal(tag):
-    if not tag:
-        return None
-
-    preferred_model = ANIMAL_TYPE_MODELS.get(tag.animal_type)
-    if preferred_model:
-        try:
-            return preferred_model.objects.select_related("tag", "animal_status").get(tag=tag)
-        except preferred_model.DoesNotExist:
-            pass
-
-    for model in (Maker, Ram, Ewe, Sheep):
-        try:
-            return model.objects.select_related("tag", "animal_status").get(tag=tag)
-        except model.DoesNotExist:
-            continue
-    return None
+    return resolve_animal_for_tag(tag, select_related=("tag", "animal_status"))
 
 
 def get_status_at_transfer(tag, current_status, transfer_date):
@@ -166,62 +152,222 @@ def get_animal_description(movement, transfer_date):
     return f"{animal_type_label} ({status_label})"
 
 
-def build_transfer_act_groups():
-    movements = (
-        PlaceMovement.objects.select_related("tag", "old_place", "new_place")
-        .order_by("created_at", "id")
+def build_transfer_act_row(movement, transfer_date):
+    """Строка акта: (бирка, описание, вес для печати, вес числом)."""
+    weight_display, weight_value = get_weight_for_transfer(movement.tag, transfer_date)
+    return (
+        movement.tag.tag_number if movement.tag else "",
+        get_animal_description(movement, transfer_date),
+        weight_display,
+        weight_value,
     )
 
-    groups_by_key = {}
-    for movement in movements:
-        if is_excluded_transfer_place(movement.old_place) or is_excluded_transfer_place(movement.new_place):
-            continue
 
-        transfer_dt = normalize_transfer_datetime(movement.created_at)
-        transfer_date = transfer_dt.date()
-        key = (
-            transfer_date,
-            movement.old_place_id,
-            movement.new_place_id,
-        )
+def _pick_status_at_transfer(history, current_status, transfer_date):
+    # history — записи бирки по возрастанию (change_date, id)
+    latest = None
+    for record in history:
+        if timezone.localtime(record.change_date).date() > transfer_date:
+            break
+        latest = record
+    if latest and latest.new_status:
+        return latest.new_status
+    return current_status
 
-        if key not in groups_by_key:
-            groups_by_key[key] = {
-                "act_number": None,
-                "transfer_date": transfer_date,
-                "old_place": get_place_name(movement.old_place),
-                "new_place": get_place_name(movement.new_place),
-                "first_created_at": transfer_dt,
-                "last_created_at": transfer_dt,
-                "first_movement_id": movement.id,
-                "movements": [],
-            }
-
-        group = groups_by_key[key]
-        group["movements"].append(movement)
-        if transfer_dt < group["first_created_at"]:
-            group["first_created_at"] = transfer_dt
-            group["first_movement_id"] = movement.id
-        if transfer_dt > group["last_created_at"]:
-            group["last_created_at"] = transfer_dt
-
-    groups = sorted(
-        groups_by_key.values(),
-        key=lambda item: (item["transfer_date"], item["first_created_at"], item["first_movement_id"]),
-    )
-    for index, group in enumerate(groups, start=1):
-        group["act_number"] = index
 
+def _pick_weight_for_transfer(records, transfer_date):
+    # records — взвешивания бирки по возрастанию (weight_date, id)
+    exact_record = None
+    previous_record = None
+    for record in records:
+        if record.weight_date == transfer_date:
+            exact_record = record
+        elif record.weight_date < transfer_date:
+            previous_record = record
+    if exact_record:
+        return format_weight(exact_record.weight), exact_record.weight
+    if previous_record:
+        return f"{format_weight(previous_record.weight)} ({format_date(previous_record.weight_date)})", previous_record.weight
+    return "", None
+
+
+def prefetch_transfer_act_rows(groups):
+    """
+    Заполняет group["rows"] сразу для нескольких актов: животные, история
+    статусов и взвешивания загружаются несколькими запросами на все акты,
+    а не запросами на каждую строку (build_transfer_act_row).
+    """
+    groups = [group for group in groups if group["movements"]]
+    tags = {movement.tag_id: movement.tag for group in groups for movement in group["movements"] if movement.tag}
+    if not tags:
+        for group in groups:
+            group["rows"] = [build_transfer_act_row(movement, group["transfer_date"]) for movement in group["movements"]]
+        return groups
+
+    last_date = max(group["transfer_date"] for group in groups)
+    animals = resolve_animals_by_tags(
+        [tag.tag_number for tag in tags.values()], select_related=("tag", "animal_status")
+    )
+    history_by_tag = {}
+    for record in (
+        StatusHistory.objects.select_related("new_status")
+        .filter(tag_id__in=tags, change_date__date__lte=last_date)
+        .order_by("tag_id", "change_date", "id")
+    ):
+        history_by_tag.setdefault(record.tag_id, []).append(record)
+    weights_by_tag = {}
+    for record in WeightRecord.objects.filter(tag_id__in=tags, weight_date__lte=last_date).order_by(
+        "tag_id", "weight_date", "id"
+    ):
+        weights_by_tag.setdefault(record.tag_id, []).append(record)
+
+    for group in groups:
+        transfer_date = group["transfer_date"]
+        rows = []
+        for movement in group["movements"]:
+            tag = movement.tag
+            if tag is None:
+                rows.append(build_transfer_act_row(movement, transfer_date))
+                continue
+            animal = animals.get(tag.tag_number)
+            animal_type = animal.get_animal_type() if animal else tag.animal_type
+            animal_type_label = ANIMAL_TYPE_LABELS.get(animal_type, animal_type or "")
+            status_obj = _pick_status_at_transfer(
+                history_by_tag.get(tag.id, ()), animal.animal_status if animal else None, transfer_date
+            )
+            status_label = status_obj.status_type if status_obj else "статус не указан"
+            weight_display, weight_value = _pick_weight_for_transfer(weights_by_tag.get(tag.id, ()), transfer_date)
+            rows.append((tag.tag_number, f"{animal_type_label} ({status_label})", weight_display, weight_value))
+        group["rows"] = rows
     return groups
 
 
-def serialize_transfer_act_group(group):
+def get_transfer_act_key(movement):
+    """
+    Ключ акта для перемещения: (дата перевода, откуда, куда) или None, если
+    перемещение в акты не попадает.
+    """
+    if is_excluded_transfer_place(movement.old_place) or is_excluded_transfer_place(movement.new_place):
+        return None
+    transfer_date = normalize_transfer_datetime(movement.created_at).date()
+    return transfer_date, movement.old_place_id, movement.new_place_id
+
+
+def _next_act_number():
+    return (TransferAct.objects.aggregate(value=Max("act_number"))["value"] or 0) + 1
+
+
+def _get_or_create_transfer_act(key, created_at):
+    """
+    Акт для ключа под блокировкой строки (создаётся со следующим номером).
+    Параллельное создание того же акта упирается в уникальность ключа, и
+    get_or_create возвращает уже созданный; при гонке за номер повторяем.
+    """
+    transfer_date, old_place_id, new_place_id = key
+    for _attempt in range(TRANSFER_ACT_NUMBER_ATTEMPTS):
+        try:
+            return TransferAct.objects.select_for_update().get_or_create(
+                transfer_date=transfer_date,
+                old_place_id=old_place_id,
+                new_place_id=new_place_id,
+                defaults={
+                    "act_number": _next_act_number,
+                    "first_created_at": created_at,
+                    "last_created_at": created_at,
+                },
+            )
+        except IntegrityError:
+            continue
+    raise IntegrityError("Не удалось присвоить номер акту перевода")
+
+
+def register_transfer_movement(movement):
+    """Добавляет перемещение в акт перевода (создавая акт со следующим номером)."""
+    key = get_transfer_act_key(movement)
+    if key is None:
+        return None
+
+    created_at = movement.created_at
+    with transaction.atomic():
+        act, created = _get_or_create_transfer_act(key, created_at)
+        if not created:
+            update_fields = []
+            if created_at < act.first_created_at:
+                act.first_created_at = created_at
+                update_fields.append("first_created_at")
+            if created_at > act.last_created_at:
+                act.last_created_at = created_at
+                update_fields.append("last_created_at")
+            if update_fields:
+                act.save(update_fields=update_fields)
+        act.movements.add(movement)
+    return act
+
+
+def _refresh_transfer_act_bounds(act):
+    """Пересчитывает границы акта по оставшимся перемещениям; пустой акт удаляется."""
+    bounds = act.movements.aggregate(first=Min("created_at"), last=Max("created_at"))
+    if bounds["first"] is None:
+        act.delete()
+        return
+    act.first_created_at = bounds["first"]
+    act.last_created_at = bounds["last"]
+    act.save(update_fields=["first_created_at", "last_created_at"])
+
+
+def sync_transfer_movement(movement):
+    """
+    Приводит акты в соответствие с изменённым перемещением: если дата или
+    места изменились, перемещение переносится в другой акт.
+    """
+    key = get_transfer_act_key(movement)
+    current_acts = list(TransferAct.objects.filter(movements=movement))
+    for act in current_acts:
+        if key == (act.transfer_date, act.old_place_id, act.new_place_id):
+            _refresh_transfer_act_bounds(act)
+            return act
+    with transaction.atomic():
+        for act in current_acts:
+            act.movements.remove(movement)
+            _refresh_transfer_act_bounds(act)
+    return register_transfer_movement(movement)
+
+
+def get_movement_transfer_act_ids(movement):
+    return list(TransferAct.objects.filter(movements__id=movement.pk).values_list("id", flat=True))
+
+
+def refresh_transfer_acts(act_ids):
+    """Обновляет границы актов после удаления перемещений (пустые акты удаляются)."""
+    for act in TransferAct.objects.filter(id__in=act_ids):
+        _refresh_transfer_act_bounds(act)
+
+
+def register_missing_transfer_movements():
+    """
+    Добавляет в акты перемещения, ещё не попавшие ни в один акт (например,
+    созданные в обход сигналов). Номера существующих актов не меняются.
+    Возвращает количество добавленных перемещений.
+    """
+    movements = (
+        PlaceMovement.objects.filter(transfer_acts__isnull=True)
+        .select_related("old_place", "new_place")
+        .order_by("created_at", "id")
+    )
+    added = 0
+    for movement in movements.iterator():
+        if register_transfer_movement(movement) is not None:
+            added += 1
+    return added
+
+
+def serialize_transfer_act(act):
     return {
-        "act_number": group["act_number"],
-        "transfer_date": group["transfer_date"].isoformat(),
-        "old_place": group["old_place"],
-        "new_place": group["new_place"],
-        "animal_count": len(group["movements"]),
+        "act_number": act.act_number,
+        "transfer_date": act.transfer_date.isoformat(),
+        "old_place": get_place_name(act.old_place),
+        "new_place": get_place_name(act.new_place),
+        "animal_count": act.animal_count,
     }
 
 
@@ -247,47 +393,40 @@ def parse_filter_int(value, min_value=None, max_value=None):
     return parsed
 
 
-def filter_transfer_act_groups(groups, transfer_date=None, month=None, year=None):
+def filter_transfer_acts(queryset, transfer_date=None, month=None, year=None):
     transfer_date = parse_filter_date(transfer_date)
     month = parse_filter_int(month, 1, 12)
     year = parse_filter_int(year, 1900, 3000)
 
-    filtered_groups = groups
     if transfer_date:
-        filtered_groups = [
-            group for group in filtered_groups
-            if group["transfer_date"] == transfer_date
-        ]
+        queryset = queryset.filter(transfer_date=transfer_date)
     if month:
-        filtered_groups = [
-            group for group in filtered_groups
-            if group["transfer_date"].month == month
-        ]
+        queryset = queryset.filter(transfer_date__month=month)
     if year:
-        filtered_groups = [
-            group for group in filtered_groups
-            if group["transfer_date"].year == year
-        ]
-
-    return filtered_groups
+        queryset = queryset.filter(transfer_date__year=year)
+    return queryset
 
 
 def get_transfer_acts_page(page_number=1, page_size=10, transfer_date=None, month=None, year=None):
-    all_groups = build_transfer_act_groups()
-    years = sorted({group["transfer_date"].year for group in all_groups}, reverse=True)
-    groups = sorted(
-        filter_transfer_act_groups(all_groups, transfer_date=transfer_date, month=month, year=year),
-        key=lambda item: (item["transfer_date"], item["last_created_at"], item["act_number"]),
-        reverse=True,
+    years = [value.year for value in TransferAct.objects.dates("transfer_date", "year", order="DESC")]
+    acts = (
+        filter_transfer_acts(
+            TransferAct.objects.select_related("old_place", "new_place"),
+            transfer_date=transfer_date,
+            month=month,
+            year=year,
+        )
+        .annotate(animal_count=Count("movements"))
+        .order_by("-transfer_date", "-last_created_at", "-act_number")
     )
-    paginator = Paginator(groups, page_size)
+    paginator = Paginator(acts, page_size)
     page = paginator.get_page(page_number)
 
     return {
         "count": paginator.count,
         "next": page.next_page_number() if page.has_next() else None,
         "previous": page.previous_page_number() if page.has_previous() else None,
-        "results": [serialize_transfer_act_group(group) for group in page.object_list],
+        "results": [serialize_transfer_act(act) for act in page.object_list],
         "years": years,
     }
 
@@ -298,10 +437,27 @@ def get_transfer_act_group(act_number):
     except (TypeError, ValueError):
         return None
 
-    for group in build_transfer_act_groups():
-        if group["act_number"] == act_number:
-            return group
-    return None
+    act = TransferAct.objects.select_related("old_place", "new_place").filter(act_number=act_number).first()
+    if act is None:
+        return None
+
+    movements = list(
+        act.movements.select_related("tag", "old_place", "new_place").order_by("created_at", "id")
+    )
+    return build_transfer_act_group(act, movements)
+
+
+def build_transfer_act_group(act, movements):
+    return {
+        "act_number": act.act_number,
+        "transfer_date": act.transfer_date,
+        "old_place": get_place_name(act.old_place),
+        "new_place": get_place_name(act.new_place),
+        "first_created_at": normalize_transfer_datetime(act.first_created_at),
+        "last_created_at": normalize_transfer_datetime(act.last_created_at),
+        "first_movement_id": movements[0].id if movements else None,
+        "movements": movements,
+    }
 
 
 def build_manual_transfer_act_group(animals, old_place_id, new_place_id):
@@ -453,9 +609,24 @@ def apply_transfer_data_row_style(sheet, row):
         )
 
 
+def prepare_transfer_act_sheet(sheet, row_count):
+    """Строки данных под row_count животных — зависят только от количества, кэшируются с шаблоном."""
+    prepare_data_rows(sheet, row_count)
+    for index in range(row_count):
+        apply_transfer_data_row_style(sheet, DATA_START_ROW + index)
+
+
+def open_transfer_act_template(row_count):
+    return open_template(
+        get_template_path(),
+        variant=row_count,
+        prepare=lambda workbook: prepare_transfer_act_sheet(workbook.active, row_count),
+    )
+
+
 def fill_transfer_act_sheet(sheet, group, user=None):
+    """Заполняет лист, подготовленный open_transfer_act_template(len(movements))."""
     movements = group["movements"]
-    prepare_data_rows(sheet, len(movements))
     download_date = timezone.localdate()
     row_count = max(len(movements), 1)
     total_row = TOTAL_ROW_BASE + row_count - DATA_TEMPLATE_ROWS
@@ -473,28 +644,30 @@ def fill_transfer_act_sheet(sheet, group, user=None):
     sheet[f"F{footer_date_row}"] = f"{download_date.month:02d}"
     sheet[f"L{footer_date_row}"] = str(download_date.year)[-2:]
 
-    for index, movement in enumerate(movements):
+    rows = group.get("rows")
+    if rows is None:
+        rows = [build_transfer_act_row(movement, group["transfer_date"]) for movement in movements]
+
+    for index, (tag_number, description, weight_display, weight_value) in enumerate(rows):
         row = DATA_START_ROW + index
-        transfer_date = group["transfer_date"]
-        sheet[f"A{row}"] = movement.tag.tag_number if movement.tag else ""
-        sheet[f"B{row}"] = get_animal_description(movement, transfer_date)
+        sheet[f"A{row}"] = tag_number
+        sheet[f"B{row}"] = description
         sheet[f"G{row}"] = 1
-        weight_display, weight_value = get_weight_for_transfer(movement.tag, transfer_date)
         sheet[f"I{row}"] = weight_display
         if weight_value is not None:
             total_weight = weight_value if total_weight is None else total_weight + weight_value
-        apply_transfer_data_row_style(sheet, row)
 
     sheet[f"G{total_row}"] = len(movements)
     sheet[f"I{total_row}"] = format_weight(total_weight) if total_weight is not None else ""
 
 
-def generate_transfer_act_workbook(act_number, user=None):
-    try:
-        from openpyxl import load_workbook
-    except ImportError as exc:
-        raise RuntimeError("Библиотека openpyxl не установлена") from exc
+def build_transfer_act_workbook(group, user=None):
+    workbook = open_transfer_act_template(len(group["movements"]))
+    fill_transfer_act_sheet(workbook.active, group, user=user)
+    return workbook
 
+
+def generate_transfer_act_workbook(act_number, user=None):
     group = get_transfer_act_group(act_number)
     if not group:
         return None, None
@@ -503,36 +676,19 @@ def generate_transfer_act_workbook(act_number, user=None):
     if not template_path.exists():
         raise FileNotFoundError(f"Шаблон акта перевода не найден: {template_path}")
 
-    workbook = load_workbook(template_path)
-    sheet = workbook.active
-    fill_transfer_act_sheet(sheet, group, user=user)
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output, group
+    # Без кэша: группа уже читается из сохранённого акта, а кэш процесса не видит
+    # изменений, сделанных в других процессах
+    return BytesIO(save_workbook(build_transfer_act_workbook(group, user=user))), group
 
 
 def generate_manual_transfer_act_workbook(animals, old_place_id, new_place_id, user=None):
-    try:
-        from openpyxl import load_workbook
-    except ImportError as exc:
-        raise RuntimeError("Библиотека openpyxl не установлена") from exc
-
     group = build_manual_transfer_act_group(animals, old_place_id, new_place_id)
 
     template_path = get_template_path()
     if not template_path.exists():
         raise FileNotFoundError(f"Шаблон акта перевода не найден: {template_path}")
 
-    workbook = load_workbook(template_path)
-    sheet = workbook.active
-    fill_transfer_act_sheet(sheet, group, user=user)
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-    return output, group
+    return BytesIO(save_workbook(build_transfer_act_workbook(group, user=user))), group
 
 
 def transfer_act_response(act_number, user=None):
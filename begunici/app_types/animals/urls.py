@@ -31,9 +31,13 @@ from .views import (
     dashboard_statistics,
     yearly_statistics,
     get_all_tags,
+    animal_autocomplete,
     get_all_statuses,
     export_to_excel,
     export_animal_detail_excel,
+    export_jobs_api,
+    export_job_status,
+    export_job_download,
     create_backup,
     backup_info,
     check_auto_backup,
@@ -55,11 +59,14 @@ from .views import (
     transfer_acts_api,
     transfer_act_download,
     manual_transfer_act_download,
+    bulk_acts_download,
     monthly_breeding_act_download,
     non_auto_act_templates_api,
     non_auto_act_template_download,
     check_kinship,
     kinship_pairs_export_excel,
+    kinship_matrix_api,
+    kinship_matrix_export_excel,
     get_animals_without_otbivka,
     bulk_otbivka,
     bulk_vaccination,
@@ -250,6 +257,7 @@ urlpatterns = [
     path("api/dashboard-statistics/", dashboard_statistics, name="dashboard-statistics"),  # API статистики
     path("api/yearly-statistics/", yearly_statistics, name="yearly-statistics"),  # API годовой статистики
     path("api/all-tags/", get_all_tags, name="all-tags"),  # API всех бирок
+    path("api/animals/autocomplete/", animal_autocomplete, name="animal-autocomplete"),
     path("api/all-statuses/", get_all_statuses, name="all-statuses"),  # API всех статусов
     path("api/common/", common_animals_api, name="common-animals-api"),  # API общего списка животных
     path("api/export-excel/", export_to_excel, name="export-excel"),  # API экспорта в Excel
@@ -258,6 +266,11 @@ urlpatterns = [
         export_animal_detail_excel,
         name="export-animal-detail-excel",
     ),
+    path("api/export-jobs/", export_jobs_api, name="export-jobs"),  # Фоновые выгрузки: очередь и список
+    path("api/export-jobs/<int:job_id>/", export_job_status, name="export-job-status"),  # Прогресс выгрузки
+    path(
+        "api/export-jobs/<int:job_id>/download/", export_job_download, name="export-job-download"
+    ),  # Скачивание готового файла
     path("main/", animals, name="animals"),  # Главная страница
     path("common/", common_animals, name="common"),  # Общая страница животных
     path("young-stock/", young_stock, name="young-stock"),
@@ -286,6 +299,7 @@ urlpatterns = [
     path("api/acts/transfer/", transfer_acts_api, name="transfer-acts-api"),
     path("api/acts/transfer/<int:act_number>/", transfer_act_download, name="transfer-act-download"),
     path("api/acts/transfer/manual/", manual_transfer_act_download, name="manual-transfer-act-download"),
+    path("api/acts/bulk/", bulk_acts_download, name="acts-bulk-download"),
     path("api/acts/monthly-breeding/", monthly_breeding_act_download, name="monthly-breeding-act-download"),
     path("api/acts/templates/", non_auto_act_templates_api, name="act-templates-api"),
     path("api/acts/templates/download/", non_auto_act_template_download, name="act-template-download"),
@@ -320,6 +334,8 @@ urlpatterns = [
     path("api/bulk-create-lambings/", bulk_create_lambings, name="bulk-create-lambings"),  # Массовое создание окотов
     path("api/check-kinship/", check_kinship, name="check-kinship"),  # Проверка родства
     path("api/kinship-pairs/export-excel/", kinship_pairs_export_excel, name="kinship-pairs-export-excel"),  # Экспорт подбора пар по родству
+    path("api/kinship-matrix/", kinship_matrix_api, name="kinship-matrix"),  # Матрица родства отцы × матери
+    path("api/kinship-matrix/export-excel/", kinship_matrix_export_excel, name="kinship-matrix-export-excel"),  # Экспорт матрицы родства
     
     # API для ковровой отбивки
     path("api/animals-without-otbivka/", get_animals_without_otbivka, name="animals-without-otbivka"),  # Животные без отбивки
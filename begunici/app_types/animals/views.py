@@ -4,7 +4,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from django.shortcuts import render, redirect
 from django.views.generic import TemplateView
-from django.http import Http404, HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.urls import reverse
 from django.db import transaction
 from django.db.models import Q
@@ -33,6 +33,7 @@ from .models import (
     LambingGroup,
     AnimalBase,
     CalendarNote,
+    MonthlyStatistic,
     ShiftTransferNote,
 )
 from .serializers import (
@@ -70,16 +71,57 @@ from .archive_acts import (
     get_archive_act_template_config,
 )
 from .transfer_acts import get_transfer_acts_page, manual_transfer_act_response, transfer_act_response
+from .bulk_acts import build_bulk_acts_export
+from .calendar_index import get_month_calendar
 from .monthly_breeding_acts import monthly_breeding_act_response
+from .pedigree import get_pedigree_graph
+from .dashboard_stats import get_dashboard_statistics
+from .archive_index import (
+    archive_rows,
+    build_archive_serializer_context,
+    filter_archive_dates,
+    load_archive_animals,
+)
+from .excel_export import (
+    EXPORT_CHUNK_SIZE,
+    XLSX_CONTENT_TYPE,
+    ExportRequestError,
+    ExportResult,
+    StreamingWorkbook,
+    build_table_export,
+    build_table_export_response,
+    estimate_column_widths,
+    export_filename,
+    iter_chunks,
+    iter_with_progress,
+)
+from .export_jobs import enqueue_export_job, get_result_path, serialize_export_job
+from .models_export_job import ExportJob
+from .monthly_stats import BOYS_TYPES, GIRLS_TYPES, get_month_rows, iter_months
+from .tag_resolver import TagResolver, resolve_animal_by_tag
+from .scales_sync import record_animal_changes
+from .animal_search import DEFAULT_SEARCH_LIMIT, animal_search_q, contains_q, search_animals
+from .record_prefetch import (
+    get_latest_vet_records,
+    get_latest_weight_records,
+    get_recent_vet_records,
+    get_recent_weight_records,
+    get_weight_records_near_dates,
+)
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.mixins import ListModelMixin
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 from django.http import JsonResponse
-from django.db.models import Count, Q, F
+from django.db.models import Q, F, Value, CharField
 from datetime import datetime, timedelta
 from django.utils import timezone
 from pathlib import Path
+import heapq
+import logging
+from itertools import islice
+
+logger = logging.getLogger(__name__)
 
 TRUTHY_FILTER_VALUES = {"1", "true", "yes", "on"}
 
@@ -182,7 +224,7 @@ class AnimalBaseViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         
         # Создаем лог удаления
-        from .models_user_log import UserActionLog
+        from .action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -200,7 +242,7 @@ class AnimalBaseViewSet(viewsets.ModelViewSet):
             english_type = instance.get_animal_type()
             russian_type = animal_type_translations.get(english_type, english_type)
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Удаление животного",
                 object_type=russian_type,
@@ -293,9 +335,8 @@ class MakerViewSet(AnimalBaseViewSet):
         
         if search:
             search_filter = (
-                _build_case_variants_filter("tag__tag_number", search)
+                animal_search_q(search)
                 | _build_case_variants_filter("animal_status__status_type", search)
-                | Q(rshn_tag__icontains=search)
                 | Q(place__sheepfold__icontains=search)
                 | Q(name__icontains=search)
             )
@@ -582,7 +623,7 @@ class MakerViewSet(AnimalBaseViewSet):
         
         # Создаем лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -590,7 +631,7 @@ class MakerViewSet(AnimalBaseViewSet):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Обновление родителей",
                     object_type="Баран-Производитель",
@@ -640,7 +681,7 @@ class MakerViewSet(AnimalBaseViewSet):
             maker.save()
             
             # Создаем лог восстановления
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -650,7 +691,7 @@ class MakerViewSet(AnimalBaseViewSet):
                 old_status_name = old_status.status_type if old_status else 'Неизвестно'
                 new_status_name = maker.animal_status.status_type if maker.animal_status else 'Неизвестно'
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Восстановление из архива",
                     object_type="Баран-Производитель",
@@ -690,9 +731,8 @@ class RamViewSet(AnimalBaseViewSet):
         
         if search:
             search_filter = (
-                _build_case_variants_filter("tag__tag_number", search)
+                animal_search_q(search)
                 | _build_case_variants_filter("animal_status__status_type", search)
-                | Q(rshn_tag__icontains=search)
                 | Q(place__sheepfold__icontains=search)
             )
             
@@ -803,7 +843,7 @@ class RamViewSet(AnimalBaseViewSet):
         
         # Создаем лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -811,7 +851,7 @@ class RamViewSet(AnimalBaseViewSet):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Обновление родителей",
                     object_type="Баранчик",
@@ -975,7 +1015,7 @@ class RamViewSet(AnimalBaseViewSet):
             ram.save()
             
             # Создаем лог восстановления
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -985,7 +1025,7 @@ class RamViewSet(AnimalBaseViewSet):
                 old_status_name = old_status.status_type if old_status else 'Неизвестно'
                 new_status_name = ram.animal_status.status_type if ram.animal_status else 'Неизвестно'
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Восстановление из архива",
                     object_type="Баранчик",
@@ -1031,9 +1071,8 @@ class EweViewSet(AnimalBaseViewSet):
         
         if search:
             search_filter = (
-                _build_case_variants_filter("tag__tag_number", search)
+                animal_search_q(search)
                 | _build_case_variants_filter("animal_status__status_type", search)
-                | Q(rshn_tag__icontains=search)
                 | Q(place__sheepfold__icontains=search)
             )
             
@@ -1124,7 +1163,7 @@ class EweViewSet(AnimalBaseViewSet):
         
         # Создаем лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -1132,7 +1171,7 @@ class EweViewSet(AnimalBaseViewSet):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Обновление родителей",
                     object_type="Ярка",
@@ -1296,7 +1335,7 @@ class EweViewSet(AnimalBaseViewSet):
             ewe.save()
             
             # Создаем лог восстановления
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -1306,7 +1345,7 @@ class EweViewSet(AnimalBaseViewSet):
                 old_status_name = old_status.status_type if old_status else 'Неизвестно'
                 new_status_name = ewe.animal_status.status_type if ewe.animal_status else 'Неизвестно'
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Восстановление из архива",
                     object_type="Ярка",
@@ -1352,9 +1391,8 @@ class SheepViewSet(AnimalBaseViewSet):
         
         if search:
             search_filter = (
-                _build_case_variants_filter("tag__tag_number", search)
+                animal_search_q(search)
                 | _build_case_variants_filter("animal_status__status_type", search)
-                | Q(rshn_tag__icontains=search)
                 | Q(place__sheepfold__icontains=search)
             )
             
@@ -1442,7 +1480,7 @@ class SheepViewSet(AnimalBaseViewSet):
         
         # Создаем лог изменений
         if changes:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -1450,7 +1488,7 @@ class SheepViewSet(AnimalBaseViewSet):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Обновление родителей",
                     object_type="Овцематка",
@@ -1614,7 +1652,7 @@ class SheepViewSet(AnimalBaseViewSet):
             sheep.save()
             
             # Создаем лог восстановления
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -1624,7 +1662,7 @@ class SheepViewSet(AnimalBaseViewSet):
                 old_status_name = old_status.status_type if old_status else 'Неизвестно'
                 new_status_name = sheep.animal_status.status_type if sheep.animal_status else 'Неизвестно'
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Восстановление из архива",
                     object_type="Овцематка",
@@ -1874,7 +1912,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
                 _set_animal_status(father, statuses["father_in_group"])
 
             try:
-                from .models_user_log import UserActionLog
+                from .action_log import log_user_action
                 from django.contrib.auth.models import AnonymousUser
 
                 if not isinstance(request.user, AnonymousUser):
@@ -1883,7 +1921,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
                         for mother, _ in mothers
                         if mother.tag
                     ]
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Постановка в группу",
                         object_type="Группа случки",
@@ -1955,7 +1993,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
 
     def _log_group_mothers_change(self, request, action_type, group, mother_tags, extra_description=""):
         try:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
 
             if isinstance(request.user, AnonymousUser):
@@ -1969,7 +2007,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
             if extra_description:
                 description = f"{description}; {extra_description}"
 
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type=action_type,
                 object_type="Группа случки",
@@ -2190,7 +2228,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
                 _set_animal_status(father, statuses["father_after_removal"])
 
             try:
-                from .models_user_log import UserActionLog
+                from .action_log import log_user_action
                 from django.contrib.auth.models import AnonymousUser
 
                 if not isinstance(request.user, AnonymousUser):
@@ -2199,7 +2237,7 @@ class LambingGroupViewSet(viewsets.ModelViewSet):
                         for mother, _ in mothers
                         if mother.tag
                     ]
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Снятие барана из группы",
                         object_type="Группа случки",
@@ -2374,7 +2412,7 @@ class LambingViewSet(viewsets.ModelViewSet):
             
             # Создаем лог завершения окота
             try:
-                from .models_user_log import UserActionLog
+                from .action_log import log_user_action
                 from django.contrib.auth.models import AnonymousUser
                 import pytz
                 
@@ -2389,7 +2427,7 @@ class LambingViewSet(viewsets.ModelViewSet):
                     
                     start_date_str = lambing.start_date.strftime('%d.%m.%Y')
                     
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Завершение окота",
                         object_type="Окот",
@@ -2568,7 +2606,7 @@ class LambingViewSet(viewsets.ModelViewSet):
             
             # Создаем лог завершения окота с детьми
             try:
-                from .models_user_log import UserActionLog
+                from .action_log import log_user_action
                 from django.contrib.auth.models import AnonymousUser
                 import pytz
                 
@@ -2593,7 +2631,7 @@ class LambingViewSet(viewsets.ModelViewSet):
                     else:
                         children_info = "без детей"
                     
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Завершение окота с детьми",
                         object_type="Окот",
@@ -2656,14 +2694,14 @@ class LambingViewSet(viewsets.ModelViewSet):
             lambing.save()
 
             try:
-                from .models_user_log import UserActionLog
+                from .action_log import log_user_action
                 from django.contrib.auth.models import AnonymousUser
 
                 if not isinstance(request.user, AnonymousUser):
                     mother_tag = lambing.get_mother_tag() or 'Неизвестно'
                     father = lambing.get_father()
                     father_tag = father.tag.tag_number if father and father.tag else 'Неизвестно'
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Досрочное завершение окота",
                         object_type="Окот",
@@ -3094,6 +3132,23 @@ class CalendarNoteViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['get'], url_path='month-calendar-data')
+    def month_calendar_data(self, request):
+        """
+        Все события календаря за месяц одним запросом: окоты, заметки,
+        ветобработки и взвешивания (из индекса событий календаря)
+        """
+        try:
+            year = int(request.query_params.get('year'))
+            month = int(request.query_params.get('month'))
+            month_start = datetime(year, month, 1).date()
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Укажите корректные год и месяц"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_month_calendar(month_start), status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='vet-calendar-data')
     def vet_calendar_data(self, request):
         """Получить данные ветобработок для календаря"""
@@ -3455,6 +3510,8 @@ class AnimalActionsViewSet(viewsets.ViewSet):
         for model in animal_models:
             # Мы используем tag__id, так как animal_ids - это ID бирок
             queryset = model.objects.filter(tag__id__in=animal_ids)
+            # update() не посылает сигналов — отмечаем изменение для терминалов весов
+            record_animal_changes(queryset.values_list("tag_id", flat=True))
             updated_count += queryset.update(animal_status=archive_status)
 
         return Response(
@@ -3469,33 +3526,30 @@ class ArchiveViewSet(ListModelMixin, GenericViewSet):
     """
 
     serializer_class = ArchiveAnimalSerializer
-    filter_backends = [OrderingFilter]  # Убираем DjangoFilterBackend, так как работаем со списком
+    filter_backends = [OrderingFilter]  # Убираем DjangoFilterBackend, так как работаем с объединенным запросом
     ordering_fields = ["birth_date", "age", "tag__tag_number"]
     pagination_class = PaginationSetting  # Возвращаем пагинацию по 10 записей
 
     def get_queryset(self):
         """
-        Получаем архив всех животных, объединяя модели Maker, Sheep, Ewe и Ram.
-        Сортируем по дате архивирования (самые свежие первыми).
+        Получаем архив всех животных, объединяя модели Maker, Sheep, Ewe и Ram
+        одним запросом (UNION ALL). Возвращает строки (тип, id, дата архивирования),
+        отсортированные по дате архивирования (самые свежие первыми).
         """
-        from django.db.models import Q
-        from begunici.app_types.veterinary.vet_models import StatusHistory
-        
         animal_type = self.request.query_params.get("type", None)
         search = self.request.query_params.get('search', '').strip()
         status_filter = self.request.query_params.get('animal_status', None)
         place_filter = self.request.query_params.get('place', None)
-        archive_date_from = self.request.query_params.get('archive_date_from', None)
-        archive_date_to = self.request.query_params.get('archive_date_to', None)
+        archive_date_from = _parse_archive_filter_date(self.request.query_params.get('archive_date_from'))
+        archive_date_to = _parse_archive_filter_date(self.request.query_params.get('archive_date_to'))
         mother_tag_filter = self.request.query_params.get('mother_tag', '').strip()
 
         # Создаем варианты поиска в разных регистрах если есть поиск
         search_filter = Q()
         if search:
             search_filter = (
-                _build_case_variants_filter("tag__tag_number", search)
+                animal_search_q(search)
                 | _build_case_variants_filter("animal_status__status_type", search)
-                | Q(rshn_tag__icontains=search)
                 | Q(place__sheepfold__icontains=search)
             )
 
@@ -3509,165 +3563,64 @@ class ArchiveViewSet(ListModelMixin, GenericViewSet):
                 queryset = queryset.filter(place_id=place_filter)
             if mother_tag_filter:
                 queryset = queryset.filter(_build_case_variants_filter('mother', mother_tag_filter))
-            return queryset
+            return filter_archive_dates(queryset, archive_date_from, archive_date_to)
 
-        def sort_by_archive_date(animals_list):
-            """Сортируем список животных по дате архивирования и фильтруем по диапазону дат"""
-            from datetime import datetime, date
-            
-            def get_archive_date(animal):
-                try:
-                    # Ищем последнюю запись в истории статусов для текущего статуса
-                    status_history = StatusHistory.objects.filter(
-                        tag=animal.tag,
-                        new_status=animal.animal_status
-                    ).order_by('-change_date', '-id').first()
-                    
-                    if status_history and status_history.change_date:
-                        # Возвращаем datetime для правильной сортировки
-                        return status_history.change_date
-                    else:
-                        # Если нет записи в истории, используем дату рождения или минимальную дату
-                        return animal.birth_date or datetime.min.replace(tzinfo=None)
-                except Exception as e:
-                    # В случае ошибки используем минимальную дату
-                    print(f"Ошибка сортировки для {animal.tag.tag_number}: {e}")
-                    return datetime.min.replace(tzinfo=None)
-            
-            # Фильтруем по диапазону дат архивирования
-            if archive_date_from or archive_date_to:
-                filtered_animals = []
-                
-                for animal in animals_list:
-                    archive_date = get_archive_date(animal)
-                    
-                    # Преобразуем datetime в date для сравнения
-                    if hasattr(archive_date, 'date'):
-                        archive_date = archive_date.date()
-                    elif isinstance(archive_date, datetime):
-                        archive_date = archive_date.date()
-                    
-                    # Проверяем диапазон дат
-                    date_matches = True
-                    
-                    if archive_date_from:
-                        try:
-                            from_date = datetime.strptime(archive_date_from, '%Y-%m-%d').date()
-                            if archive_date < from_date:
-                                date_matches = False
-                        except ValueError:
-                            pass  # Игнорируем неверный формат даты
-                    
-                    if archive_date_to and date_matches:
-                        try:
-                            to_date = datetime.strptime(archive_date_to, '%Y-%m-%d').date()
-                            if archive_date > to_date:
-                                date_matches = False
-                        except ValueError:
-                            pass  # Игнорируем неверный формат даты
-                    
-                    if date_matches:
-                        filtered_animals.append(animal)
-                
-                animals_list = filtered_animals
-            
-            # Сортируем по дате архивирования (новые первыми)
-            try:
-                animals_list.sort(key=get_archive_date, reverse=True)
-            except Exception as e:
-                print(f"Ошибка при сортировке: {e}")
-                # Fallback - сортируем по ID
-                animals_list.sort(key=lambda x: x.id, reverse=True)
-            
-            return animals_list
-
-        if animal_type == "Maker":
-            queryset = Maker.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            queryset = apply_filters(queryset)
-            # Для конкретного типа тоже применяем сортировку по дате архивирования
-            animals_list = list(queryset)
-            return sort_by_archive_date(animals_list)
-        elif animal_type == "Sheep":
-            queryset = Sheep.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            queryset = apply_filters(queryset)
-            animals_list = list(queryset)
-            return sort_by_archive_date(animals_list)
-        elif animal_type == "Ewe":
-            queryset = Ewe.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            queryset = apply_filters(queryset)
-            animals_list = list(queryset)
-            return sort_by_archive_date(animals_list)
-        elif animal_type == "Ram":
-            queryset = Ram.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            queryset = apply_filters(queryset)
-            animals_list = list(queryset)
-            return sort_by_archive_date(animals_list)
-        elif animal_type == "Lamb":
+        archive_models = {"Maker": Maker, "Ram": Ram, "Ewe": Ewe, "Sheep": Sheep}
+
+        if animal_type == "Lamb":
             # Отдельный архив ягнят:
             # - только ярки/баранчики
             # - без отбивки
             # - младше 100 дней
             # - независимо от архивных животных
             lamb_cutoff_date = timezone.now().date() - timedelta(days=100)
-            archive_status_names = ARCHIVE_STATUS_NAMES
-
-            ewes_qs = Ewe.objects.filter(
-                animal_status__status_type__in=archive_status_names,
-                date_otbivka__isnull=True,
-                birth_date__isnull=False,
-                birth_date__gt=lamb_cutoff_date,
-            ).select_related('tag', 'animal_status', 'place')
-            rams_qs = Ram.objects.filter(
-                animal_status__status_type__in=archive_status_names,
-                date_otbivka__isnull=True,
-                birth_date__isnull=False,
-                birth_date__gt=lamb_cutoff_date,
-            ).select_related('tag', 'animal_status', 'place')
-
-            ewes_qs = apply_filters(ewes_qs)
-            rams_qs = apply_filters(rams_qs)
-
-            lambs = list(ewes_qs) + list(rams_qs)
-            return sort_by_archive_date(lambs)
+            querysets = {
+                name: apply_filters(
+                    model.objects.filter(
+                        animal_status__status_type__in=ARCHIVE_STATUS_NAMES,
+                        date_otbivka__isnull=True,
+                        birth_date__isnull=False,
+                        birth_date__gt=lamb_cutoff_date,
+                    )
+                )
+                for name, model in (("Ewe", Ewe), ("Ram", Ram))
+            }
+        elif animal_type in archive_models:
+            querysets = {
+                animal_type: apply_filters(archive_models[animal_type].objects.filter(is_archived=True))
+            }
         else:
             # Для общего архива объединяем все типы животных
-            makers_qs = Maker.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            sheep_qs = Sheep.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            ewes_qs = Ewe.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            rams_qs = Ram.objects.filter(is_archived=True).select_related('tag', 'animal_status', 'place')
-            
-            # Применяем фильтры к каждому queryset
-            makers_qs = apply_filters(makers_qs)
-            sheep_qs = apply_filters(sheep_qs)
-            ewes_qs = apply_filters(ewes_qs)
-            rams_qs = apply_filters(rams_qs)
-            
-            # Объединяем все QuerySet'ы в список
-            all_animals = list(makers_qs) + list(sheep_qs) + list(ewes_qs) + list(rams_qs)
-            
-            # Сортируем по дате архивирования
-            all_animals = sort_by_archive_date(all_animals)
-            
-            return all_animals
+            querysets = {
+                name: apply_filters(model.objects.filter(is_archived=True))
+                for name, model in archive_models.items()
+            }
+
+        return archive_rows(querysets)
 
     def list(self, request, *args, **kwargs):
         """
-        Переопределяем list для работы со списком животных
+        Пагинация выполняется по строкам объединенного запроса, экземпляры
+        животных загружаются только для текущей страницы.
         """
-        queryset = self.get_queryset()
-        
-        # Если это список (общий архив), применяем пагинацию вручную
-        if isinstance(queryset, list):
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
-        else:
-            # Если это QuerySet (конкретный тип), используем стандартную логику
-            return super().list(request, *args, **kwargs)
+        rows = self.get_queryset()
+        page = self.paginate_queryset(rows)
+        animals = load_archive_animals(page if page is not None else rows)
+        context = {**self.get_serializer_context(), **build_archive_serializer_context(animals)}
+        serializer = self.get_serializer_class()(animals, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+def _parse_archive_filter_date(value):
+    """Дата фильтра архива в формате YYYY-MM-DD; неверный формат игнорируется."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
 
 # Представления для страниц
 
@@ -3686,27 +3639,9 @@ def _split_multi_search_terms(value):
     return [term.strip() for term in str(value).split(",") if term.strip()]
 
 
-def _build_single_case_variants_filter(field_name, value):
-    lowered = value.lower()
-    uppered = value.upper()
-    titled = value.title()
-    return (
-        Q(**{f"{field_name}__exact": value})
-        | Q(**{f"{field_name}__exact": lowered})
-        | Q(**{f"{field_name}__exact": uppered})
-        | Q(**{f"{field_name}__exact": titled})
-        | Q(**{f"{field_name}__contains": value})
-        | Q(**{f"{field_name}__contains": lowered})
-        | Q(**{f"{field_name}__contains": uppered})
-        | Q(**{f"{field_name}__contains": titled})
-    )
-
-
 def _build_case_variants_filter(field_name, value):
-    combined_q = Q()
-    for term in _split_multi_search_terms(value):
-        combined_q |= _build_single_case_variants_filter(field_name, term)
-    return combined_q
+    # Регистронезависимое contains по каждому слову (см. animal_search)
+    return contains_q(field_name, value)
 
 
 def _matches_multi_search(value, search):
@@ -3732,11 +3667,58 @@ def _format_dorper_display(animal):
     return formatted
 
 
+def _build_common_animals_union(querysets_by_type):
+    """
+    Объединяет выборки разных типов животных в один UNION ALL запрос
+    со столбцами (id, tag_id, type_key), отсортированный по tag_id (новые сверху).
+    Возвращает None, если не выбран ни один тип.
+    """
+    combined_queryset = None
+    for type_key, queryset in querysets_by_type:
+        part = (
+            queryset.order_by()
+            .values("id", "tag_id")
+            .annotate(type_key=Value(type_key, output_field=CharField()))
+        )
+        combined_queryset = part if combined_queryset is None else combined_queryset.union(part, all=True)
+
+    if combined_queryset is None:
+        return None
+    return combined_queryset.order_by("-tag_id")
+
+
+def _load_common_animals_page(page_rows):
+    """
+    Загружает объекты животных для строк страницы из UNION-запроса
+    (один запрос на тип) и возвращает их в исходном порядке.
+    """
+    ids_by_type = defaultdict(list)
+    for row in page_rows:
+        ids_by_type[row["type_key"]].append(row["id"])
+
+    animals_by_key = {}
+    for type_key, ids in ids_by_type.items():
+        model, _type_label = COMMON_ANIMAL_TYPE_MAP[type_key]
+        queryset = model.objects.filter(id__in=ids).select_related("tag", "animal_status", "place")
+        for animal in queryset:
+            animals_by_key[(type_key, animal.id)] = animal
+
+    items = []
+    for row in page_rows:
+        animal = animals_by_key.get((row["type_key"], row["id"]))
+        if animal is None:
+            continue
+        items.append((row["type_key"], COMMON_ANIMAL_TYPE_MAP[row["type_key"]][1], animal))
+    return items
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def common_animals_api(request):
     """
     Объединенный список животных (makers/rams/ewes/sheeps) с общей пагинацией и фильтрами.
+    Поддерживает постраничный режим (page/page_size) и keyset-режим
+    (pagination=cursor или cursor=<tag_id>) без подсчета общего количества.
     """
     search = request.query_params.get("search", "").strip()
     birth_date_from_raw = request.query_params.get("birth_date_from", "").strip()
@@ -3796,9 +3778,11 @@ def common_animals_api(request):
         queryset = queryset.filter(is_archived=False).select_related("tag", "animal_status", "place")
 
         if search:
-            search_filter = _build_case_variants_filter("tag__tag_number", search) | _build_case_variants_filter(
-                "animal_status__status_type", search
-            ) | Q(rshn_tag__icontains=search) | Q(place__sheepfold__icontains=search)
+            search_filter = (
+                animal_search_q(search)
+                | _build_case_variants_filter("animal_status__status_type", search)
+                | Q(place__sheepfold__icontains=search)
+            )
 
             if model_key == "maker":
                 search_filter |= Q(name__icontains=search)
@@ -3842,32 +3826,49 @@ def common_animals_api(request):
     else:
         selected_types = list(COMMON_ANIMAL_TYPE_MAP.keys())
 
-    combined_animals = []
+    cursor = _parse_int_param(request.query_params.get("cursor"), min_value=1)
+    querysets_by_type = []
     for type_key in selected_types:
-        model, type_label = COMMON_ANIMAL_TYPE_MAP[type_key]
+        model, _type_label = COMMON_ANIMAL_TYPE_MAP[type_key]
         queryset = apply_filters(model.objects.all(), type_key)
-        for animal in queryset:
-            combined_animals.append((type_key, type_label, animal))
-
-    # Общая сортировка по фактическому созданию через ID бирки (новые сверху)
-    combined_animals.sort(key=lambda item: item[2].tag_id, reverse=True)
+        if cursor is not None:
+            queryset = queryset.filter(tag_id__lt=cursor)
+        querysets_by_type.append((type_key, queryset))
+
+    # Общая сортировка по фактическому созданию через ID бирки (новые сверху),
+    # фильтрация, сортировка и LIMIT/OFFSET выполняются в БД одним UNION ALL.
+    combined_queryset = _build_common_animals_union(querysets_by_type)
+
+    next_cursor = None
+    if cursor is not None or request.query_params.get("pagination") == "cursor":
+        # Keyset-режим: без COUNT и OFFSET, следующая страница строится от последнего tag_id.
+        page_rows = list(combined_queryset[: page_size + 1]) if combined_queryset is not None else []
+        has_next = len(page_rows) > page_size
+        page_rows = page_rows[:page_size]
+        if has_next:
+            next_cursor = page_rows[-1]["tag_id"]
+        total_count = None
+        paginator = None
+        page_obj = None
+    else:
+        paginator = Paginator(combined_queryset if combined_queryset is not None else [], page_size)
+        page_obj = paginator.get_page(page_number)
+        page_rows = list(page_obj.object_list)
+        total_count = paginator.count
 
-    paginator = Paginator(combined_animals, page_size)
-    page_obj = paginator.get_page(page_number)
+    page_items = _load_common_animals_page(page_rows)
+    page_tag_ids = [animal.tag_id for _animal_type, _type_label, animal in page_items]
+    last_weights = get_latest_weight_records(page_tag_ids)
+    last_vets = get_latest_vet_records(page_tag_ids)
 
     results = []
-    for animal_type, animal_type_label, animal in page_obj.object_list:
+    for animal_type, animal_type_label, animal in page_items:
         display_name = animal.tag.tag_number
         if animal_type == "maker" and getattr(animal, "name", None):
             display_name = f"{animal.name}({animal.tag.tag_number})"
 
-        last_weight = WeightRecord.objects.filter(tag=animal.tag).order_by("-weight_date").first()
-        last_vet = (
-            Veterinary.objects.filter(tag=animal.tag)
-            .select_related("veterinary_care")
-            .order_by("-date_of_care")
-            .first()
-        )
+        last_weight = last_weights.get(animal.tag_id)
+        last_vet = last_vets.get(animal.tag_id)
         last_vet_care_date = last_vet.get_care_date() if last_vet else None
 
         results.append(
@@ -3914,9 +3915,27 @@ def common_animals_api(request):
         query_params["page"] = page_value
         return request.build_absolute_uri(f"{request.path}?{query_params.urlencode()}")
 
+    def build_cursor_url(cursor_value):
+        query_params = request.query_params.copy()
+        query_params.pop("page", None)
+        query_params["cursor"] = cursor_value
+        return request.build_absolute_uri(f"{request.path}?{query_params.urlencode()}")
+
+    if page_obj is None:
+        return Response(
+            {
+                "count": total_count,
+                "next": build_cursor_url(next_cursor) if next_cursor else None,
+                "previous": None,
+                "next_cursor": next_cursor,
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
     return Response(
         {
-            "count": paginator.count,
+            "count": total_count,
             "next": build_page_url(page_obj.next_page_number()) if page_obj.has_next() else None,
             "previous": build_page_url(page_obj.previous_page_number()) if page_obj.has_previous() else None,
             "results": results,
@@ -4024,7 +4043,7 @@ def _get_young_stock_filtered_items(query_params):
         ).select_related("tag", "animal_status", "place")
 
         if search:
-            search_filter = _build_case_variants_filter("tag__tag_number", search) | Q(rshn_tag__icontains=search)
+            search_filter = animal_search_q(search)
             if animal_type == "maker":
                 search_filter |= Q(name__icontains=search)
             queryset = queryset.filter(search_filter)
@@ -4051,7 +4070,16 @@ def _get_young_stock_filtered_items(query_params):
     return items
 
 
-def _build_young_stock_row(animal_type, type_label, animal):
+def _prefetch_birth_and_weaning_weights(animals):
+    """Взвешивания при рождении и на отбивке для всех животных одним запросом."""
+    tag_dates = []
+    for animal in animals:
+        tag_dates.append((animal.tag_id, animal.birth_date))
+        tag_dates.append((animal.tag_id, animal.date_otbivka))
+    return get_weight_records_near_dates(tag_dates)
+
+
+def _build_young_stock_row(animal_type, type_label, animal, near_weights=None):
     tag_number = animal.tag.tag_number if animal.tag else "-"
     mother_tag, mother_url = _get_mother_link_by_tag(animal.mother)
 
@@ -4064,8 +4092,8 @@ def _build_young_stock_row(animal_type, type_label, animal):
         "tag_url": _get_animal_url_by_type(animal_type, tag_number),
         "birth_type": "-",
         "birth_date": animal.birth_date.strftime("%Y-%m-%d") if animal.birth_date else "-",
-        "birth_weight": _format_ewe_birth_weight(animal),
-        "weaning": _format_ewe_weaning(animal),
+        "birth_weight": _format_ewe_birth_weight(animal, near_weights),
+        "weaning": _format_ewe_weaning(animal, near_weights),
         "mother_tag": mother_tag,
         "mother_url": mother_url,
     }
@@ -4091,8 +4119,9 @@ def young_stock_api(request):
     items = _get_young_stock_filtered_items(request.query_params)
     paginator = Paginator(items, page_size)
     page_obj = paginator.get_page(page_number)
+    near_weights = _prefetch_birth_and_weaning_weights(animal for _, _, animal in page_obj.object_list)
     results = [
-        _build_young_stock_row(animal_type, type_label, animal)
+        _build_young_stock_row(animal_type, type_label, animal, near_weights)
         for animal_type, type_label, animal in page_obj.object_list
     ]
 
@@ -4143,11 +4172,12 @@ def young_stock_export_excel(request):
     items = _get_young_stock_filtered_items(request.query_params)
     items = _filter_young_stock_selected_items(items, request.GET.get("selected", ""))
 
-    rows = []
-    for idx, (animal_type, type_label, animal) in enumerate(items, start=1):
-        row = _build_young_stock_row(animal_type, type_label, animal)
-        rows.append(
-            [
+    near_weights = _prefetch_birth_and_weaning_weights(animal for _, _, animal in items)
+
+    def iter_rows():
+        for idx, (animal_type, type_label, animal) in enumerate(items, start=1):
+            row = _build_young_stock_row(animal_type, type_label, animal, near_weights)
+            yield [
                 idx,
                 row["tag_number"],
                 row["birth_type"],
@@ -4156,9 +4186,8 @@ def young_stock_export_excel(request):
                 row["weaning"],
                 row["mother_tag"],
             ]
-        )
 
-    return _build_excel_response(
+    return build_table_export_response(
         filename_prefix="young_stock",
         sheet_title="Приплод",
         headers=[
@@ -4170,7 +4199,7 @@ def young_stock_export_excel(request):
             "Отбивка",
             "Номер матери (бирка)",
         ],
-        rows=rows,
+        rows=iter_rows(),
     )
 
 
@@ -4329,23 +4358,36 @@ def _get_weight_record_near_date(tag, target_date, delta_days=5):
     )
 
 
-def _format_ewe_birth_weight(animal):
-    weight_record = _get_weight_record_near_date(animal.tag, animal.birth_date)
+def _get_prefetched_weight_near_date(animal, target_date, near_weights=None, delta_days=5):
+    """
+    Берет взвешивание из карты get_weight_records_near_dates, если она передана,
+    иначе выполняет отдельный запрос.
+    """
+    if near_weights is not None:
+        return near_weights.get((animal.tag_id, target_date))
+    return _get_weight_record_near_date(animal.tag, target_date, delta_days=delta_days)
+
+
+def _format_ewe_birth_weight(animal, near_weights=None):
+    weight_record = _get_prefetched_weight_near_date(animal, animal.birth_date, near_weights)
     return _format_weight_kg_fixed(weight_record.weight) if weight_record else "-"
 
 
-def _format_ewe_weaning(animal):
-    weight_record = _get_weight_record_near_date(animal.tag, animal.date_otbivka)
+def _format_ewe_weaning(animal, near_weights=None):
+    weight_record = _get_prefetched_weight_near_date(animal, animal.date_otbivka, near_weights)
     return _format_weight_record_with_date(weight_record)
 
 
-def _format_last_vet(animal):
-    vet_record = (
-        Veterinary.objects.filter(tag=animal.tag)
-        .select_related("veterinary_care")
-        .order_by("-date_of_care", "-id")
-        .first()
-    )
+def _format_last_vet(animal, last_vets=None):
+    if last_vets is not None:
+        vet_record = last_vets.get(animal.tag_id)
+    else:
+        vet_record = (
+            Veterinary.objects.filter(tag=animal.tag)
+            .select_related("veterinary_care")
+            .order_by("-date_of_care", "-id")
+            .first()
+        )
     if not vet_record or not vet_record.veterinary_care:
         return "-"
 
@@ -4357,73 +4399,6 @@ def _format_last_vet(animal):
     return f"{care_date_text}: {care_type} ({medication})"
 
 
-def _build_excel_response(filename_prefix, sheet_title, headers, rows, summary_lines=None):
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
-    except ImportError:
-        import csv
-        import io
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-        if summary_lines:
-            for summary_line in summary_lines:
-                writer.writerow([summary_line])
-            writer.writerow([])
-        writer.writerow(headers)
-        for row in rows:
-            writer.writerow(row)
-
-        response = HttpResponse(output.getvalue(), content_type="text/csv; charset=utf-8")
-        response["Content-Disposition"] = (
-            f'attachment; filename="{filename_prefix}_{datetime.now().strftime("%Y-%m-%d")}.csv"'
-        )
-        return response
-
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = sheet_title[:31]
-
-    row_index = 1
-    if summary_lines:
-        for summary_line in summary_lines:
-            worksheet.cell(row=row_index, column=1, value=summary_line)
-            row_index += 1
-        row_index += 1
-
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-
-    for col_index, header in enumerate(headers, start=1):
-        cell = worksheet.cell(row=row_index, column=col_index, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    for data_row_idx, data_row in enumerate(rows, start=row_index + 1):
-        for col_index, value in enumerate(data_row, start=1):
-            worksheet.cell(row=data_row_idx, column=col_index, value=value)
-
-    for col_index in range(1, len(headers) + 1):
-        max_length = len(str(headers[col_index - 1]))
-        for row_idx in range(row_index + 1, row_index + 1 + len(rows)):
-            cell_value = worksheet.cell(row=row_idx, column=col_index).value
-            if cell_value is not None:
-                max_length = max(max_length, len(str(cell_value)))
-        worksheet.column_dimensions[get_column_letter(col_index)].width = min(max_length + 2, 60)
-
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = (
-        f'attachment; filename="{filename_prefix}_{datetime.now().strftime("%Y-%m-%d")}.xlsx"'
-    )
-    workbook.save(response)
-    return response
-
-
 def _get_mother_link_data(lambing):
     if lambing.sheep and lambing.sheep.tag:
         tag_number = lambing.sheep.tag.tag_number
@@ -4848,19 +4823,18 @@ def journal_progeny(request):
     }
 
     if request.GET.get("export") == "1":
-        export_rows = []
-        for idx, row in enumerate(rows, start=1):
-            export_rows.append(
-                [
-                    idx,
-                    row["mother_tag"],
-                    row["actual_lambing_date"].strftime("%d.%m.%Y"),
-                    row["total_born"],
-                    _numbered_tags_as_text(row["ewe_tags"]),
-                    _numbered_tags_as_text(row["ram_tags"]),
-                    row["dead_count"],
-                ]
-            )
+        export_rows = (
+            [
+                idx,
+                row["mother_tag"],
+                row["actual_lambing_date"].strftime("%d.%m.%Y"),
+                row["total_born"],
+                _numbered_tags_as_text(row["ewe_tags"]),
+                _numbered_tags_as_text(row["ram_tags"]),
+                row["dead_count"],
+            ]
+            for idx, row in enumerate(rows, start=1)
+        )
 
         summary_lines = [
             f"Итого родившихся ярок: {totals['ewes_count']}",
@@ -4878,7 +4852,7 @@ def journal_progeny(request):
             "Бирки баранчиков",
             "Мертворожденные",
         ]
-        return _build_excel_response(
+        return build_table_export_response(
             filename_prefix="journal_progeny",
             sheet_title="Приплод",
             headers=headers,
@@ -5105,21 +5079,21 @@ def journal_insemination(request):
     totals = {"records_count": len(rows)}
 
     if request.GET.get("export") == "1":
-        export_rows = []
-        for idx, row in enumerate(rows, start=1):
-            export_row = [
-                idx,
-                row["mother_tag"],
-                row["father_tag"],
-                row["placement_date"].strftime("%d.%m.%Y") if row["placement_date"] else "-",
-            ]
-            if show_actual_lambing_date:
-                export_row.append(
-                    row["actual_lambing_date"].strftime("%d.%m.%Y")
-                    if row["actual_lambing_date"]
-                    else "-"
-                )
-            export_rows.append(export_row)
+        def iter_export_rows():
+            for idx, row in enumerate(rows, start=1):
+                export_row = [
+                    idx,
+                    row["mother_tag"],
+                    row["father_tag"],
+                    row["placement_date"].strftime("%d.%m.%Y") if row["placement_date"] else "-",
+                ]
+                if show_actual_lambing_date:
+                    export_row.append(
+                        row["actual_lambing_date"].strftime("%d.%m.%Y")
+                        if row["actual_lambing_date"]
+                        else "-"
+                    )
+                yield export_row
 
         headers = [
             "№",
@@ -5130,11 +5104,11 @@ def journal_insemination(request):
         if show_actual_lambing_date:
             headers.append("Дата фактических родов")
         summary_lines = [f"Итого записей: {totals['records_count']}"]
-        return _build_excel_response(
+        return build_table_export_response(
             filename_prefix="journal_insemination",
             sheet_title="Осеменение - случки",
             headers=headers,
-            rows=export_rows,
+            rows=iter_export_rows(),
             summary_lines=summary_lines,
         )
 
@@ -5206,10 +5180,11 @@ def journal_shift_transfer(request):
     ).order_by("-date", "-id")
 
     if request.GET.get("export") == "1":
-        export_rows = []
-        for idx, note in enumerate(filtered_queryset, start=1):
-            export_rows.append([idx, note.date.strftime("%d.%m.%Y"), note.text])
-        return _build_excel_response(
+        export_rows = (
+            [idx, note.date.strftime("%d.%m.%Y"), note.text]
+            for idx, note in enumerate(filtered_queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1)
+        )
+        return build_table_export_response(
             filename_prefix="journal_shift_transfer",
             sheet_title="Передача смены",
             headers=["№", "Дата", "Заметка"],
@@ -5235,369 +5210,338 @@ def journal_shift_transfer(request):
     return render(request, "journal_shift_transfer.html", context)
 
 
-# API для экспорта в Excel
-
-@api_view(['POST'])
-def export_to_excel(request):
-    # Пробуем импортировать openpyxl, если не получается - используем CSV
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
-        use_excel = True
-        print("Используем Excel формат (openpyxl)")
-    except ImportError as e:
-        print(f"openpyxl не доступен: {e}. Используем CSV формат.")
-        use_excel = False
-        import csv
-        import io
-    
-    try:
-        """
-        Экспорт животных в Excel с фильтрами:
-        - animal_type: 'maker', 'ram', 'ewe', 'sheep'
-        - limit: количество животных от начала списка
-        - weight_min: минимальный вес
-        - weight_max: максимальный вес
-        - age_min: минимальный возраст
-        - age_max: максимальный возраст
-        - include_details: включить родителей, детей и историю (true/false)
-        """
-        print(f"Получен запрос на экспорт: {request.data}")  # Отладочный вывод
-        animal_type = request.data.get('animal_type', 'maker')
-        limit = request.data.get('limit', None)
-        weight_min = request.data.get('weight_min', None)
-        weight_max = request.data.get('weight_max', None)
-        age_min = request.data.get('age_min', None)
-        age_max = request.data.get('age_max', None)
-        include_details = request.data.get('include_details', False)
-        selected_animals = request.data.get('selected_animals', []) or []
-        has_rshn_tag = request.data.get('has_rshn_tag', False)
-        
-        print(f"Параметры экспорта: type={animal_type}, limit={limit}, weight_min={weight_min}, weight_max={weight_max}, age_min={age_min}, age_max={age_max}, include_details={include_details}")
-        
-        # Выбираем модель
-        model_map = {
-            'maker': Maker,
-            'ram': Ram,
-            'ewe': Ewe,
-            'sheep': Sheep
-        }
-        
-        animals_list = []
-        selected_ids = set()
-        for item_id in selected_animals:
-            try:
-                selected_ids.add(int(item_id))
-            except (TypeError, ValueError):
-                continue
+def _prefetch_children_by_parent_tag(tag_numbers):
+    """
+    Дети для набора бирок родителей (по полям mother/father) — по запросу на
+    таблицу животных: {бирка родителя: [дети]}, порядок как у get_children().
+    """
+    tag_numbers = {tag_number for tag_number in tag_numbers if tag_number}
+    children_by_parent = defaultdict(list)
+    if not tag_numbers:
+        return children_by_parent
 
-        if animal_type == 'common':
-            combined_animals = []
-            for type_key, model in model_map.items():
-                queryset = model.objects.filter(is_archived=False).select_related('tag', 'animal_status', 'place')
+    for model in [Ram, Ewe, Sheep, Maker]:
+        queryset = model.objects.filter(
+            Q(father__in=tag_numbers) | Q(mother__in=tag_numbers)
+        ).select_related('tag')
+        for child in queryset:
+            parents = {child.father, child.mother} & tag_numbers
+            for parent_tag in parents:
+                children_by_parent[parent_tag].append(child)
 
-                if age_min is not None:
-                    queryset = queryset.filter(age__gte=float(age_min))
-                if age_max is not None:
-                    queryset = queryset.filter(age__lte=float(age_max))
+    today = timezone.now().date()
+    for children in children_by_parent.values():
+        children.sort(key=lambda child: child.birth_date or today, reverse=True)
+    return children_by_parent
 
-                if _is_truthy_filter_value(has_rshn_tag):
-                    queryset = _filter_queryset_with_rshn_tag(queryset)
 
-                if selected_ids:
-                    queryset = queryset.filter(tag_id__in=selected_ids)
+# API для экспорта в Excel
 
-                for animal in queryset:
-                    combined_animals.append({
-                        'animal': animal,
-                        'animal_type': type_key
-                    })
+def build_herd_export(params, progress=None):
+    """
+    Выгрузка списка животных с фильтрами (синхронно и в фоновой задаче "herd"):
+    - animal_type: 'maker', 'ram', 'ewe', 'sheep', 'common'
+    - limit: количество животных от начала списка
+    - weight_min: минимальный вес
+    - weight_max: максимальный вес
+    - age_min: минимальный возраст
+    - age_max: максимальный возраст
+    - include_details: включить родителей, детей и историю (true/false)
+
+    Животные читаются из БД частями (iterator) в порядке, заданном в SQL, и
+    сразу пишутся в лист; последние взвешивания загружаются на каждую часть.
+    """
+    animal_type = params.get('animal_type', 'maker')
+    limit = params.get('limit', None)
+    weight_min = params.get('weight_min', None)
+    weight_max = params.get('weight_max', None)
+    age_min = params.get('age_min', None)
+    age_max = params.get('age_max', None)
+    include_details = params.get('include_details', False)
+    selected_animals = params.get('selected_animals', []) or []
+    has_rshn_tag = params.get('has_rshn_tag', False)
+
+    # Выбираем модель
+    model_map = {
+        'maker': Maker,
+        'ram': Ram,
+        'ewe': Ewe,
+        'sheep': Sheep
+    }
+    
+    selected_ids = set()
+    for item_id in selected_animals:
+        try:
+            selected_ids.add(int(item_id))
+        except (TypeError, ValueError):
+            continue
 
-            combined_animals.sort(key=lambda item: item['animal'].tag_id, reverse=True)
+    def filtered_queryset(model):
+        queryset = model.objects.filter(is_archived=False).select_related('tag', 'animal_status', 'place')
+        if age_min is not None:
+            queryset = queryset.filter(age__gte=float(age_min))
+        if age_max is not None:
+            queryset = queryset.filter(age__lte=float(age_max))
+        if _is_truthy_filter_value(has_rshn_tag):
+            queryset = _filter_queryset_with_rshn_tag(queryset)
+        return queryset
 
-            if limit and not selected_ids:
-                combined_animals = combined_animals[:int(limit)]
+    def iter_typed(queryset, type_key):
+        for animal in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield animal, type_key
 
-            for item in combined_animals:
-                animal = item['animal']
-                last_weight = WeightRecord.objects.filter(tag=animal.tag).order_by('-weight_date').first()
+    if animal_type == 'common':
+        querysets = []
+        for type_key, model in model_map.items():
+            queryset = filtered_queryset(model)
+            if selected_ids:
+                queryset = queryset.filter(tag_id__in=selected_ids)
+            querysets.append((type_key, queryset.order_by('-tag_id')))
+        total = sum(queryset.count() for _type_key, queryset in querysets)
+        # Каждая таблица уже упорядочена в SQL — общий порядок даёт слияние потоков
+        animals = heapq.merge(
+            *(iter_typed(queryset, type_key) for type_key, queryset in querysets),
+            key=lambda item: item[0].tag_id,
+            reverse=True,
+        )
+        if limit and not selected_ids:
+            animals = islice(animals, int(limit))
+            total = min(total, int(limit))
+    else:
+        model = model_map.get(animal_type, Maker)
+        queryset = filtered_queryset(model).order_by('-id')
+        if selected_ids:
+            queryset = queryset.filter(id__in=selected_ids)
+        elif limit:
+            queryset = queryset[:int(limit)]
+        total = queryset.count()
+        animals = iter_typed(queryset, animal_type)
+
+    def iter_chunks_with_weights():
+        """
+        Части [(животное, тип, последнее взвешивание)] после фильтра по весу;
+        total — число животных до фильтра (для хода выполнения).
+        """
+        for chunk in iter_chunks(animals):
+            last_weights = get_latest_weight_records(animal.tag_id for animal, _type_key in chunk)
+            filtered = []
+            for animal, type_key in chunk:
+                last_weight = last_weights.get(animal.tag_id)
                 weight_value = float(last_weight.weight) if last_weight else None
-
                 if weight_min is not None and (weight_value is None or weight_value < float(weight_min)):
                     continue
                 if weight_max is not None and (weight_value is None or weight_value > float(weight_max)):
                     continue
+                filtered.append((animal, type_key, last_weight))
+            if filtered:
+                yield filtered
 
-                animals_list.append({
-                    'animal': animal,
-                    'animal_type': item['animal_type'],
-                    'last_weight': weight_value,
-                    'last_weight_date': last_weight.weight_date if last_weight else None
-                })
-        else:
-            model = model_map.get(animal_type, Maker)
-            queryset = model.objects.filter(is_archived=False).select_related('tag', 'animal_status', 'place').order_by('-id')
-
-            if age_min is not None:
-                queryset = queryset.filter(age__gte=float(age_min))
-            if age_max is not None:
-                queryset = queryset.filter(age__lte=float(age_max))
-
-            if _is_truthy_filter_value(has_rshn_tag):
-                queryset = _filter_queryset_with_rshn_tag(queryset)
-
-            if selected_ids:
-                queryset = queryset.filter(id__in=selected_ids)
-            elif limit:
-                queryset = queryset[:int(limit)]
-
-            for animal in queryset:
-                last_weight = WeightRecord.objects.filter(tag=animal.tag).order_by('-weight_date').first()
-                weight_value = float(last_weight.weight) if last_weight else None
+    if animal_type == 'ewe':
+        headers = [
+            '№',
+            'Индивидуальный номер (бирка)',
+            'Дата рождения',
+            'Тип рождения',
+            'Вес при рождении',
+            'Статус',
+            'Назначение',
+            'Овчарня',
+            'Последнее взвешивание',
+            'Отбивка',
+            'Последняя ветобработка',
+            'Бирка РСХН',
+            'Примечание',
+        ]
 
-                if weight_min is not None and (weight_value is None or weight_value < float(weight_min)):
-                    continue
-                if weight_max is not None and (weight_value is None or weight_value > float(weight_max)):
-                    continue
+        def iter_export_data():
+            idx = 0
+            for chunk in iter_chunks_with_weights():
+                chunk_animals = [animal for animal, _type_key, _last_weight in chunk]
+                near_weights = _prefetch_birth_and_weaning_weights(chunk_animals)
+                last_vets = get_latest_vet_records(animal.tag_id for animal in chunk_animals)
+                for animal, _type_key, last_weight in chunk:
+                    idx += 1
+                    yield [
+                        idx,
+                        animal.tag.tag_number,
+                        animal.birth_date.strftime('%Y-%m-%d') if animal.birth_date else '-',
+                        '-',
+                        _format_ewe_birth_weight(animal, near_weights),
+                        animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
+                        'Брак' if animal.is_reject else '-',
+                        animal.place.sheepfold if animal.place else 'Нет данных',
+                        _format_weight_record_with_date(last_weight),
+                        _format_ewe_weaning(animal, near_weights),
+                        _format_last_vet(animal, last_vets),
+                        animal.rshn_tag or '-',
+                        animal.note or '',
+                    ]
+    elif animal_type == 'sheep':
+        headers = [
+            '№',
+            'Индивидуальный номер (бирка)',
+            'Дата рождения',
+            'Статус',
+            'Назначение',
+            'Овчарня',
+            'Последнее взвешивание',
+            'Последнее осеменение',
+            'Последняя дата окота',
+            'Последняя ветобработка',
+            'Бирка РСХН',
+            'Примечание',
+        ]
 
-                animals_list.append({
-                    'animal': animal,
-                    'animal_type': animal_type,
-                    'last_weight': weight_value,
-                    'last_weight_date': last_weight.weight_date if last_weight else None
-                })
+        def iter_export_data():
+            idx = 0
+            for chunk in iter_chunks_with_weights():
+                last_vets = get_latest_vet_records(animal.tag_id for animal, _type_key, _last_weight in chunk)
+                for animal, _type_key, last_weight in chunk:
+                    idx += 1
+                    yield [
+                        idx,
+                        animal.tag.tag_number,
+                        animal.birth_date.strftime('%Y-%m-%d') if animal.birth_date else '-',
+                        animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
+                        'Брак' if animal.is_reject else '-',
+                        animal.place.sheepfold if animal.place else 'Нет данных',
+                        _format_weight_record_with_date(last_weight),
+                        format_sheep_last_insemination_text(build_sheep_last_insemination_data(animal)),
+                        format_sheep_last_lambing_text(build_sheep_last_lambing_summary(animal)),
+                        _format_last_vet(animal, last_vets),
+                        animal.rshn_tag or '-',
+                        animal.note or '',
+                    ]
+    else:
+        headers = [
+            '№',
+            'Бирка',
+            'Статус',
+            'Возраст (мес)',
+            'Овчарня',
+            'Кровность по основной породе',
+            'Назначение',
+            'Живой вес (кг)',
+            'Дата взвешивания',
+        ]
+        if animal_type == 'common':
+            headers.insert(1, 'Тип животного')
+        
+        if animal_type == 'maker':
+            headers.extend(['Племенной статус', 'Рабочее состояние'])
+        elif animal_type == 'common':
+            headers.append('Рабочее состояние')
+        
+        headers.append('Примечание')
+        
+        if include_details:
+            headers.extend(['Мать', 'Отец', 'Дети', 'История веса', 'История ветобработок'])
+        
+        type_labels = {
+            'maker': 'Баран-Производитель',
+            'ram': 'Баранчик',
+            'ewe': 'Ярка',
+            'sheep': 'Овцематка'
+        }
+        # Словарь переводов типов животных
+        type_translations = {
+            'Maker': 'Баран-Производитель',
+            'Ram': 'Баранчик',
+            'Ewe': 'Ярка',
+            'Sheep': 'Овцематка'
+        }
 
-        print(f"Найдено {len(animals_list)} животных для экспорта")
-        if animal_type == 'ewe':
-            headers = [
-                '№',
-                'Индивидуальный номер (бирка)',
-                'Дата рождения',
-                'Тип рождения',
-                'Вес при рождении',
-                'Статус',
-                'Назначение',
-                'Овчарня',
-                'Последнее взвешивание',
-                'Отбивка',
-                'Последняя ветобработка',
-                'Бирка РСХН',
-                'Примечание',
-            ]
-            export_data = []
-            for idx, item in enumerate(animals_list, start=1):
-                animal = item['animal']
-                export_data.append([
-                    idx,
-                    animal.tag.tag_number,
-                    animal.birth_date.strftime('%Y-%m-%d') if animal.birth_date else '-',
-                    '-',
-                    _format_ewe_birth_weight(animal),
-                    animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
-                    'Брак' if animal.is_reject else '-',
-                    animal.place.sheepfold if animal.place else 'Нет данных',
-                    _format_weight_record_with_date(
-                        WeightRecord.objects.filter(tag=animal.tag).order_by('-weight_date', '-id').first()
-                    ),
-                    _format_ewe_weaning(animal),
-                    _format_last_vet(animal),
-                    animal.rshn_tag or '-',
-                    animal.note or '',
-                ])
-        elif animal_type == 'sheep':
-            headers = [
-                '№',
-                'Индивидуальный номер (бирка)',
-                'Дата рождения',
-                'Статус',
-                'Назначение',
-                'Овчарня',
-                'Последнее взвешивание',
-                'Последнее осеменение',
-                'Последняя дата окота',
-                'Последняя ветобработка',
-                'Бирка РСХН',
-                'Примечание',
-            ]
-            export_data = []
-            for idx, item in enumerate(animals_list, start=1):
-                animal = item['animal']
-                export_data.append([
-                    idx,
-                    animal.tag.tag_number,
-                    animal.birth_date.strftime('%Y-%m-%d') if animal.birth_date else '-',
-                    animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
-                    'Брак' if animal.is_reject else '-',
-                    animal.place.sheepfold if animal.place else 'Нет данных',
-                    _format_weight_record_with_date(
-                        WeightRecord.objects.filter(tag=animal.tag).order_by('-weight_date', '-id').first()
-                    ),
-                    format_sheep_last_insemination_text(build_sheep_last_insemination_data(animal)),
-                    format_sheep_last_lambing_text(build_sheep_last_lambing_summary(animal)),
-                    _format_last_vet(animal),
-                    animal.rshn_tag or '-',
-                    animal.note or '',
-                ])
-        else:
-            headers = [
-                '№',
-                'Бирка',
-                'Статус',
-                'Возраст (мес)',
-                'Овчарня',
-                'Кровность по основной породе',
-                'Назначение',
-                'Живой вес (кг)',
-                'Дата взвешивания',
+        def build_row(idx, animal, type_key, last_weight, details):
+            row_data = [
+                idx,  # №
+                animal.tag.tag_number,
+                animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
+                animal.age if animal.age else '-',
+                animal.place.sheepfold if animal.place else 'Нет данных',
+                _format_dorper_display(animal),
+                'Брак' if animal.is_reject else '-',
+                float(last_weight.weight) if last_weight and last_weight.weight else '-',
+                last_weight.weight_date.strftime('%Y-%m-%d') if last_weight and last_weight.weight_date else '-'
             ]
+
             if animal_type == 'common':
-                headers.insert(1, 'Тип животного')
+                row_data.insert(1, type_labels.get(type_key, type_key or '-'))
             
             if animal_type == 'maker':
-                headers.extend(['Племенной статус', 'Рабочее состояние'])
+                row_data.extend([
+                    animal.plemstatus if hasattr(animal, 'plemstatus') else '-',
+                    animal.working_condition if hasattr(animal, 'working_condition') else '-'
+                ])
             elif animal_type == 'common':
-                headers.append('Рабочее состояние')
+                row_data.append(animal.working_condition if hasattr(animal, 'working_condition') and animal.working_condition else '-')
             
-            headers.append('Примечание')
+            row_data.append(animal.note if animal.note else '')
             
-            if include_details:
-                headers.extend(['Мать', 'Отец', 'Дети', 'История веса', 'История ветобработок'])
-            
-            # Подготавливаем данные для экспорта
-            export_data = []
-            for idx, item in enumerate(animals_list, start=1):
-                animal = item['animal']
-                row_data = [
-                    idx,  # №
-                    animal.tag.tag_number,
-                    animal.animal_status.status_type if animal.animal_status else 'Нет статуса',
-                    animal.age if animal.age else '-',
-                    animal.place.sheepfold if animal.place else 'Нет данных',
-                    _format_dorper_display(animal),
-                    'Брак' if animal.is_reject else '-',
-                    item['last_weight'] if item['last_weight'] else '-',
-                    item['last_weight_date'].strftime('%Y-%m-%d') if item['last_weight_date'] else '-'
-                ]
-
-                if animal_type == 'common':
-                    type_labels = {
-                        'maker': 'Баран-Производитель',
-                        'ram': 'Баранчик',
-                        'ewe': 'Ярка',
-                        'sheep': 'Овцематка'
-                    }
-                    row_data.insert(1, type_labels.get(item.get('animal_type'), item.get('animal_type', '-')))
+            if details is not None:
+                children_by_parent, weights_by_tag, vets_by_tag = details
+                # Родители
+                mother = animal.mother if animal.mother else 'Нет данных'
+                father = animal.father if animal.father else 'Нет данных'
                 
-                if animal_type == 'maker':
-                    row_data.extend([
-                        animal.plemstatus if hasattr(animal, 'plemstatus') else '-',
-                        animal.working_condition if hasattr(animal, 'working_condition') else '-'
-                    ])
-                elif animal_type == 'common':
-                    row_data.append(animal.working_condition if hasattr(animal, 'working_condition') and animal.working_condition else '-')
+                # Дети
+                children = children_by_parent.get(animal.tag.tag_number, [])
+                children_str = '; '.join([
+                    f"{child.tag.tag_number} ({type_translations.get(child.get_animal_type(), child.get_animal_type())}" + 
+                    (f", {child.age}мес" if child.age else "") + ")"
+                    for child in children[:10]  # Ограничиваем до 10 детей для читаемости
+                ]) if children else 'Нет данных'
                 
-                row_data.append(animal.note if animal.note else '')
+                # История веса
+                weight_str = '; '.join([
+                    f"{w.weight_date}: {w.weight}кг" for w in weights_by_tag.get(animal.tag_id, [])
+                ])
                 
-                if include_details:
-                    # Родители
-                    mother = animal.mother if animal.mother else 'Нет данных'
-                    father = animal.father if animal.father else 'Нет данных'
-                    
-                    # Дети
-                    children = animal.get_children()
-                    # Словарь переводов типов животных
-                    type_translations = {
-                        'Maker': 'Баран-Производитель',
-                        'Ram': 'Баранчик',
-                        'Ewe': 'Ярка',
-                        'Sheep': 'Овцематка'
-                    }
-                    children_str = '; '.join([
-                        f"{child.tag.tag_number} ({type_translations.get(child.get_animal_type(), child.get_animal_type())}" + 
-                        (f", {child.age}мес" if child.age else "") + ")"
-                        for child in children[:10]  # Ограничиваем до 10 детей для читаемости
-                    ]) if children else 'Нет данных'
-                    
-                    # История веса
-                    weight_history = WeightRecord.objects.filter(tag=animal.tag).order_by('-weight_date')[:5]
-                    weight_str = '; '.join([f"{w.weight_date}: {w.weight}кг" for w in weight_history])
-                    
-                    # История ветобработок
-                    vet_history = Veterinary.objects.filter(tag=animal.tag).select_related('veterinary_care').order_by('-date_of_care')[:5]
-                    vet_items = []
-                    for v in vet_history:
-                        care_date = v.get_care_date()
-                        care_date_text = care_date.strftime('%d.%m.%Y') if care_date else '-'
-                        vet_items.append(f"{care_date_text}: {v.veterinary_care.care_name}")
-                    vet_str = '; '.join(vet_items)
-                    
-                    row_data.extend([mother, father, children_str, weight_str or 'Нет данных', vet_str or 'Нет данных'])
+                # История ветобработок
+                vet_items = []
+                for v in vets_by_tag.get(animal.tag_id, []):
+                    care_date = v.get_care_date()
+                    care_date_text = care_date.strftime('%d.%m.%Y') if care_date else '-'
+                    vet_items.append(f"{care_date_text}: {v.veterinary_care.care_name}")
+                vet_str = '; '.join(vet_items)
                 
-                export_data.append(row_data)
-        
-        # Создаем файл в зависимости от доступности openpyxl
-        if use_excel:
-            # Создаём Excel файл
-            wb = Workbook()
-            ws = wb.active
-            ws.title = f"{animal_type.capitalize()}s"
-            
-            # Стилизация заголовков
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            header_font = Font(bold=True, color="FFFFFF")
-            
-            # Добавляем заголовки
-            for col_num, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
+                row_data.extend([mother, father, children_str, weight_str or 'Нет данных', vet_str or 'Нет данных'])
             
-            # Добавляем данные
-            for row_num, row_data in enumerate(export_data, start=2):
-                for col_num, value in enumerate(row_data, 1):
-                    ws.cell(row=row_num, column=col_num, value=value)
-            
-            # Автоширина колонок
-            for col in range(1, len(headers) + 1):
-                ws.column_dimensions[get_column_letter(col)].width = 15
-            
-            # Сохраняем в response
-            filename = f"{animal_type}s_{datetime.now().strftime('%Y-%m-%d')}.xlsx"
-            
-            response = HttpResponse(
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            wb.save(response)
-        else:
-            # Создаём CSV файл
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Добавляем заголовки
-            writer.writerow(headers)
-            
-            # Добавляем данные
-            for row_data in export_data:
-                writer.writerow(row_data)
-            
-            # Сохраняем в response
-            filename = f"{animal_type}s_{datetime.now().strftime('%Y-%m-%d')}.csv"
-            
-            response = HttpResponse(
-                output.getvalue(),
-                content_type='text/csv; charset=utf-8'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+            return row_data
+
+        def iter_export_data():
+            idx = 0
+            for chunk in iter_chunks_with_weights():
+                details = None
+                if include_details:
+                    # Дети и истории — несколькими запросами на часть животных
+                    chunk_tag_ids = [animal.tag_id for animal, _type_key, _last_weight in chunk]
+                    details = (
+                        _prefetch_children_by_parent_tag(
+                            animal.tag.tag_number for animal, _type_key, _last_weight in chunk
+                        ),
+                        get_recent_weight_records(chunk_tag_ids, limit=5),
+                        get_recent_vet_records(chunk_tag_ids, limit=5),
+                    )
+                for animal, type_key, last_weight in chunk:
+                    idx += 1
+                    yield build_row(idx, animal, type_key, last_weight, details)
     
+    return build_table_export(
+        filename_prefix=f"{animal_type}s",
+        sheet_title=f"{animal_type.capitalize()}s",
+        headers=headers,
+        rows=iter_with_progress(iter_export_data(), progress, total=total),
+        column_widths=[15] * len(headers),
+    )
+
+
+@api_view(['POST'])
+def export_to_excel(request):
+    """Экспорт животных в Excel (параметры — см. build_herd_export)."""
+    try:
+        return build_herd_export(request.data).response()
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Ошибка экспорта: {error_details}")  # Для логов сервера
+        logger.exception("Ошибка экспорта животных в Excel")
         return Response(
             {"error": f"Ошибка при создании Excel файла: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -5606,13 +5550,13 @@ def export_to_excel(request):
 
 # API для статистики на главной странице
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def export_animal_detail_excel(request, animal_type, tag_number):
+def build_animal_detail_export(params, progress=None):
     """
-    Экспорт данных карточки животного в XLSX.
-    Выбор разделов передаётся в request.data['sections'].
+    Выгрузка карточки животного в XLSX (синхронно и в фоновой задаче "animal_detail").
+    params: animal_type, tag_number и список разделов sections.
     """
+    animal_type = params.get('animal_type')
+    tag_number = params.get('tag_number') or ''
     model_map = {
         'maker': Maker,
         'ram': Ram,
@@ -5628,16 +5572,16 @@ def export_animal_detail_excel(request, animal_type, tag_number):
 
     model = model_map.get(animal_type)
     if not model:
-        return Response({'error': 'Неверный тип животного'}, status=status.HTTP_400_BAD_REQUEST)
+        raise ExportRequestError('Неверный тип животного')
 
     try:
         animal = model.objects.select_related('tag', 'animal_status', 'place').get(tag__tag_number=tag_number)
     except model.DoesNotExist:
-        return Response({'error': 'Животное не найдено'}, status=status.HTTP_404_NOT_FOUND)
+        raise ExportRequestError('Животное не найдено', status.HTTP_404_NOT_FOUND)
 
-    requested_sections = request.data.get('sections', [])
+    requested_sections = params.get('sections', [])
     if not isinstance(requested_sections, list):
-        return Response({'error': 'Некорректный формат sections'}, status=status.HTTP_400_BAD_REQUEST)
+        raise ExportRequestError('Некорректный формат sections')
 
     section_order = [
         'basic_info',
@@ -5650,16 +5594,16 @@ def export_animal_detail_excel(request, animal_type, tag_number):
     ]
     selected_sections = [section for section in section_order if section in set(requested_sections)]
     if not selected_sections:
-        return Response({'error': 'Не выбраны разделы для экспорта'}, status=status.HTTP_400_BAD_REQUEST)
+        raise ExportRequestError('Не выбраны разделы для экспорта')
 
     try:
         from openpyxl import Workbook
         from openpyxl.styles import Font, Alignment, PatternFill
         from openpyxl.utils import get_column_letter
     except ImportError:
-        return Response(
-            {'error': 'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        raise ExportRequestError(
+            'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.',
+            status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
     def format_date(date_value):
@@ -5702,6 +5646,8 @@ def export_animal_detail_excel(request, animal_type, tag_number):
 
         worksheet.freeze_panes = 'A2'
         auto_width(worksheet)
+        if progress is not None:
+            progress(len(workbook.sheetnames), len(selected_sections))
         return worksheet
 
     def get_child_archive_date(child_animal):
@@ -5882,19 +5828,91 @@ def export_animal_detail_excel(request, animal_type, tag_number):
             ])
         add_table_sheet(workbook, 'История статусов', ['№', 'Дата и время', 'Старый статус', 'Новый статус'], rows)
 
-    from urllib.parse import quote
     import re
 
     timestamp = timezone.localtime(timezone.now()).strftime('%Y%m%d_%H%M%S')
     safe_tag = re.sub(r'[^\w\-]+', '_', tag_number, flags=re.UNICODE).strip('_') or 'animal'
     filename = f"{animal_type}_{safe_tag}_{timestamp}.xlsx"
+    return ExportResult(filename, XLSX_CONTENT_TYPE, workbook.save)
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def export_animal_detail_excel(request, animal_type, tag_number):
+    """
+    Экспорт данных карточки животного в XLSX.
+    Выбор разделов передаётся в request.data['sections'].
+    """
+    params = {
+        'animal_type': animal_type,
+        'tag_number': tag_number,
+        'sections': request.data.get('sections', []),
+    }
+    try:
+        return build_animal_detail_export(params).response()
+    except ExportRequestError as exc:
+        return Response({'error': exc.message}, status=exc.status_code)
+
+
+# API фоновых выгрузок: постановка в очередь, опрос прогресса и скачивание
+
+def _get_export_job_for_request(request, job_id):
+    """Задача выгрузки, доступная пользователю (своя или любая для администратора)."""
+    job = ExportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    if job.user_id is None or job.user_id == request.user.id or request.user.is_staff:
+        return job
+    return None
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def export_jobs_api(request):
+    """
+    GET — последние выгрузки текущего пользователя.
+    POST — поставить выгрузку в очередь: {"kind": "herd" | "animal_detail" | "kinship_pairs", "params": {...}}.
+    """
+    if request.method == 'POST':
+        try:
+            job = enqueue_export_job(request.user, request.data.get('kind'), request.data.get('params') or {})
+        except ExportRequestError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
+        return Response(serialize_export_job(job), status=status.HTTP_202_ACCEPTED)
+
+    if not request.user.is_authenticated:
+        return Response({'results': []})
+    jobs = ExportJob.objects.filter(user=request.user)[:20]
+    return Response({'results': [serialize_export_job(job) for job in jobs]})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_job_status(request, job_id):
+    job = _get_export_job_for_request(request, job_id)
+    if job is None:
+        return Response({'error': 'Выгрузка не найдена'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(serialize_export_job(job))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_job_download(request, job_id):
+    job = _get_export_job_for_request(request, job_id)
+    if job is None:
+        return Response({'error': 'Выгрузка не найдена'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != ExportJob.STATUS_DONE:
+        return Response({'error': 'Файл выгрузки еще не готов'}, status=status.HTTP_409_CONFLICT)
+    try:
+        file_handle = open(get_result_path(job), 'rb')
+    except FileNotFoundError:
+        return Response({'error': 'Файл выгрузки удален'}, status=status.HTTP_410_GONE)
+    return FileResponse(
+        file_handle,
+        as_attachment=True,
+        filename=job.result_filename,
+        content_type=job.content_type or 'application/octet-stream',
     )
-    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
-    workbook.save(response)
-    return response
 
 
 @api_view(['GET'])
@@ -5905,108 +5923,8 @@ def dashboard_statistics(request):
     - Перенесено в архив за текущий календарный месяц (по типам и статусам)
     - Родилось за текущий календарный месяц (только молодняк Ram и Ewe, по типам)
     """
-    from django.utils import timezone
-    
-    # Текущий календарный месяц: с 1 числа по последнее число месяца.
-    today = timezone.localdate()
-    month_start = today.replace(day=1)
-    month_end = month_start + relativedelta(months=1) - timedelta(days=1)
-    
-    # 1. Всего активных животных
-    active_makers = Maker.objects.filter(is_archived=False).count()
-    active_rams = Ram.objects.filter(is_archived=False).count()
-    active_ewes = Ewe.objects.filter(is_archived=False).count()
-    active_sheep = Sheep.objects.filter(is_archived=False).count()
-    total_active = active_makers + active_rams + active_ewes + active_sheep
-    
-    # 2. Перенесено в архив за текущий месяц
-    archive_statuses = ARCHIVE_STATUS_NAMES
-    
-    # Используем StatusHistory для получения даты архивирования
-    from begunici.app_types.veterinary.vet_models import StatusHistory
-    
-    # Получаем ID архивных статусов
-    archive_status_ids = Status.objects.filter(status_type__in=archive_statuses).values_list('id', flat=True)
-    
-    # Получаем бирки животных, которые были переведены в архивные статусы за текущий месяц
-    archived_tag_ids = StatusHistory.objects.filter(
-        new_status_id__in=archive_status_ids,
-        change_date__date__gte=month_start,
-        change_date__date__lte=month_end,
-    ).values_list('tag_id', flat=True)
-    
-    # Подсчитываем архивированных животных по типам
-    archived_makers = Maker.objects.filter(
-        is_archived=True,
-        tag_id__in=archived_tag_ids
-    ).values('animal_status__status_type').annotate(count=Count('id'))
-    
-    archived_rams = Ram.objects.filter(
-        is_archived=True,
-        tag_id__in=archived_tag_ids
-    ).values('animal_status__status_type').annotate(count=Count('id'))
-    
-    archived_ewes = Ewe.objects.filter(
-        is_archived=True,
-        tag_id__in=archived_tag_ids
-    ).values('animal_status__status_type').annotate(count=Count('id'))
-    
-    archived_sheep = Sheep.objects.filter(
-        is_archived=True,
-        tag_id__in=archived_tag_ids
-    ).values('animal_status__status_type').annotate(count=Count('id'))
-    
-    # Подсчёт общего количества архивированных
-    total_archived_makers = sum(item['count'] for item in archived_makers)
-    total_archived_rams = sum(item['count'] for item in archived_rams)
-    total_archived_ewes = sum(item['count'] for item in archived_ewes)
-    total_archived_sheep = sum(item['count'] for item in archived_sheep)
-    total_archived = total_archived_makers + total_archived_rams + total_archived_ewes + total_archived_sheep
-    
-    # 3. Родилось за текущий месяц (только молодняк)
-    born_rams = Ram.objects.filter(birth_date__gte=month_start, birth_date__lte=month_end).count()
-    born_ewes = Ewe.objects.filter(birth_date__gte=month_start, birth_date__lte=month_end).count()
-    total_born = born_rams + born_ewes
-    
-    return Response({
-        'active_animals': {
-            'total': total_active,
-            'by_type': {
-                'makers': active_makers,
-                'rams': active_rams,
-                'ewes': active_ewes,
-                'sheep': active_sheep
-            }
-        },
-        'archived_last_month': {
-            'total': total_archived,
-            'by_type': {
-                'makers': {
-                    'total': total_archived_makers,
-                    'by_status': list(archived_makers)
-                },
-                'rams': {
-                    'total': total_archived_rams,
-                    'by_status': list(archived_rams)
-                },
-                'ewes': {
-                    'total': total_archived_ewes,
-                    'by_status': list(archived_ewes)
-                },
-                'sheep': {
-                    'total': total_archived_sheep,
-                    'by_status': list(archived_sheep)
-                }
-            }
-        },
-        'born_last_month': {
-            'total': total_born,
-            'by_type': {
-                'rams': born_rams,
-                'ewes': born_ewes
-            }
-        }
-    })
+    # Два запроса с условной агрегацией; результат кэшируется на текущий месяц
+    return Response(get_dashboard_statistics())
 
 
 @api_view(['GET'])
@@ -6019,9 +5937,7 @@ def yearly_statistics(request):
     - Количество рождений мальчиков и девочек
     """
     from django.utils import timezone
-    from datetime import date, datetime, time
-    from django.db.models import Avg, Count, F, Q, Sum
-    from begunici.app_types.veterinary.vet_models import VeterinaryCare, Place, StatusHistory
+    from datetime import date
     
     year = request.GET.get('year', timezone.now().year)
     selected_month = request.GET.get('month')
@@ -6053,138 +5969,61 @@ def yearly_statistics(request):
             period_end = year_end
             months_to_calculate = range(1, 13)
 
-        current_tz = timezone.get_current_timezone()
-        period_end_exclusive_dt = timezone.make_aware(
-            datetime.combine(period_end + timedelta(days=1), time.min),
-            current_tz,
+        # Показатели читаются из помесячной свёртки MonthlyStatistic
+        # (текущий месяц считается на лету)
+        period_months = [date(year, month, 1) for month in months_to_calculate]
+        period_rows = get_month_rows(
+            period_months,
+            metrics=(
+                MonthlyStatistic.METRIC_WEIGHT_GAIN,
+                MonthlyStatistic.METRIC_VACCINATIONS,
+                MonthlyStatistic.METRIC_BIRTHS,
+                MonthlyStatistic.METRIC_DEADBORN,
+            ),
         )
-        
-        # 1. ОПТИМИЗИРОВАННЫЙ расчет среднего набора веса по месяцам
+
+        # 1. Средний набор веса по месяцам
+        gain_by_month = defaultdict(lambda: [Decimal('0'), 0])
+        treatment_stats = {}
+        births_by_type = defaultdict(int)
+        dead_lambs_born = 0
+        for row in period_rows:
+            if row.metric == MonthlyStatistic.METRIC_WEIGHT_GAIN:
+                gain_by_month[row.month.month][0] += row.total
+                gain_by_month[row.month.month][1] += row.count
+            elif row.metric == MonthlyStatistic.METRIC_VACCINATIONS:
+                # 2. Количество ветобработок по препаратам
+                treatment_stats[row.label] = treatment_stats.get(row.label, 0) + row.count
+            elif row.metric == MonthlyStatistic.METRIC_BIRTHS:
+                births_by_type[row.animal_type] += row.count
+            elif row.metric == MonthlyStatistic.METRIC_DEADBORN:
+                dead_lambs_born += int(row.total)
+
         monthly_weight_gain = {}
-        
-        # Получаем все взвешивания за выбранный период одним запросом
-        all_weights = WeightRecord.objects.filter(
-            weight_date__gte=period_start,
-            weight_date__lte=period_end
-        ).select_related('tag').order_by('tag', 'weight_date')
-        
-        # Группируем по месяцам и тегам
-        from collections import defaultdict
-        weights_by_month_tag = defaultdict(list)
-        
-        for weight in all_weights:
-            month = weight.weight_date.month
-            tag_id = weight.tag.id
-            weights_by_month_tag[(month, tag_id)].append(weight)
-        
-        # Рассчитываем прирост по месяцам
         for month in months_to_calculate:
-            total_weight_gain = 0
-            animals_with_gain = 0
-            
-            for (m, tag_id), weights in weights_by_month_tag.items():
-                if m == month and len(weights) >= 2:
-                    first_weight = weights[0].weight
-                    last_weight = weights[-1].weight
-                    weight_gain = float(last_weight - first_weight)
-                    total_weight_gain += weight_gain
-                    animals_with_gain += 1
-            
-            avg_gain = round(total_weight_gain / animals_with_gain, 2) if animals_with_gain > 0 else 0
+            total_weight_gain, animals_with_gain = gain_by_month.get(month, (Decimal('0'), 0))
+            avg_gain = round(float(total_weight_gain) / animals_with_gain, 2) if animals_with_gain > 0 else 0
             monthly_weight_gain[f'month_{month}'] = {
                 'month': month,
                 'avg_gain': avg_gain,
                 'animals_count': animals_with_gain
             }
-        
-        # 2. ОПТИМИЗИРОВАННЫЙ подсчет вакцинаций
-        treatment_stats = {}
-        vet_treatments = Veterinary.objects.filter(
-            date_of_care__date__gte=period_start,
-            date_of_care__date__lte=period_end
-        ).select_related('veterinary_care').values(
-            'veterinary_care__care_name',
-            'veterinary_care__medication'
-        ).annotate(count=Count('id'))
-        
-        for treatment in vet_treatments:
-            care_name = treatment['veterinary_care__care_name'] or 'Без названия'
-            medication = treatment['veterinary_care__medication'] or 'Без препарата'
-            key = f"{care_name} ({medication})"
-            treatment_stats[key] = treatment['count']
-        
+
         # 3. Подсчет животных по статусам на конец выбранного периода.
         # Животное попадает в статистику ровно один раз, по статусу на конец периода.
+        status_counts = defaultdict(int)
+        for row in get_month_rows([period_months[-1]], metrics=(MonthlyStatistic.METRIC_STATUS_END,)):
+            status_counts[row.status_id] += row.count
+        status_names = dict(Status.objects.filter(id__in=list(status_counts)).values_list('id', 'status_type'))
         status_stats = {}
-
-        animals_for_status = []
-        for model in [Ram, Ewe, Sheep, Maker]:
-            animals = model.objects.filter(
-                Q(birth_date__lte=period_end)
-                | Q(birth_date__isnull=True, tag__issue_date__lte=period_end)
-            ).select_related('animal_status', 'tag')
-            animals_for_status.extend(animals)
-
-        animals_by_tag = {}
-        for animal in animals_for_status:
-            if getattr(animal, 'tag_id', None) and animal.tag_id not in animals_by_tag:
-                animals_by_tag[animal.tag_id] = animal
-        animals_for_status = list(animals_by_tag.values())
-
-        tag_ids_for_status = [
-            animal.tag_id for animal in animals_for_status
-            if getattr(animal, 'tag_id', None)
-        ]
-        histories_by_tag = defaultdict(list)
-        status_histories = (
-            StatusHistory.objects.filter(tag_id__in=tag_ids_for_status)
-            .select_related('old_status', 'new_status')
-            .order_by('tag_id', 'change_date', 'id')
-        )
-        for history in status_histories:
-            histories_by_tag[history.tag_id].append(history)
-
-        for animal in animals_for_status:
-            status_type = None
-            tag_histories = histories_by_tag.get(animal.tag_id, [])
-            last_change_before_year_end = None
-            first_change_after_year_end = None
-
-            for history in tag_histories:
-                if history.change_date < period_end_exclusive_dt:
-                    last_change_before_year_end = history
-                elif first_change_after_year_end is None:
-                    first_change_after_year_end = history
-
-            if last_change_before_year_end and last_change_before_year_end.new_status:
-                status_type = last_change_before_year_end.new_status.status_type
-            elif first_change_after_year_end and first_change_after_year_end.old_status:
-                status_type = first_change_after_year_end.old_status.status_type
-            elif animal.animal_status:
-                status_type = animal.animal_status.status_type
-
+        for status_id, count in status_counts.items():
+            status_type = status_names.get(status_id)
             if status_type:
-                status_stats[status_type] = status_stats.get(status_type, 0) + 1
-        
-        # 4. ОПТИМИЗИРОВАННЫЙ подсчет рождений
-        # Используем агрегацию вместо count()
-        boys_born = (
-            Ram.objects.filter(birth_date__gte=period_start, birth_date__lte=period_end).count() +
-            Maker.objects.filter(birth_date__gte=period_start, birth_date__lte=period_end).count()
-        )
-        
-        girls_born = (
-            Ewe.objects.filter(birth_date__gte=period_start, birth_date__lte=period_end).count() +
-            Sheep.objects.filter(birth_date__gte=period_start, birth_date__lte=period_end).count()
-        )
+                status_stats[status_type] = status_stats.get(status_type, 0) + count
 
-        dead_lambs_born = (
-            Lambing.objects.filter(
-                is_active=False,
-                actual_lambing_date__gte=period_start,
-                actual_lambing_date__lte=period_end,
-            ).aggregate(total=Sum('dead_lambs_count'))['total'] or 0
-        )
+        # 4. Рождения мальчиков и девочек
+        boys_born = sum(births_by_type[animal_type] for animal_type in BOYS_TYPES)
+        girls_born = sum(births_by_type[animal_type] for animal_type in GIRLS_TYPES)
 
         # 5. Молодняк (в рамках выбранного года/месяца):
         # животные, рожденные с начала года и достигшие возраста более 7 месяцев к концу периода
@@ -6192,13 +6031,12 @@ def yearly_statistics(request):
         if young_stock_cutoff < year_start:
             young_stock_total = 0
         else:
-            young_stock_end = min(young_stock_cutoff, period_end)
-            young_stock_total = (
-                Maker.objects.filter(birth_date__gte=year_start, birth_date__lte=young_stock_end).count() +
-                Ram.objects.filter(birth_date__gte=year_start, birth_date__lte=young_stock_end).count() +
-                Ewe.objects.filter(birth_date__gte=year_start, birth_date__lte=young_stock_end).count() +
-                Sheep.objects.filter(birth_date__gte=year_start, birth_date__lte=young_stock_end).count()
+            # Граница всегда приходится на конец месяца — берём рождения по месяцам свёртки
+            young_stock_rows = get_month_rows(
+                iter_months(year_start, young_stock_cutoff.replace(day=1)),
+                metrics=(MonthlyStatistic.METRIC_BIRTHS,),
             )
+            young_stock_total = sum(row.count for row in young_stock_rows)
         
         return Response({
             'year': year,
@@ -6231,64 +6069,68 @@ def get_all_tags(request):
     """
     try:
         search = request.GET.get('search', '').strip()
+        limit = 100  # Ограничиваем до 100 результатов
 
-        def build_case_variants_q(field_name, value):
-            return _build_case_variants_filter(field_name, value)
-
+        # Сначала активные животные, затем архивные
         tags_data = []
-
-        animals_models = [
-            (Maker, 'Баран-Производитель'),
-            (Ram, 'Баранчик'),
-            (Ewe, 'Ярка'),
-            (Sheep, 'Овцематка'),
-        ]
-
-        # Сначала добавляем активных животных
-        for model, type_name in animals_models:
-            animals = model.objects.filter(is_archived=False).select_related('tag')
-            if search:
-                animals = animals.filter(build_case_variants_q('tag__tag_number', search))
-
-            for animal in animals:
-                if not animal.tag:
-                    continue
+        for is_archived in (False, True):
+            if len(tags_data) >= limit:
+                break
+            matches = search_animals(
+                search, archived=is_archived, match_rshn=False, limit=limit - len(tags_data)
+            )
+            for _type_key, type_name, animal in matches:
                 tag_number = animal.tag.tag_number or ''
-                if search and not _matches_multi_search(tag_number, search):
-                    continue
+                display_name = f'{type_name} {tag_number}'
                 tags_data.append({
                     'tag_number': tag_number,
                     'animal_type': type_name,
-                    'is_active': True,
-                    'display_name': f'{type_name} {tag_number}'
+                    'is_active': not is_archived,
+                    'display_name': f'{display_name} (архив)' if is_archived else display_name
                 })
 
-        # Затем добавляем архивных животных
-        for model, type_name in animals_models:
-            animals = model.objects.filter(is_archived=True).select_related('tag')
-            if search:
-                animals = animals.filter(build_case_variants_q('tag__tag_number', search))
+        return Response(tags_data)
 
-            for animal in animals:
-                if not animal.tag:
-                    continue
-                tag_number = animal.tag.tag_number or ''
-                if search and not _matches_multi_search(tag_number, search):
-                    continue
-                tags_data.append({
-                    'tag_number': tag_number,
-                    'animal_type': type_name,
-                    'is_active': False,
-                    'display_name': f'{type_name} {tag_number} (архив)'
-                })
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Сортируем: сначала активные, потом по номеру бирки
-        tags_data.sort(key=lambda x: (not x['is_active'], x['tag_number'].lower()))
 
-        return Response(tags_data[:100])  # Ограничиваем до 100 результатов
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def animal_autocomplete(request):
+    """
+    Автодополнение по номеру бирки и РСХН: q — строка поиска (несколько
+    значений через запятую), scope — active (по умолчанию), archived или all,
+    limit — до 100. Совпадения с начала номера идут первыми.
+    """
+    query = request.query_params.get('q', '').strip()
+    scope = request.query_params.get('scope', 'active')
+    if scope not in ('active', 'archived', 'all'):
+        return Response(
+            {'error': 'scope должен быть active, archived или all'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not query:
+        return Response({'results': []})
+    archived = {'active': False, 'archived': True, 'all': None}[scope]
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        limit = DEFAULT_SEARCH_LIMIT
 
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    results = []
+    for type_key, type_label, animal in search_animals(query, archived=archived, match_names=True, limit=limit):
+        results.append({
+            'tag_number': animal.tag.tag_number,
+            'animal_type': type_key,
+            'animal_type_label': type_label,
+            'rshn_tag': animal.rshn_tag,
+            'name': getattr(animal, 'name', None),
+            'is_active': not animal.is_archived,
+            'status': animal.animal_status.status_type if animal.animal_status else None,
+            'place': animal.place.sheepfold if animal.place else None,
+        })
+    return Response({'results': results})
 
 
 @api_view(['GET'])
@@ -6650,7 +6492,7 @@ def bulk_create_lambings(request):
         
         # Создаем лог создания окотов - отдельная запись для каждого окота
         if created_lambings:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -6664,7 +6506,7 @@ def bulk_create_lambings(request):
                 for lambing_info in created_lambings:
                     mother_tag = lambing_info['mother_tag']
                     
-                    UserActionLog.objects.create(
+                    log_user_action(
                         user=request.user,
                         action_type="Создание окота",
                         object_type="Окот",
@@ -6772,21 +6614,20 @@ def lambings_export_excel(request):
         )
         queryset = queryset.filter(father_filter)
 
-    lambings = list(queryset)
-    rows = []
-    for idx, lambing in enumerate(lambings, start=1):
-        mother_value = lambing.get_mother_tag() or '-'
-
-        father_value = '-'
-        father = lambing.get_father()
-        if father and father.tag:
-            if hasattr(father, 'name') and getattr(father, 'name', None):
-                father_value = f"{father.name}({father.tag.tag_number})"
-            else:
-                father_value = father.tag.tag_number
+    def iter_rows():
+        lambings = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        for idx, lambing in enumerate(lambings, start=1):
+            mother_value = lambing.get_mother_tag() or '-'
 
-        rows.append(
-            [
+            father_value = '-'
+            father = lambing.get_father()
+            if father and father.tag:
+                if hasattr(father, 'name') and getattr(father, 'name', None):
+                    father_value = f"{father.name}({father.tag.tag_number})"
+                else:
+                    father_value = father.tag.tag_number
+
+            yield [
                 idx,
                 mother_value,
                 father_value,
@@ -6796,9 +6637,8 @@ def lambings_export_excel(request):
                 lambing.note or '-',
                 'Активный' if lambing.is_active else 'Завершен',
             ]
-        )
 
-    return _build_excel_response(
+    return build_table_export_response(
         filename_prefix='lambings',
         sheet_title='Окоты',
         headers=[
@@ -6811,8 +6651,8 @@ def lambings_export_excel(request):
             'Примечание',
             'Статус',
         ],
-        rows=rows,
-        summary_lines=[f'Итого записей: {len(rows)}'],
+        rows=iter_rows(),
+        summary_lines=[f'Итого записей: {queryset.count()}'],
     )
 
 
@@ -6855,23 +6695,25 @@ def lambing_groups_export_excel(request):
             | _build_case_variants_q('ram__tag__tag_number', father_tag)
         )
 
-    rows = []
-    for idx, group in enumerate(queryset.distinct(), start=1):
-        mother_tags = []
-        for mother in group.get_mothers():
-            if mother.tag:
-                mother_tags.append(mother.tag.tag_number)
-
-        father_value = '-'
-        father = group.get_father()
-        if father and father.tag:
-            if hasattr(father, 'get_display_name'):
-                father_value = father.get_display_name()
-            else:
-                father_value = father.tag.tag_number
+    queryset = queryset.distinct()
 
-        rows.append(
-            [
+    def iter_rows():
+        groups = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        for idx, group in enumerate(groups, start=1):
+            mother_tags = []
+            for mother in group.get_mothers():
+                if mother.tag:
+                    mother_tags.append(mother.tag.tag_number)
+
+            father_value = '-'
+            father = group.get_father()
+            if father and father.tag:
+                if hasattr(father, 'get_display_name'):
+                    father_value = father.get_display_name()
+                else:
+                    father_value = father.tag.tag_number
+
+            yield [
                 idx,
                 '; '.join(mother_tags) if mother_tags else '-',
                 father_value,
@@ -6880,9 +6722,8 @@ def lambing_groups_export_excel(request):
                 group.note or '-',
                 'Активная' if group.is_active else 'Снята',
             ]
-        )
 
-    return _build_excel_response(
+    return build_table_export_response(
         filename_prefix='lambing_groups',
         sheet_title='Группы',
         headers=[
@@ -6894,8 +6735,8 @@ def lambing_groups_export_excel(request):
             'Примечание',
             'Статус',
         ],
-        rows=rows,
-        summary_lines=[f'Итого групп: {len(rows)}'],
+        rows=iter_rows(),
+        summary_lines=[f'Итого групп: {queryset.count()}'],
     )
 
 
@@ -6937,10 +6778,10 @@ def vet_list_export_excel(request):
     elif is_hidden == 'false':
         queryset = queryset.filter(is_hidden=False)
 
-    vet_records = list(queryset)
     if expiry_date_from or expiry_date_to:
-        filtered_records = []
-        for vet in vet_records:
+        # Дата окончания вычисляется в Python — отбираем записи заранее
+        vet_records = []
+        for vet in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
             expiry_date = vet.get_expiry_date()
             if expiry_date is None:
                 continue
@@ -6948,40 +6789,50 @@ def vet_list_export_excel(request):
                 continue
             if expiry_date_to and expiry_date > expiry_date_to:
                 continue
-            filtered_records.append(vet)
-        vet_records = filtered_records
-
-    rows = []
-    for idx, vet in enumerate(vet_records, start=1):
-        display_name = vet.tag.tag_number if vet.tag else '-'
-        if vet.tag and vet.tag.animal_type == 'Maker':
-            maker = Maker.objects.filter(tag=vet.tag).first()
-            if maker:
-                display_name = maker.get_display_name()
+            vet_records.append(vet)
+        records_count = len(vet_records)
+    else:
+        vet_records = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        records_count = queryset.count()
+
+    def iter_rows():
+        idx = 0
+        for chunk in iter_chunks(vet_records):
+            # Имена производителей — одним запросом на часть записей
+            maker_tag_ids = {vet.tag_id for vet in chunk if vet.tag and vet.tag.animal_type == 'Maker'}
+            makers = {
+                maker.tag_id: maker
+                for maker in Maker.objects.filter(tag_id__in=maker_tag_ids).select_related('tag')
+            } if maker_tag_ids else {}
+
+            for vet in chunk:
+                idx += 1
+                display_name = vet.tag.tag_number if vet.tag else '-'
+                maker = makers.get(vet.tag_id)
+                if maker:
+                    display_name = maker.get_display_name()
 
-        care_date_value = vet.get_care_date()
-        expiry_date = vet.get_expiry_date()
-        duration_text = 'Бессрочно' if vet.duration_days == 0 else f'{vet.duration_days} дней'
+                care_date_value = vet.get_care_date()
+                expiry_date = vet.get_expiry_date()
+                duration_text = 'Бессрочно' if vet.duration_days == 0 else f'{vet.duration_days} дней'
 
-        rows.append(
-            [
-                idx,
-                display_name,
-                vet.veterinary_care.care_name if vet.veterinary_care else 'Не указано',
-                (
-                    vet.veterinary_care.medication
-                    if vet.veterinary_care and vet.veterinary_care.medication
-                    else 'Не указан'
-                ),
-                duration_text,
-                _format_date_for_excel(care_date_value),
-                _format_date_for_excel(expiry_date) if expiry_date else 'Бессрочно',
-                vet.comments or 'Нет комментария',
-                'Да' if vet.is_hidden else 'Нет',
-            ]
-        )
+                yield [
+                    idx,
+                    display_name,
+                    vet.veterinary_care.care_name if vet.veterinary_care else 'Не указано',
+                    (
+                        vet.veterinary_care.medication
+                        if vet.veterinary_care and vet.veterinary_care.medication
+                        else 'Не указан'
+                    ),
+                    duration_text,
+                    _format_date_for_excel(care_date_value),
+                    _format_date_for_excel(expiry_date) if expiry_date else 'Бессрочно',
+                    vet.comments or 'Нет комментария',
+                    'Да' if vet.is_hidden else 'Нет',
+                ]
 
-    return _build_excel_response(
+    return build_table_export_response(
         filename_prefix='vet_list',
         sheet_title='Ветобработки',
         headers=[
@@ -6995,8 +6846,8 @@ def vet_list_export_excel(request):
             'Примечание',
             'Завершена',
         ],
-        rows=rows,
-        summary_lines=[f'Итого записей: {len(rows)}'],
+        rows=iter_rows(),
+        summary_lines=[f'Итого записей: {records_count}'],
     )
 
 
@@ -7005,11 +6856,7 @@ def vet_list_export_excel(request):
 def archive_export_excel(request):
     archive_viewset = ArchiveViewSet()
     archive_viewset.request = request
-    queryset = archive_viewset.get_queryset()
-    if not isinstance(queryset, list):
-        queryset = list(queryset)
-
-    serialized = ArchiveAnimalSerializer(queryset, many=True).data
+    archive_queryset = archive_viewset.get_queryset()
     is_lamb_archive = request.query_params.get("type") == "Lamb"
     animal_type_labels = {
         "Maker": "Баран-Производитель",
@@ -7034,32 +6881,40 @@ def archive_export_excel(request):
         "Вес туши",
     ])
 
-    rows = []
-    for idx, animal in enumerate(serialized, start=1):
-        row = [
-            idx,
-            animal_type_labels.get(animal.get("animal_type"), animal.get("animal_type") or "-"),
-            animal.get("display_name") or animal.get("tag_number") or "-",
-            animal.get("status") or "-",
-        ]
-        if is_lamb_archive:
-            row.append(animal.get("mother_tag") or "-")
-
-        row.extend([
-            _format_date_for_excel(animal.get("archived_date")),
-            animal.get("age") or "-",
-            animal.get("place") or "-",
-            animal.get("last_live_weight") or "-",
-            animal.get("carcass_weight") or "-",
-        ])
-        rows.append(row)
-
-    return _build_excel_response(
+    def iter_serialized():
+        # Животные и данные сериализатора загружаются частями по строкам архива
+        for chunk in iter_chunks(archive_queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)):
+            animals = load_archive_animals(chunk)
+            yield from ArchiveAnimalSerializer(
+                animals, many=True, context=build_archive_serializer_context(animals)
+            ).data
+
+    def iter_rows():
+        for idx, animal in enumerate(iter_serialized(), start=1):
+            row = [
+                idx,
+                animal_type_labels.get(animal.get("animal_type"), animal.get("animal_type") or "-"),
+                animal.get("display_name") or animal.get("tag_number") or "-",
+                animal.get("status") or "-",
+            ]
+            if is_lamb_archive:
+                row.append(animal.get("mother_tag") or "-")
+
+            row.extend([
+                _format_date_for_excel(animal.get("archived_date")),
+                animal.get("age") or "-",
+                animal.get("place") or "-",
+                animal.get("last_live_weight") or "-",
+                animal.get("carcass_weight") or "-",
+            ])
+            yield row
+
+    return build_table_export_response(
         filename_prefix="archive",
         sheet_title="Архив",
         headers=headers,
-        rows=rows,
-        summary_lines=[f"Итого записей: {len(rows)}"],
+        rows=iter_rows(),
+        summary_lines=[f"Итого записей: {archive_queryset.count()}"],
     )
 
 
@@ -7197,6 +7052,36 @@ def manual_transfer_act_download(request):
         return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["GET", "POST"])
+@permission_classes([AllowAny])
+def bulk_acts_download(request):
+    """
+    Скачивает пакет актов выбытия или перевода одним ZIP или одной книгой
+    (лист на акт). Параметры — в теле POST или в строке запроса GET.
+    """
+    source = request.data if request.method == "POST" else request.GET
+    params = {
+        key: source.get(key)
+        for key in (
+            "kind",
+            "output",
+            "tag_numbers",
+            "act_numbers",
+            "date_from",
+            "date_to",
+            "transfer_date",
+            "month",
+            "year",
+        )
+    }
+    try:
+        return build_bulk_acts_export(params, user=request.user).response()
+    except ExportRequestError as exc:
+        return Response({"error": exc.message}, status=exc.status_code)
+    except FileNotFoundError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def monthly_breeding_act_download(request):
@@ -7508,16 +7393,11 @@ def _calculate_age_days_at_date(birth_date, target_date):
     return f"{days} сут."
 
 
-def _format_otbivka_weight(animal):
-    weight_record = _get_weight_record_near_date(animal.tag, animal.date_otbivka, delta_days=5)
+def _format_otbivka_weight(animal, near_weights=None):
+    weight_record = _get_prefetched_weight_near_date(animal, animal.date_otbivka, near_weights)
     return _format_weight_kg_fixed(weight_record.weight) if weight_record else "-"
 
 
-def _get_weight_value_near_date(tag, target_date, delta_days=5):
-    weight_record = _get_weight_record_near_date(tag, target_date, delta_days=delta_days)
-    return weight_record.weight if weight_record else None
-
-
 def _calculate_age_days_number(birth_date, target_date):
     if not birth_date or not target_date:
         return None
@@ -7585,7 +7465,7 @@ def otbivka_api(request):
             'animal_type': 'maker',
             'birth_date': maker.birth_date,
             'age_at_otbivka': _calculate_age_days_at_date(maker.birth_date, maker.date_otbivka),
-            'weaning_weight': _format_otbivka_weight(maker),
+            'animal': maker,
         })
     
     # Rams
@@ -7603,7 +7483,7 @@ def otbivka_api(request):
             'animal_type': 'ram',
             'birth_date': ram.birth_date,
             'age_at_otbivka': _calculate_age_days_at_date(ram.birth_date, ram.date_otbivka),
-            'weaning_weight': _format_otbivka_weight(ram),
+            'animal': ram,
         })
     
     # Ewes
@@ -7621,7 +7501,7 @@ def otbivka_api(request):
             'animal_type': 'ewe',
             'birth_date': ewe.birth_date,
             'age_at_otbivka': _calculate_age_days_at_date(ewe.birth_date, ewe.date_otbivka),
-            'weaning_weight': _format_otbivka_weight(ewe),
+            'animal': ewe,
         })
     
     # Sheeps
@@ -7639,7 +7519,7 @@ def otbivka_api(request):
             'animal_type': 'sheep',
             'birth_date': sheep.birth_date,
             'age_at_otbivka': _calculate_age_days_at_date(sheep.birth_date, sheep.date_otbivka),
-            'weaning_weight': _format_otbivka_weight(sheep),
+            'animal': sheep,
         })
     
     # Фильтрация по поиску (по номеру бирки)
@@ -7656,6 +7536,11 @@ def otbivka_api(request):
     paginator = Paginator(animals, page_size)
     page_obj = paginator.get_page(page)
     
+    # Вес на отбивке считаем только для строк страницы, одним запросом
+    near_weights = get_weight_records_near_dates(
+        (item['animal'].tag_id, item['date_otbivka']) for item in page_obj
+    )
+
     # Форматируем данные для JSON
     results = []
     for animal in page_obj:
@@ -7665,7 +7550,7 @@ def otbivka_api(request):
             'display_name': animal['display_name'],  # Добавляем display_name
             'animal_type': animal['animal_type'],
             'age_at_otbivka': animal['age_at_otbivka'],
-            'weaning_weight': animal['weaning_weight'],
+            'weaning_weight': _format_otbivka_weight(animal['animal'], near_weights),
         })
     
     return JsonResponse({
@@ -7682,9 +7567,8 @@ def otbivka_api(request):
 @permission_classes([AllowAny])
 def otbivka_export_excel(request):
     try:
-        from openpyxl import Workbook
+        workbook = StreamingWorkbook()
         from openpyxl.styles import Alignment, Border, Font, Side
-        from openpyxl.utils import get_column_letter
     except ImportError:
         return Response(
             {'error': 'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.'},
@@ -7706,12 +7590,17 @@ def otbivka_export_excel(request):
         queryset = apply_date_filters(
             model.objects.filter(date_otbivka__isnull=False).select_related('tag', 'animal_status')
         )
+        animals = [
+            animal for animal in queryset
+            if not search_query
+            or _matches_multi_search(animal.tag.tag_number if animal.tag else '', search_query)
+        ]
+        near_weights = _prefetch_birth_and_weaning_weights(animals)
         rows = []
-        for animal in queryset:
+        for animal in animals:
             tag_number = animal.tag.tag_number if animal.tag else ''
-            if search_query and not _matches_multi_search(tag_number, search_query):
-                continue
-
+            birth_weight = _get_prefetched_weight_near_date(animal, animal.birth_date, near_weights)
+            weaning_weight = _get_prefetched_weight_near_date(animal, animal.date_otbivka, near_weights)
             rows.append(
                 {
                     'sheet_key': sheet_key,
@@ -7720,8 +7609,8 @@ def otbivka_export_excel(request):
                     'birth_date': animal.birth_date,
                     'date_otbivka': animal.date_otbivka,
                     'age_days': _calculate_age_days_number(animal.birth_date, animal.date_otbivka),
-                    'birth_weight': _get_weight_value_near_date(animal.tag, animal.birth_date, delta_days=5),
-                    'weaning_weight': _get_weight_value_near_date(animal.tag, animal.date_otbivka, delta_days=5),
+                    'birth_weight': birth_weight.weight if birth_weight else None,
+                    'weaning_weight': weaning_weight.weight if weaning_weight else None,
                     'father_tag': (animal.father or '').strip(),
                 }
             )
@@ -7735,9 +7624,6 @@ def otbivka_export_excel(request):
     )
     animals.sort(key=lambda item: (item['date_otbivka'], item['tag_number']), reverse=True)
 
-    workbook = Workbook()
-    workbook.remove(workbook.active)
-
     headers = [
         'Статус',
         'Инв. номер на правом ухе',
@@ -7754,8 +7640,10 @@ def otbivka_export_excel(request):
     column_widths = [14, 24, 24, 16, 18, 14, 14, 20, 20, 23, 28]
     thin_side = Side(style='thin', color='000000')
     cell_border = Border(left=thin_side, right=thin_side, top=thin_side, bottom=thin_side)
-    header_font = Font(bold=True)
     center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    header_style = {'font': Font(bold=True), 'alignment': center_alignment, 'border': cell_border}
+    cell_style = {'alignment': center_alignment, 'border': cell_border}
+    column_formats = {6: 'dd.mm.yyyy', 7: 'dd.mm.yyyy', 9: '0.0', 10: '0.0'}
 
     def normalize_number(value):
         if value is None:
@@ -7775,19 +7663,9 @@ def otbivka_export_excel(request):
         return sum(clean_values)
 
     def write_sheet(sheet_title, sheet_key):
-        worksheet = workbook.create_sheet(sheet_title)
-        worksheet.append(headers)
-        for column_index, width in enumerate(column_widths, start=1):
-            worksheet.column_dimensions[get_column_letter(column_index)].width = width
-
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = cell_border
-
         sheet_animals = [animal for animal in animals if animal['sheet_key'] == sheet_key]
-        for animal in sheet_animals:
-            worksheet.append([
+        rows = (
+            [
                 animal['status'],
                 animal['tag_number'],
                 '',
@@ -7799,61 +7677,35 @@ def otbivka_export_excel(request):
                 normalize_number(animal['birth_weight']),
                 normalize_number(animal['weaning_weight']),
                 animal['father_tag'],
-            ])
-
-        last_data_row = worksheet.max_row
-        worksheet.append([''] * len(headers))
-        total_row = worksheet.max_row + 1
-        worksheet.cell(row=total_row, column=7, value=len(sheet_animals))
-        worksheet.cell(
-            row=total_row,
-            column=8,
-            value=sum_or_blank(animal['age_days'] for animal in sheet_animals),
-        )
-        worksheet.cell(
-            row=total_row,
-            column=9,
-            value=sum_or_blank(normalize_number(animal['birth_weight']) for animal in sheet_animals),
+            ]
+            for animal in sheet_animals
         )
-        worksheet.cell(
-            row=total_row,
-            column=10,
-            value=sum_or_blank(normalize_number(animal['weaning_weight']) for animal in sheet_animals),
+        blank_row = [''] * len(headers)
+        total_row = [None] * len(headers)
+        total_row[6] = len(sheet_animals)
+        total_row[7] = sum_or_blank(animal['age_days'] for animal in sheet_animals)
+        total_row[8] = sum_or_blank(normalize_number(animal['birth_weight']) for animal in sheet_animals)
+        total_row[9] = sum_or_blank(normalize_number(animal['weaning_weight']) for animal in sheet_animals)
+        daily_gain_row = [None] * len(headers)
+        daily_gain_row[6] = 'с/сут'
+
+        workbook.add_table(
+            sheet_title,
+            headers,
+            rows,
+            column_widths=column_widths,
+            header_style=header_style,
+            cell_style=cell_style,
+            column_formats=column_formats,
+            footer_rows=[blank_row, total_row, blank_row, daily_gain_row],
+            freeze_header=True,
         )
-        worksheet.append([''] * len(headers))
-        daily_gain_row = worksheet.max_row + 1
-        worksheet.cell(row=daily_gain_row, column=7, value='с/сут')
-
-        for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row, max_col=len(headers)):
-            for cell in row:
-                cell.alignment = center_alignment
-                cell.border = cell_border
-
-        for row in range(2, last_data_row + 1):
-            worksheet.cell(row=row, column=6).number_format = 'dd.mm.yyyy'
-            worksheet.cell(row=row, column=7).number_format = 'dd.mm.yyyy'
-            worksheet.cell(row=row, column=9).number_format = '0.0'
-            worksheet.cell(row=row, column=10).number_format = '0.0'
-
-        worksheet.freeze_panes = 'A2'
 
     write_sheet('баранчики', 'male')
     write_sheet('ярки', 'female')
 
-    import io
+    return workbook.response(export_filename('otbivka', 'xlsx'))
 
-    output = io.BytesIO()
-    workbook.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = (
-        f'attachment; filename="otbivka_{datetime.now().strftime("%Y-%m-%d")}.xlsx"'
-    )
-    return response
 
 def calculate_age_at_date(birth_date, target_date):
     """
@@ -7908,9 +7760,9 @@ def check_kinship(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4):
+def _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4, resolver=None):
     # Проверяем прямое родство (отец-ребенок или мать-ребенок)
-    direct_kinship = check_direct_kinship(father_tag, mother_tag)
+    direct_kinship = check_direct_kinship(father_tag, mother_tag, resolver=resolver)
     if direct_kinship:
         return {
             'has_kinship': True,
@@ -7920,19 +7772,16 @@ def _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4):
             'warning': True
         }
 
-    # Строим родословные деревья для обоих животных
-    father_ancestors = build_genealogy_tree(father_tag, max_generations=max_generations)
-    mother_ancestors = build_genealogy_tree(mother_tag, max_generations=max_generations)
-
-    # Ищем общих предков
-    common_ancestors = find_common_ancestors(father_ancestors, mother_ancestors)
+    # Ищем общих предков по индексу родословной
+    pedigree = get_pedigree_graph()
+    common_ancestors = pedigree.common_ancestors(father_tag, mother_tag, max_generations=max_generations)
 
     if common_ancestors:
         # Создаем ссылки для общих предков
         ancestor_links = []
         ancestor_display_names = []
         for ancestor_tag in common_ancestors:
-            animal = find_animal_by_tag(ancestor_tag)
+            animal = find_animal_by_tag(ancestor_tag, resolver=resolver)
             if animal:
                 animal_type = animal.get_animal_type().lower()
                 url = f"/animals/{animal_type}/{ancestor_tag}/info/"
@@ -7953,6 +7802,9 @@ def _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4):
             'message': f'Обнаружены общие предки до {max_generations}-го колена: {", ".join(ancestor_display_names)}',
             'message_with_links': f'Обнаружены общие предки до {max_generations}-го колена: {", ".join(ancestor_links)}',
             'common_ancestors': common_ancestors,
+            'inbreeding_coefficient': round(
+                pedigree.coancestry(father_tag, mother_tag, max_generations=max_generations), 4
+            ),
             'warning': True
         }
 
@@ -7965,23 +7817,19 @@ def _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4):
     }
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def kinship_pairs_export_excel(request):
-    father_tag = (request.data.get('father_tag') or '').strip()
-    mother_tags_raw = request.data.get('mother_tags', [])
+def build_kinship_pairs_export(params, progress=None):
+    """
+    Выгрузка подбора пар по родству (синхронно и в фоновой задаче "kinship_pairs"):
+    params — father_tag и список mother_tags.
+    """
+    father_tag = (params.get('father_tag') or '').strip()
+    mother_tags_raw = params.get('mother_tags', [])
 
     if not father_tag:
-        return Response(
-            {'error': 'Не указана бирка барана-производителя/баранчика'},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        raise ExportRequestError('Не указана бирка барана-производителя/баранчика')
 
     if not isinstance(mother_tags_raw, list):
-        return Response(
-            {'error': 'Список матерей должен быть массивом'},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        raise ExportRequestError('Список матерей должен быть массивом')
 
     mother_tags = []
     seen = set()
@@ -7992,12 +7840,11 @@ def kinship_pairs_export_excel(request):
             mother_tags.append(tag)
 
     if not mother_tags:
-        return Response(
-            {'error': 'Не выбраны овцематки/ярки для экспорта'},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+        raise ExportRequestError('Не выбраны овцематки/ярки для экспорта')
 
-    father_animal = find_animal_by_tag(father_tag)
+    # Предки и родители повторяются между парами — запоминаем найденных животных
+    resolver = TagResolver()
+    father_animal = find_animal_by_tag(father_tag, resolver=resolver)
     father_display = father_tag
     if father_animal and hasattr(father_animal, 'get_display_name'):
         father_display = father_animal.get_display_name()
@@ -8005,13 +7852,10 @@ def kinship_pairs_export_excel(request):
     selected_rows = []
     problem_rows = []
 
-    for mother_tag in mother_tags:
-        result = _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4)
-
-        mother_animal = find_animal_by_tag(mother_tag)
+    for mother_tag in iter_with_progress(mother_tags, progress, total=len(mother_tags), step=20):
+        result = _evaluate_kinship_pair(father_tag, mother_tag, max_generations=4, resolver=resolver)
+        # Поиск матери идет по точному номеру бирки, поэтому отображаем его как есть
         mother_display = mother_tag
-        if mother_animal and mother_animal.tag:
-            mother_display = mother_animal.tag.tag_number
 
         if result.get('has_kinship'):
             problem_rows.append([father_display, mother_display, result.get('message') or 'Есть родство'])
@@ -8019,54 +7863,33 @@ def kinship_pairs_export_excel(request):
             selected_rows.append([father_display, mother_display])
 
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
+        workbook = StreamingWorkbook()
+        from openpyxl.styles import Alignment
     except ImportError:
-        return Response(
-            {'error': 'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        raise ExportRequestError(
+            'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.',
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
-    workbook = Workbook()
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
+    cell_style = {'alignment': Alignment(vertical="top", wrap_text=True)}
 
-    def fill_sheet(worksheet, headers, rows, summary_lines):
-        row_index = 1
-        for line in summary_lines:
-            worksheet.cell(row=row_index, column=1, value=line)
-            row_index += 1
-        row_index += 1
+    def fill_sheet(title, headers, rows, summary_lines):
+        # Строки итогов тоже учитываются в ширине первой колонки
+        column_widths = estimate_column_widths(
+            headers, [[line] for line in summary_lines] + rows, max_width=80
+        )
+        workbook.add_table(
+            title,
+            headers,
+            rows,
+            summary_lines=summary_lines,
+            column_widths=column_widths,
+            cell_style=cell_style,
+            empty_text="Нет записей",
+        )
 
-        for col_index, header in enumerate(headers, start=1):
-            cell = worksheet.cell(row=row_index, column=col_index, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        data_start_row = row_index + 1
-        if rows:
-            for data_row_idx, data_row in enumerate(rows, start=data_start_row):
-                for col_index, value in enumerate(data_row, start=1):
-                    data_cell = worksheet.cell(row=data_row_idx, column=col_index, value=value)
-                    data_cell.alignment = Alignment(vertical="top", wrap_text=True)
-        else:
-            empty_cell = worksheet.cell(row=data_start_row, column=1, value="Нет записей")
-            empty_cell.alignment = Alignment(vertical="top")
-
-        for col_index in range(1, len(headers) + 1):
-            max_length = len(str(headers[col_index - 1]))
-            for current_row in range(1, worksheet.max_row + 1):
-                cell_value = worksheet.cell(row=current_row, column=col_index).value
-                if cell_value is not None:
-                    max_length = max(max_length, len(str(cell_value)))
-            worksheet.column_dimensions[get_column_letter(col_index)].width = min(max_length + 2, 80)
-
-    selected_sheet = workbook.active
-    selected_sheet.title = "Подобранные"
     fill_sheet(
-        selected_sheet,
+        "Подобранные",
         ["Баран-Производитель/баранчик", "Мать"],
         selected_rows,
         [
@@ -8076,9 +7899,8 @@ def kinship_pairs_export_excel(request):
         ],
     )
 
-    problem_sheet = workbook.create_sheet(title="Проблемные")
     fill_sheet(
-        problem_sheet,
+        "Проблемные",
         ["Баран-Производитель/баранчик", "Мать", "Комментарий"],
         problem_rows,
         [
@@ -8088,31 +7910,270 @@ def kinship_pairs_export_excel(request):
         ],
     )
 
+    return workbook.result(export_filename("kinship_pairs", "xlsx"))
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def kinship_pairs_export_excel(request):
+    try:
+        return build_kinship_pairs_export(request.data).response()
+    except ExportRequestError as exc:
+        return Response({'error': exc.message}, status=exc.status_code)
+
+
+KINSHIP_MATRIX_MAX_PAIRS = 20000
+KINSHIP_DIRECT_RELATION_LABELS = {
+    "father_is_parent": "баран является родителем матери",
+    "mother_is_parent": "мать является родителем барана",
+}
+
+
+def _parse_kinship_tag_list(raw_value):
+    """Список бирок из массива или строки через запятую, без пустых и дублей."""
+    if raw_value is None:
+        return []
+    if isinstance(raw_value, str):
+        raw_items = raw_value.split(",")
+    elif isinstance(raw_value, (list, tuple)):
+        raw_items = raw_value
+    else:
+        raise ValueError("Список бирок должен быть массивом или строкой через запятую")
+
+    tags = []
+    seen = set()
+    for raw_tag in raw_items:
+        tag = (str(raw_tag) if raw_tag is not None else "").strip()
+        if tag and tag not in seen:
+            seen.add(tag)
+            tags.append(tag)
+    return tags
+
+
+def _get_kinship_matrix_params(data):
+    """
+    Разбирает параметры матрицы родства: father_tag/father_tags, mother_tags
+    или lambing_group_id (отец и матери берутся из группы случки).
+    Возвращает (father_tags, mother_tags, max_generations).
+    """
+    max_generations = _parse_int_param(data.get("max_generations", 4), 1, 8)
+    if max_generations is None:
+        raise ValueError("max_generations должен быть числом от 1 до 8")
+
+    group_id = data.get("lambing_group_id")
+    if group_id:
+        group = (
+            LambingGroup.objects.select_related("maker__tag", "ram__tag")
+            .prefetch_related("sheep__tag", "ewes__tag")
+            .filter(pk=group_id)
+            .first()
+        )
+        if not group:
+            raise ValueError("Группа случки не найдена")
+        father_tags = [group.get_father_tag()] if group.get_father_tag() else []
+        mother_tags = [mother.tag.tag_number for mother in group.get_mothers() if mother.tag]
+    else:
+        father_tags = _parse_kinship_tag_list(data.get("father_tags"))
+        single_father = (data.get("father_tag") or "").strip()
+        if single_father and single_father not in father_tags:
+            father_tags.insert(0, single_father)
+        mother_tags = _parse_kinship_tag_list(data.get("mother_tags"))
+
+    if not father_tags:
+        raise ValueError("Не указаны бирки баранов-производителей/баранчиков")
+    if not mother_tags:
+        raise ValueError("Не указаны бирки овцематок/ярок")
+    if len(father_tags) * len(mother_tags) > KINSHIP_MATRIX_MAX_PAIRS:
+        raise ValueError(f"Слишком много пар для одной проверки (максимум {KINSHIP_MATRIX_MAX_PAIRS})")
+    return father_tags, mother_tags, max_generations
+
+
+def _get_father_display_names(father_tags):
+    names = dict(
+        Maker.objects.filter(tag__tag_number__in=father_tags)
+        .exclude(name__isnull=True)
+        .exclude(name="")
+        .values_list("tag__tag_number", "name")
+    )
+    return {tag: f"{names[tag]}({tag})" if tag in names else tag for tag in father_tags}
+
+
+def _describe_kinship_cell(cell, max_generations):
+    if cell["direct_relation"]:
+        return f"Прямое родство: {KINSHIP_DIRECT_RELATION_LABELS[cell['direct_relation']]}"
+    if cell["common_ancestors"]:
+        return f"Общие предки до {max_generations}-го колена: {', '.join(cell['common_ancestors'])}"
+    return ""
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def kinship_matrix_api(request):
+    """
+    Матрица родства для отцов × матерей за один запрос.
+    Принимает father_tag или father_tags, mother_tags (массив или строка через запятую)
+    либо lambing_group_id; опционально max_generations (по умолчанию 4).
+    """
+    try:
+        father_tags, mother_tags, max_generations = _get_kinship_matrix_params(request.data)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    matrix = get_pedigree_graph().kinship_matrix(father_tags, mother_tags, max_generations=max_generations)
+    father_names = _get_father_display_names(father_tags)
+
+    rows = []
+    problem_pairs = 0
+    for father_tag, cells in zip(father_tags, matrix):
+        row_cells = []
+        for cell in cells:
+            if cell["has_kinship"]:
+                problem_pairs += 1
+            row_cells.append(
+                {
+                    **cell,
+                    "coefficient": round(cell["coefficient"], 4),
+                    "message": _describe_kinship_cell(cell, max_generations),
+                }
+            )
+        rows.append(
+            {
+                "father_tag": father_tag,
+                "father_display": father_names[father_tag],
+                "cells": row_cells,
+            }
+        )
+
+    return Response(
+        {
+            "max_generations": max_generations,
+            "fathers": father_tags,
+            "mothers": mother_tags,
+            "matrix": rows,
+            "problem_pairs": problem_pairs,
+        }
+    )
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def kinship_matrix_export_excel(request):
+    """Экспорт матрицы родства (коэффициенты в %) и списка проблемных пар в XLSX."""
+    try:
+        father_tags, mother_tags, max_generations = _get_kinship_matrix_params(request.data)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, Alignment, PatternFill
+        from openpyxl.utils import get_column_letter
+    except ImportError:
+        return Response(
+            {'error': 'Библиотека openpyxl не установлена. Экспорт XLSX недоступен.'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    matrix = get_pedigree_graph().kinship_matrix(father_tags, mother_tags, max_generations=max_generations)
+    father_names = _get_father_display_names(father_tags)
+
+    workbook = Workbook()
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    problem_fill = PatternFill(start_color="F8CBAD", end_color="F8CBAD", fill_type="solid")
+
+    matrix_sheet = workbook.active
+    matrix_sheet.title = "Матрица"
+    matrix_sheet.cell(row=1, column=1, value=f"Коэффициент родства (%), учитывается до {max_generations}-го колена")
+    header_row = 3
+    corner_cell = matrix_sheet.cell(row=header_row, column=1, value="Баран / Мать")
+    corner_cell.fill = header_fill
+    corner_cell.font = header_font
+    for col_index, mother_tag in enumerate(mother_tags, start=2):
+        cell = matrix_sheet.cell(row=header_row, column=col_index, value=mother_tag)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    problem_rows = []
+    for row_index, (father_tag, cells) in enumerate(zip(father_tags, matrix), start=header_row + 1):
+        father_cell = matrix_sheet.cell(row=row_index, column=1, value=father_names[father_tag])
+        father_cell.font = Font(bold=True)
+        for col_index, cell_data in enumerate(cells, start=2):
+            cell = matrix_sheet.cell(
+                row=row_index,
+                column=col_index,
+                value=round(cell_data["coefficient"] * 100, 2),
+            )
+            cell.alignment = Alignment(horizontal="center")
+            if cell_data["has_kinship"]:
+                cell.fill = problem_fill
+                problem_rows.append(
+                    [
+                        father_names[father_tag],
+                        cell_data["mother_tag"],
+                        round(cell_data["coefficient"] * 100, 2),
+                        _describe_kinship_cell(cell_data, max_generations),
+                    ]
+                )
+
+    matrix_sheet.column_dimensions["A"].width = min(
+        max([len("Баран / Мать")] + [len(name) for name in father_names.values()]) + 2, 40
+    )
+    for col_index, mother_tag in enumerate(mother_tags, start=2):
+        matrix_sheet.column_dimensions[get_column_letter(col_index)].width = max(len(mother_tag) + 2, 8)
+    matrix_sheet.freeze_panes = matrix_sheet.cell(row=header_row + 1, column=2)
+
+    problem_sheet = workbook.create_sheet(title="Проблемные")
+    problem_headers = ["Баран-Производитель/баранчик", "Мать", "Коэффициент родства, %", "Комментарий"]
+    problem_sheet.cell(row=1, column=1, value=f"Проблемных пар: {len(problem_rows)}")
+    for col_index, header in enumerate(problem_headers, start=1):
+        cell = problem_sheet.cell(row=3, column=col_index, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    for row_index, row in enumerate(problem_rows, start=4):
+        for col_index, value in enumerate(row, start=1):
+            problem_sheet.cell(row=row_index, column=col_index, value=value).alignment = Alignment(
+                vertical="top", wrap_text=True
+            )
+    for col_index, width in enumerate((30, 16, 24, 80), start=1):
+        problem_sheet.column_dimensions[get_column_letter(col_index)].width = width
+
     response = HttpResponse(
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
     response["Content-Disposition"] = (
-        f'attachment; filename="kinship_pairs_{datetime.now().strftime("%Y-%m-%d")}.xlsx"'
+        f'attachment; filename="kinship_matrix_{datetime.now().strftime("%Y-%m-%d")}.xlsx"'
     )
     workbook.save(response)
     return response
 
 
-def check_direct_kinship(tag1, tag2):
+def check_direct_kinship(tag1, tag2, resolver=None):
     """
     Проверяет прямое родство между двумя животными (отец-ребенок или мать-ребенок).
     Возвращает словарь с описанием родства и ссылками или None, если прямого родства нет.
     """
     if not tag1 or not tag2:
         return None
+
+    # Быстрая проверка по индексу родословной: без прямого родства в БД не ходим
+    pedigree = get_pedigree_graph()
+    if not (
+        pedigree.has_animal(tag1)
+        and pedigree.has_animal(tag2)
+        and (pedigree.direct_relation(tag1, tag2) or pedigree.direct_relation(tag2, tag1))
+    ):
+        return None
     
     # Ищем первое животное
-    animal1 = find_animal_by_tag(tag1)
+    animal1 = find_animal_by_tag(tag1, resolver=resolver)
     if not animal1:
         return None
     
     # Ищем второе животное
-    animal2 = find_animal_by_tag(tag2)
+    animal2 = find_animal_by_tag(tag2, resolver=resolver)
     if not animal2:
         return None
     
@@ -8173,71 +8234,23 @@ def build_genealogy_tree(tag_number, max_generations=5):
     Строит дерево предков для животного до указанного количества поколений.
     Возвращает множество всех номеров бирок предков.
     """
-    ancestors = set()
-    current_generation = {tag_number}
-    
-    for generation in range(max_generations):
-        if not current_generation:
-            break
-            
-        next_generation = set()
-        
-        for animal_tag in current_generation:
-            # Ищем животное во всех типах
-            animal = find_animal_by_tag(animal_tag)
-            
-            if animal:
-                # Добавляем родителей в следующее поколение
-                if animal.mother and animal.mother.strip():
-                    mother_tag = animal.mother.strip()
-                    ancestors.add(mother_tag)
-                    next_generation.add(mother_tag)
-                    
-                if animal.father and animal.father.strip():
-                    father_tag = animal.father.strip()
-                    ancestors.add(father_tag)
-                    next_generation.add(father_tag)
-        
-        current_generation = next_generation
-    
-    return ancestors
+    if not tag_number or not tag_number.strip():
+        return set()
+    return get_pedigree_graph().ancestors(tag_number, max_generations=max_generations)
 
 
-def find_animal_by_tag(tag_number):
+def find_animal_by_tag(tag_number, resolver=None):
     """
     Ищет животное по номеру бирки во всех типах животных.
-    Возвращает первое найденное животное или None.
+    Тип берётся из Tag.animal_type, поэтому запрос выполняется к одной таблице.
+    Возвращает найденное животное или None.
     """
     if not tag_number or not tag_number.strip():
         return None
-        
-    tag_number = tag_number.strip()
-    
-    # Ищем в баранах-производителях
-    try:
-        return Maker.objects.get(tag__tag_number=tag_number)
-    except Maker.DoesNotExist:
-        pass
-    
-    # Ищем в баранчиках
-    try:
-        return Ram.objects.get(tag__tag_number=tag_number)
-    except Ram.DoesNotExist:
-        pass
-    
-    # Ищем в ярках
-    try:
-        return Ewe.objects.get(tag__tag_number=tag_number)
-    except Ewe.DoesNotExist:
-        pass
-    
-    # Ищем в овцематках
-    try:
-        return Sheep.objects.get(tag__tag_number=tag_number)
-    except Sheep.DoesNotExist:
-        pass
-    
-    return None
+
+    if resolver is not None:
+        return resolver.resolve(tag_number)
+    return resolve_animal_by_tag(tag_number)
 
 
 def find_common_ancestors(ancestors1, ancestors2):
@@ -8382,10 +8395,14 @@ def bulk_otbivka(request):
         updated_count = 0
         errors = []
         
+        # Загружаем всех выбранных животных пакетно
+        resolver = TagResolver()
+        resolver.prefetch(str(tag_number) for tag_number in animal_tags if tag_number)
+
         for tag_number in animal_tags:
             try:
                 # Ищем животное во всех типах
-                animal = find_animal_by_tag(tag_number)
+                animal = find_animal_by_tag(tag_number, resolver=resolver)
                 
                 if not animal:
                     errors.append(f'Животное с биркой {tag_number} не найдено')
@@ -8481,10 +8498,14 @@ def bulk_vaccination(request):
         errors = []
         successful_tags = []
         
+        # Загружаем всех выбранных животных пакетно
+        resolver = TagResolver()
+        resolver.prefetch(str(tag_number) for tag_number in animal_tags if tag_number)
+
         for tag_number in animal_tags:
             try:
                 # Ищем животное во всех типах
-                animal = find_animal_by_tag(tag_number)
+                animal = find_animal_by_tag(tag_number, resolver=resolver)
                 
                 if not animal:
                     errors.append(f'Животное с биркой {tag_number} не найдено')
@@ -8512,7 +8533,7 @@ def bulk_vaccination(request):
                 errors.append(f'Ошибка обработки животного {tag_number}: {str(e)}')
 
         if getattr(request, "user", None) and request.user.is_authenticated:
-            from .models_user_log import UserActionLog
+            from .action_log import log_user_action
 
             object_id = ", ".join(successful_tags[:8])
             if len(successful_tags) > 8:
@@ -8534,7 +8555,7 @@ def bulk_vaccination(request):
             if errors:
                 details_parts.append(f"Ошибки: {'; '.join(errors)}")
 
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Ковровая ветобработка",
                 object_type="Ветобработка",
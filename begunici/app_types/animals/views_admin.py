@@ -1,35 +1,84 @@
-from datetime import datetime
+import base64
+import binascii
+from datetime import datetime, time, timedelta
 
 import pytz
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
 
-from .log_utils import TAG_LINK_OBJECT_TYPES, normalize_log_for_display
+from .action_log_partitions import get_recent_logs_start
+from .log_links import attach_animal_types, build_animal_link_info
+from .log_utils import normalize_log_for_display
 from .models_user_log import UserActionLog
 
 
+LOGS_PAGE_SIZE = 50
+# Период ленты по умолчанию — последние месяцы (запрос затрагивает только их секции)
+DEFAULT_LOGS_RECENT_MONTHS = 3
+
+
 def _has_admin_panel_access(user):
     return user.groups.filter(name__in=["Admin", "Main"]).exists()
 
 
 def _hide_technical_and_duplicate_logs(logs):
-    hidden_readonly_logs = (
-        Q(action_type__icontains="Предпросмотр акта")
-        | Q(description__icontains="/animals/api/archive/act-preview/")
-        | Q(additional_data__path="/animals/api/archive/act-preview/")
-        | Q(action_type__iexact="Проверка родства")
-        | Q(description__icontains="/animals/api/check-kinship/")
-        | Q(additional_data__path="/animals/api/check-kinship/")
-    )
-    successful_middleware_duplicates = Q(additional_data__status_code__lt=400) & (
-        Q(additional_data__path="/animals/lambing-group/")
-        | Q(additional_data__path__regex=r"^/animals/lambing-group/[0-9]+/remove-father/$")
-        | Q(additional_data__path__regex=r"^/animals/lambing/[0-9]+/(complete|complete-with-children|complete-early-failure)/$")
-    )
-    return logs.exclude(hidden_readonly_logs | successful_middleware_duplicates)
+    # Признак служебной записи вычисляется при записи лога (log_utils.is_technical_log)
+    return logs.filter(is_technical=False)
+
+
+def _encode_logs_cursor(log):
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_logs_cursor(cursor):
+    """(timestamp, id) из курсора или None, если курсор поврежден."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp_value, log_id = raw.rsplit("|", 1)
+        timestamp = datetime.fromisoformat(timestamp_value)
+        return timestamp, int(log_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def _paginate_logs(logs, cursor, direction):
+    """
+    Пагинация по ключу (timestamp, id) вместо OFFSET и COUNT по всей таблице.
+    Возвращает (записи страницы от новых к старым, has_next, has_previous).
+    """
+    position = _decode_logs_cursor(cursor) if cursor else None
+    if position is None:
+        page_logs = list(logs.order_by("-timestamp", "-id")[: LOGS_PAGE_SIZE + 1])
+        return page_logs[:LOGS_PAGE_SIZE], len(page_logs) > LOGS_PAGE_SIZE, False
+
+    timestamp, log_id = position
+    if direction == "prev":
+        newer = Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=log_id)
+        page_logs = list(logs.filter(newer).order_by("timestamp", "id")[: LOGS_PAGE_SIZE + 1])
+        if not page_logs:
+            # Записи за курсором исчезли (удаление, смена фильтра) — переходить некуда
+            return [], False, False
+        has_previous = len(page_logs) > LOGS_PAGE_SIZE
+        return list(reversed(page_logs[:LOGS_PAGE_SIZE])), True, has_previous
+
+    older = Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=log_id)
+    page_logs = list(logs.filter(older).order_by("-timestamp", "-id")[: LOGS_PAGE_SIZE + 1])
+    if not page_logs:
+        return [], False, False
+    return page_logs[:LOGS_PAGE_SIZE], len(page_logs) > LOGS_PAGE_SIZE, True
+
+
+def _resolve_page_animal_types(page_logs):
+    """
+    Типы животных для ссылок у записей без сохранённых типов (не удалось
+    определить при записи) — одним запросом на страницу, без сохранения.
+    """
+    attach_animal_types(page_logs)
 
 
 @login_required
@@ -52,12 +101,14 @@ def admin_logs_api(request):
         if not _has_admin_panel_access(request.user):
             return JsonResponse({"error": "Нет прав доступа"}, status=403)
 
-        page = int(request.GET.get("page", 1))
+        cursor = request.GET.get("cursor", "")
+        direction = request.GET.get("direction", "next")
         search = request.GET.get("search", "")
         user_filter = request.GET.get("user", "")
         date_filter = request.GET.get("date", "")
+        period = request.GET.get("period", "recent")
 
-        logs = UserActionLog.objects.select_related("user").order_by("-timestamp")
+        logs = UserActionLog.objects.select_related("user")
         logs = _hide_technical_and_duplicate_logs(logs)
 
         if search:
@@ -74,17 +125,27 @@ def admin_logs_api(request):
         if date_filter:
             try:
                 filter_date = datetime.strptime(date_filter, "%Y-%m-%d").date()
-                logs = logs.filter(timestamp__date=filter_date)
             except ValueError:
-                pass
-
-        paginator = Paginator(logs, 50)
-        page_obj = paginator.get_page(page)
+                filter_date = None
+            if filter_date:
+                # Диапазон по индексу вместо приведения timestamp к дате
+                day_start = timezone.make_aware(datetime.combine(filter_date, time.min))
+                logs = logs.filter(
+                    timestamp__gte=day_start,
+                    timestamp__lt=day_start + timedelta(days=1),
+                )
+        elif period != "all":
+            recent_months = getattr(settings, "ADMIN_LOGS_RECENT_MONTHS", DEFAULT_LOGS_RECENT_MONTHS)
+            logs = logs.filter(timestamp__gte=get_recent_logs_start(recent_months))
+
+        page_logs, has_next, has_previous = _paginate_logs(logs, cursor, direction)
+
+        _resolve_page_animal_types(page_logs)
 
         moscow_tz = pytz.timezone("Europe/Moscow")
         logs_data = []
 
-        for log in page_obj:
+        for log in page_logs:
             moscow_time = log.timestamp.astimezone(moscow_tz)
             display_data = normalize_log_for_display(log)
 
@@ -93,65 +154,7 @@ def admin_logs_api(request):
             display_object_id = display_data["object_id"]
             details_text = display_data["details"]
 
-            animal_link_info = None
-            should_build_animal_link = (
-                display_object_id
-                and display_object_type in TAG_LINK_OBJECT_TYPES
-                and (display_object_type != "Окот" or ", " in display_object_id)
-            )
-            if should_build_animal_link:
-                from begunici.app_types.animals.models import Ewe, Maker, Ram, Sheep
-
-                if ", " in display_object_id:
-                    tags = [tag.strip() for tag in display_object_id.split(", ")]
-                    if len(tags) == 2:
-                        animal_link_info = {"pair_tags": []}
-                        animal_types = [
-                            (Maker, "maker", "Баран-Производитель"),
-                            (Ram, "ram", "Баранчик"),
-                            (Ewe, "ewe", "Ярка"),
-                            (Sheep, "sheep", "Овцематка"),
-                        ]
-                        for tag in tags:
-                            tag_info = None
-                            for model_class, url_type, russian_name in animal_types:
-                                try:
-                                    if model_class.objects.filter(
-                                        tag__tag_number=tag
-                                    ).exists():
-                                        tag_info = {
-                                            "tag": tag,
-                                            "url_type": url_type,
-                                            "russian_name": russian_name,
-                                        }
-                                        break
-                                except Exception:
-                                    continue
-                            if tag_info:
-                                animal_link_info["pair_tags"].append(tag_info)
-                            else:
-                                animal_link_info["pair_tags"].append(
-                                    {"tag": tag, "url_type": None}
-                                )
-                else:
-                    animal_types = [
-                        (Maker, "maker", "Баран-Производитель"),
-                        (Ram, "ram", "Баранчик"),
-                        (Ewe, "ewe", "Ярка"),
-                        (Sheep, "sheep", "Овцематка"),
-                    ]
-                    for model_class, url_type, russian_name in animal_types:
-                        try:
-                            if model_class.objects.filter(
-                                tag__tag_number=display_object_id
-                            ).exists():
-                                animal_link_info = {
-                                    "url_type": url_type,
-                                    "russian_name": russian_name,
-                                }
-                                break
-                        except Exception:
-                            continue
+            animal_link_info = build_animal_link_info(display_data, log.animal_types)
 
             logs_data.append(
                 {
@@ -169,11 +172,10 @@ def admin_logs_api(request):
         return JsonResponse(
             {
                 "logs": logs_data,
-                "has_next": page_obj.has_next(),
-                "has_previous": page_obj.has_previous(),
-                "current_page": page,
-                "total_pages": paginator.num_pages,
-                "total_count": paginator.count,
+                "has_next": has_next,
+                "has_previous": has_previous,
+                "next_cursor": _encode_logs_cursor(page_logs[-1]) if page_logs and has_next else None,
+                "previous_cursor": _encode_logs_cursor(page_logs[0]) if page_logs and has_previous else None,
             }
         )
     except Exception as e:
@@ -26,7 +26,7 @@ class StatusSerializer(serializers.ModelSerializer):
         status = Status.objects.create(**validated_data)
         
         # Создаем подробный лог создания
-        from begunici.app_types.animals.models_user_log import UserActionLog
+        from begunici.app_types.animals.action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -35,7 +35,7 @@ class StatusSerializer(serializers.ModelSerializer):
         if request and not isinstance(request.user, AnonymousUser):
             moscow_tz = pytz.timezone('Europe/Moscow')
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Создание статуса",
                 object_type="Статус",
@@ -67,7 +67,7 @@ class StatusSerializer(serializers.ModelSerializer):
         
         # Создаем подробный лог изменений
         if changes:
-            from begunici.app_types.animals.models_user_log import UserActionLog
+            from begunici.app_types.animals.action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -77,7 +77,7 @@ class StatusSerializer(serializers.ModelSerializer):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Редактирование статуса",
                     object_type="Статус",
@@ -127,13 +127,13 @@ class PlaceSerializer(serializers.ModelSerializer):
         place = Place.objects.create(**validated_data)
         
         # Создаем подробный лог создания
-        from begunici.app_types.animals.models_user_log import UserActionLog
+        from begunici.app_types.animals.action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         
         # Получаем текущий запрос из контекста (если доступен)
         request = self.context.get('request')
         if request and not isinstance(request.user, AnonymousUser):
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Создание овчарни",
                 object_type="Овчарня",
@@ -159,7 +159,7 @@ class PlaceSerializer(serializers.ModelSerializer):
         
         # Создаем подробный лог изменений
         if changes:
-            from begunici.app_types.animals.models_user_log import UserActionLog
+            from begunici.app_types.animals.action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -169,7 +169,7 @@ class PlaceSerializer(serializers.ModelSerializer):
                 moscow_tz = pytz.timezone('Europe/Moscow')
                 
                 changes_text = "; ".join(changes)
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Редактирование овчарни",
                     object_type="Овчарня",
@@ -234,7 +234,7 @@ class VeterinaryCareSerializer(serializers.ModelSerializer):
         care = VeterinaryCare.objects.create(**validated_data)
         
         # Создаем подробный лог создания
-        from begunici.app_types.animals.models_user_log import UserActionLog
+        from begunici.app_types.animals.action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -263,7 +263,7 @@ class VeterinaryCareSerializer(serializers.ModelSerializer):
             details_text = "; ".join(details)
             care_name = f"{care.care_type} - {care.care_name}"
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Создание ветеринарной обработки",
                 object_type="Ветеринарная обработка",
@@ -327,7 +327,7 @@ class VeterinaryCareSerializer(serializers.ModelSerializer):
         
         # Создаем подробный лог изменений
         if changes:
-            from begunici.app_types.animals.models_user_log import UserActionLog
+            from begunici.app_types.animals.action_log import log_user_action
             from django.contrib.auth.models import AnonymousUser
             import pytz
             
@@ -339,7 +339,7 @@ class VeterinaryCareSerializer(serializers.ModelSerializer):
                 changes_text = "; ".join(changes)
                 care_name = f"{instance.care_type} - {instance.care_name}"
                 
-                UserActionLog.objects.create(
+                log_user_action(
                     user=request.user,
                     action_type="Редактирование ветеринарной обработки",
                     object_type="Ветеринарная обработка",
@@ -436,7 +436,7 @@ class VeterinarySerializer(serializers.ModelSerializer):
         veterinary = Veterinary.objects.create(**validated_data)
         
         # Создаем подробный лог создания
-        from begunici.app_types.animals.models_user_log import UserActionLog
+        from begunici.app_types.animals.action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -453,7 +453,7 @@ class VeterinarySerializer(serializers.ModelSerializer):
             if len(care_name) > 30:
                 care_name = care_name[:30] + "..."
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type="Добавление ветеринарной обработки",
                 object_type="Ветеринарная обработка",
@@ -508,7 +508,7 @@ class WeightRecordSerializer(serializers.ModelSerializer):
                 weight_record = WeightRecord.objects.create(**validated_data)
         
         # Создаем подробный лог создания или обновления.
-        from begunici.app_types.animals.models_user_log import UserActionLog
+        from begunici.app_types.animals.action_log import log_user_action
         from django.contrib.auth.models import AnonymousUser
         import pytz
         
@@ -532,7 +532,7 @@ class WeightRecordSerializer(serializers.ModelSerializer):
                     f"Дата: {date_str}; Бирка: {weight_record.tag.tag_number}"
                 )
             
-            UserActionLog.objects.create(
+            log_user_action(
                 user=request.user,
                 action_type=action_type,
                 object_type="Запись о весе",
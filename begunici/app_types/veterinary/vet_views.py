@@ -6,7 +6,6 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
-from django.http import HttpResponse
 from django.shortcuts import render
 from django.views.generic import TemplateView
 from rest_framework.exceptions import ValidationError
@@ -31,6 +30,12 @@ from .vet_serializers import (
     PlaceMovementSerializer,
 )
 from begunici.app_types.animals.models import ARCHIVE_STATUS_NAMES
+from begunici.app_types.animals.excel_export import (
+    EXPORT_CHUNK_SIZE,
+    StreamingWorkbook,
+    default_header_style,
+    export_filename,
+)
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import render
 from rest_framework.decorators import api_view
@@ -531,9 +536,7 @@ def get_all_veterinary_cares(request):
 @api_view(['GET'])
 def export_veterinary_cares_excel(request):
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
+        workbook = StreamingWorkbook()
     except ImportError:
         return Response(
             {"error": "Библиотека openpyxl не установлена. Экспорт XLSX недоступен."},
@@ -542,10 +545,6 @@ def export_veterinary_cares_excel(request):
 
     cares = VeterinaryCare.objects.all().order_by("id")
 
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Vet Cares"
-
     headers = [
         "№",
         "ID",
@@ -556,17 +555,8 @@ def export_veterinary_cares_excel(request):
         "Срок действия (дней)",
     ]
 
-    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-
-    for index, care in enumerate(cares, start=1):
-        row = [
+    rows = (
+        [
             index,
             care.id,
             care.care_type,
@@ -575,22 +565,8 @@ def export_veterinary_cares_excel(request):
             care.purpose or "",
             care.default_duration_days,
         ]
-        worksheet.append(row)
-
-    for column_cells in worksheet.columns:
-        max_length = 0
-        column_index = column_cells[0].column
-        for cell in column_cells:
-            value = "" if cell.value is None else str(cell.value)
-            if len(value) > max_length:
-                max_length = len(value)
-        worksheet.column_dimensions[get_column_letter(column_index)].width = min(max_length + 2, 60)
-
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        for index, care in enumerate(cares.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1)
     )
-    filename = f'veterinary_cares_{datetime.now().strftime("%Y-%m-%d")}.xlsx'
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    workbook.save(response)
-    return response
+    workbook.add_table("Vet Cares", headers, rows, header_style=default_header_style("1F4E78"))
+    return workbook.response(export_filename("veterinary_cares", "xlsx"))
 
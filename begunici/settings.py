@@ -179,3 +179,35 @@ REST_FRAMEWORK = {
     "SEARCH_PARAM": "search",
     "ORDERING_PARAM": "ordering",
 }
+
+# Журнал действий пользователей: записи сохраняются фоновым потоком пачками.
+# USER_ACTION_LOG_ASYNC=False возвращает синхронную запись в рамках запроса.
+USER_ACTION_LOG_ASYNC = config("USER_ACTION_LOG_ASYNC", default=True, cast=bool)
+USER_ACTION_LOG_BUFFER_SIZE = config("USER_ACTION_LOG_BUFFER_SIZE", default=10000, cast=int)
+USER_ACTION_LOG_BATCH_SIZE = config("USER_ACTION_LOG_BATCH_SIZE", default=200, cast=int)
+USER_ACTION_LOG_FLUSH_INTERVAL = config("USER_ACTION_LOG_FLUSH_INTERVAL", default=1.0, cast=float)
+# Срок хранения журнала в БД (месяцев, включая текущий): более старые месяцы
+# команда archive_action_logs выгружает в backups/action_logs и удаляет.
+USER_ACTION_LOG_RETENTION_MONTHS = config("USER_ACTION_LOG_RETENTION_MONTHS", default=12, cast=int)
+# Панель администратора по умолчанию показывает журнал за последние N месяцев.
+ADMIN_LOGS_RECENT_MONTHS = config("ADMIN_LOGS_RECENT_MONTHS", default=3, cast=int)
+
+# Фоновые выгрузки (команда run_export_jobs): каталог готовых файлов, число
+# потоков обработчика и срок хранения результатов.
+EXPORT_JOBS_DIR = config("EXPORT_JOBS_DIR", default=os.path.join(BASE_DIR, "exports"))
+EXPORT_JOBS_WORKERS = config("EXPORT_JOBS_WORKERS", default=2, cast=int)
+EXPORT_JOBS_RETENTION_DAYS = config("EXPORT_JOBS_RETENTION_DAYS", default=7, cast=int)
+
+# Пакетная печать актов: сколько актов формируется параллельно.
+ACTS_BULK_WORKERS = config("ACTS_BULK_WORKERS", default=4, cast=int)
+
+# Сервис весов: сколько дней хранятся ключи идемпотентности пакетных операций.
+SCALES_IDEMPOTENCY_RETENTION_DAYS = config("SCALES_IDEMPOTENCY_RETENTION_DAYS", default=30, cast=int)
+# Синхронизация терминалов весов: сколько дней хранится журнал изменений.
+# Терминал с более старым курсором получает полный снимок.
+SCALES_SYNC_RETENTION_DAYS = config("SCALES_SYNC_RETENTION_DAYS", default=30, cast=int)
+# Токены сервиса весов: сколько секунд проверенный токен хранится в памяти
+# процесса (за это время отзыв доходит до остальных процессов) и разрешён ли
+# ещё вход по логину и паролю (Basic) для терминалов без токена.
+SCALES_TOKEN_CACHE_SECONDS = config("SCALES_TOKEN_CACHE_SECONDS", default=60, cast=int)
+SCALES_BASIC_AUTH = config("SCALES_BASIC_AUTH", default=True, cast=bool)
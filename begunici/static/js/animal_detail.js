@@ -66,21 +66,6 @@ function getSelectedAnimalExportSections() {
     return Array.from(document.querySelectorAll('.animal-export-section:checked')).map((checkbox) => checkbox.value);
 }
 
-function resolveExportFilename(response, fallbackName) {
-    const contentDisposition = response.headers.get('Content-Disposition') || '';
-    const utf8Match = contentDisposition.match(/filename\*=UTF-8''([^;]+)/i);
-    if (utf8Match && utf8Match[1]) {
-        return decodeURIComponent(utf8Match[1]);
-    }
-
-    const plainMatch = contentDisposition.match(/filename="?([^"]+)"?/i);
-    if (plainMatch && plainMatch[1]) {
-        return plainMatch[1];
-    }
-
-    return fallbackName;
-}
-
 async function exportAnimalToExcel() {
     const animalDetail = document.getElementById('animal-detail');
     if (!animalDetail) {
@@ -96,45 +81,13 @@ async function exportAnimalToExcel() {
 
     const animalType = animalDetail.dataset.animalType;
     const tagNumber = animalDetail.dataset.tagNumber;
-    const exportUrl = `/animals/api/${animalType}/${encodeURIComponent(tagNumber)}/export-detail-excel/`;
 
     try {
-        const response = await fetch(exportUrl, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCSRFToken(),
-            },
-            body: JSON.stringify({ sections: selectedSections }),
+        await runExportJob('animal_detail', {
+            animal_type: animalType,
+            tag_number: tagNumber,
+            sections: selectedSections,
         });
-
-        if (!response.ok) {
-            let errorText = `Ошибка экспорта (${response.status})`;
-            try {
-                const errorData = await response.json();
-                errorText = errorData.error || errorData.detail || errorText;
-            } catch (_) {
-                const rawText = await response.text();
-                if (rawText) {
-                    errorText = rawText;
-                }
-            }
-            throw new Error(errorText);
-        }
-
-        const blob = await response.blob();
-        const fallbackName = `${animalType}_${tagNumber}.xlsx`;
-        const filename = resolveExportFilename(response, fallbackName);
-
-        const downloadUrl = window.URL.createObjectURL(blob);
-        const link = document.createElement('a');
-        link.href = downloadUrl;
-        link.download = filename;
-        document.body.appendChild(link);
-        link.click();
-        link.remove();
-        window.URL.revokeObjectURL(downloadUrl);
-
         closeAnimalExportModal();
     } catch (error) {
         console.error('Ошибка экспорта в Excel:', error);
@@ -50,6 +50,26 @@ function downloadArchiveAct(animalType, tagNumber) {
     document.body.removeChild(link);
 }
 
+function downloadArchiveActsBulk(output) {
+    const dateFrom = document.getElementById("archive-acts-date-from")?.value || "";
+    const dateTo = document.getElementById("archive-acts-date-to")?.value || "";
+    if (!dateFrom && !dateTo) {
+        alert("Укажите период архивирования");
+        return;
+    }
+
+    const params = new URLSearchParams({ kind: "archive", output });
+    if (dateFrom) params.set("date_from", dateFrom);
+    if (dateTo) params.set("date_to", dateTo);
+
+    const link = document.createElement("a");
+    link.href = `/animals/api/acts/bulk/?${params.toString()}`;
+    link.target = "_blank";
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
 function buildActionsCell(animal) {
     if (!animal.can_download_act) {
         return '<span class="text-muted">Акт недоступен</span>';
@@ -191,3 +211,4 @@ document.addEventListener("DOMContentLoaded", () => {
 
 window.performArchiveActsSearch = performArchiveActsSearch;
 window.downloadArchiveActFromActs = downloadArchiveAct;
+window.downloadArchiveActsBulk = downloadArchiveActsBulk;
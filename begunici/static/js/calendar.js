@@ -15,13 +15,7 @@ class LambingCalendar {
     
     init() {
         this.bindEvents();
-        // Загружаем данные параллельно
-        Promise.all([
-            this.loadLambingData(),
-            this.loadNotesData(),
-            this.loadVetData(),
-            this.loadWeighingData()
-        ]).then(() => {
+        this.loadMonthData().then(() => {
             // После загрузки всех данных рендерим календарь
             this.renderCalendar();
         }).catch(error => {
@@ -39,11 +33,7 @@ class LambingCalendar {
         if (prevBtn) {
             prevBtn.addEventListener('click', async () => {
                 this.currentDate.setMonth(this.currentDate.getMonth() - 1);
-                await Promise.all([
-                    this.loadNotesData(),
-                    this.loadVetData(),
-                    this.loadWeighingData()
-                ]);
+                await this.loadMonthData();
                 this.renderCalendar();
             });
         }
@@ -51,11 +41,7 @@ class LambingCalendar {
         if (nextBtn) {
             nextBtn.addEventListener('click', async () => {
                 this.currentDate.setMonth(this.currentDate.getMonth() + 1);
-                await Promise.all([
-                    this.loadNotesData(),
-                    this.loadVetData(),
-                    this.loadWeighingData()
-                ]);
+                await this.loadMonthData();
                 this.renderCalendar();
             });
         }
@@ -64,73 +50,29 @@ class LambingCalendar {
             // Обработчик для кнопки "Открыть полный календарь"
             fullCalendarBtn.addEventListener('click', async () => {
                 // Перезагружаем все данные
-                await Promise.all([
-                    this.loadLambingData(),
-                    this.loadNotesData(),
-                    this.loadVetData(),
-                    this.loadWeighingData()
-                ]);
+                await this.loadMonthData();
                 this.renderCalendar();
             });
         }
     }
     
-    async loadLambingData() {
-        try {
-            const response = await fetch('/animals/lambing/calendar/');
-            if (response.ok) {
-                this.lambingData = await response.json();
-            } else {
-                console.error('Ошибка загрузки данных календаря:', response.statusText);
-            }
-        } catch (error) {
-            console.error('Ошибка загрузки данных календаря:', error);
-        }
-    }
-    
-    async loadNotesData() {
+    async loadMonthData() {
+        // Окоты, заметки, ветобработки и взвешивания месяца — одним запросом
         try {
             const year = this.currentDate.getFullYear();
             const month = this.currentDate.getMonth() + 1;
-            const response = await fetch(`/animals/notes/calendar-data/?year=${year}&month=${month}`);
+            const response = await fetch(`/animals/notes/month-calendar-data/?year=${year}&month=${month}`);
             if (response.ok) {
-                this.notesData = await response.json();
+                const data = await response.json();
+                this.lambingData = data.lambings || {};
+                this.notesData = data.notes || {};
+                this.vetData = data.vet || {};
+                this.weighingData = data.weighings || {};
             } else {
-                console.error('Ошибка загрузки заметок календаря:', response.statusText);
-            }
-        } catch (error) {
-            console.error('Ошибка загрузки заметок календаря:', error);
-        }
-    }
-    
-    async loadVetData() {
-        try {
-            const year = this.currentDate.getFullYear();
-            const month = this.currentDate.getMonth() + 1;
-            const response = await fetch(`/animals/notes/vet-calendar-data/?year=${year}&month=${month}`);
-            if (response.ok) {
-                this.vetData = await response.json();
-            } else {
-                console.error('Ошибка загрузки ветеринарных данных календаря:', response.statusText);
-            }
-        } catch (error) {
-            console.error('Ошибка загрузки ветеринарных данных календаря:', error);
-        }
-    }
-    async loadWeighingData() {
-        try {
-            const year = this.currentDate.getFullYear();
-            const month = this.currentDate.getMonth() + 1;
-            const response = await fetch(`/animals/notes/weighing-calendar-data/?year=${year}&month=${month}`);
-            if (response.ok) {
-                this.weighingData = await response.json();
-            } else {
-                console.error('Ошибка загрузки данных взвешиваний календаря:', response.statusText);
-                this.weighingData = {};
+                console.error('Ошибка загрузки данных календаря:', response.statusText);
             }
         } catch (error) {
-            console.error('Ошибка загрузки данных взвешиваний календаря:', error);
-            this.weighingData = {};
+            console.error('Ошибка загрузки данных календаря:', error);
         }
     }
     
@@ -90,63 +90,36 @@ async function performExport(animalType) {
         }
     }
     
+    const exportButton = document.querySelector('#export-modal .btn-primary');
+    const originalText = exportButton ? exportButton.textContent : '';
+    if (exportButton) {
+        exportButton.disabled = true;
+    }
+
     try {
-        const csrfToken = getCSRFToken();
-        if (!csrfToken) {
-            throw new Error('CSRF токен не найден. Обновите страницу и попробуйте снова.');
-        }
-        
         console.log('Отправляем данные для экспорта:', data);
-        
-        const response = await fetch('/animals/api/export-excel/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': csrfToken
+
+        // Выгрузка выполняется в фоне, файл скачивается после готовности
+        const job = await runExportJob('herd', data, {
+            onProgress: (currentJob) => {
+                if (exportButton) {
+                    exportButton.textContent = formatExportJobProgress(currentJob);
+                }
             },
-            body: JSON.stringify(data)
         });
-        
-        if (!response.ok) {
-            const errorText = await response.text();
-            console.error('Ошибка сервера:', errorText);
-            throw new Error(`Ошибка сервера: ${response.status} ${response.statusText}`);
-        }
-        
-        // Проверяем, что ответ действительно файл (Excel или CSV)
-        const contentType = response.headers.get('content-type');
-        const isExcel = contentType && contentType.includes('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet');
-        const isCSV = contentType && contentType.includes('text/csv');
-        
-        if (!contentType || (!isExcel && !isCSV)) {
-            const errorText = await response.text();
-            console.error('Неожиданный тип ответа:', contentType, errorText);
-            throw new Error('Сервер вернул неожиданный тип данных');
-        }
-        
-        // Скачиваем файл
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        
-        // Определяем расширение файла по типу контента
-        const fileExtension = isExcel ? 'xlsx' : 'csv';
-        const filePrefix = hasSelectedAnimals ? `selected_${animalType}s` : `${animalType}s`;
-        a.download = `${filePrefix}_${new Date().toISOString().split('T')[0]}.${fileExtension}`;
-        
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
-        document.body.removeChild(a);
-        
+
         closeExportModal();
-        const formatName = isExcel ? 'Excel' : 'CSV';
+        const formatName = job.filename && job.filename.endsWith('.csv') ? 'CSV' : 'Excel';
         const exportType = hasSelectedAnimals ? 'выбранных животных' : 'всех животных';
         alert(`Файл с ${exportType} успешно экспортирован в формате ${formatName}!`);
     } catch (error) {
         console.error('Ошибка экспорта:', error);
         alert(`Ошибка при экспорте файла: ${error.message}`);
+    } finally {
+        if (exportButton) {
+            exportButton.disabled = false;
+            exportButton.textContent = originalText;
+        }
     }
 }
 
@@ -0,0 +1,88 @@
+// Фоновые выгрузки: постановка в очередь, опрос прогресса и скачивание готового файла
+
+const EXPORT_JOB_POLL_INTERVAL = 1500;
+// Если задачу так и не взяли в работу, обработчик выгрузок, скорее всего, не запущен
+const EXPORT_JOB_PENDING_TIMEOUT = 60000;
+
+function getExportJobCSRFToken() {
+    const cookies = document.cookie.split(';');
+    for (let cookie of cookies) {
+        const [name, value] = cookie.trim().split('=');
+        if (name === 'csrftoken') {
+            return decodeURIComponent(value);
+        }
+    }
+    const csrfInput = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    return csrfInput ? csrfInput.value : '';
+}
+
+async function readExportJobResponse(response) {
+    let data = {};
+    try {
+        data = await response.json();
+    } catch (_) {
+        // Ответ без JSON — сообщение сформируем по статусу
+    }
+    if (!response.ok) {
+        throw new Error(data.error || data.detail || `Ошибка сервера: ${response.status}`);
+    }
+    return data;
+}
+
+function downloadExportJobFile(job) {
+    const link = document.createElement('a');
+    link.href = job.download_url;
+    link.download = job.filename || '';
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+}
+
+/**
+ * Ставит выгрузку в очередь, ждет ее завершения и скачивает файл.
+ * kind — тип выгрузки ('herd', 'animal_detail', 'kinship_pairs'), params — ее параметры.
+ * options.onProgress(job) вызывается при каждом опросе состояния.
+ * Возвращает завершенную задачу; при ошибке выгрузки выбрасывает Error.
+ */
+async function runExportJob(kind, params, options = {}) {
+    const onProgress = options.onProgress || (() => {});
+    const response = await fetch('/animals/api/export-jobs/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getExportJobCSRFToken(),
+        },
+        body: JSON.stringify({ kind, params }),
+    });
+    let job = await readExportJobResponse(response);
+    onProgress(job);
+
+    const startedAt = Date.now();
+    while (job.status === 'pending' || job.status === 'running') {
+        if (job.status === 'pending' && Date.now() - startedAt > EXPORT_JOB_PENDING_TIMEOUT) {
+            throw new Error('Выгрузка не начата: обработчик фоновых выгрузок не запущен');
+        }
+        await new Promise((resolve) => setTimeout(resolve, EXPORT_JOB_POLL_INTERVAL));
+        job = await readExportJobResponse(await fetch(`/animals/api/export-jobs/${job.id}/`));
+        onProgress(job);
+    }
+
+    if (job.status !== 'done') {
+        throw new Error(job.error || 'Выгрузка завершилась ошибкой');
+    }
+    downloadExportJobFile(job);
+    return job;
+}
+
+function formatExportJobProgress(job) {
+    if (job.status === 'pending') {
+        return 'В очереди...';
+    }
+    if (job.status === 'running') {
+        return `Выгрузка... ${job.progress}%`;
+    }
+    return job.status_display;
+}
+
+window.runExportJob = runExportJob;
+window.formatExportJobProgress = formatExportJobProgress;
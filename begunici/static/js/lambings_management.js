@@ -2272,42 +2272,14 @@ async function exportKinshipPairsToExcel() {
     exportButton.textContent = 'Экспорт...';
 
     try {
-        const response = await fetch('/animals/api/kinship-pairs/export-excel/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCSRFToken()
-            },
-            body: JSON.stringify({
-                father_tag: selectedKinshipFather.tag_number,
-                mother_tags: Array.from(selectedKinshipMothersData.values()).map(m => m.tag_number)
-            })
-        });
-
-        if (!response.ok) {
-            let errorMessage = 'Ошибка экспорта';
-            try {
-                const errorData = await response.json();
-                errorMessage = errorData.error || errorData.detail || errorMessage;
-            } catch (jsonError) {
-                // no-op
+        await window.runExportJob('kinship_pairs', {
+            father_tag: selectedKinshipFather.tag_number,
+            mother_tags: Array.from(selectedKinshipMothersData.values()).map(m => m.tag_number)
+        }, {
+            onProgress: (job) => {
+                exportButton.textContent = window.formatExportJobProgress(job);
             }
-            throw new Error(errorMessage);
-        }
-
-        const blob = await response.blob();
-        const disposition = response.headers.get('Content-Disposition') || '';
-        const filenameMatch = disposition.match(/filename=\"?([^\";]+)\"?/i);
-        const filename = filenameMatch ? filenameMatch[1] : 'kinship_pairs.xlsx';
-
-        const downloadUrl = window.URL.createObjectURL(blob);
-        const link = document.createElement('a');
-        link.href = downloadUrl;
-        link.download = filename;
-        document.body.appendChild(link);
-        link.click();
-        link.remove();
-        window.URL.revokeObjectURL(downloadUrl);
+        });
     } catch (error) {
         console.error('Ошибка экспорта подбора пар:', error);
         alert(`Не удалось экспортировать подбор пар: ${error.message || 'Неизвестная ошибка'}`);
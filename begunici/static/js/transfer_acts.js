@@ -30,6 +30,18 @@ function downloadTransferAct(actNumber) {
     document.body.removeChild(link);
 }
 
+function downloadTransferActsBulk(output) {
+    const params = new URLSearchParams({ kind: "transfer", output });
+    setFilterParams(params);
+
+    const link = document.createElement("a");
+    link.href = `/animals/api/acts/bulk/?${params.toString()}`;
+    link.target = "_blank";
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
 function getFilterValues() {
     return {
         transferDate: document.getElementById("transfer-date-filter")?.value || "",
@@ -216,5 +228,6 @@ document.addEventListener("DOMContentLoaded", () => {
 });
 
 window.downloadTransferActFromActs = downloadTransferAct;
+window.downloadTransferActsBulk = downloadTransferActsBulk;
 window.applyTransferActFilters = applyTransferActFilters;
 window.resetTransferActFilters = resetTransferActFilters;